@@ -0,0 +1,114 @@
+import asyncio
+import time
+
+import aiohttp
+
+from CBLClient.ValueSerializer import ValueSerializer
+from CBLClient.Args import Args
+from keywords import instrumentation
+from keywords.instrumentation import method_template
+from keywords.utils import log_info
+
+
+class AsyncTransport(object):
+    """ Keep-alive HTTP connection pool shared by the AsyncClients of one event loop.
+
+    A single pool lets one event loop drive many TestServer endpoints
+    concurrently without a thread or process per device.
+    """
+
+    # event loop -> default transport
+    _defaults = {}
+
+    def __init__(self, limit=200, limit_per_host=8, keepalive_timeout=60, timeout=None):
+        self._limit = limit
+        self._limit_per_host = limit_per_host
+        self._keepalive_timeout = keepalive_timeout
+        self._timeout = timeout
+        self._session = None
+
+    @classmethod
+    def default(cls):
+        """ Transport shared by every AsyncClient created without one on the running loop """
+        loop = asyncio.get_running_loop()
+        transport = cls._defaults.get(loop)
+        if transport is None or transport.closed:
+            transport = cls()
+            cls._defaults[loop] = transport
+        return transport
+
+    @property
+    def closed(self):
+        return self._session is not None and self._session.closed
+
+    def _get_session(self):
+        if self._session is None:
+            connector = aiohttp.TCPConnector(limit=self._limit,
+                                             limit_per_host=self._limit_per_host,
+                                             keepalive_timeout=self._keepalive_timeout)
+            self._session = aiohttp.ClientSession(connector=connector,
+                                                  headers={"Content-Type": "application/json"},
+                                                  timeout=aiohttp.ClientTimeout(total=self._timeout))
+        return self._session
+
+    async def post(self, url, body):
+        """ POST body to url, returns (status code, response content) """
+        start = time.perf_counter()
+        async with self._get_session().post(url, data=body) as resp:
+            content = await resp.read()
+        instrumentation.record("cbl", "POST", method_template(url), resp.status, len(body), len(content),
+                               time.perf_counter() - start)
+        return resp.status, content
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+        for loop, transport in list(self._defaults.items()):
+            if transport is self:
+                del self._defaults[loop]
+
+
+class AsyncClient(object):
+    """ asyncio counterpart of CBLClient.Client: invokeMethod is a coroutine.
+
+        async def run(base_urls):
+            dbs = [AsyncDatabase(base_url) for base_url in base_urls]
+            cbl_dbs = await asyncio.gather(*[db.create("db") for db in dbs])
+    """
+
+    def __init__(self, base_url, transport=None):
+        self.base_url = base_url
+        self._transport = transport
+
+    @property
+    def transport(self):
+        if self._transport is None:
+            return AsyncTransport.default()
+        return self._transport
+
+    async def invokeMethod(self, method, args=None, ignore_deserialize=False):
+        url = self.base_url + "/" + method
+        content = b""
+        try:
+            status, content = await self.transport.post(url, ValueSerializer.serialize_args(args))
+            if status >= 400:
+                raise Exception("{} Error for url: {}".format(status, url))
+            if status == 200:
+                result = content
+                if ignore_deserialize:
+                    return result
+                result = result.decode('utf8', 'ignore')
+                if len(result) < 25:
+                    # Only print short messages
+                    log_info("For url: {} Got response: {}".format(url, result))
+                return ValueSerializer.deserialize(result)
+        except Exception as err:
+            if content:
+                raise Exception(str(err) + content.decode('utf8', 'ignore'))
+            else:
+                raise Exception(str(err))
+
+    async def release(self, obj):
+        args = Args()
+        args.setMemoryPointer("object", obj)
+        await self.invokeMethod("release", args)
@@ -0,0 +1,186 @@
+import copy
+
+from CBLClient.Args import Args
+from CBLClient.AsyncClient import AsyncClient
+from CBLClient.Database import Database
+from CBLClient.Document import Document
+from keywords.utils import log_info
+
+
+class AsyncDatabase(Database):
+    """ Database wrapper driven by an AsyncClient.
+
+    Every single call method of Database returns the AsyncClient coroutine
+    and has to be awaited. The bulk helpers that chain several calls are
+    reimplemented as coroutines below, the paging helpers as async generators
+    (async for doc_id, doc_body in db.iter_documents(cbl_db)).
+    """
+
+    def __init__(self, base_url, transport=None):
+        super(AsyncDatabase, self).__init__(base_url)
+        self._client = AsyncClient(base_url, transport)
+        self._collection._client = self._client
+
+    async def create_bulk_docs(self, number, id_prefix, db, channels=None, generator=None, attachments_generator=None, id_start_num=0, attachment_file_list=None, collection=None):
+        added_docs = self._generate_bulk_docs(number, id_prefix, channels, generator, attachments_generator,
+                                              id_start_num, attachment_file_list)
+        if collection:
+            await self._collection.collectionSaveDocuments(db, added_docs, collection)
+        else:
+            await self.saveDocuments(db, added_docs)
+        return list(added_docs.keys())
+
+    async def delete_bulk_docs(self, database, doc_ids=[]):
+        if not doc_ids:
+            doc_ids = await self.getDocIds(database)
+        args = Args()
+        args.setMemoryPointer("database", database)
+        args.setArray("doc_ids", doc_ids)
+        return await self._client.invokeMethod("database_deleteBulkDocs", args)
+
+    async def iter_doc_ids(self, database, page_size=1000):
+        offset = 0
+        while True:
+            doc_ids = await self.getDocIds(database, limit=page_size, offset=offset)
+            if not doc_ids:
+                return
+            for doc_id in doc_ids:
+                yield doc_id
+            if len(doc_ids) < page_size:
+                return
+            offset += page_size
+
+    async def iter_document_pages(self, database, page_size=1000, doc_ids=None):
+        if doc_ids is None:
+            doc_ids = self.iter_doc_ids(database, page_size)
+        page_ids = []
+        async for doc_id in _aiter(doc_ids):
+            page_ids.append(doc_id)
+            if len(page_ids) == page_size:
+                yield await self.getDocuments(database, page_ids)
+                page_ids = []
+        if page_ids:
+            yield await self.getDocuments(database, page_ids)
+
+    async def iter_documents(self, database, page_size=1000, doc_ids=None):
+        async for page in self.iter_document_pages(database, page_size, doc_ids):
+            for doc_id, doc_body in page.items():
+                yield doc_id, doc_body
+
+    async def update_bulk_docs(self, database, number_of_updates=1, doc_ids=[], key="updates-cbl", page_size=1000):
+        log_info("updating bulk docs")
+
+        updated = 0
+        async for docs in self.iter_document_pages(database, page_size, doc_ids or None):
+            for _ in range(number_of_updates):
+                for doc in docs:
+                    doc_body = docs[doc]
+                    if key not in doc_body:
+                        doc_body[key] = 0
+                    doc_body[key] = doc_body[key] + 1
+                await self.updateDocuments(database, docs)
+            updated += len(docs)
+        if updated < 1:
+            raise Exception("cbl docs are empty , cannot update docs")
+
+    async def update_all_docs_individually(self, database, num_of_updates=1):
+        doc_ids = await self.getDocIds(database)
+        doc_obj = Document(self.base_url)
+        doc_obj._client = self._client
+        for i in range(num_of_updates):
+            for doc_id in doc_ids:
+                doc_mem = await self.getDocument(database, doc_id)
+                doc_mut = await doc_obj.toMutable(doc_mem)
+                doc_body = await doc_obj.toMap(doc_mut)
+                if "updates-cbl" not in doc_body:
+                    doc_body["updates-cbl"] = 0
+                doc_body["updates-cbl"] = doc_body["updates-cbl"] + 1
+                await self.updateDocument(database, doc_body, doc_id)
+
+    async def deleteDBIfExists(self, db_name):
+        if await self.exists(db_name):
+            await self.deleteDBbyName(db_name)
+
+    async def deleteDBIfExistsCreateNew(self, db_name):
+        if await self.exists(db_name):
+            await self.deleteDBbyName(db_name)
+        return await self.create(db_name)
+
+    async def cbl_delete_bulk_docs(self, cbl_db):
+        cbl_doc_ids = await self.getDocIds(cbl_db)
+        for id in cbl_doc_ids:
+            doc = await self.getDocument(cbl_db, id)
+            await self.delete(cbl_db, doc)
+
+    async def getBulkDocs(self, cbl_db):
+        cbl_doc_ids = await self.getDocIds(cbl_db)
+        return await self.getDocuments(cbl_db, cbl_doc_ids)
+
+    async def update_bulk_docs_by_deleting_blobs(self, database, doc_ids=[]):
+        updated_docs = {}
+        if not doc_ids:
+            doc_ids = await self.getDocIds(database)
+
+        docs = await self.getDocuments(database, doc_ids)
+        if len(docs) < 1:
+            raise Exception("cbl docs are empty , cannot update docs")
+        for doc in docs:
+            doc_body = docs[doc]
+            del doc_body["_attachments"]
+            updated_docs[doc] = doc_body
+        await self.updateDocuments(database, updated_docs)
+
+    async def update_bulk_docs_with_blob(self, database, dictionary, blob, liteserv_platform, number_of_updates=1, doc_ids=[]):
+        # Drive the Dictionary and Blob calls through this database's AsyncClient
+        dictionary = copy.copy(dictionary)
+        dictionary._client = self._client
+        blob = copy.copy(blob)
+        blob._client = self._client
+
+        updated_docs = {}
+        if not doc_ids:
+            doc_ids = await self.getDocIds(database)
+        log_info("updating bulk docs")
+
+        docs = await self.getDocuments(database, doc_ids)
+        if len(docs) < 1:
+            raise Exception("cbl docs are empty , cannot update docs")
+        for _ in range(number_of_updates):
+            for doc in docs:
+                doc_body = docs[doc]
+                if "updates-cbl" not in doc_body:
+                    doc_body["updates-cbl"] = 0
+                doc_body["updates-cbl"] = doc_body["updates-cbl"] + 1
+
+                mutable_dictionary = await dictionary.toMutableDictionary(doc_body)
+                if liteserv_platform == "android":
+                    image_content = await blob.createImageContent("/assets/golden_gate_large.jpg")
+                    blob_value = await blob.create("image/jpeg", stream=image_content)
+                elif liteserv_platform in ["xamarin-android", "java-macosx", "java-msft", "java-ubuntu", "java-centos",
+                                           "javaws-macosx", "javaws-msft", "javaws-ubuntu", "javaws-centos"]:
+                    image_content = await blob.createImageContent("golden_gate_large.jpg")
+                    blob_value = await blob.create("image/jpeg", stream=image_content)
+                elif liteserv_platform == "ios":
+                    image_content = await blob.createImageContent("Files/golden_gate_large.jpg")
+                    blob_value = await blob.create("image/jpeg", content=image_content)
+                elif liteserv_platform == "net-msft":
+                    db_path = (await self.getPath(database)).rstrip("\\")
+                    app_dir = "\\".join(db_path.split("\\")[:-2])
+                    image_content = await blob.createImageContent("{}\\Files\\golden_gate_large.jpg".format(app_dir))
+                    blob_value = await blob.create("image/jpeg", stream=image_content)
+                else:
+                    image_content = await blob.createImageContent("Files/golden_gate_large.jpg")
+                    blob_value = await blob.create("image/jpeg", stream=image_content)
+                await dictionary.setBlob(mutable_dictionary, "_attachments", blob_value)
+                updated_docs[doc] = doc_body
+            await self.updateDocuments(database, updated_docs)
+
+
+async def _aiter(items):
+    """ Async iterator over 'items', a plain or an async iterable """
+    if hasattr(items, "__aiter__"):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
@@ -0,0 +1,15 @@
+from CBLClient.AsyncClient import AsyncClient
+from CBLClient.Query import Query
+
+
+class AsyncQuery(Query):
+    """ Query wrapper driven by an AsyncClient.
+    Every method of Query returns the AsyncClient coroutine and has to be awaited.
+    """
+
+    def __init__(self, base_url, transport=None):
+        super(AsyncQuery, self).__init__(base_url)
+        self._client = AsyncClient(base_url, transport)
+
+    def release(self, obj):
+        return self._client.release(obj)
@@ -0,0 +1,104 @@
+import asyncio
+import time
+from functools import partial
+
+from CBLClient.Args import Args
+from CBLClient.AsyncClient import AsyncClient
+from CBLClient.Authenticator import Authenticator
+from CBLClient.Replication import Replication
+from keywords.utils import log_info
+from keywords.timeutils import async_wait_until, Backoff
+
+
+class AsyncReplication(Replication):
+    """ Replication wrapper driven by an AsyncClient.
+
+    Every single call method of Replication returns the AsyncClient coroutine
+    and has to be awaited. The helpers that poll the replicator sleep with
+    asyncio.sleep so many replicators can be waited on from one event loop.
+    """
+
+    def __init__(self, base_url, transport=None):
+        super(AsyncReplication, self).__init__(base_url)
+        self._client = AsyncClient(base_url, transport)
+
+    async def stop(self, replicator, max_times=15):
+        args = Args()
+        args.setMemoryPointer("replicator", replicator)
+        await self._client.invokeMethod("replicator_stop", args)
+
+        async def replicator_stopped():
+            return await self.getActivitylevel(replicator) == "stopped"
+
+        await async_wait_until(replicator_stopped, timeout=max_times * 2, backoff=Backoff(maximum=2),
+                               name="replicator_stop", raise_on_timeout=False)
+        activity_level = await self.getActivitylevel(replicator)
+        if activity_level != "stopped":
+            raise Exception("Failed to stop the replicator: {}".format(activity_level))
+
+    async def configure_and_replicate(self, source_db, replicator_authenticator=None, target_db=None, target_url=None, replication_type="push_pull", continuous=True,
+                                      channels=None, err_check=True, wait_until_idle=True, heartbeat=None, auto_purge=None, encryptor=None):
+        if target_db is None:
+            repl_config = await self.configure(source_db, target_url=target_url, continuous=continuous,
+                                               replication_type=replication_type, channels=channels, replicator_authenticator=replicator_authenticator, heartbeat=heartbeat, auto_purge=auto_purge, encryptor=encryptor)
+        else:
+            repl_config = await self.configure(source_db, target_db=target_db, continuous=continuous,
+                                               replication_type=replication_type, channels=channels, replicator_authenticator=replicator_authenticator, heartbeat=heartbeat, auto_purge=auto_purge, encryptor=encryptor)
+        repl = await self.create(repl_config)
+        await self.start(repl)
+        if wait_until_idle:
+            await self.wait_until_replicator_idle(repl, err_check)
+        else:
+            await self.yield_for_replicator_connected(repl)
+        return repl
+
+    async def yield_for_replicator_connected(self, repl, max_times=5, sleep_time=0.5):
+        count = 0
+        # Sleep until replicator gets connected
+        activity_level = await self.getActivitylevel(repl)
+        while count < max_times:
+            await asyncio.sleep(sleep_time)
+            if activity_level == "connecting":
+                count += 1
+            else:
+                break
+
+    async def wait_until_replicator_idle(self, repl, err_check=True, max_times=150, sleep_time=2, max_timeout=600, idle_settle_time=None):
+        if idle_settle_time is None:
+            idle_settle_time = sleep_time
+
+        # Load the current replicator config to decide retry strategy
+        repl_config = await self.getConfig(repl)
+        isContinous = await self.isContinuous(repl_config)
+        log_info("The current replicator sets continuous to {}".format(isContinous))
+
+        state = {"begin": time.time(), "idle_since": None}
+
+        async def replicator_idle():
+            err = await self.getError(repl) if err_check else None
+            return self._replicator_done(state, await self.getActivitylevel(repl), await self.getTotal(repl), await self.getCompleted(repl),
+                                         err, isContinous, max_timeout, idle_settle_time)
+
+        await async_wait_until(replicator_idle, timeout=max_times * sleep_time, backoff=Backoff(maximum=sleep_time),
+                               name="wait_until_replicator_idle", raise_on_timeout=False)
+
+    async def create_session_configure_replicate(self, baseUrl, sg_admin_url, sg_db, username, password,
+                                                 channels, sg_client, cbl_db, sg_blip_url, replication_type=None,
+                                                 continuous=True, max_retries=None, max_retry_wait_time=None, encryptor=None, auth=None, collection=None):
+
+        authenticator = Authenticator(baseUrl)
+        authenticator._client = self._client
+        # MobileRestClient is blocking, keep it off the event loop
+        loop = asyncio.get_running_loop()
+        cookie, session_id = await loop.run_in_executor(None, partial(sg_client.create_session, sg_admin_url, sg_db, username, auth=auth))
+        session = cookie, session_id
+        replicator_authenticator = await authenticator.authentication(session_id, cookie, authentication_type="session")
+        repl_config = await self.configure(cbl_db, sg_blip_url, continuous=continuous, channels=channels,
+                                           replication_type=replication_type,
+                                           replicator_authenticator=replicator_authenticator,
+                                           max_retries=max_retries, max_retry_wait_time=max_retry_wait_time, encryptor=encryptor)
+        repl = await self.create(repl_config)
+        await self.start(repl)
+        await self.wait_until_replicator_idle(repl)
+
+        return session, replicator_authenticator, repl
@@ -1,34 +1,173 @@
 import json
+import threading
+from contextlib import contextmanager
 
 from requests import Session
 from requests import Response
 from CBLClient.ValueSerializer import ValueSerializer
+from CBLClient.MemoryPointer import MemoryPointer
 from CBLClient.Args import Args
+from keywords.instrumentation import instrument_session, method_template
 from keywords.utils import log_info
 
+# Status codes returned by TestServer builds that do not know the batch endpoint
+BATCH_UNSUPPORTED_STATUS_CODES = [404, 405, 501]
+
+
+class BatchResult(MemoryPointer):
+    """ Placeholder returned by Client.invokeMethod while a batch is open.
+
+    Until the batch is flushed the address is a reference ("$<index>") to the result
+    of an earlier call in the same batch, so a BatchResult can be passed with
+    Args.setMemoryPointer to later calls. Once the batch is flushed, getAddress()
+    returns the real memory address (for pointer results) and get() the deserialized value.
+    """
+
+    def __init__(self, index):
+        super(BatchResult, self).__init__("${}".format(index))
+        self._resolved = False
+        self._value = None
+
+    def resolve(self, value):
+        self._value = value
+        self._resolved = True
+        if isinstance(value, MemoryPointer):
+            self._address = value.getAddress()
+
+    def is_resolved(self):
+        return self._resolved
+
+    def get(self):
+        if not self._resolved:
+            raise RuntimeError("Batch result is not available until the batch is flushed")
+        return self._value
+
+
+class Batch(object):
+    """ Queue of method invocations sent to the TestServer as one request """
+
+    def __init__(self, client, max_calls=None):
+        self._client = client
+        self._max_calls = max_calls
+        self._calls = []
+
+    def __len__(self):
+        return len(self._calls)
+
+    def add(self, method, args, ignore_deserialize):
+        result = BatchResult(len(self._calls))
+        # Snapshot the args, the caller is free to reuse the Args object
+        arg_list = list(args) if args else []
+        self._calls.append((method, arg_list, ignore_deserialize, result))
+        if self._max_calls is not None and len(self._calls) >= self._max_calls:
+            self.flush()
+        return result
+
+    def flush(self):
+        """ Send the queued calls and resolve their BatchResults.
+
+        Falls back to one request per call if the TestServer does not
+        implement the batch endpoint.
+        """
+        calls = self._calls
+        self._calls = []
+        if not calls:
+            return
+
+        results = None
+        if Client.supports_batch(self._client.base_url):
+            results = self._client._invoke_batch(calls)
+
+        if results is None:
+            for method, args, ignore_deserialize, result in calls:
+                result.resolve(self._client._invoke(method, args, ignore_deserialize))
+            return
+
+        if len(results) != len(calls):
+            raise Exception("Batch returned {} results for {} calls".format(len(results), len(calls)))
+
+        for (method, args, ignore_deserialize, result), raw in zip(calls, results):
+            if ignore_deserialize:
+                result.resolve(raw.encode("utf8") if raw is not None else raw)
+            else:
+                result.resolve(ValueSerializer.deserialize(raw))
+
 
 class Client(object):
 
+    # base_url -> False once a TestServer has rejected the batch endpoint
+    _batch_support = {}
+    _batch_support_lock = threading.Lock()
+
+    # Open batches, per thread and per base_url
+    _local = threading.local()
+
     def __init__(self, base_url):
         self.base_url = base_url
         self.session = Session()
+        self.session.headers.update({"Content-Type": "application/json"})
+        instrument_session(self.session, "cbl", template=method_template)
+
+    @classmethod
+    def supports_batch(cls, base_url):
+        return cls._batch_support.get(base_url, True)
+
+    @classmethod
+    def _active_batches(cls):
+        if not hasattr(cls._local, "batches"):
+            cls._local.batches = {}
+        return cls._local.batches
+
+    @contextmanager
+    def batch(self, max_calls=1000):
+        """ Queue every invokeMethod call made against this TestServer
+        (from any wrapper sharing the base_url) and send them as one request
+        when the block exits. Calls return BatchResult placeholders.
+
+        Nested batches join the outer one. If the block raises, the queued calls are dropped.
+
+            with db._client.batch():
+                for doc_id in doc_ids:
+                    doc = db.getDocument(cbl_db, doc_id)
+                    db.delete(cbl_db, doc)
+        """
+        active = self._active_batches()
+        if self.base_url in active:
+            yield active[self.base_url]
+            return
+
+        batch = Batch(self, max_calls=max_calls)
+        active[self.base_url] = batch
+        try:
+            yield batch
+        finally:
+            del active[self.base_url]
+        batch.flush()
 
     def invokeMethod(self, method, args=None, ignore_deserialize=False):
+        batch = self._active_batches().get(self.base_url)
+        if batch is not None:
+            return batch.add(method, args, ignore_deserialize)
+        return self._invoke(method, args, ignore_deserialize)
+
+    @staticmethod
+    def _serialize_args(args):
+        body = {}
+        if args:
+            for k, v in args:
+                body[k] = ValueSerializer.serialize(v)
+        return body
+
+    def _invoke(self, method, args=None, ignore_deserialize=False):
         resp = Response()
         try:
-            # Create body from args.
-            body = {}
-
             url = self.base_url + "/" + method
 
-            if args:
-                for k, v in args:
-                    val = ValueSerializer.serialize(v)
-                    body[k] = val
+            # Create body from args.
+            body = ValueSerializer.serialize_args(args)
+
             # Create connection to method endpoint.
-            headers = {"Content-Type": "application/json"}
-            self.session.headers = headers
-            resp = self.session.post(url, data=json.dumps(body))
+            resp = self.session.post(url, data=body)
             resp.raise_for_status()
             responseCode = resp.status_code
             if responseCode == 200:
@@ -50,6 +189,33 @@ class Client(object):
             else:
                 raise Exception(str(err))
 
+    def _invoke_batch(self, calls):
+        """ POST the calls to the batch endpoint.
+        Returns the list of serialized results, or None if the endpoint is not supported.
+        """
+        resp = Response()
+        try:
+            url = self.base_url + "/batch"
+            body = {
+                "calls": [{"method": method, "args": self._serialize_args(args)} for method, args, _, _ in calls]
+            }
+            resp = self.session.post(url, data=json.dumps(body))
+            if resp.status_code in BATCH_UNSUPPORTED_STATUS_CODES:
+                log_info("{} does not support batched calls, falling back to one call per request".format(self.base_url))
+                with Client._batch_support_lock:
+                    Client._batch_support[self.base_url] = False
+                return None
+            resp.raise_for_status()
+            return resp.json()
+        except Exception as err:
+            if resp.content:
+                cont = resp.content
+                if isinstance(resp.content, bytes):
+                    cont = resp.content.decode('utf8', 'ignore')
+                raise Exception(str(err) + cont)
+            else:
+                raise Exception(str(err))
+
     def release(self, obj):
         args = Args()
         args.setMemoryPointer("object", obj)
@@ -5,7 +5,7 @@ from CBLClient.Collection import Collection
 from CBLClient.Args import Args
 from keywords.utils import log_info
 from keywords import types
-from libraries.data import doc_generators
+from libraries.data.doc_factory import get_doc_factory
 from .Document import Document
 from keywords import attachment
 
@@ -227,22 +227,25 @@ class Database(object):
         Add a 'number' of docs with a prefix 'id_prefix' using the provided generator from libraries.data.doc_generators.
         ex. id_prefix=testdoc with a number of 3 would create 'testdoc_0', 'testdoc_1', and 'testdoc_2'
         """
+        added_docs = self._generate_bulk_docs(number, id_prefix, channels, generator, attachments_generator,
+                                              id_start_num, attachment_file_list)
+        if collection:
+            self._collection.collectionSaveDocuments(db, added_docs, collection)
+        else:
+            self.saveDocuments(db, added_docs)
+        return list(added_docs.keys())
+
+    def _generate_bulk_docs(self, number, id_prefix, channels=None, generator=None, attachments_generator=None,
+                            id_start_num=0, attachment_file_list=None):
+        """ Build the {doc_id: doc_body} map saved by create_bulk_docs """
         added_docs = {}
         if channels is not None:
             types.verify_is_list(channels)
 
         log_info("PUT {} docs to with prefix {}".format(number, id_prefix))
 
-        for i in range(id_start_num, id_start_num + number):
-
-            if generator == "four_k":
-                doc_body = doc_generators.four_k()
-            elif generator == "simple_user":
-                doc_body = doc_generators.simple_user()
-            elif generator == "complex_doc":
-                doc_body = doc_generators.complex_doc()
-            else:
-                doc_body = doc_generators.simple()
+        bodies = get_doc_factory(generator).iter_docs(number)
+        for i, doc_body in zip(range(id_start_num, id_start_num + number), bodies):
 
             if channels is not None:
                 doc_body["channels"] = channels
@@ -262,11 +265,7 @@ class Database(object):
 
             doc_body["id"] = doc_id
             added_docs[doc_id] = doc_body
-        if collection:
-            self._collection.collectionSaveDocuments(db, added_docs, collection)
-        else:
-            self.saveDocuments(db, added_docs)
-        return list(added_docs.keys())
+        return added_docs
 
     def delete_bulk_docs(self, database, doc_ids=[]):
         if not doc_ids:
@@ -276,40 +275,84 @@ class Database(object):
         args.setArray("doc_ids", doc_ids)
         return self._client.invokeMethod("database_deleteBulkDocs", args)
 
-    def update_bulk_docs(self, database, number_of_updates=1, doc_ids=[], key="updates-cbl"):
+    def iter_doc_ids(self, database, page_size=1000):
+        """ Yield every doc id of the database, fetching 'page_size' ids per call """
+        offset = 0
+        while True:
+            doc_ids = self.getDocIds(database, limit=page_size, offset=offset)
+            if not doc_ids:
+                return
+            for doc_id in doc_ids:
+                yield doc_id
+            if len(doc_ids) < page_size:
+                return
+            offset += page_size
+
+    def iter_document_pages(self, database, page_size=1000, doc_ids=None):
+        """ Yield {doc_id: doc_body} dicts of at most 'page_size' docs.
+        Pages through every doc of the database, or through 'doc_ids' (any iterable) if provided,
+        so only one page is held in memory on either side.
+        """
+        if doc_ids is None:
+            doc_ids = self.iter_doc_ids(database, page_size)
+        page_ids = []
+        for doc_id in doc_ids:
+            page_ids.append(doc_id)
+            if len(page_ids) == page_size:
+                yield self.getDocuments(database, page_ids)
+                page_ids = []
+        if page_ids:
+            yield self.getDocuments(database, page_ids)
+
+    def iter_documents(self, database, page_size=1000, doc_ids=None):
+        """ Yield (doc_id, doc_body) for every doc of the database (or of 'doc_ids'),
+        fetched 'page_size' docs at a time.
+        """
+        for page in self.iter_document_pages(database, page_size, doc_ids):
+            for doc_id, doc_body in page.items():
+                yield doc_id, doc_body
 
-        updated_docs = {}
-        if not doc_ids:
-            doc_ids = self.getDocIds(database)
+    def update_bulk_docs(self, database, number_of_updates=1, doc_ids=[], key="updates-cbl", page_size=1000):
+        """ Increment 'key' 'number_of_updates' times on every doc (or on 'doc_ids'),
+        one page of 'page_size' docs at a time
+        """
         log_info("updating bulk docs")
 
-        docs = self.getDocuments(database, doc_ids)
-        if len(docs) < 1:
+        updated = 0
+        for docs in self.iter_document_pages(database, page_size, doc_ids or None):
+            for _ in range(number_of_updates):
+                for doc in docs:
+                    doc_body = docs[doc]
+                    if key not in doc_body:
+                        doc_body[key] = 0
+                    doc_body[key] = doc_body[key] + 1
+                self.updateDocuments(database, docs)
+            updated += len(docs)
+        if updated < 1:
             raise Exception("cbl docs are empty , cannot update docs")
-        for _ in range(number_of_updates):
-            for doc in docs:
-                doc_body = docs[doc]
-                if key not in doc_body:
-                    doc_body[key] = 0
-                doc_body[key] = doc_body[key] + 1
-                updated_docs[doc] = doc_body
-            self.updateDocuments(database, updated_docs)
 
     def update_all_docs_individually(self, database, num_of_updates=1):
         doc_ids = self.getDocIds(database)
         doc_obj = Document(self.base_url)
         for i in range(num_of_updates):
-            for doc_id in doc_ids:
-                doc_mem = self.getDocument(database, doc_id)
-                doc_mut = doc_obj.toMutable(doc_mem)
-                doc_body = doc_obj.toMap(doc_mut)
-                try:
-                    doc_body["updates-cbl"]
-                except Exception:
-                    doc_body["updates-cbl"] = 0
-
-                doc_body["updates-cbl"] = doc_body["updates-cbl"] + 1
-                self.updateDocument(database, doc_body, doc_id)
+            # One round trip to read every doc, one to write them back
+            doc_maps = {}
+            with self._client.batch():
+                for doc_id in doc_ids:
+                    doc_mem = self.getDocument(database, doc_id)
+                    doc_mut = doc_obj.toMutable(doc_mem)
+                    doc_maps[doc_id] = doc_obj.toMap(doc_mut)
+
+            with self._client.batch():
+                for doc_id, doc_map in doc_maps.items():
+                    doc_body = doc_map.get()
+                    try:
+                        doc_body["updates-cbl"]
+                    except Exception:
+                        doc_body["updates-cbl"] = 0
+
+                    doc_body["updates-cbl"] = doc_body["updates-cbl"] + 1
+                    self.updateDocument(database, doc_body, doc_id)
 
     def deleteDBIfExists(self, db_name):
         if self.exists(db_name):
@@ -322,9 +365,10 @@ class Database(object):
 
     def cbl_delete_bulk_docs(self, cbl_db):
         cbl_doc_ids = self.getDocIds(cbl_db)
-        for id in cbl_doc_ids:
-            doc = self.getDocument(cbl_db, id)
-            self.delete(cbl_db, doc)
+        with self._client.batch():
+            for id in cbl_doc_ids:
+                doc = self.getDocument(cbl_db, id)
+                self.delete(cbl_db, doc)
 
     def getBulkDocs(self, cbl_db):
         cbl_doc_ids = self.getDocIds(cbl_db)
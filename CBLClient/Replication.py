@@ -5,6 +5,7 @@ from CBLClient.Client import Client
 from CBLClient.Args import Args
 from CBLClient.Authenticator import Authenticator
 from keywords.utils import log_info, is_replicator_in_connection_retry
+from keywords.timeutils import wait_until, Backoff
 from utilities.cluster_config_utils import sg_ssl_enabled
 
 
@@ -263,10 +264,8 @@ class Replication(object):
         args.setMemoryPointer("replicator", replicator)
         # return self._client.invokeMethod("replicator_stop", args)
         self._client.invokeMethod("replicator_stop", args)
-        count = 0
-        while self.getActivitylevel(replicator) != "stopped" and count < max_times:
-            time.sleep(2)
-            count += 1
+        wait_until(lambda: self.getActivitylevel(replicator) == "stopped", timeout=max_times * 2,
+                   backoff=Backoff(maximum=2), name="replicator_stop", raise_on_timeout=False)
         if self.getActivitylevel(replicator) != "stopped":
             raise Exception("Failed to stop the replicator: {}".format(self.getActivitylevel(replicator)))
 
@@ -332,58 +331,60 @@ class Replication(object):
             else:
                 break
 
-    def wait_until_replicator_idle(self, repl, err_check=True, max_times=150, sleep_time=2, max_timeout=600):
-        count = 0
-        idle_count = 0
-        max_idle_count = 20
+    def _replicator_done(self, state, activity_level, total, completed, err, is_continuous, max_timeout, idle_settle_time):
+        """ One poll of wait_until_replicator_idle, True once the replicator is stopped,
+        or has been idle with all its changes completed for 'idle_settle_time' seconds.
+        'state' carries the idle start time and the start of the wait between polls.
+        """
+        log_info("Activity level: {}".format(activity_level))
+        log_info("total vs completed = {} vs {} ".format(total, completed))
+
+        if err is not None and err != 'nil' and err != -1:
+            if not is_continuous:
+                raise Exception("Error while replicating", err)
+            if is_replicator_in_connection_retry(err) and (time.time() - state["begin"]) < max_timeout:
+                log_info("Replicator connection is retrying, please wait ......")
+            else:
+                raise Exception("Error while replicating", err)
+
+        if activity_level == "stopped":
+            if completed < total:
+                raise Exception("replication progress is not completed")
+            return True
+        if total < completed and total <= 0:
+            raise Exception("total is less than completed")
+
+        if activity_level == "idle" and not (completed < total and total != 0):
+            if state["idle_since"] is None:
+                state["idle_since"] = time.time()
+            return time.time() - state["idle_since"] >= idle_settle_time
+
+        state["idle_since"] = None
+        return False
+
+    def wait_until_replicator_idle(self, repl, err_check=True, max_times=150, sleep_time=2, max_timeout=600, idle_settle_time=None):
+        """ Wait until the replicator is stopped, or idle with all its changes completed.
+        Polls back off up to 'sleep_time' seconds apart for at most max_times * sleep_time seconds.
+        An idle replicator has to stay idle for 'idle_settle_time' seconds (default 'sleep_time')
+        so a replicator idling between two batches is not taken as done.
+        """
+        if idle_settle_time is None:
+            idle_settle_time = sleep_time
 
         # Load the current replicator config to decide retry strategy
         repl_config = self.getConfig(repl)
         isContinous = self.isContinuous(repl_config)
         log_info("The current replicator sets continuous to {}".format(isContinous))
 
-        # Sleep until replicator completely processed
-        activity_level = self.getActivitylevel(repl)
-        begin_timestamp = time.time()
-        while count < max_times:
-            log_info("Activity level: {}".format(activity_level))
-            log_info("total vs completed = {} vs {} ".format(self.getCompleted(repl), self.getTotal(repl)))
-            log_info("count is  {}".format(count))
-            log_info("Activity level {}".format(activity_level))
-            time.sleep(sleep_time)
-            if activity_level == "offline" or activity_level == "connecting" or activity_level == "busy":
-                count += 1
-                idle_count = 0
-            else:
-                if activity_level == "idle":
-                    if (self.getCompleted(repl) < self.getTotal(repl)) and self.getTotal(repl) != 0:
-                        count += 1
-                    else:
-                        idle_count += 1
-                        time.sleep(sleep_time)
-                        if idle_count > max_idle_count:
-                            break
-            cur_timestamp = time.time()
-            if err_check:
-                err = self.getError(repl)
-                if err is not None and err != 'nil' and err != -1:
-                    if not isContinous:
-                        raise Exception("Error while replicating", err)
-                    if is_replicator_in_connection_retry(err) and (cur_timestamp - begin_timestamp) < max_timeout:
-                        log_info("Replicator connection is retrying, please wait ......")
-                    else:
-                        raise Exception("Error while replicating", err)
-
-            activity_level = self.getActivitylevel(repl)
-            total = self.getTotal(repl)
-            completed = self.getCompleted(repl)
-            if activity_level == "stopped":
-                if completed < total:
-                    raise Exception("replication progress is not completed")
-                else:
-                    break
-            if total < completed and total <= 0:
-                raise Exception("total is less than completed")
+        state = {"begin": time.time(), "idle_since": None}
+
+        def replicator_idle():
+            err = self.getError(repl) if err_check else None
+            return self._replicator_done(state, self.getActivitylevel(repl), self.getTotal(repl), self.getCompleted(repl),
+                                         err, isContinous, max_timeout, idle_settle_time)
+
+        wait_until(replicator_idle, timeout=max_times * sleep_time, backoff=Backoff(maximum=sleep_time),
+                   name="wait_until_replicator_idle", raise_on_timeout=False)
 
     def addCollection(self, replicationConfiguration, collection, collection_configuration=None):
         args = Args()
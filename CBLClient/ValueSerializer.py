@@ -1,102 +1,179 @@
 import json
+import re
+from json.encoder import encode_basestring_ascii
+
 from CBLClient.MemoryPointer import MemoryPointer
 
+# Characters json.dumps (ensure_ascii=True) escapes inside a string
+_NEEDS_ESCAPE = re.compile(r'[\\"]|[^\ -~]')
+
+
+def _escape(text, level):
+    """ Return text as it appears after being embedded 'level' times as a JSON string value """
+    if level == 0 or _needs_escape(text) is None:
+        return text
+    for _ in range(level):
+        text = encode_basestring_ascii(text)[1:-1]
+    return text
+
+
+def _json_key(key):
+    """ Key as json.dumps would write it for a dict key """
+    if isinstance(key, str):
+        return key
+    return next(iter(json.loads(json.dumps({key: None}))))
 
-class ValueSerializer(object):
-    @staticmethod
-    def serialize(value):
-        if value is None or value == "None":
-            return "null"
-        elif isinstance(value, MemoryPointer):
-            return value.getAddress()
-        elif isinstance(value, str):
-            if value.endswith(",LONGTYPE"):
-                value = value.split(',')
-                return "L" + value[0]
-            else:
-                string = str(value)
-            return "\"" + string + "\""
-        elif isinstance(value, str):
-            value = value.encode('utf-8')
-            return "\"" + value + "\""
-        elif isinstance(value, bool):
-            # bool has to be before int,
-            # Python's Bool gets caught by int
-            bool_val = bool(value)
-            return "true" if bool_val else "false"
-        elif isinstance(value, int):
-            if value < 1000000 and value > -1000000:
-                number = int(value)
-                return "I" + str(number)
-            return "L" + str(value)
-        elif isinstance(value, float):
-            number = float(value)
-            return "F" + str(number)
-        # There is no double/number in python
-        elif isinstance(value, dict):
-            dict_map = value
-            string_map = {}
-            for map_param in dict_map:
-                if isinstance(dict_map[map_param], bytes):
-                    map_param_value = dict_map[map_param].decode()
-                else:
-                    map_param_value = dict_map[map_param]
-                val = ValueSerializer.serialize(map_param_value)
-                string_map[map_param] = val
-
-            return json.dumps(string_map)
-        elif isinstance(value, list):
-            string_list = []
-
-            for obj in value:
-                string = ValueSerializer.serialize(obj)
-                string_list.append(string)
-            return json.dumps(string_list)
 
+def _quote(level):
+    """ Double quote as it appears after being embedded 'level' times as a JSON string value """
+    while len(_QUOTES) <= level:
+        _QUOTES.append(encode_basestring_ascii(_QUOTES[-1])[1:-1])
+    return _QUOTES[level]
+
+
+_QUOTES = ['"']
+_needs_escape = _NEEDS_ESCAPE.search
+
+
+def _encode(value, level, append):
+    """ Single pass encoder for the TestServer wire format.
+
+    On the wire, dicts and lists are JSON objects / arrays of serialized values,
+    and every nested dict or list is itself carried as a JSON string. Instead of
+    json.dumps-ing every nesting level (which re-escapes the whole subtree once
+    per level), each token is written already escaped for the depth it ends up
+    at. JSON string escaping is per character, so the output is byte for byte
+    what the nested json.dumps calls produce.
+    """
+    if value is None or value == "None":
+        append("null")
+    elif isinstance(value, str):
+        if value.endswith(",LONGTYPE"):
+            append(_escape("L" + value.split(',')[0], level))
+        else:
+            quote = _quote(level)
+            append(quote)
+            append(_escape(value, level))
+            append(quote)
+    elif isinstance(value, bool):
+        # bool has to be before int,
+        # Python's Bool gets caught by int
+        append("true" if value else "false")
+    elif isinstance(value, int):
+        if value < 1000000 and value > -1000000:
+            append("I" + str(int(value)))
+        else:
+            append("L" + str(value))
+    elif isinstance(value, float):
+        append("F" + str(float(value)))
+    # There is no double/number in python
+    elif isinstance(value, dict):
+        _encode_items(value.items(), level, append, decode_bytes=True)
+    elif isinstance(value, list):
+        _encode_list(value, level, append)
+    elif isinstance(value, MemoryPointer):
+        append(_escape(value.getAddress(), level))
+    else:
         raise RuntimeError("Invalid value type: {}: {}".format(value, type(value)))
 
-    @staticmethod
-    def deserialize(value):
-        if not value or len(value) == 0 or value == "null":
-            return None
-        elif value.startswith("PK"):
-            return value
-        elif value.startswith("@") or value.startswith("\"@"):
+
+def _encode_items(items, level, append, decode_bytes=False):
+    """ Encode (key, value) pairs as a JSON object of serialized values """
+    quote = _quote(level)
+    child_level = level + 1
+    child_quote = _quote(child_level)
+    open_key = quote
+    key_end = quote + ": " + quote
+    append("{")
+    for key, val in items:
+        append(open_key)
+        if type(key) is not str:
+            key = _json_key(key)
+        append(key if _needs_escape(key) is None else _escape(key, child_level))
+        append(key_end)
+        if type(val) is str and val != "None" and not val.endswith(",LONGTYPE"):
+            # Plain strings are the bulk of doc bodies, keep them off the generic path
+            append(child_quote)
+            append(val if _needs_escape(val) is None else _escape(val, child_level))
+            append(child_quote)
+        else:
+            if decode_bytes and isinstance(val, bytes):
+                val = val.decode()
+            _encode(val, child_level, append)
+        append(quote)
+        open_key = ", " + quote
+    append("}")
+
+
+def _encode_list(values, level, append):
+    """ Encode a list as a JSON array of serialized values """
+    quote = _quote(level)
+    child_level = level + 1
+    open_value = quote
+    append("[")
+    for val in values:
+        append(open_value)
+        _encode(val, child_level, append)
+        append(quote)
+        open_value = ", " + quote
+    append("]")
+
+
+def _invalid(value):
+    return RuntimeError("Invalid value type: {}: {}".format(value, type(value)))
+
+
+def _decode(value):
+    """ Decode one serialized value, dispatching on its type tag (first character) """
+    if not value:
+        return None
+    tag = value[0]
+    if tag == "\"":
+        if value.startswith("\"@"):
             return MemoryPointer(value)
-        elif value.startswith("\"") and value.endswith("\""):
+        if value.endswith("\""):
             return value[1:-1]
-        elif value == "true":
-            return True
-        elif value == "false":
-            return False
-        elif value.startswith("I") or value.startswith("L"):
-            return int(value[1:])
-        elif value.startswith("F") or value.startswith("D"):
+    elif tag == "{":
+        return {key: _decode(val) for key, val in json.loads(value).items()}
+    elif tag == "[":
+        return [_decode(val) for val in json.loads(value)]
+    elif tag == "I" or tag == "L":
+        return int(value[1:])
+    elif tag == "F" or tag == "D":
+        return float(value[1:])
+    elif tag == "@":
+        return MemoryPointer(value)
+    elif value == "true":
+        return True
+    elif value == "false":
+        return False
+    elif value == "null":
+        return None
+    elif tag == "#":
+        if "." in value:
             return float(value[1:])
-        elif value.startswith("#"):
-            if "." in value:
-                return float(value[1:])
-            else:
-                return int(value[1:])
-        elif value.startswith("{"):
-            string_map = json.loads(value)
-            map = {}
-
-            for entry in string_map:
-                key = str(entry)
-                obj = ValueSerializer.deserialize(string_map[key])
-
-                map[key] = obj
+        return int(value[1:])
+    elif value.startswith("PK"):
+        return value
+    raise _invalid(value)
 
-            return map
-        elif value.startswith("["):
-            string_list = json.loads(value)
-            res_list = []
 
-            for string in string_list:
-                obj = ValueSerializer.deserialize(string)
-                res_list.append(obj)
+class ValueSerializer(object):
+    @staticmethod
+    def serialize(value):
+        parts = []
+        _encode(value, 0, parts.append)
+        return "".join(parts)
 
-            return res_list
+    @staticmethod
+    def serialize_args(args):
+        """ Encode (name, value) pairs straight into the JSON request body,
+        same as json.dumps({name: ValueSerializer.serialize(value)})
+        """
+        parts = []
+        _encode_items(args if args else [], 0, parts.append)
+        return "".join(parts)
 
-        raise RuntimeError("Invalid value type: {}: {}".format(value, type(value)))
+    @staticmethod
+    def deserialize(value):
+        return _decode(value)
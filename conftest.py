@@ -1,6 +1,11 @@
+import os
+
 import pytest
+from keywords.logpipeline import start_log_pipeline, stop_log_pipeline
 from utilities.xml_parser import custom_rerun_xml_merge, merge_reports
 
+pytest_plugins = ["utilities.latency_report"]
+
 
 @pytest.hookimpl(tryfirst=True, hookwrapper=True)
 def pytest_runtest_makereport(item, call):
@@ -36,8 +41,26 @@ def pytest_addoption(parser):
                      help="Merge the report files path pattern, like results/**.xml. e.g.  -m '["
                           "results/***.xml]'",
                      default="")
+    parser.addoption("--structured-log", action="store",
+                     help="Also write the keywords log records as JSON lines to this file from a background thread "
+                          "(e.g. results/testkit_log.jsonl), disabled by default",
+                     default="")
+    parser.addoption("--structured-log-level", action="store",
+                     help="Level of the --structured-log records, DEBUG adds request / response previews "
+                          "(with --log-level=DEBUG)",
+                     default="INFO")
 
 
 @pytest.hookimpl(tryfirst=True)
 def pytest_configure(config):
     print("Starting the tests .....")
+    structured_log = config.getoption("--structured-log")
+    if structured_log:
+        directory = os.path.dirname(structured_log)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        start_log_pipeline(structured_log, level=config.getoption("--structured-log-level").upper())
+
+
+def pytest_unconfigure(config):
+    stop_log_pipeline()
@@ -0,0 +1,184 @@
+import asyncio
+import json
+import time
+
+import aiohttp
+
+from keywords.MobileRestClient import get_auth_adapter
+from keywords.constants import AuthType
+from keywords.utils import log_info
+
+FEEDS = ["normal", "longpoll", "continuous"]
+
+
+class FeedState(object):
+    """ Progress of one user's changes feed """
+
+    __slots__ = ["user_name", "feed", "auth", "body", "last_seq", "latest", "done", "requests", "changes"]
+
+    def __init__(self, user_name, feed, auth, body):
+        self.user_name = user_name
+        self.feed = feed
+        self.auth = auth
+        # Static part of the _changes request body (feed type and filters)
+        self.body = body
+        self.last_seq = 0
+        # doc id -> latest rev seen
+        self.latest = {}
+        self.done = False
+        self.requests = 0
+        self.changes = 0
+
+
+class ChangesFanIn(object):
+    """ Runs the _changes feeds of many Sync Gateway users from one process.
+
+    Every feed is an asyncio task on one event loop sharing one aiohttp connection pool,
+    so thousands of users (each with a normal, longpoll and continuous feed) only cost
+    an open socket and a FeedState each, instead of a process per feed.
+    A feed ends when it sees 'terminator_doc_id', posted to the 'terminator_channel' channel.
+
+        fan_in = ChangesFanIn(sg_url, sg_db, "terminator")
+        for user_name, user_auth in users:
+            fan_in.add_user(user_name, user_auth)
+        results = fan_in.run()  # {user_name: {"normal": {doc_id: rev}, "longpoll": ..., "continuous": ...}}
+    """
+
+    def __init__(self, sg_url, sg_db, terminator_doc_id, changes_delay=0, changes_limit=None,
+                 heartbeat=30000, max_connections=0, stats_interval=30, terminator_channel="terminator"):
+        self.url = "{}/{}/_changes".format(sg_url, sg_db)
+        self.terminator_doc_id = terminator_doc_id
+        self.terminator_channel = terminator_channel
+        self.changes_delay = changes_delay
+        self.changes_limit = changes_limit
+        self.heartbeat = heartbeat
+        # 0 is no limit, each continuous feed holds a connection for its whole life
+        self.max_connections = max_connections
+        self.stats_interval = stats_interval
+        self.feeds = []
+
+    def add_user(self, user_name, auth, feeds=FEEDS, channels_filtered=False, doc_ids_filtered=False):
+        """ Track the 'feeds' of a user. 'auth' is a session or (name, password) tuple.
+        channels_filtered applies a sync_gateway/bychannel filter on the 'even' and terminator_channel channels,
+        doc_ids_filtered a _doc_ids filter on the terminator doc (normal feed only)
+        """
+        auth = get_auth_adapter(auth)
+        for feed in feeds:
+            body = {"feed": feed}
+            if channels_filtered:
+                body["filter"] = "sync_gateway/bychannel"
+                body["channels"] = "even,{}".format(self.terminator_channel)
+            elif doc_ids_filtered:
+                if feed != "normal":
+                    continue
+                body["filter"] = "_doc_ids"
+                body["doc_ids"] = [self.terminator_doc_id]
+            if feed != "continuous" and self.changes_limit is not None:
+                body["limit"] = self.changes_limit
+            self.feeds.append(FeedState(user_name, feed, auth, body))
+
+    def _request_kwargs(self, state):
+        auth = state.auth
+        if auth.auth_type == AuthType.session:
+            return {"cookies": auth.request_kwargs["cookies"]}
+        if auth.auth_type == AuthType.http_basic:
+            basic = auth.auth
+            if isinstance(basic, tuple):
+                return {"auth": aiohttp.BasicAuth(basic[0], basic[1])}
+            return {"auth": aiohttp.BasicAuth(basic.username, basic.password)}
+        return {}
+
+    def _process(self, state, change):
+        """ Record a change, returns True if it is the terminator doc """
+        if change["id"] == self.terminator_doc_id:
+            return True
+        if len(change["changes"]) >= 1:
+            state.latest[change["id"]] = change["changes"][0]["rev"]
+        else:
+            state.latest[change["id"]] = ""
+        state.changes += 1
+        return False
+
+    async def _poll(self, session, state):
+        """ Looping normal / longpoll feed """
+        while not state.done:
+            body = dict(state.body, since=state.last_seq)
+            state.requests += 1
+            async with session.post(self.url, data=json.dumps(body), **self._request_kwargs(state)) as resp:
+                resp.raise_for_status()
+                resp_obj = json.loads(await resp.read())
+
+            for change in resp_obj["results"]:
+                if self._process(state, change):
+                    state.done = True
+            state.last_seq = resp_obj["last_seq"]
+
+            if not state.done and self.changes_delay:
+                await asyncio.sleep(self.changes_delay)
+
+        log_info("Found terminator ({}, {})".format(state.user_name, state.feed))
+
+    async def _stream(self, session, state):
+        """ Continuous feed, reconnects from the last seq if the feed is closed before the terminator """
+        while not state.done:
+            body = dict(state.body, since=state.last_seq, heartbeat=self.heartbeat)
+            state.requests += 1
+            async with session.post(self.url, data=json.dumps(body), **self._request_kwargs(state)) as resp:
+                resp.raise_for_status()
+                async for line in resp.content:
+                    line = line.strip()
+                    if not line:
+                        # heartbeat
+                        continue
+                    change = json.loads(line)
+                    if "last_seq" in change:
+                        state.last_seq = change["last_seq"]
+                        break
+                    state.last_seq = change["seq"]
+                    if self._process(state, change):
+                        state.done = True
+                        break
+
+        log_info("Found terminator ({}, continuous)".format(state.user_name))
+
+    def summary(self):
+        """ Totals over all feeds, logged periodically while running """
+        return {
+            "feeds": len(self.feeds),
+            "done": sum(1 for state in self.feeds if state.done),
+            "requests": sum(state.requests for state in self.feeds),
+            "changes": sum(state.changes for state in self.feeds),
+        }
+
+    def results(self):
+        """ {user_name: {feed: {doc_id: latest rev}}} """
+        results = {}
+        for state in self.feeds:
+            results.setdefault(state.user_name, {})[state.feed] = state.latest
+        return results
+
+    async def _log_stats(self, start):
+        while True:
+            await asyncio.sleep(self.stats_interval)
+            log_info("Changes fan-in after {:.0f}s: {}".format(time.time() - start, self.summary()))
+
+    async def run_async(self):
+        connector = aiohttp.TCPConnector(limit=self.max_connections)
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=60)
+        start = time.time()
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout,
+                                         headers={"Content-Type": "application/json"}) as session:
+            stats_task = asyncio.ensure_future(self._log_stats(start))
+            try:
+                await asyncio.gather(*[
+                    self._stream(session, state) if state.feed == "continuous" else self._poll(session, state)
+                    for state in self.feeds
+                ])
+            finally:
+                stats_task.cancel()
+        log_info("Changes fan-in done in {:.0f}s: {}".format(time.time() - start, self.summary()))
+        return self.results()
+
+    def run(self):
+        """ Run every feed until it sees the terminator doc, returns results() """
+        return asyncio.run(self.run_async())
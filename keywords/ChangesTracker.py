@@ -1,16 +1,22 @@
+import base64
 import json
 import time
 import logging
+import threading
 
 import requests
 from requests.exceptions import Timeout
 
-from keywords.MobileRestClient import get_auth_type
+from keywords.MobileRestClient import get_auth_adapter
 from keywords.constants import AuthType
 from keywords.utils import log_r
 from keywords.utils import log_info
 import keywords.exceptions
 
+# Heartbeat (ms) asked for on streaming feeds when none is passed,
+# bounds how long stop() takes to be noticed on an idle feed
+STREAMING_HEARTBEAT = 5000
+
 
 class ChangesTracker:
 
@@ -18,40 +24,50 @@ class ChangesTracker:
         self.processed_changes = {}
         self.endpoint = "{}/{}".format(url, db)
         self.auth = auth
+        self.last_seq = 0
 
         self.cancel = False
 
+        # doc id -> set of revs seen, processed_changes keeps the revs in feed order
+        self._revs = {}
+        # Notified every time changes are processed
+        self._changed = threading.Condition()
+        self._session = requests.Session()
+        # Open continuous responses / websockets, closed by stop()
+        self._streams = set()
+        self._streams_lock = threading.Lock()
+
     def process_changes(self, results):
         """
-        Add each doc from longpoll changes results to the processed changes list in the following format:
+        Add each doc from changes results to the processed changes list in the following format:
         { "doc_id": [ {"rev": "rev1"}, {"rev", "rev2"}, ...] }
+        and wake up the wait_until callers
         """
 
-        for doc in results:
-            if len(doc["changes"]) > 0:
-                if doc["id"] in self.processed_changes:
-                    # doc has already been seen in the changes feed,
-                    # append new changes to revs accociated with that id
-                    revs_list = self.processed_changes[doc["id"]]
-
-                    # If the document is already in 'processed_changes', make sure
-                    # that the revision doesn't already exist. If we see one, raise an exception
-                    # because we are seeing the same revision being sent twice
-                    # Checking against this scenario - https://github.com/couchbase/sync_gateway/issues/2186
-                    changes_revs = [change["rev"] for change in doc["changes"]]
-                    revs_list_revs = [rev["rev"] for rev in revs_list]
-                    for change in changes_revs:
-                        if change in revs_list_revs:
-                            raise keywords.exceptions.ChangesError("Duplicates in changes feed!")
-                    revs_list.extend(doc["changes"])
-                    self.processed_changes[doc["id"]] = revs_list
-                else:
-                    # Stored the doc with the list of rev changes
-                    self.processed_changes[doc["id"]] = doc["changes"]
-
-    def start(self, timeout=1000, heartbeat=None, request_timeout=None):
+        with self._changed:
+            for doc in results:
+                if len(doc.get("changes", [])) == 0:
+                    continue
+
+                # If the document has already been seen, make sure that the revision
+                # doesn't already exist. If we see one, raise an exception
+                # because we are seeing the same revision being sent twice
+                # Checking against this scenario - https://github.com/couchbase/sync_gateway/issues/2186
+                changes_revs = [change["rev"] for change in doc["changes"]]
+                revs = self._revs.setdefault(doc["id"], set())
+                if not revs.isdisjoint(changes_revs):
+                    raise keywords.exceptions.ChangesError("Duplicates in changes feed!")
+                revs.update(changes_revs)
+                self.processed_changes.setdefault(doc["id"], []).extend(doc["changes"])
+
+            self._changed.notify_all()
+
+    def start(self, timeout=1000, heartbeat=None, request_timeout=None, feed="longpoll"):
         """
-        Start a longpoll changes feed and and store the results in self.processed changes
+        Start a changes feed and and store the results in self.processed changes
+
+        feed="longpoll" loops on longpoll requests,
+        feed="continuous" and feed="websocket" keep one connection open and process changes as they are sent
         """
 
         # convert to seconds for use with requests lib api
@@ -60,8 +76,7 @@ class ChangesTracker:
         else:
             request_timeout = 1000
 
-        auth_type, self.auth = get_auth_type(self.auth)
-        current_seq_num = 0
+        auth = get_auth_adapter(self.auth)
 
         start = time.time()
         if timeout > 1000:
@@ -69,17 +84,39 @@ class ChangesTracker:
         else:
             loop_timeout = 60
 
-        log_info("[Changes Tracker] Changes Tracker Starting for {} ...".format(loop_timeout))
+        log_info("[Changes Tracker] Changes Tracker Starting {} feed for {} ...".format(feed, loop_timeout))
 
-        while not self.cancel:
-            # This if condition will run this method until the timeout and break and come out of this method.
-            if time.time() - start > loop_timeout:
-                logging.info("[Changes Tracker] : TIMEOUT")
-                break
+        if feed == "longpoll":
+            self._run_longpoll(auth, start, loop_timeout, timeout, heartbeat, request_timeout)
+        elif feed == "continuous":
+            self._run_continuous(auth, start, loop_timeout, timeout, heartbeat, request_timeout)
+        elif feed == "websocket":
+            self._run_websocket(auth, start, loop_timeout, heartbeat, request_timeout)
+        else:
+            raise ValueError("Unsupported changes feed: {}".format(feed))
+
+        log_info("[Changes Tracker] End of {} changes loop".format(feed))
+
+    def start_in_background(self, **kwargs):
+        """ Run start(**kwargs) on a daemon thread, returns the thread """
+        thread = threading.Thread(target=self.start, kwargs=kwargs, name="ChangesTracker {}".format(self.endpoint))
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def _timed_out(self, start, loop_timeout):
+        # This will run the feed until the timeout and break and come out of the start method.
+        if time.time() - start > loop_timeout:
+            logging.info("[Changes Tracker] : TIMEOUT")
+            return True
+        return False
+
+    def _run_longpoll(self, auth, start, loop_timeout, timeout, heartbeat, request_timeout):
+        while not self.cancel and not self._timed_out(start, loop_timeout):
             data = {
                 "feed": "longpoll",
                 "style": "all_docs",
-                "since": current_seq_num
+                "since": self.last_seq
             }
 
             if timeout is not None:
@@ -88,51 +125,145 @@ class ChangesTracker:
             if heartbeat is not None:
                 data["heartbeat"] = heartbeat
 
-            if auth_type == AuthType.session:
-                try:
-                    resp = requests.post("{}/_changes".format(self.endpoint), data=json.dumps(
-                        data), cookies=dict(SyncGatewaySession=self.auth[1]), timeout=request_timeout)
-                except Timeout as to:
-                    log_info("Request timed out. Exiting longpoll loop ...")
-                    logging.debug(to)
-                    break
-            elif auth_type == AuthType.http_basic:
-                try:
-                    resp = requests.post("{}/_changes".format(self.endpoint), data=json.dumps(
-                        data), auth=self.auth, timeout=request_timeout)
-                except Timeout as to:
-                    log_info("Request timed out. Exiting longpoll loop ...")
-                    logging.debug(to)
-                    break
-            else:
-                try:
-                    resp = requests.post("{}/_changes".format(self.endpoint), data=json.dumps(data), timeout=request_timeout)
-                except Timeout as to:
-                    log_info("Request timed out. Exiting longpoll loop ...")
-                    logging.debug(to)
-                    break
+            try:
+                resp = self._session.post("{}/_changes".format(self.endpoint), data=json.dumps(data),
+                                          timeout=request_timeout, **auth.request_kwargs)
+            except Timeout as to:
+                log_info("Request timed out. Exiting longpoll loop ...")
+                logging.debug(to)
+                break
 
             log_r(resp)
             resp.raise_for_status()
             resp_obj = resp.json()
 
+            # The server holds the request until there are changes (or the timeout),
+            # so the next request can be issued right away
             self.process_changes(resp_obj["results"])
-            current_seq_num = resp_obj["last_seq"]
-            time.sleep(2)
+            self.last_seq = resp_obj["last_seq"]
+
+    def _run_continuous(self, auth, start, loop_timeout, timeout, heartbeat, request_timeout):
+        while not self.cancel and not self._timed_out(start, loop_timeout):
+            data = {
+                "feed": "continuous",
+                "style": "all_docs",
+                "since": self.last_seq,
+                "heartbeat": heartbeat if heartbeat is not None else STREAMING_HEARTBEAT
+            }
 
-        log_info("[Changes Tracker] End of longpoll changes loop")
+            if timeout is not None:
+                data["timeout"] = timeout
+
+            try:
+                resp = self._session.post("{}/_changes".format(self.endpoint), data=json.dumps(data), stream=True,
+                                          timeout=request_timeout, **auth.request_kwargs)
+            except Timeout as to:
+                log_info("Request timed out. Exiting continuous loop ...")
+                logging.debug(to)
+                break
+
+            log_r(resp)
+            resp.raise_for_status()
+            self._add_stream(resp)
+            try:
+                for line in resp.iter_lines():
+                    if self.cancel or self._timed_out(start, loop_timeout):
+                        break
+                    if not line:
+                        # heartbeat
+                        continue
+                    change = json.loads(line)
+                    if "last_seq" in change:
+                        # Feed reached its timeout, reconnect from there
+                        self.last_seq = change["last_seq"]
+                        break
+                    self.process_changes([change])
+                    self.last_seq = change["seq"]
+            except Exception as e:
+                if not self.cancel:
+                    raise
+                logging.debug("[Changes Tracker] continuous feed closed: {}".format(e))
+            finally:
+                self._close_stream(resp)
+
+    def _websocket_headers(self, auth):
+        if auth.auth_type == AuthType.session:
+            return ["Cookie: SyncGatewaySession={}".format(auth.request_kwargs["cookies"]["SyncGatewaySession"])]
+        if auth.auth_type == AuthType.http_basic:
+            basic = auth.auth
+            if isinstance(basic, tuple):
+                name, password = basic
+            else:
+                name, password = basic.username, basic.password
+            credentials = base64.b64encode("{}:{}".format(name, password).encode()).decode("UTF-8")
+            return ["Authorization: Basic {}".format(credentials)]
+        return []
+
+    def _run_websocket(self, auth, start, loop_timeout, heartbeat, request_timeout):
+        # Only needed for this feed type
+        import websocket
+
+        ws_url = "{}/_changes?feed=websocket".format(self.endpoint).replace("http", "ws", 1)
+        heartbeat = heartbeat if heartbeat is not None else STREAMING_HEARTBEAT
+        ws = websocket.create_connection(ws_url, header=self._websocket_headers(auth), timeout=request_timeout)
+        self._add_stream(ws)
+        try:
+            ws.send(json.dumps({"since": self.last_seq, "style": "all_docs", "heartbeat": heartbeat}))
+            while not self.cancel and not self._timed_out(start, loop_timeout):
+                try:
+                    message = ws.recv()
+                except websocket.WebSocketTimeoutException:
+                    continue
+                if not message:
+                    # heartbeat
+                    continue
+                changes = json.loads(message)
+                if not changes:
+                    continue
+                self.process_changes(changes)
+                self.last_seq = changes[-1]["seq"]
+        except websocket.WebSocketConnectionClosedException as e:
+            if not self.cancel:
+                raise
+            logging.debug("[Changes Tracker] websocket feed closed: {}".format(e))
+        finally:
+            self._close_stream(ws)
+
+    def _add_stream(self, stream):
+        with self._streams_lock:
+            self._streams.add(stream)
+
+    def _close_stream(self, stream):
+        with self._streams_lock:
+            self._streams.discard(stream)
+        stream.close()
 
     def stop(self):
         """
-        Stop the longpoll changes feed
+        Stop the changes feed
         """
         log_info("[Changes Tracker] Closing _changes feed ...")
         self.cancel = True
+        with self._streams_lock:
+            streams = list(self._streams)
+        for stream in streams:
+            try:
+                stream.close()
+            except Exception as e:
+                logging.debug("[Changes Tracker] Error closing changes stream: {}".format(e))
+
+    def _rev_seen(self, doc_id, rev, rev_prefix_gen):
+        revs = self._revs.get(doc_id)
+        if not revs:
+            return False
+        if rev_prefix_gen:
+            return any(seen.startswith(rev) for seen in revs)
+        return rev in revs
 
     def wait_until(self, expected_docs, timeout=30, rev_prefix_gen=False):
         """
-        Poll self.processed_changes to see if all expected docs have been recieved
-        via the changes feed. This will return false if the polling exceeds the timeout
+        Wait until all expected docs have been recieved via the changes feed.
+        This will return false if the wait exceeds the timeout
 
         expected docs format: [{"id": "doc_id1" "rev": "rev1", "ok", "true"}, ...]
 
@@ -140,38 +271,34 @@ class ChangesTracker:
             It is useful if you want to verify changes when updated by SDK as SDK does not know the actual
             revision, but with scenario it can know what prefix in the revision it is expecting
         """
-        start = time.time()
-        while True:
-            if time.time() - start > timeout:
-                logging.error("[Changes Tracker] wait_until: TIMEOUT")
-                return False
-
-            # Check that the expected docs exist in the processed_changes
-            missing_docs = []
-            for doc in expected_docs:
-                if doc["id"] not in self.processed_changes:
-                    # doc_id not found in changes
-                    missing_docs.append(doc)
-                else:
-                    rev_found = False
-                    for rev in self.processed_changes[doc["id"]]:
-                        if rev_prefix_gen:
-                            if rev["rev"].startswith(doc["rev"]):
-                                # Found rev in changes feed, continue with the next doc
-                                rev_found = True
-                        else:
-                            if rev["rev"] == doc["rev"]:
-                                # Found rev in changes feed, continue with the next docs
-                                rev_found = True
-
-                    if not rev_found:
-                        missing_docs.append(doc)
-
-            if len(missing_docs) == 0:
-                log_info("[Changes Tracker] :) Saw all docs in the changes feed for ({})!".format(self.auth))
-
-                return True
-
-            log_info("[Changes Tracker] Docs missing from changes feed: {}".format(len(missing_docs)))
-
-            time.sleep(2)
+        # doc id -> expected revs not seen yet
+        missing = {}
+        for doc in expected_docs:
+            missing.setdefault(doc["id"], set()).add(doc["rev"])
+
+        deadline = time.time() + timeout
+        last_log = 0
+        with self._changed:
+            while True:
+                # Docs are crossed out as they are seen, each wake up only checks the ones still missing
+                for doc_id in list(missing):
+                    revs = {rev for rev in missing[doc_id] if not self._rev_seen(doc_id, rev, rev_prefix_gen)}
+                    if revs:
+                        missing[doc_id] = revs
+                    else:
+                        del missing[doc_id]
+
+                if len(missing) == 0:
+                    log_info("[Changes Tracker] :) Saw all docs in the changes feed for ({})!".format(self.auth))
+                    return True
+
+                now = time.time()
+                if now >= deadline:
+                    logging.error("[Changes Tracker] wait_until: TIMEOUT")
+                    return False
+
+                if now - last_log >= 2:
+                    log_info("[Changes Tracker] Docs missing from changes feed: {}".format(len(missing)))
+                    last_log = now
+
+                self._changed.wait(deadline - now)
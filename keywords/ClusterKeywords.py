@@ -1,4 +1,4 @@
-import json
+import copy
 import os
 
 import requests
@@ -15,6 +15,8 @@ from keywords.utils import (log_info, log_r, version_and_build,
                             version_is_binary, compare_versions)
 from libraries.testkit.cluster import Cluster
 from utilities.cluster_config_utils import is_load_balancer_enabled, get_load_balancer_ip, sg_ssl_enabled, is_load_balancer_with_two_clusters_enabled
+from utilities.cluster_config_utils import load_cluster_config_json
+from utilities.cluster_topology import get_topology
 
 
 class ClusterKeywords:
@@ -71,8 +73,15 @@ class ClusterKeywords:
           install_nginx sets it to False to get the SG_IPs for the nginx.conf
         """
 
-        with open("{}.json".format(cluster_config)) as f:
-            cluster = json.loads(f.read())
+        # The endpoints only change with the cluster config file, callers get their own copy
+        formatted_cluster = get_topology(cluster_config).memoize(
+            ("cluster_topology", self.sg_scheme, lb_enable),
+            lambda topology: self._format_cluster_topology(cluster_config, lb_enable)
+        )
+        return copy.deepcopy(formatted_cluster)
+
+    def _format_cluster_topology(self, cluster_config, lb_enable):
+        cluster = load_cluster_config_json(cluster_config)
 
         sg_urls = []
         ac_urls = []
@@ -162,8 +171,7 @@ class ClusterKeywords:
 
     def verfiy_no_running_services(self, cluster_config):
 
-        with open("{}.json".format(cluster_config)) as f:
-            cluster_obj = json.loads(f.read())
+        cluster_obj = load_cluster_config_json(cluster_config)
 
         server_port = 8091
         server_scheme = "http"
@@ -207,8 +215,7 @@ class ClusterKeywords:
 
         log_info("Verfying versions for cluster: {}".format(cluster_config))
 
-        with open("{}.json".format(cluster_config)) as f:
-            cluster_obj = json.loads(f.read())
+        cluster_obj = load_cluster_config_json(cluster_config)
 
         cbs_ssl = False
         if cluster_obj["environment"]["cbs_ssl_enabled"]:
@@ -7,6 +7,7 @@ from keywords.constants import MAX_RETRIES
 from keywords.exceptions import LiteServError
 from keywords.utils import log_r
 from keywords.utils import log_info
+from keywords.endpoints import invalidate_endpoints
 
 
 class LiteServBase(object):
@@ -60,6 +61,8 @@ class LiteServBase(object):
             port = self.port
 
         url = "http://{}:{}".format(self.host, port)
+        # A relaunched LiteServ may be a different platform or version
+        invalidate_endpoints(url)
         count = 0
         while count < MAX_RETRIES:
             try:
@@ -11,7 +11,7 @@ import concurrent.futures
 from concurrent.futures import ThreadPoolExecutor
 
 from keywords import attachment
-from libraries.data import doc_generators
+from libraries.data.doc_factory import get_doc_factory
 from libraries.provision.ansible_runner import AnsibleRunner
 
 from keywords.constants import AuthType
@@ -27,6 +27,11 @@ from keywords.constants import RBAC_FULL_ADMIN
 
 from keywords.exceptions import RestError, TimeoutException, LiteServError, ChangesError
 from keywords import types
+from keywords import endpoints
+from keywords.instrumentation import instrument_session
+from keywords import bulk_docs
+from keywords import multipart
+from keywords.timeutils import Backoff, Deadline, wait_until
 
 from requests.auth import HTTPBasicAuth
 
@@ -41,33 +46,16 @@ def parse_multipart_response(response):
         {"_id":"test_ls_db2_0","_rev":"1-9a525c69cafb3d1cdf69545fa5ccfecc","date_time_added":"2016-04-29 13:34:26.346148"}
 
     Returns a a list of docs {"rows": [ {"_id":"test_ls_db2_0","_rev":"1-9a525c69cafb3d1cdf69545fa5ccfecc" ... } ] }
+    Prefer keywords.multipart.iter_response_docs on a streamed response, which does not need the whole body in memory
     """
-    rows = []
-
-    for part in response.split("--"):
-
-        part_lines = part.splitlines()
-        # part_lines follow the format
-        # [
-        #   '5570ab847be212079e2b05bbbfa023da25b07712bda36aec6481bca024f3',
-        #   Content-Type: application/json,
-        #   { doc }
-        # ]
-        # Only include part that has doc property
-        if part_lines and len(part_lines) > 2:
-            doc = part_lines[-1]
-            try:
-                doc_obj = json.loads(doc)
-                rows.append(doc_obj)
-            except Exception as e:
-                # A few lines from the response can't be parsed as docs
-                logging.error("Could not parse docs as JSON: {} error: {}".format(doc, e))
-
-    return {"rows": rows}
+    return {"rows": list(multipart.iter_text_docs(response))}
 
 
 def get_auth_type(auth):
 
+    if isinstance(auth, AuthAdapter):
+        return auth.auth_type, auth.auth
+
     if auth is None:
         return AuthType.none, auth
 
@@ -82,6 +70,34 @@ def get_auth_type(auth):
     return auth_type, auth
 
 
+class AuthAdapter(object):
+    """ Resolved auth for MobileRestClient requests.
+    'request_kwargs' are the keyword arguments that apply the auth to a requests call.
+    """
+
+    def __init__(self, auth):
+        self.auth_type, self.auth = get_auth_type(auth)
+        if self.auth_type == AuthType.session:
+            self.request_kwargs = {"cookies": {"SyncGatewaySession": auth[1]}}
+        elif self.auth_type == AuthType.http_basic:
+            self.request_kwargs = {"auth": self.auth}
+        else:
+            self.request_kwargs = {}
+
+    def __bool__(self):
+        return self.auth_type != AuthType.none
+
+    def __repr__(self):
+        return "AuthAdapter({})".format(self.auth_type)
+
+
+def get_auth_adapter(auth):
+    """ Return the AuthAdapter for 'auth' (None, a tuple, an HTTPBasicAuth or an AuthAdapter) """
+    if isinstance(auth, AuthAdapter):
+        return auth
+    return AuthAdapter(auth)
+
+
 class MyEncoder(json.JSONEncoder):
     def default(self, obj):
         if isinstance(obj, (bytes, bytearray)):
@@ -103,6 +119,17 @@ class MobileRestClient:
         self._session = Session()
         self._session.headers = headers
         self._session.verify = False
+        instrument_session(self._session, "rest")
+
+    def _request(self, method, url, auth=None, **kwargs):
+        """ Issue a request on the shared session, applying 'auth' the way its type requires """
+        return self._session.request(method, url, **kwargs, **get_auth_adapter(auth).request_kwargs)
+
+    def _fetch_root(self, url, auth=None):
+        resp = self._request("get", url, auth=auth)
+        log_r(resp)
+        resp.raise_for_status()
+        return resp.json()
 
     def merge(self, *doc_lists):
         """
@@ -120,62 +147,28 @@ class MobileRestClient:
         """
         Issues a get to the service running at the specified url.
         It will return a server type of 'listener' or 'syncgateway'
+        The response is cached per url, see keywords.endpoints
         """
 
-        if auth:
-            resp = self._session.get(url, auth=HTTPBasicAuth(auth[0], auth[1]))
-        else:
-            resp = self._session.get(url)
-        log_r(resp)
-        resp.raise_for_status()
-        resp_obj = resp.json()
-
-        try:
-            if resp_obj["vendor"]["name"] == "Couchbase Sync Gateway":
-                logging.info("ServerType={}".format(ServerType.syncgateway))
-                return ServerType.syncgateway
-            elif resp_obj["vendor"]["name"] == "Couchbase Lite (Objective-C)":
-                logging.info("ServerType={}".format(ServerType.listener))
-                return ServerType.listener
-            elif resp_obj["vendor"]["name"] == "Couchbase Lite (C#)":
-                logging.info("ServerType={}".format(ServerType.listener))
-                return ServerType.listener
-        except KeyError:
-            # Android LiteServ
-            if resp_obj["CBLite"] == "Welcome":
-                return ServerType.listener
-
-        raise ValueError("Unsupported couchbase lite server type")
+        descriptor = endpoints.get_endpoint(url, lambda root_url: self._fetch_root(root_url, auth))
+        if descriptor.server_type is None:
+            raise ValueError("Unsupported couchbase lite server type")
+        logging.info("ServerType={}".format(descriptor.server_type))
+        return descriptor.server_type
 
     def get_server_platform(self, url):
         """
         Issues a get to the service running at the specified url.
         It will return a server type of 'macosx', 'android', or 'net' for listener
         of centos for sync_gateway
+        The response is cached per url, see keywords.endpoints
         """
 
-        resp = self._session.get(url)
-        log_r(resp)
-        resp.raise_for_status()
-        resp_obj = resp.json()
-
-        try:
-            if resp_obj["vendor"]["name"] == "Couchbase Sync Gateway":
-                logging.info("Platform={}".format(Platform.centos))
-                return Platform.centos
-            elif resp_obj["vendor"]["name"] == "Couchbase Lite (Objective-C)":
-                logging.info("Platform={}".format(Platform.macosx))
-                return Platform.macosx
-            elif resp_obj["vendor"]["name"] == "Couchbase Lite (C#)":
-                logging.info("Platform={}".format(Platform.net))
-                return Platform.net
-        except KeyError:
-            # Android LiteServ
-            if resp_obj["CBLite"] == "Welcome":
-                logging.info("Platform={}".format(Platform.android))
-                return Platform.android
-
-        raise ValueError("Unsupported platform type")
+        descriptor = endpoints.get_endpoint(url, self._fetch_root)
+        if descriptor.platform is None:
+            raise ValueError("Unsupported platform type")
+        logging.info("Platform={}".format(descriptor.platform))
+        return descriptor.platform
 
     def get_session(self, url, db=None, session_id=None):
         """
@@ -551,22 +544,12 @@ class MobileRestClient:
         GET /{db}/{doc}/{attachment}?meta=true
         Get the attachment meta data for tracking
         """
-        auth_type, auth = get_auth_type(auth)
+        auth = get_auth_adapter(auth)
 
         if attachment:
-            if auth_type == AuthType.session:
-                resp = self._session.get("{}/{}/{}/{}?meta=true".format(url, db, doc, attachment), cookies=dict(SyncGatewaySession=auth[1]))
-            elif auth_type == AuthType.http_basic:
-                resp = self._session.get("{}/{}/{}/{}?meta=true".format(url, db, doc, attachment), auth=auth)
-            else:
-                resp = self._session.get("{}/{}/{}/{}?meta=true".format(url, db, doc, attachment))
+            resp = self._request("get", "{}/{}/{}/{}?meta=true".format(url, db, doc, attachment), auth=auth)
         else:
-            if auth_type == AuthType.session:
-                resp = self._session.get("{}/{}/{}?meta=true".format(url, db, doc), cookies=dict(SyncGatewaySession=auth[1]))
-            elif auth_type == AuthType.http_basic:
-                resp = self._session.get("{}/{}/{}?meta=true".format(url, db, doc), auth=auth)
-            else:
-                resp = self._session.get("{}/{}/{}?meta=true".format(url, db, doc))
+            resp = self._request("get", "{}/{}/{}?meta=true".format(url, db, doc), auth=auth)
         log_r(resp)
         resp.raise_for_status()
         return resp.json()
@@ -749,16 +732,11 @@ class MobileRestClient:
         # Returns multipart by default, specify json for cleaner code
         headers = {"Accept": "application/json"}
 
-        auth_type, auth = get_auth_type(auth)
+        auth = get_auth_adapter(auth)
 
         params = {"open_revs": "all"}
 
-        if auth_type == AuthType.session:
-            resp = self._session.get("{}/{}/{}".format(url, db, doc_id), headers=headers, params=params, cookies=dict(SyncGatewaySession=auth[1]))
-        elif auth_type == AuthType.http_basic:
-            resp = self._session.get("{}/{}/{}".format(url, db, doc_id), headers=headers, params=params, auth=auth)
-        else:
-            resp = self._session.get("{}/{}/{}".format(url, db, doc_id), headers=headers, params=params)
+        resp = self._request("get", "{}/{}/{}".format(url, db, doc_id), auth=auth, headers=headers, params=params)
 
         log_r(resp)
         resp.raise_for_status()
@@ -775,16 +753,11 @@ class MobileRestClient:
         # Returns multipart by default, specify json for cleaner code
         headers = {"Accept": "application/json"}
 
-        auth_type, auth = get_auth_type(auth)
+        auth = get_auth_adapter(auth)
 
         params = {"open_revs": "all"}
 
-        if auth_type == AuthType.session:
-            resp = self._session.get("{}/{}/{}".format(url, db, doc_id), headers=headers, params=params, cookies=dict(SyncGatewaySession=auth[1]))
-        elif auth_type == AuthType.http_basic:
-            resp = self._session.get("{}/{}/{}".format(url, db, doc_id), headers=headers, params=params, auth=auth)
-        else:
-            resp = self._session.get("{}/{}/{}".format(url, db, doc_id), headers=headers, params=params)
+        resp = self._request("get", "{}/{}/{}".format(url, db, doc_id), auth=auth, headers=headers, params=params)
 
         log_r(resp)
         resp.raise_for_status()
@@ -804,16 +777,11 @@ class MobileRestClient:
         # Returns multipart by default, specify json for cleaner code
         headers = {"Accept": "application/json"}
 
-        auth_type, auth = get_auth_type(auth)
+        auth = get_auth_adapter(auth)
 
         params = {"open_revs": "all"}
 
-        if auth_type == AuthType.session:
-            resp = self._session.get("{}/{}/{}".format(url, db, doc_id), headers=headers, params=params, cookies=dict(SyncGatewaySession=auth[1]))
-        elif auth_type == AuthType.http_basic:
-            resp = self._session.get("{}/{}/{}".format(url, db, doc_id), headers=headers, params=params, auth=auth)
-        else:
-            resp = self._session.get("{}/{}/{}".format(url, db, doc_id), headers=headers, params=params)
+        resp = self._request("get", "{}/{}/{}".format(url, db, doc_id), auth=auth, headers=headers, params=params)
 
         log_r(resp)
         resp.raise_for_status()
@@ -859,7 +827,7 @@ class MobileRestClient:
         },
         """
 
-        auth_type, auth = get_auth_type(auth)
+        auth = get_auth_adapter(auth)
 
         params = {
             "conflicts": "true",
@@ -883,12 +851,7 @@ class MobileRestClient:
                 assert "When the scope is defined, the collection must be  defined  as well"
             url_string = "{}/{}/{}".format(url, db, doc_id)
 
-        if auth_type == AuthType.session:
-            resp = self._session.get(url_string, params=params, cookies=dict(SyncGatewaySession=auth[1]))
-        elif auth_type == AuthType.http_basic:
-            resp = self._session.get(url_string, params=params, auth=auth)
-        else:
-            resp = self._session.get(url_string, params=params)
+        resp = self._request("get", url_string, auth=auth, params=params)
 
         log_r(resp)
         resp.raise_for_status()
@@ -924,31 +887,16 @@ class MobileRestClient:
         """
 
         logging.info(auth)
-        auth_type, auth = get_auth_type(auth)
+        auth = get_auth_adapter(auth)
 
         doc["updates"] = 0
         keyspace = db
         if scope is not None:
             keyspace = db + "." + scope + "." + collection
-        if auth_type == AuthType.session:
-            if use_post:
-                resp = self._session.post("{}/{}/".format(url, keyspace), data=json.dumps(doc, cls=MyEncoder), cookies=dict(SyncGatewaySession=auth[1]))
-            else:
-                resp = self._session.put("{}/{}/{}".format(url, keyspace, doc["_id"]), data=json.dumps(doc, cls=MyEncoder), cookies=dict(SyncGatewaySession=auth[1]))
-        elif auth_type == AuthType.http_basic:
-            if use_post:
-                resp = self._session.post("{}/{}/".format(url, keyspace), data=json.dumps(doc, cls=MyEncoder), auth=auth)
-            else:
-                resp = self._session.put("{}/{}/{}".format(url, keyspace, doc["_id"]), data=json.dumps(doc, cls=MyEncoder), auth=auth)
+        if use_post:
+            resp = self._request("post", "{}/{}/".format(url, keyspace), auth=auth, data=json.dumps(doc, cls=MyEncoder))
         else:
-            if use_post:
-                resp = self._session.post("{}/{}/".format(url, keyspace), data=json.dumps(doc, cls=MyEncoder))
-            else:
-                try:
-                    resp = self._session.put("{}/{}/{}".format(url, keyspace, doc["_id"]), data=json.dumps(doc, cls=MyEncoder))
-                except Exception as err:
-                    print(err)
-                    raise
+            resp = self._request("put", "{}/{}/{}".format(url, keyspace, doc["_id"]), auth=auth, data=json.dumps(doc, cls=MyEncoder))
 
         log_r(resp)
         resp.raise_for_status()
@@ -965,20 +913,35 @@ class MobileRestClient:
 
         headers = {"Accept": "*/*"}
 
-        auth_type, auth = get_auth_type(auth)
+        auth = get_auth_adapter(auth)
 
-        if auth_type == AuthType.session:
-            resp = self._session.get("{}/{}/{}/{}".format(url, db, doc_id, attachment_name), headers=headers, cookies=dict(SyncGatewaySession=auth[1]))
-        elif auth_type == AuthType.http_basic:
-            resp = self._session.get("{}/{}/{}/{}".format(url, db, doc_id, attachment_name), headers=headers, auth=auth)
-        else:
-            resp = self._session.get("{}/{}/{}/{}".format(url, db, doc_id, attachment_name), headers=headers)
+        resp = self._request("get", "{}/{}/{}/{}".format(url, db, doc_id, attachment_name), auth=auth, headers=headers)
 
         log_r(resp)
         resp.raise_for_status()
 
         return resp.text
 
+    def put_attachment(self, url, db, doc_id, rev, attachment, auth=None):
+        """
+        Keyword to upload the raw content of 'attachment' (keywords.attachment.Attachment) to the doc 'doc_id' at 'rev'.
+        The content is streamed in chunks, no base64 copy is built.
+        ex. PUT http://localhost:4984/db/att_doc/image.png?rev=1-abc
+        Returns the new revision.
+        """
+
+        headers = {"Content-Type": attachment.content_type}
+
+        auth = get_auth_adapter(auth)
+
+        resp = self._request("put", "{}/{}/{}/{}".format(url, db, doc_id, attachment.name), auth=auth,
+                             params={"rev": rev}, headers=headers, data=attachment.stream())
+
+        log_r(resp)
+        resp.raise_for_status()
+
+        return resp.json()["rev"]
+
     def add_conflict(self, url, db, doc_id, parent_revisions, new_revision, attachment_name=None, auth=None):
         """
             1. GETs the doc with id == doc_id
@@ -1010,7 +973,7 @@ class MobileRestClient:
         else:
             raise TypeError("Add Conflict expects a list or str for parent_revisions")
 
-        auth_type, auth = get_auth_type(auth)
+        auth = get_auth_adapter(auth)
 
         logging.info("PARENT: {}".format(parent_revs))
         logging.info("NEW: {}".format(new_revision))
@@ -1052,12 +1015,7 @@ class MobileRestClient:
         doc["_revisions"]["ids"].extend(parent_revision_digests)
 
         params = {"new_edits": "false"}
-        if auth_type == AuthType.session:
-            resp = self._session.put("{}/{}/{}".format(url, db, doc_id), params=params, data=json.dumps(doc), cookies=dict(SyncGatewaySession=auth[1]))
-        elif auth_type == AuthType.http_basic:
-            resp = self._session.put("{}/{}/{}".format(url, db, doc_id), params=params, data=json.dumps(doc), auth=auth)
-        else:
-            resp = self._session.put("{}/{}/{}".format(url, db, doc_id), params=params, data=json.dumps(doc))
+        resp = self._request("put", "{}/{}/{}".format(url, db, doc_id), auth=auth, params=params, data=json.dumps(doc))
 
         log_r(resp)
         resp.raise_for_status()
@@ -1113,7 +1071,7 @@ class MobileRestClient:
         Removes a document with the specfied revision
         """
 
-        auth_type, auth = get_auth_type(auth)
+        auth = get_auth_adapter(auth)
 
         params = {}
         if rev is not None:
@@ -1121,12 +1079,7 @@ class MobileRestClient:
         if timeout is not None:
             params["timeout"] = timeout
 
-        if auth_type == AuthType.session:
-            resp = self._session.delete("{}/{}/{}".format(url, db, doc_id), params=params, cookies=dict(SyncGatewaySession=auth[1]))
-        elif auth_type == AuthType.http_basic:
-            resp = self._session.delete("{}/{}/{}".format(url, db, doc_id), params=params, auth=auth, timeout=timeout)
-        else:
-            resp = self._session.delete("{}/{}/{}".format(url, db, doc_id), params=params)
+        resp = self._request("delete", "{}/{}/{}".format(url, db, doc_id), auth=auth, params=params, timeout=timeout)
 
         log_r(resp)
         resp.raise_for_status()
@@ -1136,7 +1089,7 @@ class MobileRestClient:
 
     def verify_docs_deleted(self, url, db, docs, auth=None, reason="deleted"):
 
-        auth_type, auth = get_auth_type(auth)
+        auth = get_auth_adapter(auth)
         server_type = self.get_server_type(url)
         server_platform = self.get_server_platform(url)
 
@@ -1149,12 +1102,7 @@ class MobileRestClient:
                 raise TimeoutException("Verify Docs Deleted: TIMEOUT")
 
             for doc in docs:
-                if auth_type == AuthType.session:
-                    resp = self._session.get("{}/{}/{}".format(url, db, doc["id"]), cookies=dict(SyncGatewaySession=auth[1]))
-                elif auth_type == AuthType.http_basic:
-                    resp = self._session.get("{}/{}/{}".format(url, db, doc["id"]), auth=auth)
-                else:
-                    resp = self._session.get("{}/{}/{}".format(url, db, doc["id"]))
+                resp = self._request("get", "{}/{}/{}".format(url, db, doc["id"]), auth=auth)
                 log_r(resp)
                 resp_obj = resp.json()
 
@@ -1286,7 +1234,7 @@ class MobileRestClient:
                 update_doc_result = future.result()
                 updated_docs.append(update_doc_result)
 
-        logging.debug("url: {} db: {} updated: {}".format(url, db, updated_docs))
+        log_debug("url: %s db: %s updated: %s", url, db, updated_docs)
         return updated_docs
 
     def put_doc(self, url, db, doc_id, doc_body, rev, auth=None):
@@ -1294,18 +1242,13 @@ class MobileRestClient:
         Updates a doc with doc id, a given revision, and doc body
         """
 
-        auth_type, auth = get_auth_type(auth)
+        auth = get_auth_adapter(auth)
 
         params = {
             "rev": rev
         }
 
-        if auth_type == AuthType.session:
-            resp = self._session.put("{}/{}/{}".format(url, db, doc_id), params=params, data=json.dumps(doc_body), cookies=dict(SyncGatewaySession=auth[1]))
-        elif auth_type == AuthType.http_basic:
-            resp = self._session.put("{}/{}/{}".format(url, db, doc_id), params=params, data=json.dumps(doc_body), auth=auth)
-        else:
-            resp = self._session.put("{}/{}/{}".format(url, db, doc_id), params=params, data=json.dumps(doc_body))
+        resp = self._request("put", "{}/{}/{}".format(url, db, doc_id), auth=auth, params=params, data=json.dumps(doc_body))
 
         log_r(resp)
         resp.raise_for_status()
@@ -1320,7 +1263,7 @@ class MobileRestClient:
             3. PUTS the doc
         """
 
-        auth_type, auth = get_auth_type(auth)
+        auth = get_auth_adapter(auth)
         if doc is None:
             doc = self.get_doc(url, db, doc_id, auth)
 
@@ -1366,12 +1309,7 @@ class MobileRestClient:
             if property_updater is not None:
                 types.verify_is_callable(property_updater)
                 doc = property_updater(doc)
-            if auth_type == AuthType.session:
-                resp = self._session.put("{}/{}/{}".format(url, db, doc_id), data=json.dumps(doc, cls=MyEncoder), cookies=dict(SyncGatewaySession=auth[1]))
-            elif auth_type == AuthType.http_basic:
-                resp = self._session.put("{}/{}/{}".format(url, db, doc_id), data=json.dumps(doc, cls=MyEncoder), auth=auth)
-            else:
-                resp = self._session.put("{}/{}/{}".format(url, db, doc_id), data=json.dumps(doc, cls=MyEncoder))
+            resp = self._request("put", "{}/{}/{}".format(url, db, doc_id), auth=auth, data=json.dumps(doc, cls=MyEncoder))
 
             log_r(resp, info=False)
             resp.raise_for_status()
@@ -1396,7 +1334,7 @@ class MobileRestClient:
             3. PUTS the doc
         """
 
-        auth_type, auth = get_auth_type(auth)
+        auth = get_auth_adapter(auth)
         if doc is None:
             doc = self.get_doc(url, db, doc_id, auth)
 
@@ -1405,12 +1343,7 @@ class MobileRestClient:
             doc["channels"] = channels
         doc[key] = value
 
-        if auth_type == AuthType.session:
-            resp = self._session.put("{}/{}/{}".format(url, db, doc_id), data=json.dumps(doc, cls=MyEncoder), cookies=dict(SyncGatewaySession=auth[1]))
-        elif auth_type == AuthType.http_basic:
-            resp = self._session.put("{}/{}/{}".format(url, db, doc_id), data=json.dumps(doc, cls=MyEncoder), auth=auth)
-        else:
-            resp = self._session.put("{}/{}/{}".format(url, db, doc_id), data=json.dumps(doc, cls=MyEncoder))
+        resp = self._request("put", "{}/{}/{}".format(url, db, doc_id), auth=auth, data=json.dumps(doc, cls=MyEncoder))
 
         log_r(resp, info=False)
         resp.raise_for_status()
@@ -1419,28 +1352,10 @@ class MobileRestClient:
 
         return resp_obj
 
-    def add_docs(self, url, db, number, id_prefix, auth=None, channels=None, generator=None, attachments_generator=None, expiry=None, scope=None, collection=None):
-        """
-        if id_prefix == None, generate a uuid for each doc
-
-        Add a 'number' of docs with a prefix 'id_prefix' using the provided generator from libraries.data.doc_generators.
-        ex. id_prefix=testdoc with a number of 3 would create 'testdoc_0', 'testdoc_1', and 'testdoc_2'
-        """
-        added_docs = []
-
-        if channels is not None:
-            types.verify_is_list(channels)
-
-        log_info("PUT {} docs to {}/{}/ with prefix {}".format(number, url, db, id_prefix))
-
-        for i in range(number):
-
-            if generator == "four_k":
-                doc_body = doc_generators.four_k()
-            elif generator == "simple_user":
-                doc_body = doc_generators.simple_user()
-            else:
-                doc_body = doc_generators.simple()
+    def _generate_docs(self, number, id_prefix, channels=None, generator=None, attachments_generator=None, expiry=None):
+        """ Lazily generate the 'number' doc bodies of add_docs """
+        factory = get_doc_factory(generator if generator in ["four_k", "simple_user"] else None)
+        for i, doc_body in enumerate(factory.iter_docs(number)):
 
             if channels is not None:
                 doc_body["channels"] = channels
@@ -1459,10 +1374,56 @@ class MobileRestClient:
 
             doc_body["_id"] = doc_id
 
-            doc_obj = self.add_doc(url, db, doc_body, auth=auth, use_post=False, scope=scope, collection=collection)
-            if attachments_generator:
-                doc_obj["attachments"] = list(doc_body["_attachments"].keys())
-            added_docs.append(doc_obj)
+            yield doc_body
+
+    def add_docs(self, url, db, number, id_prefix, auth=None, channels=None, generator=None, attachments_generator=None, expiry=None, scope=None, collection=None,
+                 chunk_size=None, concurrency=1, stats=None):
+        """
+        if id_prefix == None, generate a uuid for each doc
+
+        Add a 'number' of docs with a prefix 'id_prefix' using the provided generator from libraries.data.doc_generators.
+        ex. id_prefix=testdoc with a number of 3 would create 'testdoc_0', 'testdoc_1', and 'testdoc_2'
+
+        If 'chunk_size' is passed, the docs are POSTed to _bulk_docs in chunks of 'chunk_size'
+        by 'concurrency' workers instead of one PUT per doc (see add_bulk_docs)
+        """
+        added_docs = []
+
+        if channels is not None:
+            types.verify_is_list(channels)
+
+        docs = self._generate_docs(number, id_prefix, channels=channels, generator=generator,
+                                   attachments_generator=attachments_generator, expiry=expiry)
+
+        if chunk_size:
+            log_info("POST {} docs to {}/{}/_bulk_docs with prefix {} in chunks of {}".format(number, url, db, id_prefix, chunk_size))
+            keyspace = db
+            if scope is not None:
+                keyspace = db + "." + scope + "." + collection
+
+            attachment_names = []
+
+            def track_attachments(docs):
+                for doc_body in docs:
+                    doc_body["updates"] = 0
+                    if attachments_generator:
+                        attachment_names.append(list(doc_body["_attachments"].keys()))
+                    yield doc_body
+
+            doc_resps = self.add_bulk_docs(url, keyspace, track_attachments(docs), auth=auth,
+                                           chunk_size=chunk_size, concurrency=concurrency, stats=stats)
+            for i, doc_resp in enumerate(doc_resps):
+                doc_obj = {"ok": True, "id": doc_resp["id"], "rev": doc_resp["rev"]}
+                if attachments_generator:
+                    doc_obj["attachments"] = attachment_names[i]
+                added_docs.append(doc_obj)
+        else:
+            log_info("PUT {} docs to {}/{}/ with prefix {}".format(number, url, db, id_prefix))
+            for doc_body in docs:
+                doc_obj = self.add_doc(url, db, doc_body, auth=auth, use_post=False, scope=scope, collection=collection)
+                if attachments_generator:
+                    doc_obj["attachments"] = list(doc_body["_attachments"].keys())
+                added_docs.append(doc_obj)
 
         # check that the docs returned in the responses equals the expected number
         if len(added_docs) != number:
@@ -1472,36 +1433,71 @@ class MobileRestClient:
 
         return added_docs
 
-    def add_bulk_docs(self, url, db, docs, auth=None):
+    def add_bulk_docs(self, url, db, docs, auth=None, chunk_size=None, concurrency=1, stats=None):
         """
         Keyword that issues POST _bulk docs with the specified 'docs'.
         Use the Document.create_docs() to create the docs.
+
+        By default all the docs are sent in one request. If 'chunk_size' is passed, 'docs'
+        can be any iterable (e.g. a generator) and is consumed lazily, in chunks of 'chunk_size'
+        POSTed by 'concurrency' workers. Returns the per doc results in the order of 'docs'.
+        Pass a keywords.bulk_docs.BulkDocsStats as 'stats' to get the throughput and
+        per chunk latencies back, they are logged when 'stats' is passed or the docs are chunked.
         """
         server_type = self.get_server_type(url, auth)
-        auth_type, auth = get_auth_type(auth)
+        auth = get_auth_adapter(auth)
 
-        # transform 'docs' into a format expected by _bulk_docs
-        if server_type == ServerType.listener:
-            request_body = {"docs": docs, "new_edits": True}
-        else:
-            request_body = {"docs": docs}
+        chunked = chunk_size is not None
+        if not chunked:
+            docs = list(docs)
+            chunk_size = max(len(docs), 1)
+        if stats is None and chunked:
+            stats = bulk_docs.BulkDocsStats()
 
-        if auth_type == AuthType.session:
-            resp = self._session.post("{}/{}/_bulk_docs".format(url, db),
-                                      data=json.dumps(request_body, cls=MyEncoder),
-                                      cookies=dict(SyncGatewaySession=auth[1]))
-        elif auth_type == AuthType.http_basic:
-            resp = self._session.post("{}/{}/_bulk_docs".format(url, db), data=json.dumps(request_body), auth=auth)
-        else:
-            resp = self._session.post("{}/{}/_bulk_docs".format(url, db), data=json.dumps(request_body))
+        def post_chunk(chunk):
+            # transform 'docs' into a format expected by _bulk_docs
+            if server_type == ServerType.listener:
+                request_body = {"docs": chunk, "new_edits": True}
+            else:
+                request_body = {"docs": chunk}
+            data = json.dumps(request_body, cls=MyEncoder)
 
-        log_r(resp)
-        resp.raise_for_status()
-        resp_obj = resp.json()
+            start = time.time()
+            resp = self._request("post", "{}/{}/_bulk_docs".format(url, db), auth=auth, data=data)
+            latency = time.time() - start
 
-        for doc_resp in resp_obj:
-            if "error" in doc_resp:
-                raise RestError("Error while adding bulk docs!")
+            log_r(resp)
+            resp.raise_for_status()
+            if stats is not None:
+                stats.record_chunk(len(chunk), len(data), latency)
+            return resp.json()
+
+        # Results per chunk index. At most 2 chunks per worker are generated ahead of the requests
+        chunk_resps = {}
+        start = time.time()
+        if not chunked and concurrency == 1:
+            # One request, sent from the calling thread
+            chunk_resps[0] = post_chunk(docs)
+        else:
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                pending = {}
+                for index, chunk in enumerate(bulk_docs.chunks(docs, chunk_size)):
+                    pending[executor.submit(post_chunk, chunk)] = index
+                    if len(pending) >= 2 * concurrency:
+                        done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                        for future in done:
+                            chunk_resps[pending.pop(future)] = future.result()
+                for future in concurrent.futures.as_completed(pending):
+                    chunk_resps[pending[future]] = future.result()
+        if stats is not None:
+            stats.elapsed = time.time() - start
+            log_info(stats.summary())
+
+        resp_obj = [doc_resp for index in sorted(chunk_resps) for doc_resp in chunk_resps[index]]
+
+        errors = [doc_resp for doc_resp in resp_obj if "error" in doc_resp]
+        if errors:
+            raise RestError("Error while adding bulk docs! {} of {} docs failed, first error: {}".format(len(errors), len(resp_obj), errors[0]))
 
         return resp_obj
 
@@ -1510,7 +1506,7 @@ class MobileRestClient:
         Issues a bulk delete by setting the _deleted flag to true.
         This will create a tombstone.
         """
-        auth_type, auth = get_auth_type(auth)
+        auth = get_auth_adapter(auth)
         server_type = self.get_server_type(url, auth)
 
         for doc in docs:
@@ -1522,14 +1518,7 @@ class MobileRestClient:
         else:
             request_body = {"docs": docs}
 
-        if auth_type == AuthType.session:
-            resp = self._session.post("{}/{}/_bulk_docs".format(url, db),
-                                      data=json.dumps(request_body),
-                                      cookies=dict(SyncGatewaySession=auth[1]))
-        elif auth_type == AuthType.http_basic:
-            resp = self._session.post("{}/{}/_bulk_docs".format(url, db), data=json.dumps(request_body), auth=auth)
-        else:
-            resp = self._session.post("{}/{}/_bulk_docs".format(url, db), data=json.dumps(request_body))
+        resp = self._request("post", "{}/{}/_bulk_docs".format(url, db), auth=auth, data=json.dumps(request_body))
 
         log_r(resp)
         resp.raise_for_status()
@@ -1544,17 +1533,12 @@ class MobileRestClient:
     def get_all_docs(self, url, db, auth=None, include_docs=False):
         """ Get all docs for a database via _all_docs """
 
-        auth_type, auth = get_auth_type(auth)
+        auth = get_auth_adapter(auth)
         params = {}
         if include_docs:
             params["include_docs"] = "true"
 
-        if auth_type == AuthType.session:
-            resp = self._session.get("{}/{}/_all_docs".format(url, db), params=params, cookies=dict(SyncGatewaySession=auth[1]))
-        elif auth_type == AuthType.http_basic:
-            resp = self._session.get("{}/{}/_all_docs".format(url, db), params=params, auth=auth)
-        else:
-            resp = self._session.get("{}/{}/_all_docs".format(url, db), params=params)
+        resp = self._request("get", "{}/{}/_all_docs".format(url, db), auth=auth, params=params)
 
         log_r(resp)
         resp.raise_for_status()
@@ -1579,27 +1563,20 @@ class MobileRestClient:
         # ]
         doc_ids_formatted = [{"id": doc_id} for doc_id in doc_ids]
         request_body = {"docs": doc_ids_formatted}
-        auth_type, auth = get_auth_type(auth)
+        auth = get_auth_adapter(auth)
         keyspace = db
         if scope is not None:
             keyspace = db + "." + scope + "." + collection
 
-        if auth_type == AuthType.session:
-            resp = self._session.post("{}/{}/_bulk_get?revs={}".format(url, keyspace, rev_history), data=json.dumps(request_body), cookies=dict(SyncGatewaySession=auth[1]))
-        elif auth_type == AuthType.http_basic:
-            resp = self._session.post("{}/{}/_bulk_get?revs={}".format(url, keyspace, rev_history), data=json.dumps(request_body), auth=auth)
-        else:
-            resp = self._session.post("{}/{}/_bulk_get?revs={}".format(url, keyspace, rev_history), data=json.dumps(request_body))
+        resp = self._request("post", "{}/{}/_bulk_get?revs={}".format(url, keyspace, rev_history), auth=auth, data=json.dumps(request_body),
+                             headers=multipart.PART_ENCODING_HEADERS, stream=True)
 
-        log_r(resp)
+        log_r(resp, streamed=True)
         resp.raise_for_status()
 
-        resp_obj = parse_multipart_response(resp.text)
-        logging.debug(resp_obj)
-
         docs = []
         errors = []
-        for row in resp_obj["rows"]:
+        for row in multipart.iter_response_docs(resp):
             if "error" in row:
                 errors.append(row)
             else:
@@ -1858,16 +1835,50 @@ class MobileRestClient:
 
         return resp.json()
 
-    def verify_docs_present(self, url, db, expected_docs, auth=None, timeout=CLIENT_REQUEST_TIMEOUT, attachments=False):
+    def _get_docs_for_verify(self, url, db, server_type, auth, doc_ids):
+        """ Fetch 'doc_ids' for verify_docs_present, returns {doc_id: rev} for the docs found """
+        found = {}
+        if server_type == ServerType.listener:
+
+            data = {"keys": doc_ids}
+            resp = self._session.post("{}/{}/_all_docs".format(url, db), data=json.dumps(data))
+            log_r(resp)
+            resp.raise_for_status()
+
+            # Mac OSX - {"key":"test_ls_db2_5","error":"not_found"}
+            # Android - {"doc":null,"id":"test_ls_db2_5","key":"test_ls_db2_5","value":{}}
+            for resp_doc in resp.json()["rows"]:
+                if "error" not in resp_doc and resp_doc.get("value"):
+                    found[resp_doc["id"]] = resp_doc["value"]["rev"]
+
+        elif server_type == ServerType.syncgateway:
+
+            # Constuct _bulk_get body
+            bulk_get_body = {"docs": [{"id": doc_id} for doc_id in doc_ids]}
+            resp = self._request("post", "{}/{}/_bulk_get".format(url, db), auth=auth, data=json.dumps(bulk_get_body),
+                                 headers=multipart.PART_ENCODING_HEADERS, stream=True)
+            log_r(resp, streamed=True)
+            resp.raise_for_status()
+
+            for resp_doc in multipart.iter_response_docs(resp):
+                if "error" not in resp_doc and "_id" in resp_doc:
+                    found[resp_doc["_id"]] = resp_doc["_rev"]
+
+        return found
+
+    def verify_docs_present(self, url, db, expected_docs, auth=None, timeout=CLIENT_REQUEST_TIMEOUT, attachments=False, chunk_size=1000):
         """
         Verifies the expected docs are present in the database using a polling loop with
         POST _all_docs with Listener and a POST _bulk_get for sync_gateway
 
         expected_docs should be a dict {id: {rev: ""}} or
         a list of {id: {rev: ""}}. If the expected docs are a list, they will be converted to a single map.
+
+        Docs found with the expected rev are crossed out, each retry only requests
+        the docs still missing, 'chunk_size' ids per request.
         """
 
-        auth_type, auth = get_auth_type(auth)
+        auth = get_auth_adapter(auth)
         server_type = self.get_server_type(url, auth)
 
         logging.debug(expected_docs)
@@ -1889,110 +1900,51 @@ class MobileRestClient:
 
         log_info("Verify {}/{} has {} docs".format(url, db, len(expected_doc_map)), is_verify=True)
 
+        # Docs not found yet with the expected rev (and attachments)
+        missing_doc_map = dict(expected_doc_map)
+
         start = time.time()
         while True:
 
             if time.time() - start > timeout:
                 raise TimeoutException("Verify Docs Present: TIMEOUT")
 
-            if server_type == ServerType.listener:
-
-                data = {"keys": list(expected_doc_map.keys())}
-                resp = self._session.post("{}/{}/_all_docs".format(url, db), data=json.dumps(data))
-                log_r(resp)
-                resp.raise_for_status()
-                resp_obj = resp.json()
-
-            elif server_type == ServerType.syncgateway:
-
-                # Constuct _bulk_get body
-                bulk_get_body_id_list = []
-                for key in list(expected_doc_map.keys()):
-                    bulk_get_body_id_list.append({"id": key})
-                bulk_get_body = {"docs": bulk_get_body_id_list}
-
-                if auth_type == AuthType.session:
-                    resp = self._session.post("{}/{}/_bulk_get".format(url, db), data=json.dumps(bulk_get_body), cookies=dict(SyncGatewaySession=auth[1]))
-                elif auth_type == AuthType.http_basic:
-                    resp = self._session.post("{}/{}/_bulk_get".format(url, db), data=json.dumps(bulk_get_body), auth=auth)
-                else:
-                    resp = self._session.post("{}/{}/_bulk_get".format(url, db), data=json.dumps(bulk_get_body))
-
-                log_r(resp)
-                resp.raise_for_status()
-
-                resp_obj = parse_multipart_response(resp.text)
-
-            # See any docs were not retured
-            # Mac OSX - {"key":"test_ls_db2_5","error":"not_found"}
-            # Android - {"doc":null,"id":"test_ls_db2_5","key":"test_ls_db2_5","value":{}}
-
-            all_docs_returned = True
-            all_attachments_returned = True
-            missing_docs = []
             missing_attachment_docs = []
-            for resp_doc in resp_obj["rows"]:
-                if "error" in resp_doc or ("value" in resp_doc and len(resp_doc["value"]) == 0):
-                    # Doc not found
-                    missing_docs.append(resp_doc)
-                    all_docs_returned = False
-                elif server_type == ServerType.listener and resp_doc["value"]["rev"] != expected_doc_map[resp_doc["id"]]:
-                    # Found the doc but unexpected rev on LiteServ
-                    missing_docs.append(resp_doc)
-                    all_docs_returned = False
-                elif server_type == ServerType.syncgateway and resp_doc["_rev"] != expected_doc_map[resp_doc["_id"]]:
-                    # Found the doc but unexpected rev on LiteServ
-                    missing_docs.append(resp_doc)
-                    all_docs_returned = False
-
-                if attachments and server_type == ServerType.listener:
-                    # Check for an attachment
-                    doc_id = resp_doc["key"]
-                    doc_data = self._session.get("{}/{}/{}".format(url, db, doc_id))
-                    doc_json = doc_data.json()
-
-                    if "_attachments" not in doc_json and "id" in resp_doc and expected_attachment_map[resp_doc["id"]] != list(doc_json["_attachments"].keys()):
-                        all_attachments_returned = False
-                        missing_attachment_docs.append(doc_id)
-
-            logging.debug("Missing Docs = {}".format(missing_docs))
-            log_info("Num found docs: {}".format(len(resp_obj["rows"]) - len(missing_docs)))
-            log_info("Num missing docs: {}".format(len(missing_docs)))
-
-            # Issue the request again, docs my still be replicating
-            if not all_docs_returned:
-                logging.info("Retrying to verify all docs are present ...")
-                time.sleep(1)
-                continue
-
-            # Issue the request again, docs my still be replicating
+            for doc_ids in bulk_docs.chunks(list(missing_doc_map), chunk_size):
+                found = self._get_docs_for_verify(url, db, server_type, auth, doc_ids)
+
+                for doc_id, rev in found.items():
+                    if rev != missing_doc_map[doc_id]:
+                        # Found the doc but unexpected rev
+                        continue
+
+                    if attachments and server_type == ServerType.listener:
+                        # Check for an attachment
+                        doc_json = self._session.get("{}/{}/{}".format(url, db, doc_id)).json()
+                        if "_attachments" not in doc_json or expected_attachment_map[doc_id] != list(doc_json["_attachments"].keys()):
+                            missing_attachment_docs.append(doc_id)
+                            continue
+
+                    del missing_doc_map[doc_id]
+
+            log_debug("Missing Docs = %s", list(missing_doc_map))
+            log_info("Num found docs: {}".format(len(expected_doc_map) - len(missing_doc_map)))
+            log_info("Num missing docs: {}".format(len(missing_doc_map)))
             if attachments:
                 log_info("Num missing attachment Docs = {}".format(len(missing_attachment_docs)))
-                if not all_attachments_returned:
-                    logging.info("Retrying to verify all attachments are present ...")
-                    time.sleep(1)
-                    continue
 
-            resp_docs = {}
-            for resp_doc in resp_obj["rows"]:
-                if server_type == ServerType.listener:
-                    resp_docs[resp_doc["id"]] = resp_doc["value"]["rev"]
-                elif server_type == ServerType.syncgateway:
-                    resp_docs[resp_doc["_id"]] = resp_doc["_rev"]
-
-            logging.debug("Expected: {}".format(expected_doc_map))
-            logging.debug("Actual: {}".format(resp_docs))
-
-            if expected_doc_map != resp_docs:
-                raise AssertionError("Unable to verify docs present. Dictionaries are not equal")
+            if not missing_doc_map:
+                break
 
-            break
+            # Issue the request again for the missing docs, docs my still be replicating
+            logging.info("Retrying to verify all docs are present ...")
+            time.sleep(1)
 
     def stream_continuous_changes(self, url, db, since, auth, filter_type=None, filter_channels=None):
         """
         Issues a continuous changes feed request and returns the stream
         """
-        auth_type, auth = get_auth_type(auth)
+        auth = get_auth_adapter(auth)
         body = {
             "feed": "continuous",
             "since": since
@@ -2013,12 +1965,7 @@ class MobileRestClient:
                     filter_type
                 ))
 
-        if auth_type == AuthType.session:
-            resp = self._session.post("{}/{}/_changes".format(url, db), data=json.dumps(body), cookies=dict(SyncGatewaySession=auth[1]), stream=True)
-        elif auth_type == AuthType.http_basic:
-            resp = self._session.post("{}/{}/_changes".format(url, db), data=json.dumps(body), auth=auth, stream=True)
-        else:
-            resp = self._session.post("{}/{}/_changes".format(url, db), data=json.dumps(body), stream=True)
+        resp = self._request("post", "{}/{}/_changes".format(url, db), auth=auth, data=json.dumps(body), stream=True)
 
         return resp
 
@@ -2035,7 +1982,7 @@ class MobileRestClient:
         timeout *= 1000
 
         server_type = self.get_server_type(url, auth)
-        auth_type, auth = get_auth_type(auth)
+        auth = get_auth_adapter(auth)
 
         if server_type == ServerType.listener:
 
@@ -2043,12 +1990,7 @@ class MobileRestClient:
             if limit is not None:
                 request_url += "&limit={}".format(limit)
 
-            if auth_type == AuthType.session:
-                resp = self._session.get(request_url, cookies=dict(SyncGatewaySession=auth[1]))
-            elif auth_type == AuthType.http_basic:
-                resp = self._session.get(request_url, auth=auth)
-            else:
-                resp = self._session.get(request_url)
+            resp = self._request("get", request_url, auth=auth)
 
         elif server_type == ServerType.syncgateway:
 
@@ -2090,12 +2032,7 @@ class MobileRestClient:
 
             log_info("Using POST data: {}".format(body))
 
-            if auth_type == AuthType.session:
-                resp = self._session.post("{}/{}/_changes".format(url, db), data=json.dumps(body), cookies=dict(SyncGatewaySession=auth[1]))
-            elif auth_type == AuthType.http_basic:
-                resp = self._session.post("{}/{}/_changes".format(url, db), data=json.dumps(body), auth=auth)
-            else:
-                resp = self._session.post("{}/{}/_changes".format(url, db), data=json.dumps(body))
+            resp = self._request("post", "{}/{}/_changes".format(url, db), auth=auth, data=json.dumps(body))
 
         log_r(resp)
         resp.raise_for_status()
@@ -2151,7 +2088,7 @@ class MobileRestClient:
         if "rev" in doc:
             raise ValueError("User doc should not have a rev")
 
-    def verify_docs_in_changes(self, url, db, expected_docs, auth=None, strict=False, polling_interval=60):
+    def verify_docs_in_changes(self, url, db, expected_docs, auth=None, strict=False, polling_interval=60, since=0):
         """
         Verifies the expected docs are present in the database _changes feed using longpoll in a loop with
         Uses a GET _changes?feed=longpoll&since=last_seq for Listener
@@ -2161,6 +2098,9 @@ class MobileRestClient:
         a list of {id: {rev: ""}}. If the expected docs are a list, they will be converted to a single map.
 
         If strict = True, fail if any docs other that the expected docs are found while validating
+
+        The feed is read from 'since' and each poll resumes from the last sequence seen.
+        Returns that last sequence, pass it as 'since' to a later verification to skip the changes already checked.
         """
 
         if isinstance(expected_docs, list):
@@ -2175,17 +2115,14 @@ class MobileRestClient:
         log_info("Verify {}/{} has {} docs in changes".format(url, db, len(expected_doc_map)), is_verify=True)
 
         sequence_number_map = {}
+        deadline = Deadline(CLIENT_REQUEST_TIMEOUT)
+        state = {"last_seq": since}
 
-        start = time.time()
-        last_seq = 0
-
-        while True:
-            logging.info(time.time() - start)
-
-            if time.time() - start > CLIENT_REQUEST_TIMEOUT:
-                raise TimeoutException("Verify Docs In Changes: TIMEOUT")
-
-            resp_obj = self.get_changes(url=url, db=db, since=last_seq, auth=auth, timeout=polling_interval)
+        def expected_docs_in_changes():
+            # The longpoll is held server side until there are new changes, so polls need no sleep in between,
+            # but it must not outlive the deadline
+            longpoll_timeout = max(1, min(polling_interval, int(deadline.remaining())))
+            resp_obj = self.get_changes(url=url, db=db, since=state["last_seq"], auth=auth, timeout=longpoll_timeout)
 
             missing_expected_docs = []
             for resp_doc in resp_obj["results"]:
@@ -2200,12 +2137,14 @@ class MobileRestClient:
                     if resp_doc["id"].startswith("_user/"):
                         self.verify_is_user_doc(resp_doc)
                         del expected_doc_map[resp_doc["id"]]
+                        continue
 
                     # Check that the rev of the changes docs matches the expected docs rev
                     for resp_doc_change in resp_doc["changes"]:
                         if resp_doc_change["rev"] == expected_doc_map[resp_doc["id"]]:
                             # expected doc with expected revision found in changes, cross out doc from expected docs
                             del expected_doc_map[resp_doc["id"]]
+                            break
                         else:
                             # expected rev not found
                             logging.debug("Found doc: {} in changes but could not find expected rev")
@@ -2217,17 +2156,19 @@ class MobileRestClient:
                 raise ChangesError("Found unexpected docs in changes feed: {}".format(missing_expected_docs))
 
             log_info("Missing expected docs: {}".format(len(expected_doc_map)))
-            log_debug("Sequence number map: {}".format(sequence_number_map))
+            log_debug("Sequence number map: %s", sequence_number_map)
 
-            if len(expected_doc_map) == 0:
-                # All expected docs have been crossed out
-                break
+            # update last sequence, the next poll resumes from it
+            state["last_seq"] = resp_obj["last_seq"]
+            log_info("last_seq: {}".format(state["last_seq"]))
 
-            # update last sequence and continue
-            last_seq = resp_obj["last_seq"]
-            log_info("last_seq: {}".format(last_seq))
+            # All expected docs have been crossed out
+            return len(expected_doc_map) == 0
 
-            time.sleep(1)
+        wait_until(expected_docs_in_changes, deadline=deadline, backoff=Backoff(initial=0, jitter=0),
+                   name="verify_docs_in_changes", message="Verify Docs In Changes: TIMEOUT")
+
+        return state["last_seq"]
 
     def add_design_doc(self, url, db, name, doc, auth=None):
         """
@@ -2293,7 +2234,7 @@ class MobileRestClient:
         Keyword that returns a view query for a design doc with a view name
         """
 
-        auth_type, auth = get_auth_type(auth)
+        auth = get_auth_adapter(auth)
         server_type = self.get_server_type(url, auth)
 
         url = "{}/{}/_design/{}/_view/{}".format(url, db, design_doc_name, view_name)
@@ -2310,21 +2251,10 @@ class MobileRestClient:
                 raise RestError("Could not get view after retries!")
 
             try:
-                if auth_type == AuthType.session:
-                    resp = self._session.get(url, params=params, cookies=dict(SyncGatewaySession=auth[1]))
-                    log_r(resp)
-                    resp.raise_for_status()
-                    break
-                elif auth_type == AuthType.http_basic:
-                    resp = self._session.get(url, params=params, auth=auth)
-                    log_r(resp)
-                    resp.raise_for_status()
-                    break
-                else:
-                    resp = self._session.get(url, params=params)
-                    log_r(resp)
-                    resp.raise_for_status()
-                    break
+                resp = self._request("get", url, auth=auth, params=params)
+                log_r(resp)
+                resp.raise_for_status()
+                break
             except HTTPError as he:
                 # It is possible that the view is not inialized.
                 # The server will return 500 in this case, handle this with a few retries.
@@ -2404,8 +2334,8 @@ class MobileRestClient:
                 # doc was found
                 found_doc_ids.append(doc["_id"])
 
-        logging.debug("Found Doc Ids: {}".format(found_doc_ids))
-        logging.debug("Expected Doc Ids: {}".format(expected_doc_ids))
+        log_debug("Found Doc Ids: %s", found_doc_ids)
+        log_debug("Expected Doc Ids: %s", expected_doc_ids)
         if found_doc_ids != expected_doc_ids:
             raise AssertionError("Found doc ids should be the same as expected doc ids")
 
@@ -2425,8 +2355,8 @@ class MobileRestClient:
                 # missing doc was found
                 missing_doc_ids.append(doc["id"])
 
-        logging.debug("Found Doc Ids: {}".format(missing_doc_ids))
-        logging.debug("Expected Doc Ids: {}".format(expected_missing_doc_ids))
+        log_debug("Found Doc Ids: %s", missing_doc_ids)
+        log_debug("Expected Doc Ids: %s", expected_missing_doc_ids)
         if missing_doc_ids != expected_missing_doc_ids:
             raise AssertionError("Found doc ids should be the same as expected doc ids")
 
@@ -2468,19 +2398,14 @@ class MobileRestClient:
 
     def get_changes_style_all_docs(self, url, db, auth=None, include_docs=False):
         """ Get all changes with include docs enabled and style all_docs """
-        auth_type, auth = get_auth_type(auth)
+        auth = get_auth_adapter(auth)
 
         params = {}
         if include_docs:
             params["include_docs"] = "true"
             params["style"] = "all_docs"
 
-        if auth_type == AuthType.session:
-            resp = self._session.get("{}/{}/_changes".format(url, db), params=params, cookies=dict(SyncGatewaySession=auth[1]))
-        elif auth_type == AuthType.http_basic:
-            resp = self._session.get("{}/{}/_changes".format(url, db), params=params, auth=auth)
-        else:
-            resp = self._session.get("{}/{}/_changes".format(url, db), params=params)
+        resp = self._request("get", "{}/{}/_changes".format(url, db), auth=auth, params=params)
 
         log_r(resp)
         resp.raise_for_status()
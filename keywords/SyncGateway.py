@@ -7,11 +7,12 @@ from requests.auth import HTTPBasicAuth
 from jinja2 import Template
 import time
 import re
-from keywords.constants import SYNC_GATEWAY_CONFIGS, SYNC_GATEWAY_CERT, SYNC_GATEWAY_CONFIGS_CPC
+from keywords.constants import SYNC_GATEWAY_CONFIGS, SYNC_GATEWAY_CERT, SYNC_GATEWAY_CONFIGS_CPC, RBAC_FULL_ADMIN
+from keywords.timeutils import wait_until, Backoff
 from keywords.utils import version_is_binary, add_cbs_to_sg_config_server_field
 from keywords.utils import log_r
 from keywords.utils import version_and_build
-from keywords.utils import hostname_for_url, ip_from_url
+from keywords.utils import hostname_for_url, hostnames_for_urls, ip_from_url
 from keywords.utils import log_info
 from utilities.cluster_config_utils import get_revs_limit, is_x509_auth, generate_x509_certs, get_cbs_primary_nodes_str
 from keywords.exceptions import ProvisioningError, Error
@@ -24,8 +25,9 @@ from libraries.testkit.cluster import Cluster
 
 from keywords.utils import host_for_url
 from keywords import document
+from keywords.endpoints import invalidate_endpoints
 from keywords.utils import random_string
-from utilities.cluster_config_utils import copy_sgconf_to_temp, replace_string_on_sgw_config, get_cluster
+from utilities.cluster_config_utils import copy_sgconf_to_temp, replace_string_on_sgw_config, get_cluster, load_cluster_config_json
 from utilities.cluster_config_utils import is_server_tls_skip_verify_enabled, is_admin_auth_disabled, is_tls_server_disabled
 from libraries.testkit import cluster
 
@@ -81,6 +83,47 @@ def get_sync_gateway_version(host):
     return running_version_formatted, running_vendor_version
 
 
+def sync_gateway_ready(host, public=True, session=requests):
+    """ True if the sync gateway on host answers GET / on the public port (skipped for sg_accel
+    with public=False) and GET /_expvar on the admin port
+    """
+    sg_scheme = "http"
+    cluster_config = os.environ["CLUSTER_CONFIG"]
+    if sg_ssl_enabled(cluster_config):
+        sg_scheme = "https"
+    if ":" in host:
+        host = "[{}]".format(host)
+
+    probes = ["{}://{}:4985/_expvar".format(sg_scheme, host)]
+    if public:
+        probes.insert(0, "{}://{}:4984/".format(sg_scheme, host))
+
+    for probe in probes:
+        try:
+            resp = session.get(probe, verify=False, timeout=5, auth=HTTPBasicAuth(RBAC_FULL_ADMIN['user'], RBAC_FULL_ADMIN['pwd']))
+        except requests.exceptions.RequestException as e:
+            log_info("{} not ready: {}".format(probe, e))
+            return False
+        if resp.status_code != 200:
+            log_info("{} not ready: {}".format(probe, resp.status_code))
+            return False
+    return True
+
+
+def wait_for_sync_gateway_ready(host, public=True, timeout=120):
+    """ Wait until sync_gateway_ready(host) instead of sleeping after a (re)start,
+    raises TimeoutException after 'timeout' seconds
+    """
+    wait_until(
+        lambda: sync_gateway_ready(host, public=public),
+        timeout=timeout,
+        backoff=Backoff(initial=0.5, maximum=5),
+        name="wait_for_sync_gateway_ready",
+        message="Sync Gateway {} not ready after {}s".format(host, timeout)
+    )
+    log_info("Sync Gateway {} is ready".format(host))
+
+
 def verify_sync_gateway_product_info(host):
     """ Get the product information from host and verify for Sync Gateway:
     - vendor name in GET / request
@@ -428,8 +471,7 @@ class SyncGateway(object):
 
         log_info("Verfying versions for cluster: {}".format(cluster_config))
 
-        with open("{}.json".format(cluster_config)) as f:
-            cluster_obj = json.loads(f.read())
+        cluster_obj = load_cluster_config_json(cluster_config)
 
         # Verify sync_gateway versions
         if url is None:
@@ -445,8 +487,9 @@ class SyncGateway(object):
 
     def start_sync_gateways(self, cluster_config, url=None, config=None, bucket_list=[], use_config=False):
         """Start sync gateways in a cluster. If url is passed,
-        start the sync gateway at that url
+        start the sync gateway at that url, a list of urls starts them all in one playbook run
         """
+        invalidate_endpoints(url)
         ansible_runner = AnsibleRunner(cluster_config)
         c_cluster = cluster.Cluster(cluster_config)
         if config is None:
@@ -648,7 +691,7 @@ class SyncGateway(object):
             playbook_vars["disable_admin_auth"] = '"admin_interface_authentication": false,    \n"metrics_interface_authentication": false,'
 
         if url is not None:
-            target = hostname_for_url(cluster_config, url)
+            target = hostnames_for_urls(cluster_config, url)
             log_info("Starting {} sync_gateway.".format(target))
             status = ansible_runner.run_ansible_playbook(
                 "start-sync-gateway.yml",
@@ -671,12 +714,13 @@ class SyncGateway(object):
 
     def stop_sync_gateways(self, cluster_config, url=None):
         """ Stop sync gateways in a cluster. If url is passed, shut down
-        shut down the sync gateway at that url
+        shut down the sync gateway at that url, or every one of a list of urls
         """
+        invalidate_endpoints(url)
         ansible_runner = AnsibleRunner(cluster_config)
 
         if url is not None:
-            target = hostname_for_url(cluster_config, url)
+            target = hostnames_for_urls(cluster_config, url)
             log_info("Shutting down sync_gateway on {} ...".format(target))
             status = ansible_runner.run_ansible_playbook(
                 "stop-sync-gateway.yml",
@@ -692,12 +736,13 @@ class SyncGateway(object):
 
     def restart_sync_gateways(self, cluster_config, url=None):
         """ Restart sync gateways in a cluster. If url is passed, restart
-         the sync gateway at that url
+         the sync gateway at that url, or every one of a list of urls
         """
+        invalidate_endpoints(url)
         ansible_runner = AnsibleRunner(cluster_config)
 
         if url is not None:
-            target = hostname_for_url(cluster_config, url)
+            target = hostnames_for_urls(cluster_config, url)
             log_info("Restarting sync_gateway on {} ...".format(target))
             status = ansible_runner.run_ansible_playbook(
                 "restart-sync-gateway.yml",
@@ -711,28 +756,27 @@ class SyncGateway(object):
         if status != 0:
             raise ProvisioningError("Could not restart sync_gateway")
 
-    def upgrade_sync_gateway(self, sync_gateways, sync_gateway_version, sync_gateway_upgraded_version, sg_conf, cluster_config, verify_version=True):
+    def upgrade_sync_gateway(self, sync_gateways, sync_gateway_version, sync_gateway_upgraded_version, sg_conf, cluster_config, verify_version=True,
+                             concurrency=1):
+        """ Upgrade 'sync_gateways', 'concurrency' nodes at a time (1 is a rolling upgrade, 0 all at once) """
+        from keywords.SyncGatewayOrchestrator import SyncGatewayOrchestrator
         log_info('------------------------------------------')
         log_info('START Sync Gateway cluster upgrade')
         log_info('------------------------------------------')
 
-        for sg in sync_gateways:
-            sg_ip = host_for_url(sg["admin"])
+        sg_ips = [host_for_url(sg["admin"]) for sg in sync_gateways]
+        for sg_ip in sg_ips:
             log_info("Checking for sync gateway product info before upgrade")
             verify_sync_gateway_product_info(sg_ip)
             log_info("Checking for sync gateway version: {}".format(sync_gateway_version))
             if verify_version:
                 verify_sync_gateway_version(sg_ip, sync_gateway_version)
-            log_info("Upgrading sync gateway: {}".format(sg_ip))
-            self.upgrade_sync_gateways(
-                cluster_config=cluster_config,
-                sg_conf=sg_conf,
-                sgw_previous_version=sync_gateway_version,
-                sync_gateway_version=sync_gateway_upgraded_version,
-                url=sg_ip
-            )
 
-            time.sleep(10)  # After upgrading each sync gateway, it need few seconds to get product info
+        # Each batch is probed until it serves product info again before the next one is upgraded
+        orchestrator = SyncGatewayOrchestrator(cluster_config, concurrency=concurrency)
+        orchestrator.upgrade(sg_ips, sg_conf, sync_gateway_version, sync_gateway_upgraded_version)
+
+        for sg_ip in sg_ips:
             log_info("Checking for sync gateway product info after upgrade")
             verify_sync_gateway_product_info(sg_ip)
             log_info("Checking for sync gateway version after upgrade: {}".format(sync_gateway_upgraded_version))
@@ -745,8 +789,9 @@ class SyncGateway(object):
 
     def upgrade_sync_gateways(self, cluster_config, sg_conf, sgw_previous_version, sync_gateway_version, url=None, upgrade_only=False):
         """ Upgrade sync gateways in a cluster. If url is passed, upgrade
-            the sync gateway at that url
+            the sync gateway at that url, or every one of a list of urls
         """
+        invalidate_endpoints(url)
         ansible_runner = AnsibleRunner(cluster_config)
         c_cluster = cluster.Cluster(cluster_config)
         from libraries.provision.install_sync_gateway import SyncGatewayConfig
@@ -915,7 +960,7 @@ class SyncGateway(object):
         playbook_vars.update(playbook_vars1)
         if upgrade_only:
             if url is not None:
-                target = hostname_for_url(cluster_config, url)
+                target = hostnames_for_urls(cluster_config, url)
                 log_info("Upgrading sync_gateway on target {}".format(target))
                 status = ansible_runner.run_ansible_playbook(
                     "upgrade-sgw-package.yml",
@@ -933,7 +978,7 @@ class SyncGateway(object):
             log_info("upgrade status is {}".format(status))
         else:
             if url is not None:
-                target = hostname_for_url(cluster_config, url)
+                target = hostnames_for_urls(cluster_config, url)
                 log_info("Upgrading sync_gateway/sg_accel on {} ...".format(target))
                 status = ansible_runner.run_ansible_playbook(
                     "upgrade-sg-sgaccel-package.yml",
@@ -973,7 +1018,9 @@ class SyncGateway(object):
     def redeploy_sync_gateway_config(self, cluster_config, sg_conf, url, sync_gateway_version, enable_import=False, deploy_only=False):
         """Deploy an SG config with xattrs enabled
             Will also enable import if enable_import is set to True
-            It is used to enable xattrs and import in the SG config"""
+            It is used to enable xattrs and import in the SG config
+            url can be a list of urls to deploy to several sync gateways in one playbook run"""
+        invalidate_endpoints(url)
         ansible_runner = AnsibleRunner(cluster_config)
         from libraries.testkit.syncgateway import SyncGateway
         c_cluster = cluster.Cluster(cluster_config)
@@ -1132,7 +1179,7 @@ class SyncGateway(object):
         # Deploy config
         if deploy_only:
             if url is not None:
-                target = hostname_for_url(cluster_config, url)
+                target = hostnames_for_urls(cluster_config, url)
                 log_info("Deploying sync_gateway config on {} ...".format(target))
                 status = ansible_runner.run_ansible_playbook(
                     "deploy-only-sync-gateway.yml",
@@ -1149,7 +1196,7 @@ class SyncGateway(object):
                 raise Exception("Could not deploy config to sync_gateway")
         else:
             if url is not None:
-                target = hostname_for_url(cluster_config, url)
+                target = hostnames_for_urls(cluster_config, url)
                 log_info("Deploying sync_gateway config on {} ...".format(target))
                 status = ansible_runner.run_ansible_playbook(
                     "deploy-sync-gateway-config.yml",
@@ -1168,10 +1215,11 @@ class SyncGateway(object):
                 if status == 0:
                     if url is not None:
                         # Now create rest API for all database configs
-                        sg_name = hostname_for_url(cluster_config, url)
-                        sg_ip = ip_from_url(url)
-                        sg_target = {"name": sg_name, "ip": sg_ip}
-                        sg_gateways = [SyncGateway(cluster_config=cluster_config, target=sg_target)]
+                        sg_urls = [url] if isinstance(url, str) else url
+                        sg_gateways = [
+                            SyncGateway(cluster_config=cluster_config, target={"name": hostname_for_url(cluster_config, sg_url), "ip": ip_from_url(sg_url)})
+                            for sg_url in sg_urls
+                        ]
                         send_dbconfig_as_restCall(cluster_config, db_config_json, sg_gateways, sgw_config_data)
                     else:
                         send_dbconfig_as_restCall(cluster_config, db_config_json, c_cluster.sync_gateways, sgw_config_data)
@@ -0,0 +1,80 @@
+import concurrent.futures
+import time
+
+from keywords.SyncGateway import SyncGateway, wait_for_sync_gateway_ready
+from keywords.exceptions import ProvisioningError
+from keywords.utils import log_info, ip_from_url
+
+
+class SyncGatewayOrchestrator(object):
+    """ Runs start / stop / restart / redeploy / upgrade on several sync gateway or sg_accel nodes.
+
+    'concurrency' nodes go through a single playbook run at a time (0 is all of them at once,
+    1 is a rolling operation), then every node of the batch is probed with
+    wait_for_sync_gateway_ready before the next batch starts.
+
+        orchestrator = SyncGatewayOrchestrator(cluster_config)
+        orchestrator.restart([sg["admin"] for sg in cluster_topology["sync_gateways"]])
+        orchestrator.restart(cluster_topology["sg_accels"], sg_accel=True)
+    """
+
+    def __init__(self, cluster_config, concurrency=0, ready_timeout=120):
+        self.cluster_config = cluster_config
+        self.concurrency = concurrency
+        self.ready_timeout = ready_timeout
+        self.sg = SyncGateway()
+
+    def _batches(self, urls):
+        urls = list(urls)
+        size = self.concurrency or len(urls)
+        return [urls[i:i + size] for i in range(0, len(urls), size)]
+
+    def wait_until_ready(self, urls, sg_accel=False):
+        """ Probe the nodes of 'urls' concurrently, raises ProvisioningError listing the ones not ready """
+        hosts = [ip_from_url(url) for url in urls]
+        errors = []
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(hosts)) as executor:
+            futures = {
+                executor.submit(wait_for_sync_gateway_ready, host, public=not sg_accel, timeout=self.ready_timeout): host
+                for host in hosts
+            }
+            for future in concurrent.futures.as_completed(futures):
+                try:
+                    future.result()
+                except Exception as e:
+                    errors.append("{}: {}".format(futures[future], e))
+        if errors:
+            raise ProvisioningError("Nodes not ready: {}".format(errors))
+
+    def _run(self, name, urls, operation, ready=True, sg_accel=False):
+        if not urls:
+            return
+        start = time.time()
+        for batch in self._batches(urls):
+            log_info("{} {}".format(name, batch))
+            operation(batch)
+            if ready:
+                self.wait_until_ready(batch, sg_accel=sg_accel)
+        log_info("{} of {} nodes done in {:.1f}s".format(name, len(urls), time.time() - start))
+
+    def start(self, urls, config, sg_accel=False, **kwargs):
+        self._run("Starting", urls, lambda batch: self.sg.start_sync_gateways(self.cluster_config, url=batch, config=config, **kwargs),
+                  sg_accel=sg_accel)
+
+    def stop(self, urls):
+        self._run("Stopping", urls, lambda batch: self.sg.stop_sync_gateways(self.cluster_config, url=batch), ready=False)
+
+    def restart(self, urls, sg_accel=False):
+        self._run("Restarting", urls, lambda batch: self.sg.restart_sync_gateways(self.cluster_config, url=batch),
+                  sg_accel=sg_accel)
+
+    def redeploy(self, urls, sg_conf, sync_gateway_version, enable_import=False, deploy_only=False, sg_accel=False):
+        self._run("Redeploying", urls, lambda batch: self.sg.redeploy_sync_gateway_config(
+            self.cluster_config, sg_conf, url=batch, sync_gateway_version=sync_gateway_version,
+            enable_import=enable_import, deploy_only=deploy_only
+        ), sg_accel=sg_accel)
+
+    def upgrade(self, urls, sg_conf, sgw_previous_version, sync_gateway_version, sg_accel=False):
+        self._run("Upgrading", urls, lambda batch: self.sg.upgrade_sync_gateways(
+            self.cluster_config, sg_conf, sgw_previous_version, sync_gateway_version, url=batch
+        ), sg_accel=sg_accel)
@@ -1,8 +1,11 @@
 import base64
+import os
 import random
+import struct
+import threading
 import uuid
-
-from PIL import Image
+import zlib
+from collections import OrderedDict
 
 from keywords.constants import DATA_DIR
 from keywords.utils import log_info
@@ -45,31 +48,91 @@ def generate_5_png_100_100():
     return att_one_list + att_two_list + att_three_list + att_four_list + att_five_list
 
 
-def generate_png(width, height):
-    """ Generates a noise rgb images for attachment testing. """
+def generate_png(width, height, seed=None):
+    """ Generates a noise rgb image for attachment testing, returned as a list with one Attachment.
+    A 'seed' gives the same image on every call (see AttachmentFactory)
+    """
+    return [default_factory.png(width, height, seed)]
 
-    img = Image.new("RGBA", (width, height), 255)
-    random_rgb_grid = [(
-        int(random.random() * 256),
-        int(random.random() * 256),
-        int(random.random() * 256)
-    ) for x in [0] * width * height]
 
-    img.putdata(random_rgb_grid)
+def _png_chunk(chunk_type, data):
+    return struct.pack(">I", len(data)) + chunk_type + data + struct.pack(">I", zlib.crc32(chunk_type + data) & 0xffffffff)
 
-    image_temp_name = "{}.png".format(str(uuid.uuid4()))
-    image_temp_path = "{}/{}".format(DATA_DIR, image_temp_name)
 
-    # Save temporary image
-    log_info("Saving temporary generated image: {}".format(image_temp_path))
-    img.save(image_temp_path)
+def encode_png(width, height, pixels):
+    """ PNG file of 8 bit RGB 'pixels' (width * height * 3 bytes, row by row) """
+    stride = width * 3
+    # Every scanline starts with its filter type, 0 is none
+    scanlines = b"".join(b"\x00" + pixels[y * stride:(y + 1) * stride] for y in range(height))
+    return b"".join([
+        b"\x89PNG\r\n\x1a\n",
+        _png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)),
+        # Noise does not compress, do not spend time trying
+        _png_chunk(b"IDAT", zlib.compress(scanlines, 1)),
+        _png_chunk(b"IEND", b""),
+    ])
 
-    # Load and store image data
-    att = load_from_data_dir([image_temp_name])
-    log_info("Creating Attachment: {}".format(image_temp_name))
 
-    # Return attachment with generated name and loaded image data
-    return att
+def random_bytes(size, seed=None):
+    """ 'size' random bytes, the same ones for a given 'seed' """
+    if seed is None:
+        return os.urandom(size)
+    return random.Random(seed).getrandbits(size * 8).to_bytes(size, "little")
+
+
+class AttachmentFactory(object):
+    """ Builds noise PNG attachments in memory.
+
+    Images of a given (width, height, seed) are encoded once and kept in a LRU cache of 'max_cached' entries,
+    so repeating a seeded attachment costs nothing. Images without seed are random and never cached.
+
+        factory = AttachmentFactory()
+        att = factory.png(1000, 700, seed=1)
+        att.content / att.data / att.stream()
+    """
+
+    def __init__(self, max_cached=64):
+        self.max_cached = max_cached
+        self._lock = threading.Lock()
+        # (width, height, seed) -> (png bytes, base64 bytes)
+        self._cache = OrderedDict()
+
+    def _encode(self, width, height, seed):
+        content = encode_png(width, height, random_bytes(width * height * 3, seed))
+        return content, base64.standard_b64encode(content)
+
+    def png_data(self, width, height, seed=None):
+        """ (png bytes, base64 bytes) of the image """
+        if seed is None:
+            return self._encode(width, height, seed)
+
+        key = (width, height, seed)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                return cached
+
+        cached = self._encode(width, height, seed)
+        with self._lock:
+            self._cache[key] = cached
+            while len(self._cache) > self.max_cached:
+                self._cache.popitem(last=False)
+        return cached
+
+    def png(self, width, height, seed=None, name=None):
+        """ Attachment of a width x height noise image, named '<uuid>.png' unless 'name' is given """
+        content, data = self.png_data(width, height, seed)
+        if name is None:
+            name = "{}.png".format(uuid.uuid4())
+        return Attachment(name, data, content=content, content_type="image/png")
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+
+default_factory = AttachmentFactory()
 
 
 def load_from_data_dir(names):
@@ -80,14 +143,34 @@ def load_from_data_dir(names):
     for name in names:
         file_path = "{}/{}".format(DATA_DIR, name)
         log_info("Loading attachment from file: {}".format(file_path))
-        with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
-            data = base64.standard_b64encode(f.read().encode())
-            atts.append(Attachment(name, data))
+        with open(file_path, 'rb') as f:
+            content = f.read()
+        atts.append(Attachment(name, base64.standard_b64encode(content), content=content))
     return atts
 
 
 class Attachment:
+    """ A named attachment. 'data' is the base64 encoded content used in _attachments,
+    'content' the raw bytes and stream() yields them in chunks for raw uploads (REST attachment PUT, CBL blobs)
+    """
 
-    def __init__(self, name, data):
+    def __init__(self, name, data, content=None, content_type="application/octet-stream"):
         self.name = name
         self.data = data
+        self._content = content
+        self.content_type = content_type
+
+    @property
+    def content(self):
+        if self._content is None:
+            self._content = base64.standard_b64decode(self.data)
+        return self._content
+
+    def __len__(self):
+        return len(self.content)
+
+    def stream(self, chunk_size=64 * 1024):
+        """ Generator of the raw content, 'chunk_size' bytes at a time, without copying it """
+        view = memoryview(self.content)
+        for start in range(0, len(view), chunk_size):
+            yield view[start:start + chunk_size]
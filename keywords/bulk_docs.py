@@ -0,0 +1,69 @@
+""" Helpers for MobileRestClient's chunked _bulk_docs ingestion """
+import threading
+
+from itertools import islice
+
+# Upper bounds (ms) of the per chunk latency histogram buckets
+LATENCY_BUCKETS_MS = [10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000]
+
+
+def chunks(iterable, size):
+    """ Yield lists of up to 'size' items from 'iterable' without materializing it """
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class BulkDocsStats(object):
+    """ Throughput and per chunk latency of a chunked _bulk_docs ingestion.
+    Chunks are recorded from the worker threads, so recording is locked.
+    """
+
+    def __init__(self, latency_buckets_ms=LATENCY_BUCKETS_MS):
+        self.latency_buckets_ms = list(latency_buckets_ms)
+        self.docs = 0
+        self.bytes = 0
+        self.chunk_latencies = []
+        self.elapsed = 0.0
+        self._lock = threading.Lock()
+
+    def record_chunk(self, num_docs, num_bytes, latency):
+        """ Record one _bulk_docs request, 'latency' in seconds """
+        with self._lock:
+            self.docs += num_docs
+            self.bytes += num_bytes
+            self.chunk_latencies.append(latency)
+
+    @property
+    def docs_per_sec(self):
+        return self.docs / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def bytes_per_sec(self):
+        return self.bytes / self.elapsed if self.elapsed else 0.0
+
+    def latency_histogram(self):
+        """ Returns [(bucket upper bound in ms or None for the overflow bucket, number of chunks)] """
+        counts = [0] * (len(self.latency_buckets_ms) + 1)
+        for latency in self.chunk_latencies:
+            latency_ms = latency * 1000
+            for i, bound in enumerate(self.latency_buckets_ms):
+                if latency_ms <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+        return list(zip(self.latency_buckets_ms + [None], counts))
+
+    def summary(self):
+        lines = ["{} docs, {} bytes in {:.2f}s ({:.1f} docs/s, {:.1f} bytes/s), {} chunks".format(
+            self.docs, self.bytes, self.elapsed, self.docs_per_sec, self.bytes_per_sec, len(self.chunk_latencies)
+        )]
+        for bound, count in self.latency_histogram():
+            if count:
+                label = "<= {}ms".format(bound) if bound is not None else "> {}ms".format(self.latency_buckets_ms[-1])
+                lines.append("  {:>10}: {}".format(label, count))
+        return "\n".join(lines)
@@ -19,6 +19,9 @@ MAX_RETRIES = 10
 CLIENT_REQUEST_TIMEOUT = 180
 REBALANCE_TIMEOUT_SECS = 3600
 REMOTE_EXECUTOR_TIMEOUT = 180
+# Lines of stdout / stderr kept in memory by RemoteExecutor.execute, older lines are only sent to the sink
+REMOTE_EXECUTOR_TAIL_LINES = 10000
+REMOTE_EXECUTOR_KEEPALIVE = 30
 SDK_TIMEOUT = 3600
 
 # Required to make sure that these are created with encryption
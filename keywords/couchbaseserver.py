@@ -1,3 +1,5 @@
+import concurrent.futures
+import threading
 import time
 import json
 import requests
@@ -10,7 +12,8 @@ from couchbase.exceptions import CouchbaseException, DocumentNotFoundException
 from couchbase.cluster import QueryIndexManager, PasswordAuthenticator, ClusterTimeoutOptions, ClusterOptions, Cluster
 import keywords.constants
 from keywords.remoteexecutor import RemoteExecutor
-from keywords.exceptions import CBServerError, ProvisioningError, TimeoutError, RBACUserCreationError
+from keywords.exceptions import CBServerError, ProvisioningError, TimeoutError, TimeoutException, RBACUserCreationError
+from keywords.timeutils import wait_until, Backoff
 from libraries.provision.ansible_runner import AnsibleRunner
 from keywords.utils import log_r, log_info, log_debug, log_error, hostname_for_url, host_for_url
 from keywords.utils import version_and_build, random_string
@@ -139,6 +142,25 @@ class CouchbaseServer:
         log_r(resp)
         resp.raise_for_status()
 
+    def flush_bucket(self, name):
+        """ Delete every document of the bucket 'name', the bucket must have been created with flushEnabled """
+        count = 0
+        while True:
+            resp = self._session.post("{}/pools/default/buckets/{}/controller/doFlush".format(self.url, name))
+            log_r(resp)
+            # 503 while a previous flush or the bucket warmup is still running
+            if resp.status_code != 503 or count == self.max_retries:
+                break
+            count += 1
+            time.sleep(1)
+        resp.raise_for_status()
+
+    def flush_buckets(self, bucket_names):
+        """ Flush 'bucket_names', faster than deleting and recreating them as indexes are kept """
+        for bucket_name in bucket_names:
+            log_info("Flushing bucket: {}".format(bucket_name))
+            self.flush_bucket(bucket_name)
+
     def delete_buckets(self):
         """ Deletes all of the buckets on a Couchbase Server.
         If the buckets cannot be deleted after 3 tries, an exception will be raised.
@@ -233,43 +255,60 @@ class CouchbaseServer:
                 count += 1
                 time.sleep(15)
 
+    def _nodes_healthy(self, path):
+        """ True if every node of the 'nodes' list at 'path' reports a "healthy" status """
+        try:
+            resp = self._session.get("{}{}".format(self.url, path))
+            log_r(resp)
+        except ConnectionError:
+            # If bringing a server online, there may be some connnection issues. Poll again.
+            return False
+        if resp.status_code != 200:
+            return False
+
+        resp_obj = resp.json()
+        not_healthy = [node["status"] for node in resp_obj["nodes"] if node["status"] != "healthy"]
+        if not_healthy:
+            log_info("Nodes of {} still not healthy. Status: {} Retrying ...".format(path, not_healthy))
+            return False
+        log_debug(resp_obj)
+        return True
+
     def wait_for_ready_state(self):
         """
         Verify all server node is in are in a "healthy" state to avoid sync_gateway startup failures
         Work around for this - https://github.com/couchbase/sync_gateway/issues/1745
         """
-        start = time.time()
-        while True:
-
-            elapsed = time.time()
-            if elapsed - start > keywords.constants.CLIENT_REQUEST_TIMEOUT:
-                raise Exception("Timeout: Server not in ready state! {}s".format(elapsed))
-
-            # Verfy the server is in a "healthy", not "warmup" state
-            try:
-                resp = self._session.get("{}/pools/nodes".format(self.url))
-                log_r(resp)
-            except ConnectionError:
-                # If bringing a server online, there may be some connnection issues. Continue and try again.
-                time.sleep(1)
-                continue
-
-            resp_obj = resp.json()
-
-            all_nodes_healthy = True
-            for node in resp_obj["nodes"]:
-                if node["status"] != "healthy":
-                    all_nodes_healthy = False
-                    log_info("Node is still not healthy. Status: {} Retrying ...".format(node["status"]))
-                    time.sleep(1)
+        wait_until(lambda: self._nodes_healthy("/pools/nodes"), timeout=keywords.constants.CLIENT_REQUEST_TIMEOUT,
+                   backoff=Backoff(maximum=1), name="wait_for_ready_state",
+                   message="Timeout: Server not in ready state! {}s".format(keywords.constants.CLIENT_REQUEST_TIMEOUT))
+        log_info("All nodes are healthy")
+
+    def wait_for_bucket_ready(self, name):
+        """ Wait for the warmup of bucket 'name' to be over on every node """
+        wait_until(lambda: self._nodes_healthy("/pools/default/buckets/{}".format(name)),
+                   timeout=keywords.constants.CLIENT_REQUEST_TIMEOUT, backoff=Backoff(maximum=1),
+                   name="wait_for_bucket_ready", message="Timeout: Bucket {} still warming up".format(name))
+
+    def _query(self, statement):
+        query_url = self.url.replace("8091", "8093")
+        resp = self._session.post("{}/query/service".format(query_url), data={"statement": statement})
+        log_r(resp)
+        resp.raise_for_status()
+        return resp.json()
 
-            if not all_nodes_healthy:
+    def drop_bucket_indexes(self, name, keep_prefix="sg_"):
+        """ Drop the GSI indexes of bucket 'name' not starting with 'keep_prefix' (the ones Sync Gateway creates)
+        and delete the prepared statements on the bucket, so a flushed bucket looks like a new one to the next test.
+        Prepared statements of the other buckets are left alone, a running test may be using them.
+        """
+        resp_obj = self._query('SELECT RAW name FROM system:indexes WHERE keyspace_id = "{}"'.format(name))
+        for index_name in resp_obj.get("results", []):
+            if keep_prefix and index_name.startswith(keep_prefix):
                 continue
-
-            log_info("All nodes are healthy")
-            log_debug(resp_obj)
-            # All nodes are heathy if it made it to here
-            break
+            log_info("Dropping index {} of bucket {}".format(index_name, name))
+            self._query("DROP INDEX `{}`.`{}`".format(name, index_name))
+        self._query('DELETE FROM system:prepareds WHERE statement LIKE "%`{}`%"'.format(name))
 
     def _create_internal_rbac_bucket_user(self, bucketname, cluster_config):
         # Create user with username=bucketname and assign role
@@ -616,42 +655,32 @@ class CouchbaseServer:
         """
 
         # Check that rebalance is in the tasks before polling for its completion
-        start = time.time()
-        found_rebalance = False
-        while not found_rebalance:
+        def rebalance_found():
+            if any(task["type"] == "rebalance" for task in self._get_tasks()):
+                log_info("Rebalance found in tasks!")
+                return True
+            log_info("Did not find rebalance task. Retrying.")
+            return False
 
-            if time.time() - start > keywords.constants.CLIENT_REQUEST_TIMEOUT:
-                raise TimeoutError("Did not find rebalance task!")
-
-            tasks = self._get_tasks()
-            for task in tasks:
-                if task["type"] == "rebalance":
-                    log_info("Rebalance found in tasks!")
-                    found_rebalance = True
-
-            if not found_rebalance:
-                log_info("Did not find rebalance task. Retrying.")
-                time.sleep(1)
-
-        start = time.time()
-        while True:
-            if time.time() - start > keywords.constants.REBALANCE_TIMEOUT_SECS:
-                raise Exception("wait_for_rebalance_complete: TIMEOUT")
+        try:
+            wait_until(rebalance_found, timeout=keywords.constants.CLIENT_REQUEST_TIMEOUT, backoff=Backoff(maximum=1),
+                       name="rebalance_found")
+        except TimeoutException:
+            raise TimeoutError("Did not find rebalance task!")
 
-            tasks = self._get_tasks()
+        def rebalance_done():
             done_rebalacing = True
-            for task in tasks:
+            for task in self._get_tasks():
                 # loop through each task and see if any rebalance tasks are running
                 task_type = task["type"]
                 task_status = task["status"]
                 log_info("{} is {}".format(task_type, task_status))
                 if task_type == "rebalance" and task_status == "running":
                     done_rebalacing = False
+            return done_rebalacing
 
-            if done_rebalacing:
-                break
-
-            time.sleep(5)
+        wait_until(rebalance_done, timeout=keywords.constants.REBALANCE_TIMEOUT_SECS, backoff=Backoff(maximum=5),
+                   name="wait_for_rebalance_complete", message="wait_for_rebalance_complete: TIMEOUT")
 
     def add_node(self, server_to_add, services="kv"):
         """
@@ -1183,6 +1212,120 @@ class CouchbaseServer:
         return True
 
 
+class BucketPool(object):
+    """ Reuses the buckets of a Couchbase Server across resets instead of deleting and recreating them.
+
+    acquire() hands out the requested bucket names:
+    - buckets already on the server (including the ones found there on first use) are flushed and their indexes cleaned up (see recycle),
+      the RBAC user of a bucket is created with it and kept as long as the bucket exists
+    - if one of them does not exist yet, every bucket is deleted and they are all created,
+      as the RAM quota of the existing buckets was computed for another number of buckets
+    Buckets on the server that were not requested stay idle and are recycled in the background,
+    while the next test runs, so a later acquire of them only has to wait for that recycle.
+
+        pool = get_bucket_pool(cluster.servers[0], cluster_config)
+        pool.acquire(["data-bucket", "data-bucket-1"])
+    """
+
+    def __init__(self, server, cluster_config, ipv6=False, max_workers=2):
+        self.server = server
+        self.cluster_config = cluster_config
+        self.ipv6 = ipv6
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+        self._lock = threading.Lock()
+        # bucket name -> Future of its background recycle
+        self._recycling = {}
+        # buckets used since their last recycle
+        self._dirty = set()
+        # buckets the pool created or has seen on the server, the others hold data of a previous session
+        self._seen = set()
+
+    def recycle(self, name):
+        """ Flush bucket 'name', drop its indexes and wait for the bucket to be ready again """
+        start = time.time()
+        self.server.flush_bucket(name)
+        self.server.drop_bucket_indexes(name)
+        self.server.wait_for_bucket_ready(name)
+        with self._lock:
+            self._dirty.discard(name)
+        log_info("Recycled bucket {} in {:.1f}s".format(name, time.time() - start))
+
+    def _recycle_in_background(self, names):
+        with self._lock:
+            for name in names:
+                if name not in self._recycling:
+                    self._recycling[name] = self._executor.submit(self.recycle, name)
+
+    def _wait_for_recycle(self, names):
+        """ Wait for the background recycles of 'names', a failed recycle makes the bucket dirty again """
+        for name in names:
+            with self._lock:
+                future = self._recycling.pop(name, None)
+            if future is None:
+                continue
+            try:
+                future.result()
+            except Exception as e:
+                log_info("Background recycle of bucket {} failed: {}".format(name, e))
+                with self._lock:
+                    self._dirty.add(name)
+
+    def acquire(self, bucket_names):
+        """ Make 'bucket_names' exist, empty and ready on the server, returns 'bucket_names' """
+        types.verify_is_list(bucket_names)
+        existing = self.server.get_bucket_names()
+        missing = [name for name in bucket_names if name not in existing]
+        with self._lock:
+            self._dirty.update(name for name in existing if name not in self._seen)
+            self._seen.update(existing)
+
+        if missing:
+            log_info("Buckets {} not in the pool, recreating {}".format(missing, bucket_names))
+            self._wait_for_recycle(list(self._recycling))
+            self.server.delete_buckets()
+            with self._lock:
+                self._dirty.clear()
+            self.server.create_buckets(bucket_names=bucket_names, cluster_config=self.cluster_config, ipv6=self.ipv6)
+            with self._lock:
+                self._seen.update(bucket_names)
+        else:
+            self._wait_for_recycle(bucket_names)
+            with self._lock:
+                dirty = [name for name in bucket_names if name in self._dirty]
+            for name in dirty:
+                self.recycle(name)
+            log_info("Reusing buckets {} ({} recycled now)".format(bucket_names, len(dirty)))
+
+        with self._lock:
+            # Deleted by the recreation when buckets were missing
+            idle = [name for name in existing if name not in bucket_names and name in self._dirty]
+            self._dirty.update(bucket_names)
+        self._recycle_in_background(idle)
+
+        self.server.wait_for_ready_state()
+        return bucket_names
+
+    def close(self):
+        """ Wait for the pending recycles and stop the background workers """
+        self._wait_for_recycle(list(self._recycling))
+        self._executor.shutdown(wait=True)
+
+
+_bucket_pools_lock = threading.Lock()
+# server url -> BucketPool
+_bucket_pools = {}
+
+
+def get_bucket_pool(server, cluster_config, ipv6=False):
+    """ BucketPool of 'server', shared by every reset of the session """
+    with _bucket_pools_lock:
+        pool = _bucket_pools.get(server.url)
+        if pool is None:
+            pool = BucketPool(server, cluster_config, ipv6=ipv6)
+            _bucket_pools[server.url] = pool
+        return pool
+
+
 def get_sdk_client_with_bucket(ssl_enabled, cluster, cbs_ip, cbs_bucket):
     if ssl_enabled and cluster.ipv6:
         connection_url = "couchbases://{}?ssl=no_verify&ipv6=allow".format(cbs_ip)
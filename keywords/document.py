@@ -1,4 +1,8 @@
+import itertools
+import json
 import logging
+import os
+import threading
 import uuid
 import zlib
 
@@ -49,30 +53,146 @@ def get_vbucket_number(key):
     """ Return the vbucket number for a given key.
         Taken from https://github.com/abhinavdangeti/cbTools/blob/f51f80b1eec5993a99fe49b45631e880b6835dc8/targetKeys.py#L6
     """
+    if isinstance(key, str):
+        key = key.encode("utf-8")
     return (((zlib.crc32(key)) >> 16) & 0x7fff) & (NUM_VBUCKETS - 1)
 
 
-def generate_doc_id_for_vbucket(vbucket_number):
-    """ Returns a random doc id that will hash to a given vbucket. """
-    if vbucket_number < 0 or vbucket_number > 1023:
-        raise keywords.exceptions.DocumentError("'vbucket_number' must be between 0-1023")
+class VBucketIndex(object):
+    """ Doc ids grouped by the vBucket they hash to.
 
-    # loop over random generated doc ids until the desired vbucket is returned
-    while True:
-        doc_id = str(uuid.uuid4())
-        if get_vbucket_number(doc_id) == vbucket_number:
-            utils.log_info("doc_id: {} -> vBucket: {}".format(doc_id, vbucket_number))
-            return doc_id
+    Candidate ids '<prefix>_<n>' are hashed in batches and dealt into all NUM_VBUCKETS vBuckets in one pass,
+    so taking N ids for any vBucket costs O(N) instead of ~NUM_VBUCKETS random tries per id.
+    Ids handed out by take() are never handed out again by the same index.
+    With a 'path', the ids are kept in a JSON file and reused by later runs with the same prefix.
 
+        index = VBucketIndex(per_vbucket=10)
+        doc_ids = index.take(66, 5)
+    """
 
-def generate_doc_ids_for_vbucket(vbucket_number, number_doc_ids):
-    """ Returns a list of generated doc ids that will hash to a given vBucket number """
+    def __init__(self, per_vbucket=8, prefix=None, path=None, batch_size=65536):
+        self.per_vbucket = per_vbucket
+        self.batch_size = batch_size
+        self.path = path
+        self._lock = threading.Lock()
+        self.prefix = prefix if prefix is not None else uuid.uuid4().hex[:12]
+        # Next candidate number to hash
+        self._next = 0
+        self._ids = [[] for _ in range(NUM_VBUCKETS)]
+
+        if path is not None and os.path.isfile(path):
+            self._load(path)
+        self._fill(per_vbucket)
+        if path is not None:
+            self.save()
+
+    def _load(self, path):
+        with open(path) as f:
+            cached = json.load(f)
+        if cached["prefix"] != self.prefix or len(cached["ids"]) != NUM_VBUCKETS:
+            logging.info("Ignoring vBucket index {}, built for prefix {}".format(path, cached["prefix"]))
+            return
+        self._next = cached["next"]
+        self._ids = cached["ids"]
+
+    def save(self, path=None):
+        """ Write the ids not taken yet to 'path' (defaults to the index path) """
+        path = path or self.path
+        with self._lock:
+            cached = {"prefix": self.prefix, "next": self._next, "ids": self._ids}
+            tmp_path = "{}.tmp".format(path)
+            with open(tmp_path, "w") as f:
+                json.dump(cached, f)
+            os.replace(tmp_path, path)
+
+    def _hash_batch(self, batch_size, vbucket_number=None):
+        """ Hash the next 'batch_size' candidates and deal them into their vBuckets.
+        Only 'vbucket_number' takes more than per_vbucket spare ids
+        """
+        head = "{}_".format(self.prefix)
+        # crc32 of the key continues from the crc32 of its prefix, only the number is hashed per candidate
+        head_crc = zlib.crc32(head.encode("utf-8"))
+        numbers = range(self._next, self._next + batch_size)
+        crcs = map(zlib.crc32, map(b"%d".__mod__, numbers), itertools.repeat(head_crc))
+        self._next += batch_size
+        per_vbucket = self.per_vbucket
+        target = self._ids[vbucket_number] if vbucket_number is not None else None
+        for n, crc in zip(numbers, crcs):
+            ids = self._ids[(crc >> 16) & (NUM_VBUCKETS - 1)]
+            if ids is target or len(ids) < per_vbucket:
+                ids.append(head + str(n))
+
+    def _fill(self, number):
+        """ Hash candidates until every vBucket holds at least 'number' ids """
+        while min(len(ids) for ids in self._ids) < number:
+            self._hash_batch(self.batch_size)
+
+    def _fill_vbucket(self, vbucket_number, number):
+        """ Hash candidates, 'batch_size' at a time, until 'vbucket_number' holds at least 'number' ids """
+        while len(self._ids[vbucket_number]) < number:
+            self._hash_batch(self.batch_size, vbucket_number)
+
+    def peek(self, vbucket_number, number):
+        """ The next 'number' ids of 'vbucket_number', without taking them """
+        _verify_vbucket_number(vbucket_number)
+        with self._lock:
+            self._fill_vbucket(vbucket_number, number)
+            return self._ids[vbucket_number][:number]
+
+    def _take(self, vbucket_number, number):
+        _verify_vbucket_number(vbucket_number)
+        with self._lock:
+            self._fill_vbucket(vbucket_number, number)
+            ids = self._ids[vbucket_number]
+            taken = ids[:number]
+            del ids[:number]
+        return taken
+
+    def take(self, vbucket_number, number):
+        """ 'number' ids hashing to 'vbucket_number', never returned again by this index """
+        taken = self._take(vbucket_number, number)
+        if self.path is not None:
+            self.save()
+        return taken
+
+    def take_one_per_vbucket(self, exclude=None):
+        """ One id for every vBucket not in 'exclude', as a list of (vbucket_number, doc_id) """
+        exclude = set(exclude or [])
+        taken = [(vbucket_number, self._take(vbucket_number, 1)[0]) for vbucket_number in range(NUM_VBUCKETS)
+                 if vbucket_number not in exclude]
+        if self.path is not None:
+            self.save()
+        return taken
+
+
+def _verify_vbucket_number(vbucket_number):
+    if vbucket_number < 0 or vbucket_number >= NUM_VBUCKETS:
+        raise keywords.exceptions.DocumentError("'vbucket_number' must be between 0-{}".format(NUM_VBUCKETS - 1))
+
+
+_vbucket_index_lock = threading.Lock()
+_vbucket_index = None
+
+
+def get_vbucket_index():
+    """ Shared VBucketIndex of this process """
+    global _vbucket_index
+    with _vbucket_index_lock:
+        if _vbucket_index is None:
+            _vbucket_index = VBucketIndex()
+        return _vbucket_index
 
-    doc_ids = []
-    for _ in range(number_doc_ids):
-        doc_ids.append(generate_doc_id_for_vbucket(vbucket_number))
 
-    return doc_ids
+def generate_doc_id_for_vbucket(vbucket_number):
+    """ Returns a doc id that will hash to a given vbucket. """
+    doc_id = get_vbucket_index().take(vbucket_number, 1)[0]
+    utils.log_debug("doc_id: {} -> vBucket: {}".format(doc_id, vbucket_number))
+    return doc_id
+
+
+def generate_doc_ids_for_vbucket(vbucket_number, number_doc_ids):
+    """ Returns a list of generated doc ids that will hash to a given vBucket number """
+    return get_vbucket_index().take(vbucket_number, number_doc_ids)
 
 
 def update_prop_generator():
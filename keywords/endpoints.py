@@ -0,0 +1,81 @@
+""" Cache of what Sync Gateway / LiteServ endpoints report about themselves.
+
+MobileRestClient needs the server type and platform of the url it talks to
+for most bulk keywords. Both come from a GET on the server root, so the
+response is parsed once per url into an EndpointDescriptor and reused until
+the endpoint is restarted, upgraded or redeployed and the cache invalidated.
+"""
+import logging
+import threading
+
+from urllib.parse import urlparse
+
+from keywords.constants import ServerType
+from keywords.constants import Platform
+
+_endpoints = {}
+_endpoints_lock = threading.Lock()
+
+
+def _cache_key(url):
+    return url.rstrip("/")
+
+
+def _host(url):
+    return urlparse(url).hostname or url.split(":")[0]
+
+
+class EndpointDescriptor(object):
+    """ Server type, platform and version of the service at 'url', parsed from its root response """
+
+    def __init__(self, url, root):
+        self.url = url
+        self.root = root
+
+        vendor = root.get("vendor", {}).get("name")
+        if vendor == "Couchbase Sync Gateway":
+            self.server_type, self.platform = ServerType.syncgateway, Platform.centos
+        elif vendor == "Couchbase Lite (Objective-C)":
+            self.server_type, self.platform = ServerType.listener, Platform.macosx
+        elif vendor == "Couchbase Lite (C#)":
+            self.server_type, self.platform = ServerType.listener, Platform.net
+        elif vendor is None and root.get("CBLite") == "Welcome":
+            # Android LiteServ
+            self.server_type, self.platform = ServerType.listener, Platform.android
+        else:
+            self.server_type, self.platform = None, None
+
+        self.version = root.get("version", root.get("vendor", {}).get("version"))
+
+    def __repr__(self):
+        return "EndpointDescriptor(url={}, server_type={}, platform={}, version={})".format(
+            self.url, self.server_type, self.platform, self.version
+        )
+
+
+def get_endpoint(url, fetch_root):
+    """ Return the cached EndpointDescriptor for 'url'.
+    'fetch_root' is called with the url to GET the root response on a cache miss.
+    """
+    key = _cache_key(url)
+    descriptor = _endpoints.get(key)
+    if descriptor is None:
+        descriptor = EndpointDescriptor(key, fetch_root(url))
+        with _endpoints_lock:
+            _endpoints[key] = descriptor
+        logging.info("Cached {}".format(descriptor))
+    return descriptor
+
+
+def invalidate_endpoints(url=None):
+    """ Forget the descriptors of every port of the host of 'url' (a url, a bare host or a list of them),
+    or of every endpoint if no url is passed.
+    Call after a restart, upgrade or redeploy that can change what an endpoint reports.
+    """
+    with _endpoints_lock:
+        if url is None:
+            _endpoints.clear()
+            return
+        hosts = {_host(url)} if isinstance(url, str) else {_host(u) for u in url}
+        for key in [key for key in _endpoints if _host(key) in hosts]:
+            del _endpoints[key]
@@ -0,0 +1,223 @@
+import threading
+import time
+from collections import namedtuple
+from urllib.parse import urlparse
+
+
+CallRecord = namedtuple("CallRecord", ["client", "method", "endpoint", "status", "bytes_out", "bytes_in", "seconds"])
+
+# Path segments followed by a principal / document name in Sync Gateway and LiteServ urls
+_NAMED_SEGMENTS = {"_user", "_role", "_session", "_local", "_design", "_view", "_replication", "_flush", "_raw", "_revtree"}
+
+
+def endpoint_template(url):
+    """ Sync Gateway / LiteServ endpoint of 'url' with the names replaced by placeholders,
+    so requests for different docs are aggregated: http://sg:4984/db/doc1/att?rev=1-a -> /{db}/{doc}/{attachment}
+    """
+    segments = [segment for segment in urlparse(url).path.split("/") if segment]
+    template = []
+    for i, segment in enumerate(segments):
+        if segment.startswith("_"):
+            template.append(segment)
+        elif i == 0:
+            template.append("{db}")
+        elif template[-1] in _NAMED_SEGMENTS:
+            template.append("{name}")
+        elif i == 1:
+            template.append("{doc}")
+        else:
+            template.append("{attachment}")
+    return "/" + "/".join(template)
+
+
+def method_template(url):
+    """ TestServer endpoint of 'url': the name of the invoked method """
+    return urlparse(url).path.rsplit("/", 1)[-1]
+
+
+class Histogram(object):
+    """ Latency histogram with HDR style log-linear buckets.
+
+    Values are recorded in microseconds, each power of two range is split in 128 buckets,
+    so percentiles are within 1% of the recorded values whatever their magnitude, in a fixed amount of memory.
+    """
+
+    SUB_BUCKET_BITS = 7
+
+    def __init__(self):
+        # bucket lower bound -> count
+        self.counts = {}
+        self.count = 0
+        self.min = None
+        self.max = None
+        self.total = 0
+
+    @classmethod
+    def _bucket(cls, value):
+        shift = max(value.bit_length() - cls.SUB_BUCKET_BITS, 0)
+        return (value >> shift) << shift, shift
+
+    def record(self, seconds):
+        value = max(int(seconds * 1000000), 1)
+        lower, _ = self._bucket(value)
+        self.counts[lower] = self.counts.get(lower, 0) + 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other):
+        for lower, count in other.counts.items():
+            self.counts[lower] = self.counts.get(lower, 0) + count
+        self.count += other.count
+        self.total += other.total
+        for value in [other.min, other.max]:
+            if value is not None:
+                self.min = value if self.min is None else min(self.min, value)
+                self.max = value if self.max is None else max(self.max, value)
+
+    def percentile(self, percent):
+        """ Value in seconds below which 'percent' % of the recorded values are """
+        if not self.count:
+            return None
+        rank = max(percent / 100.0 * self.count, 1)
+        seen = 0
+        for lower in sorted(self.counts):
+            seen += self.counts[lower]
+            if seen >= rank:
+                _, shift = self._bucket(lower)
+                middle = lower + ((1 << shift) >> 1)
+                return min(max(middle, self.min), self.max) / 1000000.0
+        return self.max / 1000000.0
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "min": self.min / 1000000.0 if self.count else None,
+            "mean": self.total / 1000000.0 / self.count if self.count else None,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "max": self.max / 1000000.0 if self.count else None,
+        }
+
+
+class EndpointStats(object):
+    """ Latency histogram, statuses and bytes of one (client, method, endpoint) """
+
+    def __init__(self):
+        self.latency = Histogram()
+        self.statuses = {}
+        self.bytes_out = 0
+        self.bytes_in = 0
+
+    def record(self, call):
+        self.latency.record(call.seconds)
+        status = str(call.status)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        self.bytes_out += call.bytes_out
+        self.bytes_in += call.bytes_in
+
+    def merge(self, other):
+        self.latency.merge(other.latency)
+        for status, count in other.statuses.items():
+            self.statuses[status] = self.statuses.get(status, 0) + count
+        self.bytes_out += other.bytes_out
+        self.bytes_in += other.bytes_in
+
+    def summary(self):
+        summary = self.latency.summary()
+        summary.update({"statuses": dict(self.statuses), "bytes_out": self.bytes_out, "bytes_in": self.bytes_in})
+        return summary
+
+
+class LatencyRecorder(object):
+    """ Hook aggregating the calls in EndpointStats per scope (the running test) and endpoint """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.scope = None
+        # scope -> "client METHOD endpoint" -> EndpointStats
+        self.scopes = {}
+
+    def __call__(self, call):
+        key = "{} {} {}".format(call.client, call.method, call.endpoint)
+        with self._lock:
+            endpoints = self.scopes.setdefault(self.scope, {})
+            stats = endpoints.get(key)
+            if stats is None:
+                stats = endpoints[key] = EndpointStats()
+            stats.record(call)
+
+    def totals(self):
+        """ EndpointStats of every endpoint across scopes """
+        totals = {}
+        with self._lock:
+            for endpoints in self.scopes.values():
+                for key, stats in endpoints.items():
+                    totals.setdefault(key, EndpointStats()).merge(stats)
+        return totals
+
+    def report(self):
+        with self._lock:
+            scopes = {str(scope): {key: stats.summary() for key, stats in sorted(endpoints.items())}
+                      for scope, endpoints in self.scopes.items()}
+        return {
+            "endpoints": {key: stats.summary() for key, stats in sorted(self.totals().items())},
+            "tests": scopes,
+        }
+
+
+_hooks = []
+
+
+def add_hook(hook):
+    """ Call hook(CallRecord) after every instrumented request """
+    if hook not in _hooks:
+        _hooks.append(hook)
+
+
+def remove_hook(hook):
+    if hook in _hooks:
+        _hooks.remove(hook)
+
+
+def record(client, method, endpoint, status, bytes_out, bytes_in, seconds):
+    if not _hooks:
+        return
+    call = CallRecord(client, method, endpoint, status, bytes_out, bytes_in, seconds)
+    for hook in list(_hooks):
+        hook(call)
+
+
+def _body_length(body):
+    if body is None:
+        return 0
+    if isinstance(body, (bytes, str)):
+        return len(body)
+    # Generators and files are streamed, their size is unknown
+    return 0
+
+
+def instrument_session(session, client, template=endpoint_template):
+    """ Record every request of the requests.Session 'session' as 'client' calls.
+
+    Latency is the time to the response headers plus, for non streamed responses, the body download.
+    Streamed responses (changes feeds ...) are only counted up to their headers.
+    """
+    def response_hook(resp, *args, **kwargs):
+        if not _hooks:
+            return
+        seconds = resp.elapsed.total_seconds()
+        if kwargs.get("stream"):
+            bytes_in = int(resp.headers.get("Content-Length", 0))
+        else:
+            # Read here, requests reads it right after the hooks anyway
+            start = time.perf_counter()
+            bytes_in = len(resp.content)
+            seconds += time.perf_counter() - start
+        record(client, resp.request.method, template(resp.request.url), resp.status_code,
+               _body_length(resp.request.body), bytes_in, seconds)
+
+    session.hooks["response"].append(response_hook)
+    return session
@@ -0,0 +1,131 @@
+import datetime
+import json
+import logging
+import logging.handlers
+import queue
+import threading
+
+LOGGER_NAME = "keywords"
+# Bytes of request / response bodies kept in debug records
+BODY_PREVIEW_BYTES = 2048
+
+logger = logging.getLogger(LOGGER_NAME)
+
+
+def preview(body, limit=BODY_PREVIEW_BYTES):
+    """ At most 'limit' bytes of 'body' as text, with the full size when truncated """
+    if body is None or body is False:
+        return None
+    if isinstance(body, str):
+        body = body.encode("utf-8", "replace")
+    if not isinstance(body, (bytes, bytearray)):
+        # Generators and files are streamed, nothing to show without consuming them
+        return "<{}>".format(type(body).__name__)
+    text = bytes(body[:limit]).decode("utf-8", "replace")
+    if len(body) > limit:
+        text = "{}... ({} bytes)".format(text, len(body))
+    return text
+
+
+class HttpMessage(object):
+    """ Debug message of a requests.Response, only formatted when a handler emits it.
+
+    Bodies are cut to BODY_PREVIEW_BYTES and a streamed response body is never read,
+    so the record can be formatted later on the logging thread.
+    """
+
+    __slots__ = ["method", "url", "status", "request_headers", "request_body", "response_body", "limit"]
+
+    def __init__(self, resp, limit=BODY_PREVIEW_BYTES, streamed=False):
+        request = resp.request
+        self.method = request.method
+        self.url = request.url
+        self.status = resp.status_code
+        self.request_headers = request.headers
+        self.request_body = request.body
+        # None / False until a body has been read, do not trigger the read of a streamed response.
+        # A 'streamed' body is left out even once read, it is consumed part by part by the caller
+        self.response_body = None if streamed else getattr(resp, "_content", None)
+        self.limit = limit
+
+    def fields(self):
+        return {
+            "method": self.method,
+            "url": self.url,
+            "status": self.status,
+            "request_headers": dict(self.request_headers),
+            "request_body": preview(self.request_body, self.limit),
+            "response_body": preview(self.response_body, self.limit),
+        }
+
+    def __str__(self):
+        fields = self.fields()
+        return "{method} {url} {status}\nHEADERS = {request_headers}\nBODY = {request_body}\nRESPONSE = {response_body}".format(**fields)
+
+
+class JsonLineFormatter(logging.Formatter):
+    """ One JSON object per record: time, level, logger, thread, message and the HttpMessage fields """
+
+    def format(self, record):
+        entry = {
+            "time": datetime.datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+        }
+        if isinstance(record.msg, HttpMessage):
+            entry["message"] = "{} {} {}".format(record.msg.method, record.msg.url, record.msg.status)
+            entry["http"] = record.msg.fields()
+        else:
+            entry["message"] = record.getMessage()
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """ QueueHandler leaving the formatting of the record to the QueueListener thread.
+    The records stay in process, so they do not need to be made picklable first.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+_lock = threading.Lock()
+# (DeferredQueueHandler, QueueListener) of the running pipeline
+_pipeline = None
+
+
+def start_log_pipeline(path, level=logging.INFO, max_bytes=100 * 1024 * 1024, backup_count=3):
+    """ Also write the records of the 'keywords' logger as JSON lines to 'path' from a background thread.
+    The records keep propagating to the root logger (pytest capture, --log-file, caplog),
+    'level' only filters the JSON lines: DEBUG records are created when the logger is enabled for them (--log-level=DEBUG).
+    """
+    global _pipeline
+    stop_log_pipeline()
+
+    file_handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count)
+    file_handler.setFormatter(JsonLineFormatter())
+    queue_handler = DeferredQueueHandler(queue.SimpleQueue())
+    queue_handler.setLevel(level)
+    listener = logging.handlers.QueueListener(queue_handler.queue, file_handler)
+
+    with _lock:
+        logger.addHandler(queue_handler)
+        listener.start()
+        _pipeline = (queue_handler, listener)
+
+
+def stop_log_pipeline():
+    """ Flush the pending records and stop writing JSON lines """
+    global _pipeline
+    with _lock:
+        if _pipeline is None:
+            return
+        queue_handler, listener = _pipeline
+        _pipeline = None
+        logger.removeHandler(queue_handler)
+    listener.stop()
+    for handler in listener.handlers:
+        handler.close()
@@ -0,0 +1,153 @@
+""" Streaming parser for the MIME multipart bodies returned by Sync Gateway _bulk_get
+
+A _bulk_get response is a multipart/mixed body with one part per requested doc:
+    - application/json parts hold a doc (or an error row), gzip compressed when
+      'X-Accept-Part-Encoding: gzip' was sent with the request (Content-Encoding: gzip)
+    - multipart/related parts hold a doc followed by one part per attachment
+      marked as "follows": true in the doc's _attachments
+
+The body is read incrementally and docs are yielded as their part completes,
+so only one part is held in memory at a time.
+"""
+import base64
+import gzip
+import json
+import logging
+import re
+
+PART_ENCODING_HEADERS = {"X-Accept-Part-Encoding": "gzip"}
+
+_BOUNDARY = re.compile(r'boundary="?([^";]+)"?', re.IGNORECASE)
+_FILENAME = re.compile(r'filename="?([^";]+)"?', re.IGNORECASE)
+
+
+def boundary_from_content_type(content_type):
+    match = _BOUNDARY.search(content_type or "")
+    if match is None:
+        return None
+    return match.group(1)
+
+
+def _parse_headers(block):
+    headers = {}
+    for line in block.decode("utf-8", "replace").splitlines():
+        name, sep, value = line.partition(":")
+        if sep:
+            headers[name.strip().lower()] = value.strip()
+    return headers
+
+
+def _split_part(part):
+    """ Returns the (headers, body) of a raw part """
+    for separator in (b"\r\n\r\n", b"\n\n"):
+        index = part.find(separator)
+        if index != -1:
+            return _parse_headers(part[:index]), part[index + len(separator):]
+    # No headers
+    return {}, part.lstrip(b"\r\n")
+
+
+def iter_parts(chunks, boundary):
+    """ Yield (headers, body) for each part of the multipart body read from the byte 'chunks' """
+    if isinstance(boundary, str):
+        boundary = boundary.encode("utf-8")
+    # Delimiters start on a new line, the leading newline lets the first one match at the start of the body
+    delimiter = b"\n--" + boundary
+    buf = bytearray(b"\n")
+    search_from = 0
+    in_part = False
+    chunks = iter(chunks)
+
+    while True:
+        index = buf.find(delimiter, search_from)
+        if index == -1:
+            chunk = next(chunks, None)
+            if chunk is None:
+                return
+            search_from = max(0, len(buf) - len(delimiter))
+            buf += chunk
+            continue
+
+        if in_part:
+            part = buf[:index]
+            if part.endswith(b"\r"):
+                part = part[:-1]
+            yield _split_part(bytes(part))
+
+        # Need the rest of the delimiter line, "--" after the boundary closes the body
+        rest = buf[index + len(delimiter):]
+        while len(rest) < 2 or (not rest.startswith(b"--") and b"\n" not in rest):
+            chunk = next(chunks, None)
+            if chunk is None:
+                return
+            rest += chunk
+        if rest.startswith(b"--"):
+            return
+        buf = bytearray(rest[rest.index(b"\n") + 1:])
+        search_from = 0
+        in_part = True
+
+
+def _decode_body(headers, body):
+    if headers.get("content-encoding", "").lower() == "gzip":
+        body = gzip.decompress(body)
+    return body
+
+
+def _load_json(body):
+    try:
+        return json.loads(body.decode("utf-8"))
+    except ValueError as e:
+        logging.error("Could not parse docs as JSON: {} error: {}".format(body[:200], e))
+        return None
+
+
+def _related_doc(body, boundary):
+    """ Doc of a multipart/related part, with the attachments that follow it inlined as base64 'data' """
+    doc = None
+    for headers, part_body in iter_parts([body], boundary):
+        part_body = _decode_body(headers, part_body)
+        if doc is None:
+            doc = _load_json(part_body)
+            if doc is None:
+                return None
+            continue
+
+        match = _FILENAME.search(headers.get("content-disposition", ""))
+        if match is None:
+            continue
+        attachment = doc.setdefault("_attachments", {}).setdefault(match.group(1), {})
+        attachment.pop("follows", None)
+        attachment["data"] = base64.b64encode(part_body).decode("ascii")
+    return doc
+
+
+def iter_docs(chunks, boundary):
+    """ Yield the docs (and error rows) of a _bulk_get multipart body """
+    for headers, body in iter_parts(chunks, boundary):
+        content_type = headers.get("content-type", "application/json")
+        body = _decode_body(headers, body)
+        if content_type.lower().startswith("multipart/"):
+            doc = _related_doc(body, boundary_from_content_type(content_type))
+        else:
+            doc = _load_json(body)
+        if doc is not None:
+            yield doc
+
+
+def iter_response_docs(resp, chunk_size=64 * 1024):
+    """ Yield the docs of a _bulk_get response as they arrive.
+    Issue the request with stream=True to avoid buffering the whole body.
+    """
+    boundary = boundary_from_content_type(resp.headers.get("Content-Type"))
+    if boundary is None:
+        raise ValueError("Response is not multipart: {}".format(resp.headers.get("Content-Type")))
+    return iter_docs(resp.iter_content(chunk_size=chunk_size), boundary)
+
+
+def iter_text_docs(text):
+    """ Yield the docs of a multipart body held in 'text', the boundary is read from its first delimiter line """
+    for line in text.splitlines():
+        if line.startswith("--"):
+            return iter_docs([text.encode("utf-8")], line[2:].strip())
+    return iter([])
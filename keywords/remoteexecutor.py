@@ -1,18 +1,99 @@
+import collections
+import concurrent.futures
+import logging
+import logging.handlers
+import threading
+
 import paramiko
 import ansible.constants
 
 from keywords.exceptions import RemoteCommandError
 from keywords.utils import log_info
-from keywords.constants import REMOTE_EXECUTOR_TIMEOUT
+from keywords.constants import REMOTE_EXECUTOR_TIMEOUT, REMOTE_EXECUTOR_TAIL_LINES, REMOTE_EXECUTOR_KEEPALIVE
 from utilities.cluster_config_utils import load_cluster_config_json
 
 
-def stream_output(stdio_file_stream):
-    lines = []
+class RotatingFileSink(object):
+    """ Output sink writing lines to 'path', rotated to path.1 ... path.<backup_count> every 'max_bytes' """
+
+    def __init__(self, path, max_bytes=100 * 1024 * 1024, backup_count=5):
+        self.handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count)
+        self.handler.setFormatter(logging.Formatter("%(message)s"))
+
+    def __call__(self, line):
+        self.handler.handle(logging.makeLogRecord({"msg": line.rstrip("\n")}))
+
+    def close(self):
+        self.handler.close()
+
+
+def stream_output(stdio_file_stream, sink=print, tail_lines=REMOTE_EXECUTOR_TAIL_LINES):
+    """ Send every line of 'stdio_file_stream' to 'sink' and return the last 'tail_lines' lines """
+    lines = collections.deque(maxlen=tail_lines)
     for line in stdio_file_stream:
-        print(line)
+        if sink is not None:
+            sink(line)
         lines.append(line)
-    return lines
+    return list(lines)
+
+
+_connections_lock = threading.Lock()
+# (host, username, password) -> paramiko.SSHClient
+_connections = {}
+# (host, username, password) -> lock held while connecting
+_connect_locks = collections.defaultdict(threading.Lock)
+
+
+def _is_active(client):
+    transport = client.get_transport()
+    return transport is not None and transport.is_active()
+
+
+def get_ssh_client(host, username, password=None):
+    """ Connected SSHClient for 'host', kept alive and shared by every RemoteExecutor of the host.
+    paramiko opens one channel per command on the shared transport, so commands can run concurrently
+    """
+    key = (host, username, password)
+    with _connections_lock:
+        connect_lock = _connect_locks[key]
+
+    with connect_lock:
+        with _connections_lock:
+            client = _connections.get(key)
+        if client is not None and _is_active(client):
+            return client
+        if client is not None:
+            client.close()
+
+        log_info("Connecting to {}".format(host))
+        client = paramiko.SSHClient()
+        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        if password is None:
+            client.connect(host, username=username, banner_timeout=REMOTE_EXECUTOR_TIMEOUT)
+        else:
+            client.connect(host, username=username, password=password, banner_timeout=REMOTE_EXECUTOR_TIMEOUT)
+        client.get_transport().set_keepalive(REMOTE_EXECUTOR_KEEPALIVE)
+
+        with _connections_lock:
+            _connections[key] = client
+        return client
+
+
+def drop_ssh_client(host, username, password=None):
+    """ Close the pooled connection of 'host', the next command reconnects """
+    with _connections_lock:
+        client = _connections.pop((host, username, password), None)
+    if client is not None:
+        client.close()
+
+
+def close_ssh_clients():
+    """ Close every pooled connection """
+    with _connections_lock:
+        clients = list(_connections.values())
+        _connections.clear()
+    for client in clients:
+        client.close()
 
 
 class RemoteExecutor:
@@ -24,9 +105,6 @@ class RemoteExecutor:
     """
 
     def __init__(self, host, sg_platform="centos", username=None, password=None, cluster_config=None):
-        client = paramiko.SSHClient()
-        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        self.client = client
         self.host = host
         self.sg_platform = sg_platform
         if "[" in self.host:
@@ -38,57 +116,96 @@ class RemoteExecutor:
                 username = json_cluster["sync_gateways:vars"]["ansible_user"]
                 password = json_cluster["sync_gateways:vars"]["ansible_password"]
         self.username = ansible.constants.DEFAULT_REMOTE_USER
+        self.password = None
         if username is not None:
             self.username = username
             self.password = password
 
-    def execute(self, command):
+    def _connection_password(self):
+        """ Password used to connect, None for key based authentication """
+        if self.sg_platform == "windows" or self.sg_platform.startswith("c-") or "macos" in self.sg_platform:
+            return self.password
+        return None
+
+    def _exec_command(self, client, command):
+        if self.sg_platform == "windows":
+            return client.exec_command("cmd /c " + command, timeout=60)
+        if self.sg_platform.startswith("c-"):
+            return client.exec_command(command, timeout=60)
+        # get_pty=True is required for sudo commands
+        return client.exec_command(command, get_pty=True)
+
+    def execute(self, command, sink=print, tail_lines=REMOTE_EXECUTOR_TAIL_LINES):
         """Executes a shell command on a remote host.
-        It will stream the stdout and stderr and return an error code
+        Every line of stdout and stderr is sent to 'sink' (print by default, or a RotatingFileSink),
+        only the last 'tail_lines' lines of each are kept in memory.
+        Returns the error code and the stdout and stderr lines
         """
 
-        log_info("Connecting to {}".format(self.host))
         log_info("Running '{}' on host {}".format(command, self.host))
-        if self.sg_platform == "windows":
-            self.client.connect(self.host, username=self.username, password=self.password, banner_timeout=REMOTE_EXECUTOR_TIMEOUT)
-            command = "cmd /c " + command
-            stdin, stdout, stderr = self.client.exec_command(command, timeout=60)
-        elif self.sg_platform.startswith("c-"):
-            self.client.connect(self.host, username=self.username, password=self.password,
-                                banner_timeout=REMOTE_EXECUTOR_TIMEOUT)
-            stdin, stdout, stderr = self.client.exec_command(command, timeout=60)
-        else:
-            if "macos" in self.sg_platform:
-                self.client.connect(self.host, username=self.username, password=self.password, banner_timeout=REMOTE_EXECUTOR_TIMEOUT)
-            else:
-                self.client.connect(self.host, username=self.username, banner_timeout=REMOTE_EXECUTOR_TIMEOUT)
-            # get_pty=True is required for sudo commands
-            stdin, stdout, stderr = self.client.exec_command(command, get_pty=True)
+        password = self._connection_password()
+        client = get_ssh_client(self.host, self.username, password)
+        try:
+            stdin, stdout, stderr = self._exec_command(client, command)
+        except (paramiko.SSHException, EOFError) as e:
+            # The pooled connection went stale (host restarted ...), reconnect once
+            log_info("Reconnecting to {} after: {}".format(self.host, e))
+            drop_ssh_client(self.host, self.username, password)
+            client = get_ssh_client(self.host, self.username, password)
+            stdin, stdout, stderr = self._exec_command(client, command)
 
         # We should not be sending / recieving data on the stdin channel so close it
         stdin.close()
 
-        # Stream output to console, and capture all of the output.
-        # TODO: this is not memory efficient and if there is a ton of output, this will blow up
-        stdout_p = stream_output(stdout)
-        stderr_p = stream_output(stderr)
+        stdout_p = stream_output(stdout, sink, tail_lines)
+        stderr_p = stream_output(stderr, sink, tail_lines)
 
         # this will block until the command has completed and will return the error code from
         # the command. If the command does not return an exit status, then -1 is returned
         status = stdout.channel.recv_exit_status()
-
-        log_info("Closing connection to {}".format(self.host))
-        self.client.close()
+        stdout.channel.close()
 
         return status, stdout_p, stderr_p
 
-    def must_execute(self, command):
+    def must_execute(self, command, sink=print, tail_lines=REMOTE_EXECUTOR_TAIL_LINES):
         """This wraps self.execute(command) and throws
         an exception if the status returned is non-zero
         """
 
-        status, stdout_p, stderr_p = self.execute(command)
+        status, stdout_p, stderr_p = self.execute(command, sink=sink, tail_lines=tail_lines)
         if status != 0:
             log_info("{}: {}".format(stdout_p, stderr_p))
             raise RemoteCommandError("command: {} failed on host: {}".format(command, self.host))
         return stdout_p, stderr_p
+
+
+def execute_on_hosts(hosts, command, sg_platform="centos", username=None, password=None, sink=None,
+                     tail_lines=REMOTE_EXECUTOR_TAIL_LINES, max_workers=None):
+    """ Run 'command' on every host concurrently.
+    'sink' is called with (host, line) for every output line, lines are printed with a host prefix by default.
+    Returns {host: (status, stdout lines, stderr lines)}, raises RemoteCommandError listing the hosts that could not run it
+    """
+    if not hosts:
+        return {}
+
+    if sink is None:
+        def sink(host, line):
+            print("{}: {}".format(host, line))
+
+    def run(host):
+        executor = RemoteExecutor(host, sg_platform, username, password)
+        return executor.execute(command, sink=lambda line: sink(host, line), tail_lines=tail_lines)
+
+    results = {}
+    errors = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers or len(hosts)) as executor:
+        futures = {executor.submit(run, host): host for host in hosts}
+        for future in concurrent.futures.as_completed(futures):
+            host = futures[future]
+            try:
+                results[host] = future.result()
+            except Exception as e:
+                errors.append("{}: {!r}".format(host, e))
+    if errors:
+        raise RemoteCommandError("command: {} failed on hosts: {}".format(command, errors))
+    return results
@@ -1,7 +1,12 @@
+import asyncio
+import collections
+import random
 import time
 import datetime
 
+from keywords.exceptions import TimeoutException
 from keywords.utils import log_info
+from keywords.utils import log_debug
 
 
 class Time:
@@ -40,3 +45,140 @@ class Time:
         log_info("With delta: {}".format(timestamp_with_delta))
 
         return timestamp_with_delta
+
+
+class Deadline(object):
+    """ Point in time a wait has to finish by.
+    Pass it down to nested waits so they never outlive the caller's timeout.
+    """
+
+    def __init__(self, timeout=None):
+        self.expires = None if timeout is None else time.time() + timeout
+
+    @classmethod
+    def within(cls, timeout=None, deadline=None):
+        """ The earliest of 'deadline' and 'timeout' seconds from now """
+        new_deadline = cls(timeout)
+        if deadline is not None and deadline.expires is not None:
+            if new_deadline.expires is None or deadline.expires < new_deadline.expires:
+                new_deadline.expires = deadline.expires
+        return new_deadline
+
+    def remaining(self):
+        """ Seconds left (never negative), None for no deadline """
+        if self.expires is None:
+            return None
+        return max(0.0, self.expires - time.time())
+
+    def expired(self):
+        return self.expires is not None and time.time() >= self.expires
+
+
+class Backoff(object):
+    """ Exponential delays between polls: 'initial', then multiplied by 'factor'
+    up to 'maximum', each randomized by +/- 'jitter' (a fraction of the delay)
+    """
+
+    def __init__(self, initial=0.05, maximum=2, factor=2, jitter=0.1):
+        self.initial = initial
+        self.maximum = maximum
+        self.factor = factor
+        self.jitter = jitter
+
+    def delays(self):
+        delay = self.initial
+        while True:
+            if self.jitter:
+                yield max(0.0, delay * random.uniform(1 - self.jitter, 1 + self.jitter))
+            else:
+                yield delay
+            delay = min(self.maximum, delay * self.factor)
+
+
+WaitRecord = collections.namedtuple("WaitRecord", ["name", "duration", "polls", "success"])
+
+# Most recent waits, see get_wait_records
+_wait_records = collections.deque(maxlen=10000)
+
+
+def get_wait_records(name=None):
+    """ Returns the recorded WaitRecords, only the ones named 'name' if passed """
+    return [record for record in list(_wait_records) if name is None or record.name == name]
+
+
+def clear_wait_records():
+    _wait_records.clear()
+
+
+def _record_wait(name, start, polls, success):
+    record = WaitRecord(name, time.time() - start, polls, success)
+    _wait_records.append(record)
+    log_debug("Wait {} {} after {:.3f}s and {} polls".format(
+        name, "done" if success else "timed out", record.duration, polls
+    ))
+    return record
+
+
+def wait_until(predicate, timeout=None, deadline=None, backoff=None, name=None, raise_on_timeout=True,
+               message=None):
+    """ Poll 'predicate' until it returns a truthy value and return that value.
+
+    Polls are spaced by 'backoff' (Backoff() by default), so a condition that is
+    already met returns after one poll instead of sleeping out a fixed interval.
+    The wait ends at the earliest of 'timeout' seconds and 'deadline'. Then a
+    TimeoutException is raised, or the last value is returned if 'raise_on_timeout' is False.
+    Duration and number of polls of every wait are recorded (see get_wait_records).
+    """
+    if name is None:
+        name = getattr(predicate, "__name__", "wait")
+    deadline = Deadline.within(timeout, deadline)
+    delays = (backoff or Backoff()).delays()
+    start = time.time()
+    polls = 0
+    while True:
+        polls += 1
+        result = predicate()
+        if result:
+            _record_wait(name, start, polls, True)
+            return result
+
+        remaining = deadline.remaining()
+        if remaining is not None and remaining <= 0:
+            record = _record_wait(name, start, polls, False)
+            if raise_on_timeout:
+                raise TimeoutException(message or "{}: TIMEOUT after {:.1f}s and {} polls".format(name, record.duration, polls))
+            return result
+
+        delay = next(delays)
+        if remaining is not None:
+            delay = min(delay, remaining)
+        time.sleep(delay)
+
+
+async def async_wait_until(predicate, timeout=None, deadline=None, backoff=None, name=None, raise_on_timeout=True,
+                           message=None):
+    """ wait_until for a coroutine function 'predicate', sleeps with asyncio.sleep """
+    if name is None:
+        name = getattr(predicate, "__name__", "wait")
+    deadline = Deadline.within(timeout, deadline)
+    delays = (backoff or Backoff()).delays()
+    start = time.time()
+    polls = 0
+    while True:
+        polls += 1
+        result = await predicate()
+        if result:
+            _record_wait(name, start, polls, True)
+            return result
+
+        remaining = deadline.remaining()
+        if remaining is not None and remaining <= 0:
+            record = _record_wait(name, start, polls, False)
+            if raise_on_timeout:
+                raise TimeoutException(message or "{}: TIMEOUT after {:.1f}s and {} polls".format(name, record.duration, polls))
+            return result
+
+        delay = next(delays)
+        if remaining is not None:
+            delay = min(delay, remaining)
+        await asyncio.sleep(delay)
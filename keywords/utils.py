@@ -7,6 +7,7 @@ import re
 import socket
 from keywords.exceptions import FeatureSupportedError
 from keywords.constants import DATA_DIR
+from keywords.logpipeline import logger, HttpMessage
 from utilities.cluster_config_utils import get_cbs_servers, get_sg_version
 
 
@@ -22,52 +23,46 @@ def log_info(message, is_verify=False):
         print(str(message))
     except UnicodeEncodeError:
         print(str(message).encode())
-    logging.info(message)
+    logger.info(message)
 
 
 def log_section():
     output = "----------------"
     print(output)
-    logging.info(output)
+    logger.info(output)
 
 
-def log_debug(message):
-    """Wrapper around logging.debug if we want to add hooks in the future."""
-    logging.debug(message)
+def log_debug(message, *args):
+    """Wrapper around logging.debug, 'args' are %-formatted into 'message' only if debug is enabled."""
+    logger.debug(message, *args)
 
 
 def log_error(message):
     """Wrapper around logging.error if we want to add hooks in the future."""
     print(message)
-    logging.error(message)
+    logger.error(message)
 
 
 def log_warn(message):
     """Wrapper around logging.warn if we want to add hooks in the future."""
     print(message)
-    logging.warning(message)
+    logger.warning(message)
 
 
-def log_r(request, info=True):
-    request_summary = "{0} {1} {2}".format(
-        request.request.method,
-        request.request.url,
-        request.status_code
-    )
-
+def log_r(request, info=True, streamed=False):
+    """ Log "METHOD URL STATUS" of a requests.Response,
+    and its headers and bodies (cut to a preview) when debug is enabled.
+    Pass streamed=True for stream=True responses the caller reads incrementally: their body is never accessed
+    """
     if info:
-        log_info(request_summary)
+        log_info("{0} {1} {2}".format(
+            request.request.method,
+            request.request.url,
+            request.status_code
+        ))
 
-    logging.debug("{0} {1}\nHEADERS = {2}\nBODY = {3}".format(
-        request.request.method,
-        request.request.url,
-        request.request.headers,
-        request.request.body))
-
-    try:
-        logging.debug("{}".format(request.text.encode("utf-8")))
-    except Exception as err:
-        log_debug("Error occurred: {}".format(err))
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(HttpMessage(request, streamed=streamed))
 
 
 def version_is_binary(version):
@@ -136,6 +131,15 @@ def hostname_for_url(cluster_config, url):
     raise ValueError("Could not find name for url: {} in cluster_config: {}".format(url, cluster_config))
 
 
+def hostnames_for_urls(cluster_config, urls):
+    """ Playbook subset for a url or a list of urls,
+    a list gives 'sg1:sg2' so one playbook run covers all of them in parallel
+    """
+    if isinstance(urls, str):
+        return hostname_for_url(cluster_config, urls)
+    return ":".join(hostname_for_url(cluster_config, url) for url in urls)
+
+
 def ip_from_url(url):
     # strip possible ports
     url = url.replace("http://", "")
@@ -310,9 +314,11 @@ def add_additional_new_field_to_doc(doc_body):
     return doc_body
 
 
-def compare_docs(cbl_db, db, docs_dict):
-    doc_ids = db.getDocIds(cbl_db)
-    cbl_db_docs = db.getDocuments(cbl_db, doc_ids)
+def compare_docs(cbl_db, db, docs_dict, page_size=1000):
+    """ Compare Sync Gateway docs ('docs_dict', any iterable of {"doc": {...}}, e.g. a generator)
+    with the same docs in 'cbl_db', fetching 'page_size' CBL docs at a time.
+    """
+    page = {}
     for doc in docs_dict:
         try:
             del doc["doc"]["_rev"]
@@ -320,28 +326,38 @@ def compare_docs(cbl_db, db, docs_dict):
             log_info("no _rev exists in the dict")
         key = doc["doc"]["_id"]
         del doc["doc"]["_id"]
-        try:
-            del cbl_db_docs[key]["_id"]
-        except KeyError:
-            log_info("Ignoring id verification")
-        assert deep_dict_compare(doc["doc"], cbl_db_docs[key]), "mismatch in the dictionary"
+        page[key] = doc["doc"]
+        if len(page) == page_size:
+            _compare_docs_page(cbl_db, db, page)
+            page = {}
+    if page:
+        _compare_docs_page(cbl_db, db, page)
 
 
-def compare_cbl_docs(db, cbl_db1, cbl_db2):
-    doc_ids1 = db.getDocIds(cbl_db1)
-    cbl_db_docs1 = db.getDocuments(cbl_db1, doc_ids1)
-    doc_ids2 = db.getDocIds(cbl_db2)
-    cbl_db_docs2 = db.getDocuments(cbl_db2, doc_ids2)
-    for doc in cbl_db_docs1:
+def _compare_docs_page(cbl_db, db, expected_docs):
+    cbl_db_docs = db.getDocuments(cbl_db, list(expected_docs.keys()))
+    for key in expected_docs:
         try:
-            del cbl_db_docs1[doc]["_id"]
-        except KeyError:
-            log_info("Ignoring id verification on cbl db1")
-        try:
-            del cbl_db_docs2[doc]["_id"]
+            del cbl_db_docs[key]["_id"]
         except KeyError:
-            log_info("Ignoring id verification on cbl db2")
-        assert deep_dict_compare(cbl_db_docs1[doc], cbl_db_docs2[doc]), "mismatch in the dictionary"
+            log_info("Ignoring id verification")
+        assert deep_dict_compare(expected_docs[key], cbl_db_docs[key]), "mismatch in the dictionary"
+
+
+def compare_cbl_docs(db, cbl_db1, cbl_db2, page_size=1000):
+    """ Compare every doc of cbl_db1 with the same doc in cbl_db2, 'page_size' docs at a time """
+    for cbl_db_docs1 in db.iter_document_pages(cbl_db1, page_size):
+        cbl_db_docs2 = db.getDocuments(cbl_db2, list(cbl_db_docs1.keys()))
+        for doc in cbl_db_docs1:
+            try:
+                del cbl_db_docs1[doc]["_id"]
+            except KeyError:
+                log_info("Ignoring id verification on cbl db1")
+            try:
+                del cbl_db_docs2[doc]["_id"]
+            except KeyError:
+                log_info("Ignoring id verification on cbl db2")
+            assert deep_dict_compare(cbl_db_docs1[doc], cbl_db_docs2[doc]), "mismatch in the dictionary"
 
 
 def compare_generic_types(object1, object2, isPredictiveResult=False):
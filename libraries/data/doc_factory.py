@@ -0,0 +1,292 @@
+import datetime
+import json
+import math
+import random
+import re
+import string
+import threading
+import types
+import uuid
+
+from libraries.data import doc_generators
+
+
+# random byte -> ascii letter, to turn random bytes into random_string() like text
+_LETTERS = (string.ascii_letters * 5)[:256].encode("ascii")
+_INT_TOKEN_BASE = 7391000000000000000
+_FLOAT_TOKEN_BASE = 7391000000000
+
+
+def fixed_size(size):
+    """ Body size distribution: always 'size' bytes """
+    return lambda rng: size
+
+
+def uniform_size(minimum, maximum):
+    """ Body size distribution: uniform between 'minimum' and 'maximum' bytes """
+    return lambda rng: rng.randint(minimum, maximum)
+
+
+def lognormal_size(median, sigma=1.0, minimum=1024, maximum=1024 * 1024):
+    """ Body size distribution: log-normal around 'median' bytes, clamped to [minimum, maximum] """
+    mu = math.log(median)
+    return lambda rng: int(min(max(rng.lognormvariate(mu, sigma), minimum), maximum))
+
+
+class Uncompilable(Exception):
+    """ The generator uses randomness the template recorder does not know """
+
+
+class _Token(object):
+    """ Stands for a random value while the template is recorded, str() gives its placeholder text """
+
+    def __init__(self, text):
+        self.text = text
+
+    def __str__(self):
+        return self.text
+
+
+class _Recorder(object):
+    """ Replaces the random helpers seen by a doc generator, every call returns a unique placeholder
+    and records how the value is generated: slots[placeholder] = (kind, args...)
+    """
+
+    def __init__(self):
+        self.slots = {}
+
+    def _int_token(self, slot):
+        token = _INT_TOKEN_BASE + len(self.slots)
+        self.slots[str(token)] = slot
+        return token
+
+    def _str_token(self, slot):
+        token = "QSLOTq{:06d}q".format(len(self.slots))
+        self.slots[token] = slot
+        return token
+
+    def random_bool(self):
+        return self._int_token(("bool",))
+
+    def random_long(self):
+        return self._int_token(("randrange", 10000000))
+
+    def random_int(self):
+        return self._int_token(("bits", 63))
+
+    def random_float(self):
+        token = float("{}.5".format(_FLOAT_TOKEN_BASE + len(self.slots)))
+        self.slots[repr(token)] = ("uniform", -100000000000000.0, 100000000000000.0)
+        return token
+
+    def random_string(self, length):
+        return self._str_token(("string", length))
+
+    # random module
+    def getrandbits(self, k):
+        return self._int_token(("bits", k))
+
+    def randint(self, a, b):
+        return self._int_token(("randint", a, b))
+
+    def uniform(self, a, b):
+        token = float("{}.5".format(_FLOAT_TOKEN_BASE + len(self.slots)))
+        self.slots[repr(token)] = ("uniform", a, b)
+        return token
+
+    def choice(self, seq):
+        seq = list(seq)
+        if all(isinstance(item, str) for item in seq):
+            return self._str_token(("choice", [json.dumps(item)[1:-1] for item in seq]))
+        if all(isinstance(item, (bool, int)) for item in seq):
+            return self._int_token(("choice", [json.dumps(item) for item in seq]))
+        raise Uncompilable("random.choice of {!r}".format(seq))
+
+    def __getattr__(self, name):
+        raise Uncompilable("random.{} is not supported".format(name))
+
+
+class _RecordingDatetime(object):
+
+    def __init__(self, recorder):
+        self._recorder = recorder
+
+    def now(self):
+        return _Token(self._recorder._str_token(("now",)))
+
+
+class _RecordingUuid(object):
+
+    def __init__(self, recorder):
+        self._recorder = recorder
+
+    def uuid4(self):
+        return _Token(self._recorder._str_token(("uuid",)))
+
+
+def _record(generator):
+    """ Run 'generator' with recording random helpers, returns (doc with placeholders, recorder) """
+    func = getattr(generator, "__func__", generator)
+    if not isinstance(func, types.FunctionType):
+        raise Uncompilable("{!r} is not a python function".format(generator))
+
+    recorder = _Recorder()
+    func_globals = dict(func.__globals__)
+    for name in ["random_bool", "random_long", "random_int", "random_float", "random_string"]:
+        func_globals[name] = getattr(recorder, name)
+    func_globals["random"] = recorder
+    func_globals["datetime"] = types.SimpleNamespace(datetime=_RecordingDatetime(recorder))
+    func_globals["uuid"] = types.SimpleNamespace(uuid4=_RecordingUuid(recorder).uuid4)
+    recording = types.FunctionType(func.__code__, func_globals, func.__name__, func.__defaults__, func.__closure__)
+    return recording(), recorder
+
+
+class DocTemplate(object):
+    """ A doc generator compiled once to a %-format string of its JSON, with one slot per random value """
+
+    def __init__(self, generator, extra=None):
+        doc, recorder = _record(generator)
+        if not isinstance(doc, dict):
+            raise Uncompilable("{!r} does not return a dict".format(generator))
+        doc.update(extra or {})
+        text = json.dumps(doc)
+
+        tokens = re.compile("|".join(re.escape(token) for token in sorted(recorder.slots, key=len, reverse=True)))
+        segments = []
+        self.slots = []
+        pos = 0
+        for match in tokens.finditer(text) if recorder.slots else []:
+            segments.append(text[pos:match.start()])
+            self.slots.append(recorder.slots[match.group(0)])
+            pos = match.end()
+        segments.append(text[pos:])
+        if len(self.slots) != len(recorder.slots):
+            # A value was transformed (hashed, sliced ...) before landing in the doc
+            raise Uncompilable("{} random values recorded, {} found in the doc".format(len(recorder.slots), len(self.slots)))
+        self.format = "%s".join(segment.replace("%", "%%") for segment in segments)
+
+    @staticmethod
+    def _column(slot, rng, number):
+        """ 'number' JSON texts of the slot """
+        kind = slot[0]
+        if kind == "string":
+            length = slot[1]
+            size = length * number
+            letters = rng.getrandbits(8 * size).to_bytes(size, "little").translate(_LETTERS).decode("ascii") if size else ""
+            return [letters[i:i + length] for i in range(0, size, length)] if length else [""] * number
+        if kind == "bits":
+            return [str(rng.getrandbits(slot[1])) for _ in range(number)]
+        if kind == "bool":
+            bits = "{:0{}b}".format(rng.getrandbits(number), number)
+            return ["true" if bit == "1" else "false" for bit in bits]
+        if kind == "randrange":
+            return [str(rng.randrange(slot[1])) for _ in range(number)]
+        if kind == "randint":
+            return [str(rng.randint(slot[1], slot[2])) for _ in range(number)]
+        if kind == "uniform":
+            return [repr(rng.uniform(slot[1], slot[2])) for _ in range(number)]
+        if kind == "choice":
+            return [rng.choice(slot[1]) for _ in range(number)]
+        if kind == "now":
+            return [str(datetime.datetime.now())] * number
+        if kind == "uuid":
+            return [str(uuid.UUID(int=rng.getrandbits(128), version=4)) for _ in range(number)]
+        raise ValueError("Unknown slot {}".format(slot))
+
+    def render(self, rng, number):
+        """ 'number' JSON texts of the doc """
+        if not self.slots:
+            return [self.format.replace("%%", "%")] * number
+        columns = [self._column(slot, rng, number) for slot in self.slots]
+        return [self.format % row for row in zip(*columns)]
+
+
+class DocFactory(object):
+    """ Produces the docs of a libraries.data.doc_generators generator in batches.
+
+    The generator is compiled once to a DocTemplate, then a batch of docs is rendered from a
+    random.Random('seed') slot by slot, straight to JSON. The same seed always gives the same docs
+    (date_time_added aside). 'body_size' (see fixed_size, uniform_size, lognormal_size) pads every doc
+    with a random "padding" string up to the drawn size in bytes.
+    Generators the template recorder cannot compile are called once per doc instead.
+
+        factory = DocFactory(doc_generators.four_k, seed=1, body_size=lognormal_size(4096), extra={"channels": ["ABC"]})
+        bodies = factory.json_batch(100000, id_prefix="doc")
+    """
+
+    def __init__(self, generator=doc_generators.simple, seed=None, body_size=None, extra=None):
+        self.generator = generator
+        self.rng = random.Random(seed)
+        self.body_size = body_size
+        self.extra = dict(extra or {})
+        try:
+            self.template = DocTemplate(generator, self.extra)
+        except Uncompilable:
+            self.template = None
+
+    def _render(self, number):
+        if self.template is not None:
+            return self.template.render(self.rng, number)
+        texts = []
+        for _ in range(number):
+            doc = self.generator()
+            doc.update(self.extra)
+            texts.append(json.dumps(doc))
+        return texts
+
+    def _pad(self, text):
+        # len(', "padding": ""')
+        padding = self.body_size(self.rng) - len(text) - 15
+        if padding <= 0:
+            return text
+        letters = self.rng.getrandbits(8 * padding).to_bytes(padding, "little").translate(_LETTERS).decode("ascii")
+        separator = ", " if text != "{}" else ""
+        return '{}{}"padding": "{}"}}'.format(text[:-1], separator, letters)
+
+    def json_texts(self, number, id_prefix=None, start=0):
+        texts = self._render(number)
+        if self.body_size is not None:
+            texts = [self._pad(text) for text in texts]
+        if id_prefix is not None:
+            # '{"_id": "<id_prefix>_' without its closing quote, the number is appended to it
+            head = '{"_id": ' + json.dumps("{}_".format(id_prefix))[:-1]
+            texts = [head + str(i) + ('", ' + text[1:] if text != "{}" else '"}')
+                     for i, text in enumerate(texts, start)]
+        return texts
+
+    def json_batch(self, number, id_prefix=None, start=0):
+        """ 'number' serialized docs (bytes), with an _id '<id_prefix>_<n>' from 'start' if id_prefix is given """
+        return [text.encode("ascii") for text in self.json_texts(number, id_prefix, start)]
+
+    def batch(self, number, id_prefix=None, start=0):
+        """ 'number' docs as dicts """
+        return [json.loads(text) for text in self.json_texts(number, id_prefix, start)]
+
+    def iter_docs(self, number, id_prefix=None, start=0, batch_size=1000):
+        """ Yield 'number' docs as dicts, rendered 'batch_size' at a time """
+        for offset in range(0, number, batch_size):
+            for doc in self.batch(min(batch_size, number - offset), id_prefix, start + offset):
+                yield doc
+
+
+_lock = threading.Lock()
+# generator name -> DocFactory without seed
+_factories = {}
+_GENERATORS = {
+    "four_k": doc_generators.four_k,
+    "simple_user": doc_generators.simple_user,
+    "complex_doc": doc_generators.complex_doc,
+}
+
+
+def get_doc_factory(generator=None):
+    """ Shared DocFactory of a generator name used by the bulk doc keywords ("four_k", "simple_user",
+    "complex_doc", anything else is simple)
+    """
+    generator = generator if generator in _GENERATORS else "simple"
+    with _lock:
+        factory = _factories.get(generator)
+        if factory is None:
+            factory = DocFactory(_GENERATORS.get(generator, doc_generators.simple))
+            _factories[generator] = factory
+        return factory
@@ -10,7 +10,7 @@ def random_bool():
 
 
 def random_long():
-    return int(random.choice(list(range(0, 10000000))))
+    return random.randrange(0, 10000000)
 
 
 def random_int():
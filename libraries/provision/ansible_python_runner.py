@@ -1,5 +1,8 @@
+import collections
 import os
 import os.path
+import threading
+import time
 from keywords.utils import log_info
 import ansible
 import ansible.inventory
@@ -9,6 +12,7 @@ from ansible.executor import playbook_executor
 from ansible.utils.display import Display
 from ansible import constants
 from ansible.parsing.dataloader import DataLoader
+from ansible.plugins.callback import CallbackBase
 
 
 class Options(object):
@@ -65,15 +69,92 @@ class Options(object):
         self.module_path = module_path
 
 
+# Parsed inventories shared by every Runner: abs inventory path -> (mtime/size stamp, DataLoader, InventoryManager)
+_contexts = {}
+_contexts_lock = threading.Lock()
+
+
+def _inventory_context(inventory_filename):
+    """ DataLoader and InventoryManager for 'inventory_filename',
+    only parsed again when the file changes
+    """
+    path = os.path.abspath(inventory_filename)
+    stat = os.stat(path)
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    with _contexts_lock:
+        context = _contexts.get(path)
+        if context is None or context[0] != stamp:
+            loader = DataLoader()
+            context = (stamp, loader, InventoryManager(loader=loader, sources=[inventory_filename]))
+            _contexts[path] = context
+    return context[1], context[2]
+
+
+def clear_inventory_cache():
+    """ Forget the parsed inventories, e.g. after a playbook added hosts with add_host """
+    with _contexts_lock:
+        _contexts.clear()
+
+
+class TaskTimer(CallbackBase):
+    """ Callback recording how long each task took across all hosts """
+
+    CALLBACK_VERSION = 2.0
+    CALLBACK_TYPE = 'aggregate'
+    CALLBACK_NAME = 'mobile_testkit_task_timer'
+    CALLBACK_NEEDS_WHITELIST = False
+
+    def __init__(self, clock=time.time):
+        super(TaskTimer, self).__init__()
+        self._clock = clock
+        self._playbook = None
+        self._current = None
+        # [(playbook, task name, seconds)] in execution order
+        self.timings = []
+
+    def _finish(self):
+        if self._current is not None:
+            playbook, name, start = self._current
+            self.timings.append((playbook, name, self._clock() - start))
+            self._current = None
+
+    def v2_playbook_on_start(self, playbook):
+        self._finish()
+        self._playbook = os.path.basename(playbook._file_name)
+
+    def v2_playbook_on_task_start(self, task, is_conditional):
+        self._finish()
+        self._current = (self._playbook, task.get_name(), self._clock())
+
+    def v2_playbook_on_handler_task_start(self, task):
+        self.v2_playbook_on_task_start(task, False)
+
+    def v2_playbook_on_stats(self, stats):
+        self._finish()
+
+    def slowest(self, count=10):
+        return sorted(self.timings, key=lambda timing: timing[2], reverse=True)[:count]
+
+    def playbook_totals(self):
+        """ {playbook: seconds} """
+        totals = collections.OrderedDict()
+        for playbook, _, seconds in self.timings:
+            totals[playbook] = totals.get(playbook, 0) + seconds
+        return totals
+
+
 class Runner(object):
 
     def __init__(self, inventory_filename, playbook, extra_vars, verbosity=0, subset=constants.DEFAULT_SUBSET):
+        """ 'playbook' can be a list of playbooks, they are run one after the other by the same executor """
 
         if not os.path.exists(inventory_filename):
             raise Exception("Cannot find inventory_filename: {}.  Current dir: {}".format(inventory_filename, os.getcwd()))
 
-        if not os.path.exists(playbook):
-            raise Exception("Cannot find playbook: {}.  Current dir: {}".format(playbook, os.getcwd()))
+        playbooks = [playbook] if isinstance(playbook, str) else list(playbook)
+        for playbook in playbooks:
+            if not os.path.exists(playbook):
+                raise Exception("Cannot find playbook: {}.  Current dir: {}".format(playbook, os.getcwd()))
 
         self.options = Options()
         self.options.verbosity = verbosity
@@ -108,35 +189,33 @@ class Runner(object):
         # Become Pass Needed if not logging in as user root
         passwords = {}
 
-        # Gets data from YAML/JSON files
-        self.loader = DataLoader()
-
-        # All the variables from all the various places
-        self.variable_manager = VariableManager()
-        self.variable_manager.extra_vars = extra_vars
-
         # WARNING: this is a dirty hack to avoid a situation where creating multiple
         # instance of this Runner each with it's own Inventory instance was creating
         # a situation where we ended up with different UUID's for hosts and comparisons
         # were failing (see http://bit.ly/1qKmV3x)
         ansible.inventory.HOSTS_PATTERNS_CACHE = {}
 
-        # Set inventory, using most of above objects
-        self.inventory = InventoryManager(loader=self.loader, sources=[inventory_filename])
+        # The loader (YAML/JSON files) and the inventory are parsed once per inventory file,
+        # only the subset and the variables are per run
+        self.loader, self.inventory = _inventory_context(inventory_filename)
+        self.inventory.clear_pattern_cache()
         self.inventory.subset(self.options.subset)
         self.variable_manager = VariableManager(loader=self.loader, inventory=self.inventory)
         self.variable_manager.extra_vars = extra_vars
 
         # Setup playbook executor, but don't run until run() called
-        log_info("Running playbook: {}".format(playbook))
+        log_info("Running playbook: {}".format(", ".join(playbooks)))
         self.pbex = playbook_executor.PlaybookExecutor(
-            playbooks=[playbook],
+            playbooks=playbooks,
             inventory=self.inventory,
             variable_manager=self.variable_manager,
             loader=self.loader,
             options=self.options,
             passwords=passwords)
 
+        self.task_timer = TaskTimer()
+        self.pbex._tqm._callback_plugins.append(self.task_timer)
+
     def run(self):
         # Results of PlaybookExecutor
         self.pbex.run()
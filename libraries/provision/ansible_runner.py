@@ -9,12 +9,20 @@ class AnsibleRunner:
 
     def __init__(self, config):
         self.provisiong_config = config
+        # [(playbook, task name, seconds)] of the last run
+        self.last_task_timings = []
 
     def run_ansible_playbook(self, script_name, extra_vars={}, subset=constants.DEFAULT_SUBSET):
+        """ Run a playbook, or a list of playbooks in one executor run.
+        Returns the number of failed + unreachable hosts
+        """
 
         inventory_filename = self.provisiong_config
 
-        playbook_filename = "{}/{}".format(PLAYBOOKS_HOME, script_name)
+        if isinstance(script_name, str):
+            playbook_filename = "{}/{}".format(PLAYBOOKS_HOME, script_name)
+        else:
+            playbook_filename = ["{}/{}".format(PLAYBOOKS_HOME, name) for name in script_name]
 
         runner = Runner(
             inventory_filename=inventory_filename,
@@ -26,4 +34,11 @@ class AnsibleRunner:
 
         stats = runner.run()
         logging.info(stats)
+
+        self.last_task_timings = runner.task_timer.timings
+        for playbook, seconds in runner.task_timer.playbook_totals().items():
+            logging.info("Playbook {} took {:.1f}s".format(playbook, seconds))
+        for playbook, task, seconds in runner.task_timer.slowest(5):
+            logging.info("Slow task {:.1f}s: {} ({})".format(seconds, task, playbook))
+
         return len(stats.failures) + len(stats.dark)
@@ -1,17 +1,19 @@
 import requests
 import subprocess
 import json
-import concurrent.futures
 import os
 import time
 
 from libraries.testkit.user import User
 from libraries.testkit import settings
+from libraries.testkit.connection_pool import pooled_session
+from libraries.testkit.provisioning import BulkProvisioner
 from libraries.testkit.debug import log_request
 from libraries.testkit.debug import log_response
 from keywords import cbgtconfig
 from utilities.cluster_config_utils import sg_ssl_enabled
 from keywords.utils import log_info
+from keywords.timeutils import wait_until, Backoff
 from keywords.constants import RBAC_FULL_ADMIN
 from requests.auth import HTTPBasicAuth
 from utilities.cluster_config_utils import is_admin_auth_disabled
@@ -33,6 +35,7 @@ class Admin:
         self.users = {}
         self._headers = {"Content-Type": "application/json"}
         self.auth = None
+        self._session = pooled_session()
 
     def create_db_with_rest(self, db, db_config={}):
         db_config = json.dumps(db_config)
@@ -45,9 +48,9 @@ class Admin:
         if not is_admin_auth_disabled(self.cluster_config):
             self.auth = HTTPBasicAuth(RBAC_FULL_ADMIN['user'], RBAC_FULL_ADMIN['pwd'])
         if self.auth:
-            resp = requests.put("{}/{}/".format(self.admin_url, name), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, data=json.dumps(db_config), verify=False, auth=self.auth)
+            resp = self._session.put("{}/{}/".format(self.admin_url, name), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, data=json.dumps(db_config), verify=False, auth=self.auth)
         else:
-            resp = requests.put("{}/{}/".format(self.admin_url, name), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, data=json.dumps(db_config), verify=False)
+            resp = self._session.put("{}/{}/".format(self.admin_url, name), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, data=json.dumps(db_config), verify=False)
         log.info("PUT {}".format(resp.url))
         log_request(resp)
         log_response(resp)
@@ -58,9 +61,9 @@ class Admin:
         if not is_admin_auth_disabled(self.cluster_config):
             self.auth = HTTPBasicAuth(RBAC_FULL_ADMIN['user'], RBAC_FULL_ADMIN['pwd'])
         if self.auth:
-            r = requests.delete("{}/{}".format(self.admin_url, name), verify=False, auth=self.auth)
+            r = self._session.delete("{}/{}".format(self.admin_url, name), verify=False, auth=self.auth)
         else:
-            r = requests.delete("{}/{}".format(self.admin_url, name), verify=False)
+            r = self._session.delete("{}/{}".format(self.admin_url, name), verify=False)
         log_request(r)
         log_response(r)
         r.raise_for_status()
@@ -70,9 +73,9 @@ class Admin:
         if not is_admin_auth_disabled(self.cluster_config):
             self.auth = HTTPBasicAuth(RBAC_FULL_ADMIN['user'], RBAC_FULL_ADMIN['pwd'])
         if self.auth:
-            r = requests.get("{}/_all_dbs".format(self.admin_url), verify=False, auth=self.auth)
+            r = self._session.get("{}/_all_dbs".format(self.admin_url), verify=False, auth=self.auth)
         else:
-            r = requests.get("{}/_all_dbs".format(self.admin_url), verify=False)
+            r = self._session.get("{}/_all_dbs".format(self.admin_url), verify=False)
         log.info("GET {}".format(r.url))
         log_response(r)
         r.raise_for_status()
@@ -82,9 +85,9 @@ class Admin:
         if not is_admin_auth_disabled(self.cluster_config):
             self.auth = HTTPBasicAuth(RBAC_FULL_ADMIN['user'], RBAC_FULL_ADMIN['pwd'])
         if self.auth:
-            r = requests.get("{}/_config".format(self.admin_url), verify=False, auth=self.auth)
+            r = self._session.get("{}/_config".format(self.admin_url), verify=False, auth=self.auth)
         else:
-            r = requests.get("{}/_config".format(self.admin_url), verify=False)
+            r = self._session.get("{}/_config".format(self.admin_url), verify=False)
         log.info("GET {}".format(r.url))
         r.raise_for_status()
         json_config = r.json()
@@ -95,9 +98,9 @@ class Admin:
         if not is_admin_auth_disabled(self.cluster_config):
             self.auth = HTTPBasicAuth(RBAC_FULL_ADMIN['user'], RBAC_FULL_ADMIN['pwd'])
         if self.auth:
-            resp = requests.get("{0}/{1}/".format(self.admin_url, db), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, verify=False, auth=self.auth)
+            resp = self._session.get("{0}/{1}/".format(self.admin_url, db), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, verify=False, auth=self.auth)
         else:
-            resp = requests.get("{0}/{1}/".format(self.admin_url, db), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, verify=False)
+            resp = self._session.get("{0}/{1}/".format(self.admin_url, db), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, verify=False)
         log.info("GET {}".format(resp.url))
         resp.raise_for_status()
         return resp.json()
@@ -108,9 +111,9 @@ class Admin:
             self.auth = HTTPBasicAuth(RBAC_FULL_ADMIN['user'], RBAC_FULL_ADMIN['pwd'])
         data = {"name": name, "admin_channels": channels}
         if self.auth:
-            resp = requests.put("{0}/{1}/_role/{2}".format(self.admin_url, db, name), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, data=json.dumps(data), verify=False, auth=self.auth)
+            resp = self._session.put("{0}/{1}/_role/{2}".format(self.admin_url, db, name), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, data=json.dumps(data), verify=False, auth=self.auth)
         else:
-            resp = requests.put("{0}/{1}/_role/{2}".format(self.admin_url, db, name), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, data=json.dumps(data), verify=False)
+            resp = self._session.put("{0}/{1}/_role/{2}".format(self.admin_url, db, name), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, data=json.dumps(data), verify=False)
         log.info("PUT {}".format(resp.url))
         resp.raise_for_status()
 
@@ -119,9 +122,9 @@ class Admin:
         if not is_admin_auth_disabled(self.cluster_config):
             self.auth = HTTPBasicAuth(RBAC_FULL_ADMIN['user'], RBAC_FULL_ADMIN['pwd'])
         if self.auth:
-            resp = requests.get("{0}/{1}/_role/".format(self.admin_url, db), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, verify=False, auth=self.auth)
+            resp = self._session.get("{0}/{1}/_role/".format(self.admin_url, db), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, verify=False, auth=self.auth)
         else:
-            resp = requests.get("{0}/{1}/_role/".format(self.admin_url, db), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, verify=False)
+            resp = self._session.get("{0}/{1}/_role/".format(self.admin_url, db), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, verify=False)
         log.info("GET {}".format(resp.url))
         resp.raise_for_status()
         return resp.json()
@@ -131,9 +134,9 @@ class Admin:
         if not is_admin_auth_disabled(self.cluster_config):
             self.auth = HTTPBasicAuth(RBAC_FULL_ADMIN['user'], RBAC_FULL_ADMIN['pwd'])
         if self.auth:
-            resp = requests.get("{0}/{1}/_role/{2}".format(self.admin_url, db, name), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, verify=False, auth=self.auth)
+            resp = self._session.get("{0}/{1}/_role/{2}".format(self.admin_url, db, name), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, verify=False, auth=self.auth)
         else:
-            resp = requests.get("{0}/{1}/_role/{2}".format(self.admin_url, db, name), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, verify=False)
+            resp = self._session.get("{0}/{1}/_role/{2}".format(self.admin_url, db, name), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, verify=False)
         log.info("GET {}".format(resp.url))
         resp.raise_for_status()
         return resp.json()
@@ -148,9 +151,9 @@ class Admin:
             data = {"name": name, "password": password, "admin_channels": channels, "admin_roles": roles}
 
         if self.auth:
-            resp = requests.put("{0}/{1}/_user/{2}".format(self.admin_url, db, name), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, data=json.dumps(data), verify=False, auth=self.auth)
+            resp = self._session.put("{0}/{1}/_user/{2}".format(self.admin_url, db, name), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, data=json.dumps(data), verify=False, auth=self.auth)
         else:
-            resp = requests.put("{0}/{1}/_user/{2}".format(self.admin_url, db, name), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, data=json.dumps(data), verify=False)
+            resp = self._session.put("{0}/{1}/_user/{2}".format(self.admin_url, db, name), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, data=json.dumps(data), verify=False)
         log.info("PUT {}".format(resp.url))
         resp.raise_for_status()
 
@@ -159,7 +162,7 @@ class Admin:
     def delete_user_if_exists(self, db, sg_username):
         does_user_exist = self.does_user_exist(db, sg_username)
         if does_user_exist:
-            resp = requests.delete("{}/{}/_user/{}".format(self.admin_url, db, sg_username))
+            resp = self._session.delete("{}/{}/_user/{}".format(self.admin_url, db, sg_username))
             log.info("DELETE user {} from database {}".format(db, sg_username))
             resp.raise_for_status()
 
@@ -170,29 +173,42 @@ class Admin:
         if type(channels) is not list:
             raise ValueError("Channels needs to be a list")
 
-        users = []
-        with concurrent.futures.ThreadPoolExecutor(max_workers=num_of_workers) as executor:
-            futures = [executor.submit(self.register_user, target=target, db=db, name="{}_{}".format(name_prefix, i), password=password, channels=channels, roles=roles) for i in range(number)]
-            for future in concurrent.futures.as_completed(futures):
-                try:
-                    user = future.result()
-                    users.append(user)
-                except Exception as e:
-                    raise ValueError("register_bulk_users failed: {}".format(e))
-
-        if len(users) != number:
+        handles = self.provision_users(
+            target, db,
+            [{"name": "{}_{}".format(name_prefix, i), "password": password, "channels": channels, "roles": roles} for i in range(number)],
+            concurrency=num_of_workers
+        )
+
+        if len(handles) != number:
             raise ValueError("Not all users added during register_bulk users")
 
-        return users
+        return [handle.user for handle in handles]
+
+    def provision_users(self, target, db, users, roles=None, concurrency=settings.MAX_REQUEST_WORKERS):
+        """ Create 'roles' ({name: channels}) then 'users' ([{"name", "password", "channels", "roles"}])
+        with a bounded fan-out, returns a UserHandle per user
+        """
+        if not is_admin_auth_disabled(self.cluster_config):
+            self.auth = HTTPBasicAuth(RBAC_FULL_ADMIN['user'], RBAC_FULL_ADMIN['pwd'])
+
+        provisioner = BulkProvisioner(self.admin_url, db, auth=self.auth, target=target, concurrency=concurrency)
+        for name, channels in (roles or {}).items():
+            provisioner.add_role(name, channels)
+        handles = [
+            provisioner.add_user(user["name"], user.get("password"), user.get("channels"), user.get("roles"))
+            for user in users
+        ]
+        provisioner.run()
+        return handles
 
     # GET /{db}/_user/
     def get_users_info(self, db):
         if not is_admin_auth_disabled(self.cluster_config):
             self.auth = HTTPBasicAuth(RBAC_FULL_ADMIN['user'], RBAC_FULL_ADMIN['pwd'])
         if self.auth:
-            resp = requests.get("{0}/{1}/_user/".format(self.admin_url, db), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, verify=False, auth=self.auth)
+            resp = self._session.get("{0}/{1}/_user/".format(self.admin_url, db), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, verify=False, auth=self.auth)
         else:
-            resp = requests.get("{0}/{1}/_user/".format(self.admin_url, db), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, verify=False)
+            resp = self._session.get("{0}/{1}/_user/".format(self.admin_url, db), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, verify=False)
         log.info("GET {}".format(resp.url))
         resp.raise_for_status()
         return resp.json()
@@ -202,9 +218,9 @@ class Admin:
         if not is_admin_auth_disabled(self.cluster_config):
             self.auth = HTTPBasicAuth(RBAC_FULL_ADMIN['user'], RBAC_FULL_ADMIN['pwd'])
         if self.auth:
-            resp = requests.get("{0}/{1}/_user/{2}".format(self.admin_url, db, name), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, verify=False, auth=self.auth)
+            resp = self._session.get("{0}/{1}/_user/{2}".format(self.admin_url, db, name), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, verify=False, auth=self.auth)
         else:
-            resp = requests.get("{0}/{1}/_user/{2}".format(self.admin_url, db, name), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, verify=False)
+            resp = self._session.get("{0}/{1}/_user/{2}".format(self.admin_url, db, name), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, verify=False)
         log.info("GET {}".format(resp.url))
         resp.raise_for_status()
         return resp.json()
@@ -215,9 +231,9 @@ class Admin:
             self.auth = HTTPBasicAuth(RBAC_FULL_ADMIN['user'], RBAC_FULL_ADMIN['pwd'])
         result = dict()
         if self.auth:
-            resp = requests.post("{0}/{1}/_resync".format(self.admin_url, db), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, verify=False, auth=self.auth)
+            resp = self._session.post("{0}/{1}/_resync".format(self.admin_url, db), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, verify=False, auth=self.auth)
         else:
-            resp = requests.post("{0}/{1}/_resync".format(self.admin_url, db), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, verify=False)
+            resp = self._session.post("{0}/{1}/_resync".format(self.admin_url, db), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, verify=False)
         log.info("POST {}".format(resp.url))
         resp.raise_for_status()
         result['status_code'] = resp.status_code
@@ -230,9 +246,9 @@ class Admin:
         if not is_admin_auth_disabled(self.cluster_config):
             self.auth = HTTPBasicAuth(RBAC_FULL_ADMIN['user'], RBAC_FULL_ADMIN['pwd'])
         if self.auth:
-            resp = requests.get("{0}/{1}/_resync".format(self.admin_url, db), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, verify=False, auth=self.auth)
+            resp = self._session.get("{0}/{1}/_resync".format(self.admin_url, db), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, verify=False, auth=self.auth)
         else:
-            resp = requests.get("{0}/{1}/_resync".format(self.admin_url, db), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, verify=False)
+            resp = self._session.get("{0}/{1}/_resync".format(self.admin_url, db), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, verify=False)
         log.info("GET {}".format(resp.url))
         resp.raise_for_status()
         result['status_code'] = resp.status_code
@@ -248,9 +264,9 @@ class Admin:
             data = {"delay": delay}
 
         if self.auth:
-            resp = requests.post("{0}/{1}/_online".format(self.admin_url, db), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, data=json.dumps(data), verify=False, auth=self.auth)
+            resp = self._session.post("{0}/{1}/_online".format(self.admin_url, db), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, data=json.dumps(data), verify=False, auth=self.auth)
         else:
-            resp = requests.post("{0}/{1}/_online".format(self.admin_url, db), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, data=json.dumps(data), verify=False)
+            resp = self._session.post("{0}/{1}/_online".format(self.admin_url, db), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, data=json.dumps(data), verify=False)
         log.info("POST {}".format(resp.url))
         resp.raise_for_status()
         return resp.status_code
@@ -260,9 +276,9 @@ class Admin:
         if not is_admin_auth_disabled(self.cluster_config):
             self.auth = HTTPBasicAuth(RBAC_FULL_ADMIN['user'], RBAC_FULL_ADMIN['pwd'])
         if self.auth:
-            resp = requests.post("{0}/{1}/_offline".format(self.admin_url, db), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, verify=False, auth=self.auth)
+            resp = self._session.post("{0}/{1}/_offline".format(self.admin_url, db), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, verify=False, auth=self.auth)
         else:
-            resp = requests.post("{0}/{1}/_offline".format(self.admin_url, db), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, verify=False)
+            resp = self._session.post("{0}/{1}/_offline".format(self.admin_url, db), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, verify=False)
         log.info("POST {}".format(resp.url))
         resp.raise_for_status()
         return resp.status_code
@@ -272,9 +288,9 @@ class Admin:
         if not is_admin_auth_disabled(self.cluster_config):
             self.auth = HTTPBasicAuth(RBAC_FULL_ADMIN['user'], RBAC_FULL_ADMIN['pwd'])
         if self.auth:
-            resp = requests.get("{0}/{1}/_config".format(self.admin_url, db), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, verify=False, auth=self.auth)
+            resp = self._session.get("{0}/{1}/_config".format(self.admin_url, db), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, verify=False, auth=self.auth)
         else:
-            resp = requests.get("{0}/{1}/_config".format(self.admin_url, db), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, verify=False)
+            resp = self._session.get("{0}/{1}/_config".format(self.admin_url, db), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, verify=False)
         log.info("GET {}".format(resp.url))
         resp.raise_for_status()
         return resp.json()
@@ -284,9 +300,9 @@ class Admin:
         if not is_admin_auth_disabled(self.cluster_config):
             self.auth = HTTPBasicAuth(RBAC_FULL_ADMIN['user'], RBAC_FULL_ADMIN['pwd'])
         if self.auth:
-            resp = requests.put("{0}/{1}/_config".format(self.admin_url, db), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, data=json.dumps(config), verify=False, auth=self.auth)
+            resp = self._session.put("{0}/{1}/_config".format(self.admin_url, db), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, data=json.dumps(config), verify=False, auth=self.auth)
         else:
-            resp = requests.put("{0}/{1}/_config".format(self.admin_url, db), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, data=json.dumps(config), verify=False)
+            resp = self._session.put("{0}/{1}/_config".format(self.admin_url, db), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, data=json.dumps(config), verify=False)
         log.info("PUT {}".format(resp.url))
         resp.raise_for_status()
         return resp.status_code
@@ -294,9 +310,9 @@ class Admin:
     # POST /{db}/_config
     def post_db_config(self, db, config):
         if self.auth:
-            resp = requests.post("{0}/{1}/_config".format(self.admin_url, db), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, data=json.dumps(config), verify=False, auth=self.auth)
+            resp = self._session.post("{0}/{1}/_config".format(self.admin_url, db), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, data=json.dumps(config), verify=False, auth=self.auth)
         else:
-            resp = requests.post("{0}/{1}/_config".format(self.admin_url, db), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, data=json.dumps(config), verify=False)
+            resp = self._session.post("{0}/{1}/_config".format(self.admin_url, db), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, data=json.dumps(config), verify=False)
         log.info("POST {}".format(resp.url))
         resp.raise_for_status()
 
@@ -308,9 +324,9 @@ class Admin:
             self.auth = HTTPBasicAuth(RBAC_FULL_ADMIN['user'], RBAC_FULL_ADMIN['pwd'])
 
         if self.auth:
-            resp = requests.get("{0}/_config".format(self.admin_url), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, verify=False, auth=self.auth)
+            resp = self._session.get("{0}/_config".format(self.admin_url), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, verify=False, auth=self.auth)
         else:
-            resp = requests.get("{0}/_config".format(self.admin_url), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, verify=False)
+            resp = self._session.get("{0}/_config".format(self.admin_url), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, verify=False)
         log.info("GET {}".format(resp.url))
         resp.raise_for_status()
         return resp.json()
@@ -322,9 +338,9 @@ class Admin:
         if not is_admin_auth_disabled(self.cluster_config):
             self.auth = HTTPBasicAuth(RBAC_FULL_ADMIN['user'], RBAC_FULL_ADMIN['pwd'])
         if self.auth:
-            resp = requests.get("{0}/_cbgt/api/cfg".format(self.admin_url), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, verify=False, auth=self.auth)
+            resp = self._session.get("{0}/_cbgt/api/cfg".format(self.admin_url), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, verify=False, auth=self.auth)
         else:
-            resp = requests.get("{0}/_cbgt/api/cfg".format(self.admin_url), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, verify=False)
+            resp = self._session.get("{0}/_cbgt/api/cfg".format(self.admin_url), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, verify=False)
         log.info("GET {}".format(resp.url))
         resp.raise_for_status()
         return cbgtconfig.CbgtConfig(resp.json())
@@ -334,9 +350,9 @@ class Admin:
         if not is_admin_auth_disabled(self.cluster_config):
             self.auth = HTTPBasicAuth(RBAC_FULL_ADMIN['user'], RBAC_FULL_ADMIN['pwd'])
         if self.auth:
-            resp = requests.get("{0}/_cbgt/api/diag".format(self.admin_url), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, verify=False, auth=self.auth)
+            resp = self._session.get("{0}/_cbgt/api/diag".format(self.admin_url), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, verify=False, auth=self.auth)
         else:
-            resp = requests.get("{0}/_cbgt/api/diag".format(self.admin_url), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, verify=False)
+            resp = self._session.get("{0}/_cbgt/api/diag".format(self.admin_url), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, verify=False)
         log.info("GET {}".format(resp.url))
         resp.raise_for_status()
         return resp.json()
@@ -346,9 +362,9 @@ class Admin:
         if not is_admin_auth_disabled(self.cluster_config):
             self.auth = HTTPBasicAuth(RBAC_FULL_ADMIN['user'], RBAC_FULL_ADMIN['pwd'])
         if self.auth:
-            r = requests.get("{}/{}/_changes".format(self.admin_url, db), verify=False, auth=self.auth)
+            r = self._session.get("{}/{}/_changes".format(self.admin_url, db), verify=False, auth=self.auth)
         else:
-            r = requests.get("{}/{}/_changes".format(self.admin_url, db), verify=False)
+            r = self._session.get("{}/{}/_changes".format(self.admin_url, db), verify=False)
         log_request(r)
         log_response(r)
         r.raise_for_status()
@@ -360,9 +376,9 @@ class Admin:
         if not is_admin_auth_disabled(self.cluster_config):
             self.auth = HTTPBasicAuth(RBAC_FULL_ADMIN['user'], RBAC_FULL_ADMIN['pwd'])
         if self.auth:
-            r = requests.get("{}/_active_tasks".format(self.admin_url), verify=False, auth=self.auth)
+            r = self._session.get("{}/_active_tasks".format(self.admin_url), verify=False, auth=self.auth)
         else:
-            r = requests.get("{}/_active_tasks".format(self.admin_url), verify=False)
+            r = self._session.get("{}/_active_tasks".format(self.admin_url), verify=False)
         log_request(r)
         log_response(r)
         r.raise_for_status()
@@ -373,9 +389,9 @@ class Admin:
         if not is_admin_auth_disabled(self.cluster_config):
             self.auth = HTTPBasicAuth(RBAC_FULL_ADMIN['user'], RBAC_FULL_ADMIN['pwd'])
         if self.auth:
-            resp = requests.get("{0}/{1}/_all_docs".format(self.admin_url, db), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, verify=False, auth=self.auth)
+            resp = self._session.get("{0}/{1}/_all_docs".format(self.admin_url, db), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, verify=False, auth=self.auth)
         else:
-            resp = requests.get("{0}/{1}/_all_docs".format(self.admin_url, db), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, verify=False)
+            resp = self._session.get("{0}/{1}/_all_docs".format(self.admin_url, db), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, verify=False)
         log.info("GET {}".format(resp.url))
         resp.raise_for_status()
         return resp.json()
@@ -388,9 +404,9 @@ class Admin:
         max_count = 5
         while True:
             if self.auth:
-                r = requests.get("{}/{}/_replicationStatus".format(self.admin_url, db), verify=False, auth=self.auth)
+                r = self._session.get("{}/{}/_replicationStatus".format(self.admin_url, db), verify=False, auth=self.auth)
             else:
-                r = requests.get("{}/{}/_replicationStatus".format(self.admin_url, db), verify=False)
+                r = self._session.get("{}/{}/_replicationStatus".format(self.admin_url, db), verify=False)
             log_request(r)
             log_response(r)
             r.raise_for_status()
@@ -405,71 +421,48 @@ class Admin:
             time.sleep(1)
         return active_resp_data
 
-    def wait_until_sgw_replication_done(self, db, repl_id, read_flag=False, write_flag=False, max_times=180):
+    def wait_until_sgw_replication_done(self, db, repl_id, read_flag=False, write_flag=False, max_times=180, stall_timeout=120):
+        """ Poll _replicationStatus until the replication is no longer running, or until the docs_read
+        (read_flag) / docs_written (write_flag) counts have not moved for 'stall_timeout' seconds.
+        Raises if that takes more than 'max_times' seconds.
+        """
         if not is_admin_auth_disabled(self.cluster_config):
             self.auth = HTTPBasicAuth(RBAC_FULL_ADMIN['user'], RBAC_FULL_ADMIN['pwd'])
-        # read_flag = True
-        # write_flag = True
-        read_timeout = False
-        write_timeout = False
-        if read_flag is False:
-            read_timeout = True  # To avoid waiting for read doc count as there is not expectation of read docs
-        if write_flag is False:
-            write_timeout = True  # To avoid waiting for write doc count as there is not expectation of write docs
-        retry_max_count = 120
-        count = 0
-        prev_read_count = 0
-        prev_write_count = 0
-        read_retry_count = 0
-        write_retry_count = 0
-        while count < max_times:
+
+        # counter name -> [last count, time it last moved], only for the counts there is an expectation for
+        progress = {}
+        if read_flag:
+            progress["docs_read"] = [0, time.time()]
+        if write_flag:
+            progress["docs_written"] = [0, time.time()]
+
+        def replication_done():
             if self.auth:
-                r = requests.get("{}/{}/_replicationStatus/{}".format(self.admin_url, db, repl_id), verify=False, auth=self.auth)
+                r = self._session.get("{}/{}/_replicationStatus/{}".format(self.admin_url, db, repl_id), verify=False, auth=self.auth)
             else:
-                r = requests.get("{}/{}/_replicationStatus/{}".format(self.admin_url, db, repl_id), verify=False)
+                r = self._session.get("{}/{}/_replicationStatus/{}".format(self.admin_url, db, repl_id), verify=False)
             r.raise_for_status()
             resp_obj = r.json()
             status = resp_obj["status"]
             if status == "starting" or status == "started":
-                count += 1
-            elif status == "running":
-                if read_flag:
-                    if read_retry_count < retry_max_count:
-                        try:
-                            docs_read_count = resp_obj["docs_read"]
-                            if docs_read_count > prev_read_count:
-                                prev_read_count = docs_read_count
-                                read_retry_count = 0
-                            else:
-                                read_retry_count += 1
-                        except KeyError:
-                            read_retry_count += 1
-                    else:
-                        read_timeout = True
-
-                if write_flag:
-                    if write_retry_count < retry_max_count:
-                        try:
-                            docs_write_count = resp_obj["docs_written"]
-                            if docs_write_count > prev_write_count:
-                                prev_write_count = docs_write_count
-                                write_retry_count = 0
-                            else:
-                                write_retry_count += 1
-                        except KeyError:
-                            write_retry_count += 1
-                    else:
-                        write_timeout = True
-            else:
+                return False
+            if status != "running":
                 log_info("looks like replication is stopped")
-                break
-            count += 1
-            time.sleep(1)
-            if read_timeout and write_timeout:
+                return True
+
+            now = time.time()
+            for counter, last in progress.items():
+                count = resp_obj.get(counter)
+                if count is not None and count > last[0]:
+                    last[0] = count
+                    last[1] = now
+            if all(now - last[1] >= stall_timeout for last in progress.values()):
                 log_info("read or write timeout happened")
-                break
-        if count == max_times:
-            raise Exception("timeout while waiting for replication to complete on sgw replication")
+                return True
+            return False
+
+        wait_until(replication_done, timeout=max_times, backoff=Backoff(maximum=1), name="wait_until_sgw_replication_done",
+                   message="timeout while waiting for replication to complete on sgw replication")
 
     def get_replications_count(self, db, expected_count=1):
         if not is_admin_auth_disabled(self.cluster_config):
@@ -478,9 +471,9 @@ class Admin:
         max_count = 15
         while True:
             if self.auth:
-                r = requests.get("{}/{}/_replication".format(self.admin_url, db), verify=False, auth=self.auth)
+                r = self._session.get("{}/{}/_replication".format(self.admin_url, db), verify=False, auth=self.auth)
             else:
-                r = requests.get("{}/{}/_replication".format(self.admin_url, db), verify=False)
+                r = self._session.get("{}/{}/_replication".format(self.admin_url, db), verify=False)
             log_request(r)
             log_response(r)
             r.raise_for_status()
@@ -501,9 +494,9 @@ class Admin:
             self.auth = HTTPBasicAuth(RBAC_FULL_ADMIN['user'], RBAC_FULL_ADMIN['pwd'])
         sync_headers = {"Content-Type": "application/javascript"}
         if self.auth:
-            resp = requests.put("{0}/{1}/_config/sync".format(self.admin_url, db), headers=sync_headers, timeout=settings.HTTP_REQ_TIMEOUT, data=sync_func, verify=False, auth=self.auth)
+            resp = self._session.put("{0}/{1}/_config/sync".format(self.admin_url, db), headers=sync_headers, timeout=settings.HTTP_REQ_TIMEOUT, data=sync_func, verify=False, auth=self.auth)
         else:
-            resp = requests.put("{0}/{1}/_config/sync".format(self.admin_url, db), headers=sync_headers, timeout=settings.HTTP_REQ_TIMEOUT, data=sync_func, verify=False)
+            resp = self._session.put("{0}/{1}/_config/sync".format(self.admin_url, db), headers=sync_headers, timeout=settings.HTTP_REQ_TIMEOUT, data=sync_func, verify=False)
         log.info("PUT {}".format(resp.url))
         resp.raise_for_status()
         return resp.status_code
@@ -513,9 +506,9 @@ class Admin:
             self.auth = HTTPBasicAuth(RBAC_FULL_ADMIN['user'], RBAC_FULL_ADMIN['pwd'])
         sync_headers = {"Content-Type": "application/javascript"}
         if self.auth:
-            resp = requests.delete("{0}/{1}/_config/sync".format(self.admin_url, db), headers=sync_headers, timeout=settings.HTTP_REQ_TIMEOUT, verify=False, auth=self.auth)
+            resp = self._session.delete("{0}/{1}/_config/sync".format(self.admin_url, db), headers=sync_headers, timeout=settings.HTTP_REQ_TIMEOUT, verify=False, auth=self.auth)
         else:
-            resp = requests.delete("{0}/{1}/_config/sync".format(self.admin_url, db), headers=sync_headers, timeout=settings.HTTP_REQ_TIMEOUT, verify=False)
+            resp = self._session.delete("{0}/{1}/_config/sync".format(self.admin_url, db), headers=sync_headers, timeout=settings.HTTP_REQ_TIMEOUT, verify=False)
         log.info("PUT {}".format(resp.url))
         resp.raise_for_status()
         return resp.status_code
@@ -524,9 +517,9 @@ class Admin:
         if not is_admin_auth_disabled(self.cluster_config):
             self.auth = HTTPBasicAuth(RBAC_FULL_ADMIN['user'], RBAC_FULL_ADMIN['pwd'])
         if self.auth:
-            resp = requests.put("{0}/{1}/_config/import_filter".format(self.admin_url, db), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, data=imp_fltr_func, verify=False, auth=self.auth)
+            resp = self._session.put("{0}/{1}/_config/import_filter".format(self.admin_url, db), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, data=imp_fltr_func, verify=False, auth=self.auth)
         else:
-            resp = requests.put("{0}/{1}/_config/import_filter".format(self.admin_url, db), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, data=imp_fltr_func, verify=False)
+            resp = self._session.put("{0}/{1}/_config/import_filter".format(self.admin_url, db), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, data=imp_fltr_func, verify=False)
         log.info("PUT {}".format(resp.url))
         resp.raise_for_status()
         return resp.status_code
@@ -536,9 +529,9 @@ class Admin:
         if not is_admin_auth_disabled(self.cluster_config):
             self.auth = HTTPBasicAuth(RBAC_FULL_ADMIN['user'], RBAC_FULL_ADMIN['pwd'])
         if self.auth:
-            resp = requests.put("{0}/_config".format(self.admin_url), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, data=json.dumps(config), verify=False, auth=self.auth)
+            resp = self._session.put("{0}/_config".format(self.admin_url), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, data=json.dumps(config), verify=False, auth=self.auth)
         else:
-            resp = requests.put("{0}/_config".format(self.admin_url), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, data=json.dumps(config), verify=False)
+            resp = self._session.put("{0}/_config".format(self.admin_url), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, data=json.dumps(config), verify=False)
         log.info("PUT {}".format(resp.url))
         resp.raise_for_status()
         return resp.status_code
@@ -548,9 +541,9 @@ class Admin:
         if not is_admin_auth_disabled(self.cluster_config):
             self.auth = HTTPBasicAuth(RBAC_FULL_ADMIN['user'], RBAC_FULL_ADMIN['pwd'])
         if self.auth:
-            resp = requests.get("{0}/_config?include_runtime=true".format(self.admin_url), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, verify=False, auth=self.auth)
+            resp = self._session.get("{0}/_config?include_runtime=true".format(self.admin_url), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, verify=False, auth=self.auth)
         else:
-            resp = requests.get("{0}/_config?include_runtime=true".format(self.admin_url), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, verify=False)
+            resp = self._session.get("{0}/_config?include_runtime=true".format(self.admin_url), headers=self._headers, timeout=settings.HTTP_REQ_TIMEOUT, verify=False)
         log.info("GET {}".format(resp.url))
         resp.raise_for_status()
         return resp.json()
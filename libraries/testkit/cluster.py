@@ -1,3 +1,4 @@
+import hashlib
 import json
 import os
 import time
@@ -5,7 +6,7 @@ from jinja2 import Template
 from requests.exceptions import ConnectionError
 
 import keywords.exceptions
-from keywords.couchbaseserver import CouchbaseServer
+from keywords.couchbaseserver import CouchbaseServer, get_bucket_pool
 from keywords.exceptions import ProvisioningError
 from keywords.utils import log_info, add_cbs_to_sg_config_server_field
 from keywords.utils import version_and_build
@@ -20,8 +21,30 @@ from utilities.cluster_config_utils import is_load_balancer_enabled, get_revs_li
 from utilities.cluster_config_utils import get_load_balancer_ip, no_conflicts_enabled, is_delta_sync_enabled, get_sg_platform, choose_logging_level
 from utilities.cluster_config_utils import generate_x509_certs, is_x509_auth, get_cbs_primary_nodes_str, is_hide_prod_version_enabled
 from keywords.constants import SYNC_GATEWAY_CERT
-from utilities.cluster_config_utils import get_sg_replicas, get_sg_use_views, get_sg_version
+from utilities.cluster_config_utils import get_sg_replicas, get_sg_use_views, get_sg_version, load_cluster_config_json
 from utilities.cluster_config_utils import is_centralized_persistent_config_disabled, is_server_tls_skip_verify_enabled, is_admin_auth_disabled, is_tls_server_disabled
+from utilities.cluster_config_utils import is_reset_by_diff_enabled, is_bucket_pool_enabled
+from utilities.cluster_topology import get_topology
+
+
+# cluster_config -> fingerprint, buckets and start vars of the last reset (see Cluster.reset)
+_last_resets = {}
+
+
+def reset_fingerprint(cluster_config, sg_config_path, bucket_list, use_config, sgdb_creation):
+    """ Hash of everything a reset depends on: the sg config, the requested buckets
+    and the cluster config (nodes and environment flags)
+    """
+    with open(sg_config_path) as f:
+        sg_config = f.read()
+    state = {
+        "sg_config": sg_config,
+        "bucket_list": sorted(bucket_list),
+        "use_config": use_config,
+        "sgdb_creation": sgdb_creation,
+        "cluster_config": get_topology(cluster_config).config
+    }
+    return hashlib.sha1(json.dumps(state, sort_keys=True).encode("utf-8")).hexdigest()
 
 
 class Cluster:
@@ -46,8 +69,7 @@ class Cluster:
         log_info(self._cluster_config)
 
         # Load resources/cluster_configs/<cluster_config>.json
-        with open("{}.json".format(config)) as f:
-            cluster = json.loads(f.read())
+        cluster = load_cluster_config_json(config)
         # Get load balancer IP
         lb_ip = None
         if is_load_balancer_with_two_clusters_enabled(self._cluster_config):
@@ -115,7 +137,13 @@ class Cluster:
         self.servers = [CouchbaseServer(url=cb_url) for cb_url in cbs_urls]
         self.sync_gateway_config = None  # will be set to Config object when reset() called
 
-    def reset(self, sg_config_path, bucket_list=[], use_config=False, sgdb_creation=True):
+    def reset(self, sg_config_path, bucket_list=[], use_config=False, sgdb_creation=True, reset_by_diff=None):
+        """ Stop sync_gateway / sg_accel, recreate the buckets and start sync_gateway with 'sg_config_path'.
+
+        With reset_by_diff (defaults to the reset_by_diff flag of the cluster config), if the sg config,
+        bucket list and cluster config are the same as the last full reset of this cluster and the same
+        buckets still exist, the buckets are flushed instead of deleted and recreated.
+        """
 
         ansible_runner = AnsibleRunner(self._cluster_config)
 
@@ -123,37 +151,96 @@ class Cluster:
         log_info(">>> CBS SSL enabled: {}".format(self.cbs_ssl))
         log_info(">>> Using xattrs: {}".format(self.xattrs))
 
-        # Stop sync_gateways
-        log_info(">>> Stopping sync_gateway")
-        status = ansible_runner.run_ansible_playbook("stop-sync-gateway.yml")
-        assert status == 0, "Failed to stop sync gateway"
+        # Stop sync_gateways and sg_accels and delete their artifacts in one executor run
+        log_info(">>> Stopping sync_gateway / sg_accel and deleting their artifacts")
+        status = ansible_runner.run_ansible_playbook([
+            "stop-sync-gateway.yml",
+            "stop-sg-accel.yml",
+            "delete-sync-gateway-artifacts.yml",
+            "delete-sg-accel-artifacts.yml"
+        ])
+        assert status == 0, "Failed to stop sync_gateway / sg_accel or to delete their artifacts"
+
+        if reset_by_diff is None:
+            reset_by_diff = is_reset_by_diff_enabled(self._cluster_config)
+        fingerprint = reset_fingerprint(self._cluster_config, sg_config_path, bucket_list, use_config, sgdb_creation)
+        last_reset = _last_resets.pop(self._cluster_config, None)
+
+        if reset_by_diff and last_reset is not None and last_reset["fingerprint"] == fingerprint \
+                and sorted(self.servers[0].get_bucket_names()) == last_reset["bucket_names"]:
+            log_info(">>> Cluster config, sg config and buckets are unchanged, flushing buckets {}".format(last_reset["bucket_names"]))
+            self.servers[0].flush_buckets(last_reset["bucket_names"])
+            self.servers[0].wait_for_ready_state()
+            config = Config(os.path.abspath(sg_config_path), self._cluster_config, bucket_list=bucket_list)
+            playbook_vars = last_reset["playbook_vars"]
+            db_config_json = last_reset["db_config_json"]
+            sgw_config_data = last_reset["sgw_config_data"]
+        else:
+            config, playbook_vars, db_config_json, sgw_config_data = self._recreate_buckets(sg_config_path, bucket_list, use_config, ansible_runner)
+        self.sync_gateway_config = config
+        mode = config.get_mode()
 
-        # Stop sync_gateway accels
-        log_info(">>> Stopping sg_accel")
-        status = ansible_runner.run_ansible_playbook("stop-sg-accel.yml")
-        assert status == 0, "Failed to stop sg_accel"
-
-        # Deleting sync_gateway artifacts
-        log_info(">>> Deleting sync_gateway artifacts")
-        status = ansible_runner.run_ansible_playbook("delete-sync-gateway-artifacts.yml")
-        assert status == 0, "Failed to delete sync_gateway artifacts"
-
-        # Deleting sg_accel artifacts
-        log_info(">>> Deleting sg_accel artifacts")
-        status = ansible_runner.run_ansible_playbook("delete-sg-accel-artifacts.yml")
-        assert status == 0, "Failed to delete sg_accel artifacts"
-
-        # Delete buckets
-        log_info(">>> Deleting buckets on: {}".format(self.servers[0].url))
-        self.servers[0].delete_buckets()
+        status = ansible_runner.run_ansible_playbook(
+            "start-sync-gateway.yml",
+            extra_vars=playbook_vars
+        )
+        assert status == 0, "Failed to start to Sync Gateway"
+
+        # HACK - only enable sg_accel for distributed index tests
+        # revise this with https://github.com/couchbaselabs/sync-gateway-testcluster/issues/222
+        if mode == "di":
+            # Start sg-accel
+            status = ansible_runner.run_ansible_playbook(
+                "start-sg-accel.yml",
+                extra_vars=playbook_vars
+            )
+            assert status == 0, "Failed to start sg_accel"
+
+        # Validate CBGT
+        if mode == "di":
+            if not self.validate_cbgt_pindex_distribution_retry(len(self.sg_accels)):
+                self.save_cbgt_diagnostics()
+                raise Exception("Failed to validate CBGT Pindex distribution")
+            log_info(">>> Detected valid CBGT Pindex distribution")
+        else:
+            log_info(">>> Running in channel cache")
+
+        if status == 0 and sgdb_creation:
+            time.sleep(5)  # give a time afer restart to create db config, change to 60 if it fails
+            if get_sg_version(self._cluster_config) >= "3.0.0" and not is_centralized_persistent_config_disabled(self._cluster_config):
+                # Now create rest API for all database configs
+                send_dbconfig_as_restCall(self._cluster_config, db_config_json, self.sync_gateways, sgw_config_data)
+
+        _last_resets[self._cluster_config] = {
+            "fingerprint": fingerprint,
+            "bucket_names": sorted(self.servers[0].get_bucket_names()),
+            "playbook_vars": playbook_vars,
+            "db_config_json": db_config_json,
+            "sgw_config_data": sgw_config_data
+        }
+        return mode
+
+    def _recreate_buckets(self, sg_config_path, bucket_list, use_config, ansible_runner):
+        """ Delete every bucket (or reuse them through the BucketPool), create the ones of the sg config
+        and build the start-sync-gateway.yml vars.
+        Returns (config, playbook_vars, db_config_json, sgw_config_data)
+        """
+        bucket_pool = None
+        if is_bucket_pool_enabled(self._cluster_config):
+            bucket_pool = get_bucket_pool(self.servers[0], self._cluster_config, ipv6=self.ipv6)
+        else:
+            # Delete buckets
+            log_info(">>> Deleting buckets on: {}".format(self.servers[0].url))
+            self.servers[0].delete_buckets()
         # Parse config and grab bucket names
         config_path_full = os.path.abspath(sg_config_path)
         config = Config(config_path_full, self._cluster_config, bucket_list=bucket_list)
-        self.sync_gateway_config = config
-        mode = config.get_mode()
+        db_config_json = None
+        sgw_config_data = None
 
         if get_sg_version(self._cluster_config) >= "3.0.0" and not is_centralized_persistent_config_disabled(self._cluster_config):
-            playbook_vars, db_config_json, sgw_config_data = self.setup_server_and_sgw(sg_config_path=sg_config_path, bucket_list=bucket_list, use_config=use_config)
+            playbook_vars, db_config_json, sgw_config_data = self.setup_server_and_sgw(sg_config_path=sg_config_path, bucket_list=bucket_list, use_config=use_config,
+                                                                                       bucket_pool=bucket_pool)
         else:
             bucket_name_set = config.get_bucket_name_set()
             sg_cert_path = os.path.abspath(SYNC_GATEWAY_CERT)
@@ -166,9 +253,12 @@ class Cluster:
 
             log_info(">>> Creating buckets on: {}".format(self.servers[0].url))
             log_info(">>> Creating buckets {}".format(bucket_name_set))
-            self.servers[0].create_buckets(bucket_names=bucket_name_set,
-                                           cluster_config=self._cluster_config,
-                                           ipv6=self.ipv6)
+            if bucket_pool is not None:
+                bucket_pool.acquire(bucket_name_set)
+            else:
+                self.servers[0].create_buckets(bucket_names=bucket_name_set,
+                                               cluster_config=self._cluster_config,
+                                               ipv6=self.ipv6)
 
             # Wait for server to be in a warmup state to work around
             # https://github.com/couchbase/sync_gateway/issues/1745
@@ -330,40 +420,10 @@ class Cluster:
             time.sleep(5)
             # time.sleep(30)
 
-        status = ansible_runner.run_ansible_playbook(
-            "start-sync-gateway.yml",
-            extra_vars=playbook_vars
-        )
-        assert status == 0, "Failed to start to Sync Gateway"
+        return config, playbook_vars, db_config_json, sgw_config_data
 
-        # HACK - only enable sg_accel for distributed index tests
-        # revise this with https://github.com/couchbaselabs/sync-gateway-testcluster/issues/222
-        if mode == "di":
-            # Start sg-accel
-            status = ansible_runner.run_ansible_playbook(
-                "start-sg-accel.yml",
-                extra_vars=playbook_vars
-            )
-            assert status == 0, "Failed to start sg_accel"
-
-        # Validate CBGT
-        if mode == "di":
-            if not self.validate_cbgt_pindex_distribution_retry(len(self.sg_accels)):
-                self.save_cbgt_diagnostics()
-                raise Exception("Failed to validate CBGT Pindex distribution")
-            log_info(">>> Detected valid CBGT Pindex distribution")
-        else:
-            log_info(">>> Running in channel cache")
-
-        if status == 0 and sgdb_creation:
-            time.sleep(5)  # give a time afer restart to create db config, change to 60 if it fails
-            if get_sg_version(self._cluster_config) >= "3.0.0" and not is_centralized_persistent_config_disabled(self._cluster_config):
-                # Now create rest API for all database configs
-                send_dbconfig_as_restCall(self._cluster_config, db_config_json, self.sync_gateways, sgw_config_data)
-
-        return mode
-
-    def setup_server_and_sgw(self, sg_config_path, bucket_creation=True, bucket_list=[], use_config=False, sync_gateway_version=None):
+    def setup_server_and_sgw(self, sg_config_path, bucket_creation=True, bucket_list=[], use_config=False, sync_gateway_version=None,
+                             bucket_pool=None):
         # Parse config and grab bucket names
         ansible_runner = AnsibleRunner(self._cluster_config)
         sg_conf_name = "sync_gateway_default"
@@ -400,7 +460,10 @@ class Cluster:
         if bucket_creation:
             log_info(">>> Creating buckets on: {}".format(self.servers[0].url))
             log_info(">>> Creating buckets {}".format(bucket_name_set))
-            self.servers[0].create_buckets(bucket_names=bucket_name_set, cluster_config=self._cluster_config, ipv6=self.ipv6)
+            if bucket_pool is not None:
+                bucket_pool.acquire(bucket_name_set)
+            else:
+                self.servers[0].create_buckets(bucket_names=bucket_name_set, cluster_config=self._cluster_config, ipv6=self.ipv6)
             log_info(">>> Waiting for Server: {} to be in a healthy state".format(self.servers[0].url))
             self.servers[0].wait_for_ready_state()
         self.servers[0]._create_internal_rbac_user_by_roles('*', self._cluster_config, common_bucket_user, "mobile_sync_gateway")
@@ -411,8 +474,7 @@ class Cluster:
             sgw_config_data = config.read()
 
         # Extracting cluster from cluster config
-        with open("{}.json".format(self._cluster_config)) as f:
-            cluster = json.loads(f.read())
+        cluster = load_cluster_config_json(self._cluster_config)
 
         server_scheme_var = "couchbase"
         server_port_var = ""
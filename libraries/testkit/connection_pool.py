@@ -0,0 +1,76 @@
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from libraries.testkit import settings
+
+
+class PooledAdapter(HTTPAdapter):
+    """ HTTPAdapter shared by every testkit REST client.
+
+    The underlying urllib3 PoolManager keeps one keep-alive pool per (scheme, host, port),
+    'budget' caps the requests in flight through the adapter across all hosts.
+    The pools do not block: streamed responses (continuous _changes, multipart _bulk_get) hold their
+    connection until closed, so once a host pool is exhausted extra connections are opened
+    and only POOL_MAXSIZE_PER_HOST of them are kept alive.
+    """
+
+    def __init__(self, budget, **kwargs):
+        self._budget = budget
+        super(PooledAdapter, self).__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        with self._budget:
+            return super(PooledAdapter, self).send(request, **kwargs)
+
+    def close(self):
+        # Sessions close their adapters, the shared pools are only closed by close_pools()
+        pass
+
+    def close_pools(self):
+        super(PooledAdapter, self).close()
+
+
+_lock = threading.Lock()
+_budget = None
+# scheme prefix -> PooledAdapter
+_adapters = {}
+
+
+def get_adapter(prefix):
+    """ Shared adapter for 'http://' or 'https://' """
+    global _budget
+    with _lock:
+        adapter = _adapters.get(prefix)
+        if adapter is None:
+            if _budget is None:
+                _budget = threading.BoundedSemaphore(settings.POOL_MAX_IN_FLIGHT)
+            adapter = PooledAdapter(
+                _budget,
+                pool_connections=settings.POOL_MAX_HOSTS,
+                pool_maxsize=settings.POOL_MAXSIZE_PER_HOST,
+                pool_block=False
+            )
+            _adapters[prefix] = adapter
+        return adapter
+
+
+def pooled_session():
+    """ requests.Session using the shared pools.
+    The session only holds its own headers / cookies / auth, so it is cheap to create one per user
+    """
+    session = requests.Session()
+    for prefix in ["http://", "https://"]:
+        session.mount(prefix, get_adapter(prefix))
+    return session
+
+
+def close_pools():
+    """ Close every pooled connection, the next request opens new pools """
+    global _budget
+    with _lock:
+        for adapter in _adapters.values():
+            adapter.close_pools()
+        _adapters.clear()
+        _budget = None
@@ -0,0 +1,168 @@
+import asyncio
+import json
+import time
+
+import aiohttp
+
+from libraries.testkit import settings
+from keywords.utils import log_info
+
+
+class UserHandle(object):
+    """ A provisioned user: its name, password, db and access.
+    The full User (and its HTTP session) is only built the first time 'user' is used
+    """
+
+    __slots__ = ["target", "db", "name", "password", "channels", "roles", "_user"]
+
+    def __init__(self, target, db, name, password, channels, roles):
+        self.target = target
+        self.db = db
+        self.name = name
+        self.password = password
+        self.channels = channels
+        self.roles = roles
+        self._user = None
+
+    @property
+    def auth(self):
+        """ (name, password) tuple for basic auth or session creation """
+        return self.name, self.password
+
+    @property
+    def user(self):
+        if self._user is None:
+            # Imported here, libraries.testkit.user is only needed once a handle is used
+            from libraries.testkit.user import User
+            self._user = User(self.target, self.db, self.name, self.password, self.channels)
+        return self._user
+
+
+class BulkProvisioner(object):
+    """ Creates Sync Gateway roles, users and channel grants through the admin REST api.
+
+    Requests are spread over 'concurrency' asyncio workers on one event loop.
+    Every request is a PUT of the whole principal, so it is retried on connection errors
+    and settings.ERROR_CODE_LIST statuses with an exponential backoff.
+    Roles are created before the users that may reference them, grants are applied last.
+
+        provisioner = BulkProvisioner(admin_url, "db")
+        provisioner.add_role("radio_stations", ["ABC"])
+        handles = [provisioner.add_user("dj_{}".format(i), "password", roles=["radio_stations"]) for i in range(10000)]
+        provisioner.run()
+    """
+
+    def __init__(self, admin_url, db, auth=None, target=None, concurrency=settings.MAX_REQUEST_WORKERS,
+                 retries=settings.MAX_HTTP_RETRIES, backoff_factor=settings.BACKOFF_FACTOR, progress_interval=10):
+        self.url = "{}/{}".format(admin_url, db)
+        self.db = db
+        # HTTPBasicAuth or (name, password) of the admin user, None when admin auth is disabled
+        self.auth = auth
+        # Sync Gateway the users will talk to, used when building User objects from handles
+        self.target = target
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.progress_interval = progress_interval
+        # phase -> [(path, body)]
+        self._requests = {"roles": [], "users": [], "grants": []}
+        self.stats = {"requests": 0, "retries": 0, "failed": 0}
+
+    def add_role(self, name, channels=None):
+        self._requests["roles"].append(("_role/{}".format(name), {"name": name, "admin_channels": list(channels or [])}))
+
+    def add_user(self, name, password=None, channels=None, roles=None):
+        """ Queue the creation of a user, returns its UserHandle """
+        channels = list(channels or [])
+        roles = list(roles or [])
+        if password is None:
+            data = {"name": name, "admin_channels": channels, "admin_roles": roles, "disabled": False}
+        else:
+            data = {"name": name, "password": password, "admin_channels": channels, "admin_roles": roles}
+        self._requests["users"].append(("_user/{}".format(name), data))
+        return UserHandle(self.target, self.db, name, password, channels, roles)
+
+    def grant(self, name, channels=None, roles=None):
+        """ Queue overwriting the channels and roles of an existing user, the password is left as it is """
+        data = {"name": name, "admin_channels": list(channels or []), "admin_roles": list(roles or [])}
+        self._requests["grants"].append(("_user/{}".format(name), data))
+
+    def _request_kwargs(self):
+        if self.auth is None:
+            return {}
+        if isinstance(self.auth, tuple):
+            return {"auth": aiohttp.BasicAuth(self.auth[0], self.auth[1])}
+        return {"auth": aiohttp.BasicAuth(self.auth.username, self.auth.password)}
+
+    async def _put(self, session, path, data):
+        """ PUT with retries, returns None on success or the error """
+        url = "{}/{}".format(self.url, path)
+        body = json.dumps(data)
+        for attempt in range(self.retries + 1):
+            if attempt > 0:
+                self.stats["retries"] += 1
+                await asyncio.sleep(self.backoff_factor * (2 ** (attempt - 1)))
+            self.stats["requests"] += 1
+            try:
+                async with session.put(url, data=body, **self._request_kwargs()) as resp:
+                    if resp.status < 300:
+                        return None
+                    error = "PUT {} -> {}: {}".format(url, resp.status, await resp.text())
+                    if resp.status not in settings.ERROR_CODE_LIST:
+                        return error
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = "PUT {} -> {!r}".format(url, e)
+        return error
+
+    async def _run_phase(self, session, phase):
+        pending = self._requests[phase]
+        if not pending:
+            return []
+
+        queue = iter(pending)
+        errors = []
+        done = [0]
+
+        async def worker():
+            for path, data in queue:
+                error = await self._put(session, path, data)
+                if error is not None:
+                    self.stats["failed"] += 1
+                    errors.append(error)
+                done[0] += 1
+
+        async def progress():
+            while True:
+                await asyncio.sleep(self.progress_interval)
+                log_info("Provisioning {}: {}/{} {}".format(phase, done[0], len(pending), self.stats))
+
+        start = time.time()
+        progress_task = asyncio.ensure_future(progress())
+        try:
+            await asyncio.gather(*[worker() for _ in range(min(self.concurrency, len(pending)))])
+        finally:
+            progress_task.cancel()
+        log_info("Provisioned {} {} in {:.1f}s, {} failed".format(len(pending), phase, time.time() - start, len(errors)))
+        return errors
+
+    async def run_async(self):
+        connector = aiohttp.TCPConnector(limit=self.concurrency, ssl=False)
+        timeout = aiohttp.ClientTimeout(total=settings.HTTP_REQ_TIMEOUT)
+        errors = []
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout,
+                                         headers={"Content-Type": "application/json"}) as session:
+            for phase in ["roles", "users", "grants"]:
+                errors.extend(await self._run_phase(session, phase))
+                if errors:
+                    # Later phases depend on the earlier ones
+                    break
+
+        if errors:
+            raise ValueError("Provisioning failed for {} principals: {}".format(len(errors), errors[:10]))
+
+        for phase in self._requests:
+            self._requests[phase] = []
+
+    def run(self):
+        """ Send every queued role, user and grant. Raises ValueError listing the failures """
+        asyncio.run(self.run_async())
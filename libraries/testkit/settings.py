@@ -7,6 +7,14 @@ HTTP_REQ_TIMEOUT = 120
 # Number of thread workers for requests
 MAX_REQUEST_WORKERS = 50
 
+# Shared HTTP connection pools (libraries/testkit/connection_pool.py)
+# Hosts kept in the pool registry
+POOL_MAX_HOSTS = 50
+# Keep-alive connections per host, more are opened (and not kept) when they are all in use
+POOL_MAXSIZE_PER_HOST = 100
+# Requests in flight across all hosts
+POOL_MAX_IN_FLIGHT = 500
+
 # Backoff factor, double for each retry. in seconds
 BACKOFF_FACTOR = 0.2
 
@@ -21,6 +21,7 @@ from keywords.utils import add_cbs_to_sg_config_server_field, log_info, random_s
 from keywords.constants import SYNC_GATEWAY_CERT, SGW_DB_CONFIGS, SYNC_GATEWAY_CONFIGS, SYNC_GATEWAY_CONFIGS_CPC
 from keywords.exceptions import ProvisioningError
 from keywords.remoteexecutor import RemoteExecutor
+from keywords.endpoints import invalidate_endpoints
 from utilities.cluster_config_utils import is_server_tls_skip_verify_enabled, is_admin_auth_disabled, is_tls_server_disabled
 from keywords.constants import RBAC_FULL_ADMIN
 from requests.auth import HTTPBasicAuth
@@ -64,6 +65,7 @@ class SyncGateway:
         return r.text
 
     def stop(self):
+        invalidate_endpoints(self.ip)
         status = self.ansible_runner.run_ansible_playbook(
             "stop-sync-gateway.yml",
             subset=self.hostname
@@ -71,6 +73,7 @@ class SyncGateway:
         return status
 
     def start(self, config):
+        invalidate_endpoints(self.ip)
         # c_cluster = cluster.Cluster(self.cluster_config)
         if get_sg_version(self.cluster_config) >= "3.0.0" and not is_centralized_persistent_config_disabled(self.cluster_config):
             playbook_vars, db_config_json, sgw_config_data = setup_sgwconfig_db_config(self.cluster_config, config)
@@ -225,6 +228,7 @@ class SyncGateway:
         return status
 
     def restart(self, config, cluster_config=None, use_config=False):
+        invalidate_endpoints(self.ip)
 
         if cluster_config is None:
             cluster_config = self.cluster_config
@@ -1,4 +1,3 @@
-import requests
 import concurrent.futures
 import json
 import base64
@@ -11,6 +10,8 @@ from requests.exceptions import HTTPError
 from libraries.testkit.debug import log_request
 from libraries.testkit.debug import log_response
 from libraries.testkit import settings
+from libraries.testkit.connection_pool import pooled_session
+from keywords import multipart
 import logging
 log = logging.getLogger(settings.LOGGER)
 
@@ -26,9 +27,8 @@ class User:
         self.channels = list(channels)
         self.target = target
 
-        self._session = requests.Session()
-        adapter = requests.adapters.HTTPAdapter(pool_connections=100, pool_maxsize=100)
-        self._session.mount('http://', adapter)
+        # Connections come from the shared pools, the session only holds this user's headers
+        self._session = pooled_session()
         self._session.headers["Content-Type"] = "application/json"
 
         if self.name is not None:
@@ -52,18 +52,13 @@ class User:
         docs_array = [{"id": doc_id} for doc_id in doc_ids]
         body = {"docs": docs_array}
 
-        resp = self._session.post("{0}/{1}/_bulk_get".format(self.target.url, self.db), data=json.dumps(body))
+        resp = self._session.post("{0}/{1}/_bulk_get".format(self.target.url, self.db), data=json.dumps(body),
+                                  headers=multipart.PART_ENCODING_HEADERS, stream=True)
         log.debug("POST {}".format(resp.url))
         resp.raise_for_status()
 
         # Parse Mime and build python obj of docs returned
-        # May need to fix this if we start including attachments
-        docs = []
-        for part in resp.text.splitlines():
-            if part.startswith("{"):
-                docs.append(json.loads(part))
-
-        return docs
+        return list(multipart.iter_response_docs(resp))
 
     # GET /{db}/_all_docs
     def get_all_docs(self):
@@ -0,0 +1,58 @@
+import os
+
+from libraries.provision import ansible_python_runner
+from libraries.provision.ansible_python_runner import TaskTimer, _inventory_context
+
+
+class FakePlaybook(object):
+
+    def __init__(self, file_name):
+        self._file_name = file_name
+
+
+class FakeTask(object):
+
+    def __init__(self, name):
+        self.name = name
+
+    def get_name(self):
+        return self.name
+
+
+def test_task_timer_records_each_task():
+    now = [0]
+    timer = TaskTimer(clock=lambda: now[0])
+
+    timer.v2_playbook_on_start(FakePlaybook("/playbooks/stop-sync-gateway.yml"))
+    timer.v2_playbook_on_task_start(FakeTask("stop service"), False)
+    now[0] = 3
+    timer.v2_playbook_on_task_start(FakeTask("wait for port"), False)
+    now[0] = 4
+    timer.v2_playbook_on_start(FakePlaybook("/playbooks/delete-sync-gateway-artifacts.yml"))
+    timer.v2_playbook_on_task_start(FakeTask("delete logs"), False)
+    now[0] = 9
+    timer.v2_playbook_on_stats(None)
+
+    assert timer.timings == [
+        ("stop-sync-gateway.yml", "stop service", 3),
+        ("stop-sync-gateway.yml", "wait for port", 1),
+        ("delete-sync-gateway-artifacts.yml", "delete logs", 5),
+    ]
+    assert timer.slowest(1) == [("delete-sync-gateway-artifacts.yml", "delete logs", 5)]
+    assert list(timer.playbook_totals().items()) == [("stop-sync-gateway.yml", 4), ("delete-sync-gateway-artifacts.yml", 5)]
+
+
+def test_inventory_is_parsed_once_per_file_version(tmp_path):
+    ansible_python_runner.clear_inventory_cache()
+    inventory_file = tmp_path / "cluster"
+    inventory_file.write_text("[sync_gateways]\nsg1 ansible_host=10.0.0.1\n")
+
+    loader, inventory = _inventory_context(str(inventory_file))
+    assert _inventory_context(str(inventory_file)) == (loader, inventory)
+    assert [host.name for host in inventory.get_hosts("sync_gateways")] == ["sg1"]
+
+    inventory_file.write_text("[sync_gateways]\nsg1 ansible_host=10.0.0.1\nsg2 ansible_host=10.0.0.2\n")
+    os.utime(str(inventory_file), ns=(0, 0))
+    _, reloaded = _inventory_context(str(inventory_file))
+    assert reloaded is not inventory
+    assert [host.name for host in reloaded.get_hosts("sync_gateways")] == ["sg1", "sg2"]
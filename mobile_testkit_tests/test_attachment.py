@@ -1,4 +1,9 @@
+import base64
+import io
+
 import pytest
+from PIL import Image
+
 from keywords import attachment
 
 
@@ -10,3 +15,39 @@ def test_load_from_data_dir_requires_list():
 def test_load_from_data_dir():
     atts = attachment.load_from_data_dir(["sample_text.txt", "golden_gate_large.jpg"])
     assert len(atts) == 2 and atts[0].name == "sample_text.txt" and atts[1].name == "golden_gate_large.jpg"
+
+
+def test_load_from_data_dir_keeps_binary_content():
+    att = attachment.load_from_data_dir(["golden_gate_large.jpg"])[0]
+    with open("resources/data/golden_gate_large.jpg", "rb") as f:
+        assert att.content == f.read()
+    assert base64.standard_b64decode(att.data) == att.content
+
+
+def test_generate_png_is_a_valid_png():
+    att = attachment.generate_png(30, 20)[0]
+
+    assert att.name.endswith(".png")
+    image = Image.open(io.BytesIO(att.content))
+    assert image.size == (30, 20)
+    assert len(image.convert("RGB").tobytes()) == 30 * 20 * 3
+
+
+def test_seeded_png_is_deterministic_and_cached():
+    factory = attachment.AttachmentFactory(max_cached=1)
+    first = factory.png(10, 10, seed=42)
+    second = factory.png(10, 10, seed=42)
+
+    assert first.content is second.content
+    assert first.name != second.name
+    assert factory.png(10, 10, seed=43).content != first.content
+    # Evicted, encoded again with the same pixels
+    assert factory.png(10, 10, seed=42).content == first.content
+    assert factory.png(10, 10).content != factory.png(10, 10).content
+
+
+def test_attachment_stream():
+    att = attachment.Attachment("a.txt", base64.standard_b64encode(b"0123456789"))
+
+    assert [bytes(chunk) for chunk in att.stream(chunk_size=4)] == [b"0123", b"4567", b"89"]
+    assert len(att) == 10
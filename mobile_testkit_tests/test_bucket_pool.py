@@ -0,0 +1,145 @@
+from keywords import couchbaseserver
+from keywords.couchbaseserver import BucketPool, CouchbaseServer
+
+
+class FakeServer(object):
+
+    def __init__(self, buckets):
+        self.url = "http://cbs:8091"
+        self.buckets = list(buckets)
+        self.events = []
+
+    def get_bucket_names(self):
+        return list(self.buckets)
+
+    def flush_bucket(self, name):
+        self.events.append(("flush", name))
+
+    def drop_bucket_indexes(self, name):
+        self.events.append(("drop_indexes", name))
+
+    def wait_for_bucket_ready(self, name):
+        pass
+
+    def delete_buckets(self):
+        self.events.append(("delete", list(self.buckets)))
+        self.buckets = []
+
+    def create_buckets(self, bucket_names, cluster_config, ipv6=False):
+        self.events.append(("create", list(bucket_names)))
+        self.buckets.extend(bucket_names)
+
+    def wait_for_ready_state(self):
+        pass
+
+
+def test_acquire_creates_missing_buckets():
+    server = FakeServer(["old"])
+    pool = BucketPool(server, "cluster")
+
+    assert pool.acquire(["data-bucket"]) == ["data-bucket"]
+    pool.close()
+
+    assert server.events == [("delete", ["old"]), ("create", ["data-bucket"])]
+
+
+def test_acquire_recycles_existing_buckets_on_first_use():
+    server = FakeServer(["data-bucket"])
+    pool = BucketPool(server, "cluster")
+
+    pool.acquire(["data-bucket"])
+    pool.close()
+
+    assert server.events == [("flush", "data-bucket"), ("drop_indexes", "data-bucket")]
+
+
+def test_acquire_recycles_used_buckets():
+    server = FakeServer([])
+    pool = BucketPool(server, "cluster")
+    pool.acquire(["data-bucket"])
+    server.events = []
+
+    pool.acquire(["data-bucket"])
+    pool.close()
+
+    assert server.events == [("flush", "data-bucket"), ("drop_indexes", "data-bucket")]
+
+
+def test_idle_buckets_are_recycled_in_background():
+    server = FakeServer([])
+    pool = BucketPool(server, "cluster")
+    pool.acquire(["a", "b"])
+    server.events = []
+
+    # 'b' is idle, it gets recycled in the background and is clean for the next acquire
+    pool.acquire(["a"])
+    server.events = [event for event in server.events if event[1] == "a"]
+    pool.acquire(["b"])
+    pool.close()
+
+    assert ("flush", "b") not in server.events
+    # 'a' went idle in turn and was recycled by close()
+    assert server.events[-2:] == [("flush", "a"), ("drop_indexes", "a")]
+    assert pool._dirty == {"b"}
+
+
+class FakeResponse(object):
+
+    def __init__(self, obj, status_code=200):
+        self.obj = obj
+        self.status_code = status_code
+        self.text = str(obj)
+
+    def json(self):
+        return self.obj
+
+
+class FakeSession(object):
+
+    def __init__(self, statuses):
+        self.statuses = list(statuses)
+        self.urls = []
+
+    def get(self, url):
+        self.urls.append(url)
+        return FakeResponse({"nodes": [{"status": status} for status in self.statuses.pop(0)]})
+
+
+def test_wait_for_ready_state_polls_until_healthy(monkeypatch):
+    monkeypatch.setattr(couchbaseserver, "log_r", lambda resp: None)
+    server = CouchbaseServer.__new__(CouchbaseServer)
+    server.url = "http://cbs:8091"
+    server._session = FakeSession([["warmup", "healthy"], ["healthy", "healthy"]])
+
+    server.wait_for_ready_state()
+
+    assert server._session.urls == ["http://cbs:8091/pools/nodes"] * 2
+
+
+def test_wait_for_bucket_ready(monkeypatch):
+    monkeypatch.setattr(couchbaseserver, "log_r", lambda resp: None)
+    server = CouchbaseServer.__new__(CouchbaseServer)
+    server.url = "http://cbs:8091"
+    server._session = FakeSession([["warmup"], ["healthy"]])
+
+    server.wait_for_bucket_ready("data-bucket")
+
+    assert server._session.urls == ["http://cbs:8091/pools/default/buckets/data-bucket"] * 2
+
+
+def test_drop_bucket_indexes_only_touches_the_bucket():
+    server = CouchbaseServer.__new__(CouchbaseServer)
+    statements = []
+
+    def query(statement):
+        statements.append(statement)
+        return {"results": ["sg_channels_x1", "test_idx"]}
+
+    server._query = query
+    server.drop_bucket_indexes("data-bucket")
+
+    assert statements == [
+        'SELECT RAW name FROM system:indexes WHERE keyspace_id = "data-bucket"',
+        "DROP INDEX `data-bucket`.`test_idx`",
+        'DELETE FROM system:prepareds WHERE statement LIKE "%`data-bucket`%"',
+    ]
@@ -0,0 +1,148 @@
+import json
+import threading
+
+import pytest
+
+from keywords import endpoints
+from keywords.bulk_docs import BulkDocsStats
+from keywords.bulk_docs import chunks
+from keywords.exceptions import RestError
+from keywords.MobileRestClient import MobileRestClient
+
+SG_URL = "http://sg1:4984"
+SG_ROOT = {"vendor": {"name": "Couchbase Sync Gateway", "version": "3.1"}}
+
+
+@pytest.fixture(autouse=True)
+def clear_endpoints():
+    endpoints.invalidate_endpoints()
+    yield
+    endpoints.invalidate_endpoints()
+
+
+class FakeResponse(object):
+
+    def __init__(self, body):
+        self._json = body
+        self.status_code = 200
+        self.request = self
+        self.method = "POST"
+        self.url = "fake"
+        self.headers = {}
+        self.body = None
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self._json
+
+
+def make_client(fail_ids=()):
+    client = MobileRestClient()
+    client.bulk_requests = []
+    lock = threading.Lock()
+
+    def request(method, url, **kwargs):
+        if url == SG_URL:
+            return FakeResponse(SG_ROOT)
+        docs = json.loads(kwargs["data"])["docs"]
+        with lock:
+            client.bulk_requests.append(docs)
+        return FakeResponse([
+            {"id": doc["_id"], "error": "conflict"} if doc["_id"] in fail_ids else {"id": doc["_id"], "rev": "1-abc"}
+            for doc in docs
+        ])
+
+    client._session.request = request
+    return client
+
+
+def test_chunks_is_lazy():
+    consumed = []
+
+    def docs():
+        for i in range(5):
+            consumed.append(i)
+            yield i
+
+    chunk_iter = chunks(docs(), 2)
+    assert next(chunk_iter) == [0, 1]
+    assert consumed == [0, 1]
+    assert list(chunk_iter) == [[2, 3], [4]]
+
+
+def test_add_bulk_docs_unchunked_is_one_request():
+    client = make_client()
+
+    resp = client.add_bulk_docs(SG_URL, "db", [{"_id": "doc_{}".format(i)} for i in range(7)])
+
+    assert len(client.bulk_requests) == 1
+    assert [doc["id"] for doc in resp] == ["doc_{}".format(i) for i in range(7)]
+
+
+def test_add_bulk_docs_unchunked_posts_inline_without_stats(monkeypatch):
+    client = make_client()
+    threads = []
+    logged = []
+    request = client._session.request
+
+    def record_thread(method, url, **kwargs):
+        threads.append(threading.current_thread())
+        return request(method, url, **kwargs)
+
+    client._session.request = record_thread
+    monkeypatch.setattr("keywords.MobileRestClient.log_info", logged.append)
+    monkeypatch.setattr("keywords.MobileRestClient.ThreadPoolExecutor", None)
+
+    client.add_bulk_docs(SG_URL, "db", [{"_id": "doc_0"}])
+
+    assert threads[-1] is threading.current_thread()
+    assert logged == []
+
+    stats = BulkDocsStats()
+    client.add_bulk_docs(SG_URL, "db", [{"_id": "doc_1"}], stats=stats)
+    assert stats.docs == 1
+    assert logged == [stats.summary()]
+
+
+def test_add_bulk_docs_chunked_keeps_order_and_records_stats():
+    client = make_client()
+    stats = BulkDocsStats()
+
+    docs = ({"_id": "doc_{}".format(i)} for i in range(25))
+    resp = client.add_bulk_docs(SG_URL, "db", docs, chunk_size=10, concurrency=3, stats=stats)
+
+    assert sorted(len(chunk) for chunk in client.bulk_requests) == [5, 10, 10]
+    assert [doc["id"] for doc in resp] == ["doc_{}".format(i) for i in range(25)]
+    assert stats.docs == 25 and len(stats.chunk_latencies) == 3
+    assert stats.bytes > 0 and stats.docs_per_sec > 0
+    assert sum(count for _, count in stats.latency_histogram()) == 3
+
+
+def test_add_bulk_docs_chunked_reports_errors_after_all_chunks():
+    client = make_client(fail_ids={"doc_3"})
+
+    with pytest.raises(RestError) as err:
+        client.add_bulk_docs(SG_URL, "db", [{"_id": "doc_{}".format(i)} for i in range(6)], chunk_size=2, concurrency=2)
+
+    assert len(client.bulk_requests) == 3
+    assert "1 of 6" in str(err.value)
+
+
+def test_add_docs_chunked_uses_bulk_docs():
+    client = make_client()
+
+    added = client.add_docs(SG_URL, "db", 12, "pfx", channels=["A"], chunk_size=5, concurrency=2)
+
+    assert sorted(len(chunk) for chunk in client.bulk_requests) == [2, 5, 5]
+    assert [doc["id"] for doc in added] == ["pfx_{}".format(i) for i in range(12)]
+    assert all(doc["channels"] == ["A"] for chunk in client.bulk_requests for doc in chunk)
+
+
+def test_latency_histogram_buckets():
+    stats = BulkDocsStats(latency_buckets_ms=[10, 100])
+    for latency in [0.005, 0.05, 0.06, 1.0]:
+        stats.record_chunk(1, 10, latency)
+
+    assert stats.latency_histogram() == [(10, 1), (100, 2), (None, 1)]
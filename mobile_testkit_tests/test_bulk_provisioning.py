@@ -0,0 +1,72 @@
+import asyncio
+import json
+
+import pytest
+from aiohttp import web
+
+from libraries.testkit.provisioning import BulkProvisioner
+
+PUTS = []
+
+
+async def handle_put(request):
+    body = json.loads(await request.text())
+    PUTS.append((request.match_info["kind"], body))
+    name = request.match_info["name"]
+    if name == "broken":
+        return web.Response(status=400, text="bad request")
+    # Every user_3 PUT fails once with a retryable status
+    if name == "user_3" and len([put for put in PUTS if put[1]["name"] == "user_3"]) % 2 == 1:
+        return web.Response(status=503)
+    return web.json_response({})
+
+
+async def provision(setup):
+    del PUTS[:]
+    app = web.Application()
+    app.router.add_put("/db/{kind}/{name}", handle_put)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    try:
+        provisioner = BulkProvisioner("http://127.0.0.1:{}".format(port), "db", concurrency=4, backoff_factor=0.01)
+        handles = setup(provisioner)
+        await provisioner.run_async()
+        return provisioner, handles
+    finally:
+        await runner.cleanup()
+
+
+def test_provision_roles_users_and_grants():
+    def setup(provisioner):
+        provisioner.add_role("radio_stations", ["ABC"])
+        handles = [provisioner.add_user("user_{}".format(i), "password", channels=["ABC"], roles=["radio_stations"]) for i in range(20)]
+        provisioner.grant("user_0", channels=["terminator"])
+        return handles
+
+    provisioner, handles = asyncio.run(provision(setup))
+
+    # Roles first, grants last, the 503 was retried
+    assert PUTS[0] == ("_role", {"name": "radio_stations", "admin_channels": ["ABC"]})
+    assert PUTS[-1] == ("_user", {"name": "user_0", "admin_channels": ["terminator"], "admin_roles": []})
+    assert len(PUTS) == 1 + 20 + 1 + 1
+    assert provisioner.stats["retries"] == 1 and provisioner.stats["failed"] == 0
+
+    handle = handles[3]
+    assert handle.auth == ("user_3", "password") and handle.roles == ["radio_stations"]
+    assert handle._user is None
+
+
+def test_provision_failures_are_reported():
+    def setup(provisioner):
+        provisioner.add_user("broken", "password")
+        provisioner.grant("broken", channels=["ABC"])
+
+    with pytest.raises(ValueError) as e:
+        asyncio.run(provision(setup))
+
+    assert "broken" in str(e.value)
+    # Not retried, grants are skipped once users failed
+    assert len(PUTS) == 1
@@ -0,0 +1,61 @@
+from CBLClient.Database import Database
+from keywords.utils import compare_cbl_docs
+
+
+class FakeClient(object):
+    """ Serves database_getDocIds / getDocuments / updateDocuments from in memory dbs """
+
+    def __init__(self, dbs):
+        self.dbs = dbs
+        self.calls = []
+
+    def invokeMethod(self, method, args=None, ignore_deserialize=False):
+        params = args.getArgs()
+        self.calls.append((method, params))
+        docs = self.dbs[params["database"]]
+        if method == "database_getDocIds":
+            return sorted(docs)[params["offset"]:params["offset"] + params["limit"]]
+        if method == "database_getDocuments":
+            return {doc_id: dict(docs[doc_id]) for doc_id in params["ids"] if doc_id in docs}
+        if method == "database_updateDocuments":
+            docs.update(params["documents"])
+
+
+def make_db(dbs):
+    db = Database("http://fake:8080")
+    db._client = FakeClient(dbs)
+    return db
+
+
+def test_iter_documents_pages_through_all_docs():
+    db = make_db({"db": {"doc_{:03d}".format(i): {"i": i} for i in range(25)}})
+
+    docs = dict(db.iter_documents("db", page_size=10))
+
+    assert len(docs) == 25 and docs["doc_024"] == {"i": 24}
+    get_docs_calls = [params for method, params in db._client.calls if method == "database_getDocuments"]
+    assert [len(params["ids"]) for params in get_docs_calls] == [10, 10, 5]
+
+
+def test_iter_documents_with_doc_ids_generator():
+    db = make_db({"db": {"doc_{}".format(i): {"i": i} for i in range(5)}})
+
+    docs = list(db.iter_documents("db", page_size=2, doc_ids=("doc_{}".format(i) for i in [1, 3, 4])))
+
+    assert docs == [("doc_1", {"i": 1}), ("doc_3", {"i": 3}), ("doc_4", {"i": 4})]
+
+
+def test_update_bulk_docs_pages():
+    dbs = {"db": {"doc_{:02d}".format(i): {"i": i} for i in range(7)}}
+    db = make_db(dbs)
+
+    db.update_bulk_docs("db", number_of_updates=2, page_size=3)
+
+    assert all(doc["updates-cbl"] == 2 for doc in dbs["db"].values())
+
+
+def test_compare_cbl_docs_pages():
+    docs = {"doc_{}".format(i): {"i": i, "_id": "doc_{}".format(i)} for i in range(5)}
+    db = make_db({"db1": docs, "db2": {doc_id: dict(body) for doc_id, body in docs.items()}})
+
+    compare_cbl_docs(db, "db1", "db2", page_size=2)
@@ -0,0 +1,100 @@
+import asyncio
+import json
+import sys
+
+import pytest
+from aiohttp import web
+
+from CBLClient.AsyncClient import AsyncClient, AsyncTransport
+from CBLClient.AsyncDatabase import AsyncDatabase
+from CBLClient.Blob import Blob
+from CBLClient.Dictionary import Dictionary
+
+
+CALLS = []
+NUM_DOCS = 2
+
+
+async def handle(request):
+    method = request.match_info["method"]
+    body = json.loads(await request.text())
+    CALLS.append((method, body))
+    if method == "database_create":
+        return web.Response(text="@db_" + body["name"].strip("\""))
+    if method == "database_getDocIds":
+        offset, limit = int(body["offset"][1:]), int(body["limit"][1:])
+        doc_ids = ["doc_{}".format(i) for i in range(NUM_DOCS)][offset:offset + limit]
+        return web.Response(text=json.dumps([json.dumps(doc_id) for doc_id in doc_ids]))
+    if method == "database_getDocuments":
+        doc_ids = [json.loads(doc_id) for doc_id in json.loads(body["ids"])]
+        return web.Response(text=json.dumps({doc_id: json.dumps({"k": "I{}".format(int(doc_id[4:]) + 1)})
+                                             for doc_id in doc_ids}))
+    if method == "database_fail":
+        return web.Response(status=500, text="boom")
+    return web.Response(text="true")
+
+
+async def run_with_server(scenario):
+    del CALLS[:]
+    app = web.Application()
+    app.router.add_post("/{method}", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    transport = AsyncTransport()
+    try:
+        return await scenario("http://127.0.0.1:{}".format(port), transport), list(CALLS)
+    finally:
+        await transport.close()
+        await runner.cleanup()
+
+
+def test_async_database_calls_run_concurrently():
+    async def scenario(base_url, transport):
+        dbs = [AsyncDatabase(base_url, transport) for _ in range(10)]
+        cbl_dbs = await asyncio.gather(*[db.create("db{}".format(i)) for i, db in enumerate(dbs)])
+        docs = await dbs[0].getBulkDocs(cbl_dbs[0])
+        return cbl_dbs, docs
+
+    (cbl_dbs, docs), calls = asyncio.run(run_with_server(scenario))
+    assert sorted(db.getAddress() for db in cbl_dbs) == sorted("@db_db{}".format(i) for i in range(10))
+    assert docs == {"doc_0": {"k": 1}, "doc_1": {"k": 2}}
+    assert calls[-1] == ("database_getDocuments", {"database": "@db_db0", "ids": json.dumps(["\"doc_0\"", "\"doc_1\""]), "encrypted": "false"})
+
+
+def test_async_client_error_includes_response_body():
+    async def scenario(base_url, transport):
+        with pytest.raises(Exception) as err:
+            await AsyncClient(base_url, transport).invokeMethod("database_fail")
+        return str(err.value)
+
+    message, _ = asyncio.run(run_with_server(scenario))
+    assert "500" in message and "boom" in message
+
+
+def test_async_database_pages_through_documents(monkeypatch):
+    monkeypatch.setattr(sys.modules[__name__], "NUM_DOCS", 5)
+
+    async def scenario(base_url, transport):
+        db = AsyncDatabase(base_url, transport)
+        cbl_db = await db.create("db")
+        return [doc async for doc in db.iter_documents(cbl_db, page_size=2)]
+
+    docs, calls = asyncio.run(run_with_server(scenario))
+    assert docs == [("doc_{}".format(i), {"k": i + 1}) for i in range(5)]
+    assert [method for method, _ in calls].count("database_getDocIds") == 3
+    assert [len(json.loads(body["ids"])) for method, body in calls if method == "database_getDocuments"] == [2, 2, 1]
+
+
+def test_async_database_update_bulk_docs_with_blob():
+    async def scenario(base_url, transport):
+        db = AsyncDatabase(base_url, transport)
+        cbl_db = await db.create("db")
+        await db.update_bulk_docs_with_blob(cbl_db, Dictionary(base_url), Blob(base_url), "ios")
+
+    _, calls = asyncio.run(run_with_server(scenario))
+    assert [method for method, _ in calls] == ["database_create", "database_getDocIds", "database_getDocuments"] + \
+        ["dictionary_toMutableDictionary", "blob_createImageContent", "blob_create", "dictionary_setBlob"] * 2 + \
+        ["database_updateDocuments"]
@@ -0,0 +1,139 @@
+import json
+
+import pytest
+
+from CBLClient.Client import Client
+from CBLClient.Args import Args
+from CBLClient.MemoryPointer import MemoryPointer
+
+
+class FakeResponse(object):
+    def __init__(self, status_code, content):
+        self.status_code = status_code
+        self.content = content.encode("utf8")
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise Exception("HTTP {}".format(self.status_code))
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class FakeSession(object):
+    """ Records POSTs and answers from a handler """
+
+    def __init__(self, handler):
+        self.headers = {}
+        self.posts = []
+        self.handler = handler
+
+    def post(self, url, data=None):
+        self.posts.append((url, json.loads(data)))
+        return self.handler(url, json.loads(data))
+
+
+def batch_handler(url, body):
+    if url.endswith("/batch"):
+        results = []
+        for i, call in enumerate(body["calls"]):
+            if call["method"] == "database_getDocument":
+                results.append("@doc{}".format(i))
+            else:
+                results.append("true")
+        return FakeResponse(200, json.dumps(results))
+    return FakeResponse(200, "@single")
+
+
+def make_client(base_url, handler):
+    Client._batch_support.pop(base_url, None)
+    client = Client(base_url)
+    client.session = FakeSession(handler)
+    return client
+
+
+def get_doc_args(doc_id):
+    args = Args()
+    args.setMemoryPointer("database", MemoryPointer("@db"))
+    args.setString("id", doc_id)
+    return args
+
+
+def delete_args(doc):
+    args = Args()
+    args.setMemoryPointer("database", MemoryPointer("@db"))
+    args.setMemoryPointer("document", doc)
+    return args
+
+
+def test_batch_sends_one_request_and_chains_results():
+    client = make_client("http://batch-host:8080", batch_handler)
+
+    with client.batch():
+        doc = client.invokeMethod("database_getDocument", get_doc_args("doc_0"))
+        deleted = client.invokeMethod("database_delete", delete_args(doc))
+
+    assert len(client.session.posts) == 1
+    url, body = client.session.posts[0]
+    assert url == "http://batch-host:8080/batch"
+    assert body["calls"][0] == {"method": "database_getDocument", "args": {"database": "@db", "id": "\"doc_0\""}}
+    assert body["calls"][1]["args"]["document"] == "$0"
+
+    assert doc.getAddress() == "@doc0"
+    assert isinstance(doc.get(), MemoryPointer)
+    assert deleted.get() is True
+
+
+def test_batch_is_shared_by_clients_with_same_base_url():
+    client = make_client("http://shared-host:8080", batch_handler)
+    other = Client("http://shared-host:8080")
+    other.session = client.session
+
+    with client.batch():
+        doc = other.invokeMethod("database_getDocument", get_doc_args("doc_0"))
+        client.invokeMethod("database_delete", delete_args(doc))
+
+    assert len(client.session.posts) == 1
+    assert len(client.session.posts[0][1]["calls"]) == 2
+
+
+def test_batch_falls_back_to_per_call_dispatch():
+    def handler(url, body):
+        if url.endswith("/batch"):
+            return FakeResponse(404, "unknown method")
+        if url.endswith("database_getDocument"):
+            return FakeResponse(200, "@doc_from_single")
+        return FakeResponse(200, "true")
+
+    client = make_client("http://old-host:8080", handler)
+
+    with client.batch():
+        doc = client.invokeMethod("database_getDocument", get_doc_args("doc_0"))
+        client.invokeMethod("database_delete", delete_args(doc))
+
+    urls = [url for url, _ in client.session.posts]
+    assert urls == ["http://old-host:8080/batch",
+                    "http://old-host:8080/database_getDocument",
+                    "http://old-host:8080/database_delete"]
+    # The reference is replaced by the real address on replay
+    assert client.session.posts[2][1]["document"] == "@doc_from_single"
+    assert not Client.supports_batch("http://old-host:8080")
+
+
+def test_batch_discarded_on_error():
+    client = make_client("http://error-host:8080", batch_handler)
+
+    with pytest.raises(ValueError):
+        with client.batch():
+            result = client.invokeMethod("database_getDocument", get_doc_args("doc_0"))
+            raise ValueError("boom")
+
+    assert client.session.posts == []
+    with pytest.raises(RuntimeError):
+        result.get()
+
+
+def test_invoke_outside_batch_is_unchanged():
+    client = make_client("http://single-host:8080", batch_handler)
+    assert client.invokeMethod("database_getDocument", get_doc_args("doc_0")).getAddress() == "@single"
+    assert client.session.posts[0][0] == "http://single-host:8080/database_getDocument"
@@ -0,0 +1,85 @@
+import asyncio
+import json
+
+from aiohttp import web
+
+from keywords.ChangesFanIn import ChangesFanIn
+
+# seq -> change, the terminator is the last one
+CHANGES = [
+    {"seq": 1, "id": "doc_0", "changes": [{"rev": "1-a"}]},
+    {"seq": 2, "id": "doc_1", "changes": [{"rev": "1-a"}]},
+    {"seq": 3, "id": "doc_0", "changes": [{"rev": "2-a"}]},
+    {"seq": 4, "id": "terminator", "changes": [{"rev": "1-t"}]},
+]
+REQUESTS = []
+
+
+async def handle_changes(request):
+    body = json.loads(await request.text())
+    REQUESTS.append((request.cookies.get("SyncGatewaySession"), body))
+    since = body["since"]
+    limit = body.get("limit", len(CHANGES))
+    results = [change for change in CHANGES if change["seq"] > since][:limit]
+
+    if body["feed"] != "continuous":
+        last_seq = results[-1]["seq"] if results else since
+        return web.json_response({"results": results, "last_seq": last_seq})
+
+    resp = web.StreamResponse()
+    await resp.prepare(request)
+    # Close the first continuous connection early to exercise the reconnect
+    if since == 0:
+        results = results[:1]
+    for change in results:
+        await resp.write(json.dumps(change).encode("utf-8") + b"\n")
+        await resp.write(b"\n")
+    if since == 0:
+        await resp.write(json.dumps({"last_seq": 1}).encode("utf-8") + b"\n")
+    await resp.write_eof()
+    return resp
+
+
+async def run_fan_in(num_users):
+    del REQUESTS[:]
+    app = web.Application()
+    app.router.add_post("/db/_changes", handle_changes)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    try:
+        fan_in = ChangesFanIn("http://127.0.0.1:{}".format(port), "db", "terminator", changes_limit=2)
+        for i in range(num_users):
+            fan_in.add_user("unique_user_{}".format(i), ("SyncGatewaySession", "session_{}".format(i)))
+        fan_in.add_user("filtered_doc_ids_user_0", ("SyncGatewaySession", "filtered"), doc_ids_filtered=True)
+        return fan_in, await fan_in.run_async()
+    finally:
+        await runner.cleanup()
+
+
+def test_fan_in_runs_every_feed_to_the_terminator():
+    fan_in, results = asyncio.run(run_fan_in(50))
+
+    assert len(results) == 51
+    for feed in ["normal", "longpoll", "continuous"]:
+        assert results["unique_user_7"][feed] == {"doc_0": "2-a", "doc_1": "1-a"}
+    assert list(results["filtered_doc_ids_user_0"]) == ["normal"]
+
+    summary = fan_in.summary()
+    assert summary["feeds"] == 50 * 3 + 1 and summary["done"] == summary["feeds"]
+
+    # Each user's requests carry its session, polling feeds page with the limit
+    assert ("session_7", {"feed": "normal", "limit": 2, "since": 2}) in REQUESTS
+    filtered = [body for session, body in REQUESTS if session == "filtered"]
+    assert filtered[0]["filter"] == "_doc_ids" and filtered[0]["doc_ids"] == ["terminator"]
+    continuous_since = [body["since"] for session, body in REQUESTS if session == "session_7" and body["feed"] == "continuous"]
+    assert continuous_since == [0, 1]
+
+
+def test_channel_filter_uses_the_terminator_channel():
+    fan_in = ChangesFanIn("http://sg:4984", "db", "killfeeds", terminator_channel="TERMINATE")
+    fan_in.add_user("filtered_channel_user_0", ("SyncGatewaySession", "session"), channels_filtered=True)
+
+    assert {state.body["channels"] for state in fan_in.feeds} == {"even,TERMINATE"}
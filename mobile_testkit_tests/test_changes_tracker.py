@@ -0,0 +1,91 @@
+import json
+import threading
+import time
+
+import pytest
+
+from keywords.ChangesTracker import ChangesTracker
+from keywords.exceptions import ChangesError
+
+
+class FakeStreamResponse(object):
+
+    def __init__(self, lines):
+        self.lines = lines
+        self.status_code = 200
+        self.request = self
+        self.method = "POST"
+        self.url = "fake"
+        self.headers = {}
+        self.body = None
+        self.closed = False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_lines(self):
+        for line in self.lines:
+            yield line.encode("utf-8")
+
+    def close(self):
+        self.closed = True
+
+
+def change(seq, doc_id, rev):
+    return {"seq": seq, "id": doc_id, "changes": [{"rev": rev}]}
+
+
+def test_process_changes_rejects_duplicate_revs():
+    ct = ChangesTracker("http://sg:4984", "db")
+    ct.process_changes([change(1, "doc_0", "1-a"), change(2, "doc_1", "1-a")])
+    ct.process_changes([change(3, "doc_0", "2-a")])
+
+    assert ct.processed_changes["doc_0"] == [{"rev": "1-a"}, {"rev": "2-a"}]
+    with pytest.raises(ChangesError):
+        ct.process_changes([change(4, "doc_0", "1-a")])
+
+
+def test_wait_until_is_woken_by_changes():
+    ct = ChangesTracker("http://sg:4984", "db")
+    expected = [{"id": "doc_{}".format(i), "rev": "1-a"} for i in range(100)]
+
+    def feed():
+        for i in range(100):
+            ct.process_changes([change(i + 1, "doc_{}".format(i), "1-abc")])
+
+    timer = threading.Timer(0.05, feed)
+    start = time.time()
+    timer.start()
+    assert ct.wait_until(expected, timeout=10, rev_prefix_gen=True)
+    assert time.time() - start < 2
+
+
+def test_wait_until_times_out():
+    ct = ChangesTracker("http://sg:4984", "db")
+    ct.process_changes([change(1, "doc_0", "1-a")])
+
+    assert not ct.wait_until([{"id": "doc_0", "rev": "1-a"}, {"id": "doc_1", "rev": "1-a"}], timeout=0.1)
+
+
+def test_continuous_feed_reconnects_from_last_seq():
+    ct = ChangesTracker("http://sg:4984", "db")
+    requests_since = []
+    responses = [
+        FakeStreamResponse([json.dumps(change(1, "doc_0", "1-a")), "", json.dumps({"last_seq": 1})]),
+        FakeStreamResponse([json.dumps(change(2, "doc_1", "1-a"))]),
+    ]
+
+    def post(url, data=None, **kwargs):
+        requests_since.append(json.loads(data)["since"])
+        assert kwargs["stream"]
+        if not responses:
+            ct.stop()
+            return FakeStreamResponse([])
+        return responses.pop(0)
+
+    ct._session.post = post
+    ct.start(feed="continuous")
+
+    assert requests_since == [0, 1, 2]
+    assert set(ct.processed_changes) == {"doc_0", "doc_1"}
+    assert ct.last_seq == 2
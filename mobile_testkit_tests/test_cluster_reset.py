@@ -0,0 +1,93 @@
+import json
+
+import pytest
+
+from libraries.testkit import cluster as cluster_module
+from libraries.testkit.cluster import Cluster
+
+
+class FakeAnsibleRunner(object):
+
+    def __init__(self, config):
+        pass
+
+    def run_ansible_playbook(self, script_name, extra_vars={}, subset=None):
+        return 0
+
+
+class FakeServer(object):
+
+    def __init__(self, events):
+        self.events = events
+        self.buckets = []
+        self.url = "http://cbs:8091"
+
+    def get_bucket_names(self):
+        return list(self.buckets)
+
+    def flush_buckets(self, bucket_names):
+        self.events.append(("flush", bucket_names))
+
+    def wait_for_ready_state(self):
+        pass
+
+
+class FakeConfig(object):
+
+    def __init__(self, conf_path, cluster_config=None, bucket_list=[]):
+        pass
+
+    def get_mode(self):
+        return "cc"
+
+
+@pytest.fixture
+def reset_cluster(tmp_path, monkeypatch):
+    cluster_config = str(tmp_path / "cluster")
+    with open(cluster_config + ".json", "w") as f:
+        json.dump({"environment": {"reset_by_diff": True}, "couchbase_servers": []}, f)
+    sg_config = tmp_path / "sg_config.json"
+    sg_config.write_text('{"databases": {"db": {"bucket": "data-bucket"}}}')
+
+    events = []
+    monkeypatch.setattr(cluster_module, "AnsibleRunner", FakeAnsibleRunner)
+    monkeypatch.setattr(cluster_module, "Config", FakeConfig)
+    monkeypatch.setattr(cluster_module, "_last_resets", {})
+
+    cluster = Cluster.__new__(Cluster)
+    cluster._cluster_config = cluster_config
+    cluster.cbs_ssl = False
+    cluster.xattrs = False
+    cluster.servers = [FakeServer(events)]
+
+    def recreate_buckets(sg_config_path, bucket_list, use_config, ansible_runner):
+        events.append(("recreate", bucket_list))
+        cluster.servers[0].buckets = ["data-bucket"]
+        return FakeConfig(sg_config_path), {"vars": 1}, None, None
+
+    cluster._recreate_buckets = recreate_buckets
+    return cluster, str(sg_config), events
+
+
+def test_reset_flushes_when_nothing_changed(reset_cluster):
+    cluster, sg_config, events = reset_cluster
+
+    assert cluster.reset(sg_config, sgdb_creation=False) == "cc"
+    cluster.reset(sg_config, sgdb_creation=False)
+
+    assert events == [("recreate", []), ("flush", ["data-bucket"])]
+
+
+def test_reset_recreates_when_config_or_buckets_changed(reset_cluster, tmp_path):
+    cluster, sg_config, events = reset_cluster
+
+    cluster.reset(sg_config, sgdb_creation=False)
+    cluster.reset(sg_config, bucket_list=["other-bucket"], sgdb_creation=False)
+
+    # A test left an extra bucket behind
+    cluster.servers[0].buckets.append("extra")
+    cluster.reset(sg_config, bucket_list=["other-bucket"], sgdb_creation=False)
+
+    cluster.reset(sg_config, bucket_list=["other-bucket"], sgdb_creation=False, reset_by_diff=False)
+
+    assert [event[0] for event in events] == ["recreate", "recreate", "recreate", "recreate"]
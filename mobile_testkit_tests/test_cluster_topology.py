@@ -0,0 +1,50 @@
+import json
+
+from utilities import cluster_topology
+from utilities.cluster_config_utils import (is_delta_sync_enabled,
+                                            get_sg_version,
+                                            load_cluster_config_json,
+                                            persist_cluster_config_environment_prop)
+
+
+def write_cluster_config(tmp_path, **environment):
+    cluster_config = str(tmp_path / "mock_cluster")
+    env = {"sync_gateway_version": "3.0.0", "ipv6_enabled": False}
+    env.update(environment)
+    with open(cluster_config + ".json", "w") as f:
+        json.dump({"environment": env, "couchbase_servers": [{"ip": "cbs1"}]}, f)
+    with open(cluster_config, "w") as f:
+        f.write("[environment]\n")
+    return cluster_config
+
+
+def test_topology_is_parsed_once(tmp_path, monkeypatch):
+    cluster_config = write_cluster_config(tmp_path)
+    topology = cluster_topology.get_topology(cluster_config)
+
+    monkeypatch.setattr(cluster_topology.json, "loads", None)
+    assert cluster_topology.get_topology(cluster_config + ".json") is topology
+    assert get_sg_version(cluster_config) == "3.0.0"
+    assert not is_delta_sync_enabled(cluster_config)
+    assert topology.cbs_ips == ["cbs1"]
+
+
+def test_load_cluster_config_json_returns_a_copy(tmp_path):
+    cluster_config = write_cluster_config(tmp_path)
+
+    cluster = load_cluster_config_json(cluster_config)
+    cluster["couchbase_servers"][0]["ip"] = "[cbs1]"
+
+    assert load_cluster_config_json(cluster_config)["couchbase_servers"][0]["ip"] == "cbs1"
+
+
+def test_topology_is_reloaded_when_the_file_changes(tmp_path):
+    cluster_config = write_cluster_config(tmp_path)
+    topology = cluster_topology.get_topology(cluster_config)
+
+    persist_cluster_config_environment_prop(cluster_config, "delta_sync_enabled", True)
+    assert is_delta_sync_enabled(cluster_config)
+
+    write_cluster_config(tmp_path, sync_gateway_version="3.1.0", padding="changes the size")
+    assert get_sg_version(cluster_config) == "3.1.0"
+    assert cluster_topology.get_topology(cluster_config) is not topology
@@ -0,0 +1,59 @@
+import threading
+import time
+
+from libraries.testkit import connection_pool
+from libraries.testkit import settings
+
+
+def test_sessions_share_adapters_but_not_auth():
+    first = connection_pool.pooled_session()
+    second = connection_pool.pooled_session()
+    first.headers["Authorization"] = "Basic first"
+
+    assert first.get_adapter("http://sg:4984") is second.get_adapter("http://sg:4985")
+    assert first.get_adapter("https://sg:4984") is connection_pool.get_adapter("https://")
+    assert "Authorization" not in second.headers
+
+    # Closing a session leaves the shared pools open
+    first.close()
+    assert second.get_adapter("http://sg:4984") is connection_pool.get_adapter("http://")
+
+
+def test_in_flight_budget(monkeypatch):
+    monkeypatch.setattr(settings, "POOL_MAX_IN_FLIGHT", 2)
+    connection_pool.close_pools()
+    adapter = connection_pool.get_adapter("http://")
+
+    in_flight = []
+    peak = []
+
+    def fake_send(self, request, **kwargs):
+        in_flight.append(request)
+        peak.append(len(in_flight))
+        time.sleep(0.05)
+        in_flight.remove(request)
+
+    monkeypatch.setattr(connection_pool.HTTPAdapter, "send", fake_send)
+    threads = [threading.Thread(target=adapter.send, args=(object(),)) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert max(peak) == 2
+    connection_pool.close_pools()
+
+
+def test_exhausted_host_pool_does_not_block(monkeypatch):
+    monkeypatch.setattr(settings, "POOL_MAXSIZE_PER_HOST", 1)
+    connection_pool.close_pools()
+    pool = connection_pool.get_adapter("http://").poolmanager.connection_from_url("http://sg:4984")
+
+    # A streamed _changes feed holds the only pooled connection
+    feed_conn = pool._get_conn()
+    other_conn = pool._get_conn(timeout=0.1)
+
+    assert other_conn is not feed_conn
+    pool._put_conn(feed_conn)
+    pool._put_conn(other_conn)
+    connection_pool.close_pools()
@@ -0,0 +1,70 @@
+import json
+
+from libraries.data import doc_generators
+from libraries.data.doc_factory import DocFactory, fixed_size, lognormal_size, get_doc_factory
+
+
+def strip_time(doc):
+    doc = dict(doc)
+    doc.pop("date_time_added", None)
+    return doc
+
+
+def test_compiled_docs_have_the_generator_shape():
+    for generator in [doc_generators.simple, doc_generators.simple_user, doc_generators.four_k]:
+        factory = DocFactory(generator, seed=1)
+        assert factory.template is not None
+        doc = factory.batch(1)[0]
+        reference = generator()
+        assert sorted(doc) == sorted(reference)
+        assert [type(doc[key]) for key in sorted(doc)] == [type(reference[key]) for key in sorted(doc)]
+
+
+def test_simple_doc_values_are_random():
+    docs = DocFactory(doc_generators.simple, seed=1).batch(2)
+
+    assert len(docs[0]["dict"]["name"]) == 10
+    assert docs[0]["dict"]["name"] != docs[1]["dict"]["name"]
+    assert all(isinstance(value, bool) for value in docs[0]["dict_with_list"]["list"])
+    assert all(0 <= value <= 2 ** 63 - 1 for value in docs[0]["list"])
+    assert docs[0]["location"] == "california"
+
+
+def test_seeded_docs_are_deterministic():
+    first = DocFactory(doc_generators.simple_user, seed=7).batch(3)
+    second = DocFactory(doc_generators.simple_user, seed=7).batch(3)
+
+    assert [strip_time(doc) for doc in first] == [strip_time(doc) for doc in second]
+    assert first != DocFactory(doc_generators.simple_user, seed=8).batch(3)
+
+
+def test_json_batch_with_ids_and_extra_fields():
+    factory = DocFactory(doc_generators.simple, seed=1, extra={"channels": ["ABC"]})
+    bodies = factory.json_batch(3, id_prefix="doc", start=5)
+
+    docs = [json.loads(body) for body in bodies]
+    assert [doc["_id"] for doc in docs] == ["doc_5", "doc_6", "doc_7"]
+    assert all(doc["channels"] == ["ABC"] for doc in docs)
+
+
+def test_body_size_distributions():
+    bodies = DocFactory(doc_generators.simple, seed=1, body_size=fixed_size(4096)).json_batch(10)
+    assert {len(body) for body in bodies} == {4096}
+
+    sizes = [len(body) for body in DocFactory(doc_generators.simple, seed=1, body_size=lognormal_size(4096, maximum=65536)).json_batch(200)]
+    assert min(sizes) >= 1024 and max(sizes) <= 65536
+    assert 1024 < sorted(sizes)[100] < 16384
+
+
+def test_uncompilable_generator_falls_back_to_calls():
+    factory = DocFactory(doc_generators.complex_doc, seed=1)
+
+    assert factory.template is None
+    assert sorted(factory.batch(1)[0]) == sorted(doc_generators.complex_doc())
+
+
+def test_get_doc_factory_is_shared():
+    assert get_doc_factory("four_k") is get_doc_factory("four_k")
+    assert get_doc_factory("unknown") is get_doc_factory(None)
+    docs = list(get_doc_factory("simple").iter_docs(5, batch_size=2))
+    assert len(docs) == 5
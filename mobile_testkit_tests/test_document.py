@@ -1,6 +1,7 @@
 import pytest
 from keywords import document
 from keywords import attachment
+from keywords.exceptions import DocumentError
 
 ATTACHMENT_ONE = attachment.generate_png_100_100()
 ATTACHMENT_TWO = attachment.generate_png_100_100()
@@ -51,3 +52,46 @@ def test_document_attachment_not_list():
 def test_document_channels_not_list():
     with pytest.raises(TypeError):
         document.create_doc(None, None, None, None, "B")
+
+
+def test_vbucket_number_of_str_and_bytes_keys():
+    assert document.get_vbucket_number("doc_1") == document.get_vbucket_number(b"doc_1")
+    assert 0 <= document.get_vbucket_number("doc_1") < document.NUM_VBUCKETS
+
+
+def test_vbucket_index_takes_unique_ids_for_a_vbucket():
+    index = document.VBucketIndex(per_vbucket=2, batch_size=4096)
+
+    first = index.take(66, 5)
+    second = index.take(66, 50)
+
+    assert len(set(first + second)) == 55
+    assert {document.get_vbucket_number(doc_id) for doc_id in first + second} == {66}
+    assert all(len(ids) <= 2 for vbucket, ids in enumerate(index._ids) if vbucket != 66)
+    # Filled 'batch_size' candidates at a time, whatever the number of ids asked for
+    assert index._next % 4096 == 0
+
+
+def test_vbucket_index_one_id_per_vbucket():
+    taken = document.VBucketIndex(per_vbucket=1).take_one_per_vbucket(exclude=[66])
+
+    assert [vbucket for vbucket, _ in taken] == [vbucket for vbucket in range(document.NUM_VBUCKETS) if vbucket != 66]
+    assert all(document.get_vbucket_number(doc_id) == vbucket for vbucket, doc_id in taken)
+
+
+def test_vbucket_index_reuses_its_cache_file(tmp_path):
+    path = str(tmp_path / "vbuckets.json")
+    index = document.VBucketIndex(per_vbucket=2, prefix="rollback", path=path)
+    taken = index.take(3, 1)
+
+    reloaded = document.VBucketIndex(per_vbucket=2, prefix="rollback", path=path)
+    assert reloaded._ids[5] == index._ids[5]
+    assert reloaded.peek(3, 1) == index.peek(3, 1)
+    assert taken[0] not in reloaded.take(3, 10)
+
+    assert document.VBucketIndex(per_vbucket=2, prefix="other", path=path)._ids != reloaded._ids
+
+
+def test_vbucket_index_rejects_unknown_vbucket():
+    with pytest.raises(DocumentError):
+        document.generate_doc_ids_for_vbucket(1024, 1)
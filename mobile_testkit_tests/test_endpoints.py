@@ -0,0 +1,109 @@
+import pytest
+
+from requests.auth import HTTPBasicAuth
+
+from keywords import endpoints
+from keywords.constants import AuthType
+from keywords.constants import ServerType
+from keywords.constants import Platform
+from keywords.MobileRestClient import MobileRestClient
+from keywords.MobileRestClient import get_auth_adapter
+
+SG_ROOT = {"couchdb": "Welcome", "vendor": {"name": "Couchbase Sync Gateway", "version": "3.1"}, "version": "Couchbase Sync Gateway/3.1.0(1;abc) EE"}
+ANDROID_ROOT = {"CBLite": "Welcome", "version": "2.8.0"}
+
+
+@pytest.fixture(autouse=True)
+def clear_endpoints():
+    endpoints.invalidate_endpoints()
+    yield
+    endpoints.invalidate_endpoints()
+
+
+class FakeResponse(object):
+
+    def __init__(self, body):
+        self._json = body
+        self.status_code = 200
+        self.text = "fake"
+        self.request = self
+        self.method = "GET"
+        self.url = "fake"
+        self.headers = {}
+        self.body = None
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self._json
+
+
+def make_client(roots):
+    client = MobileRestClient()
+    client.requests = []
+
+    def request(method, url, **kwargs):
+        client.requests.append((method, url, kwargs))
+        return FakeResponse(roots[url.rstrip("/")])
+
+    client._session.request = request
+    return client
+
+
+def test_server_type_and_platform_share_one_root_request():
+    client = make_client({"http://sg1:4984": SG_ROOT})
+
+    assert client.get_server_type("http://sg1:4984") == ServerType.syncgateway
+    assert client.get_server_platform("http://sg1:4984/") == Platform.centos
+    assert client.get_server_type("http://sg1:4984", auth=("user", "pass")) == ServerType.syncgateway
+    assert len(client.requests) == 1
+
+
+def test_android_liteserv_descriptor():
+    client = make_client({"http://ls:5984": ANDROID_ROOT})
+
+    assert client.get_server_type("http://ls:5984") == ServerType.listener
+    assert client.get_server_platform("http://ls:5984") == Platform.android
+
+
+def test_unknown_vendor_raises():
+    client = make_client({"http://other:80": {"vendor": {"name": "CouchDB"}}})
+
+    with pytest.raises(ValueError):
+        client.get_server_type("http://other:80")
+
+
+def test_invalidate_by_host_drops_every_port():
+    client = make_client({"http://sg1:4984": SG_ROOT, "http://sg1:4985": SG_ROOT, "http://sg2:4984": SG_ROOT})
+    for url in ["http://sg1:4984", "http://sg1:4985", "http://sg2:4984"]:
+        client.get_server_type(url)
+
+    endpoints.invalidate_endpoints("sg1")
+
+    for url in ["http://sg1:4984", "http://sg1:4985", "http://sg2:4984"]:
+        client.get_server_type(url)
+    assert len(client.requests) == 5
+
+
+def test_auth_adapter_request_kwargs():
+    session = get_auth_adapter(("SyncGatewaySession", "abc"))
+    basic = get_auth_adapter(("user", "pass"))
+    none = get_auth_adapter(None)
+
+    assert session.auth_type == AuthType.session
+    assert session.request_kwargs == {"cookies": {"SyncGatewaySession": "abc"}}
+    assert basic.request_kwargs == {"auth": ("user", "pass")}
+    assert none.request_kwargs == {} and not none
+    assert get_auth_adapter(("user", "pass")) is not basic
+    assert get_auth_adapter(("user", "pass")).request_kwargs == basic.request_kwargs
+    assert get_auth_adapter(basic) is basic
+    assert isinstance(get_auth_adapter(HTTPBasicAuth("user", "pass")).request_kwargs["auth"], HTTPBasicAuth)
+
+
+def test_request_applies_session_cookie():
+    client = make_client({"http://sg1:4984/db/doc": {"_id": "doc"}})
+
+    client._request("get", "http://sg1:4984/db/doc", auth=("SyncGatewaySession", "abc"), params={"rev": "1-a"})
+
+    assert client.requests == [("get", "http://sg1:4984/db/doc", {"params": {"rev": "1-a"}, "cookies": {"SyncGatewaySession": "abc"}})]
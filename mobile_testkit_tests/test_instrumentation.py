@@ -0,0 +1,78 @@
+import pytest
+from requests import Response, Session
+from requests.adapters import BaseAdapter
+
+from keywords import instrumentation
+from keywords.instrumentation import Histogram, LatencyRecorder, endpoint_template, instrument_session, method_template
+
+
+@pytest.mark.parametrize("url, template", [
+    ("http://sg:4984/db/", "/{db}"),
+    ("http://sg:4984/db/_changes?feed=longpoll", "/{db}/_changes"),
+    ("http://sg:4984/db/doc_1?rev=1-a", "/{db}/{doc}"),
+    ("http://sg:4984/db/doc_1/att.png", "/{db}/{doc}/{attachment}"),
+    ("http://sg:4985/db/_user/seth", "/{db}/_user/{name}"),
+    ("http://sg:4985/_expvar", "/_expvar"),
+])
+def test_endpoint_template(url, template):
+    assert endpoint_template(url) == template
+
+
+def test_method_template():
+    assert method_template("http://device:8080/database_create") == "database_create"
+
+
+def test_histogram_percentiles():
+    histogram = Histogram()
+    for ms in range(1, 1001):
+        histogram.record(ms / 1000.0)
+
+    assert histogram.count == 1000
+    for percent, expected in [(50, 0.5), (95, 0.95), (99, 0.99)]:
+        assert histogram.percentile(percent) == pytest.approx(expected, rel=0.01)
+    assert histogram.percentile(100) == pytest.approx(1.0, rel=0.01)
+
+    other = Histogram()
+    other.record(5)
+    histogram.merge(other)
+    assert histogram.summary()["max"] == 5
+    assert histogram.summary()["count"] == 1001
+
+
+class FakeAdapter(BaseAdapter):
+
+    def send(self, request, **kwargs):
+        resp = Response()
+        resp.status_code = 201
+        resp._content = b'{"ok": true}'
+        resp.request = request
+        resp.url = request.url
+        return resp
+
+    def close(self):
+        pass
+
+
+def test_instrumented_session_records_calls():
+    session = Session()
+    session.mount("http://", FakeAdapter())
+    instrument_session(session, "rest")
+    recorder = LatencyRecorder()
+    instrumentation.add_hook(recorder)
+    try:
+        recorder.scope = "test_a"
+        session.put("http://sg:4984/db/doc_1", data='{"a": 1}')
+        session.put("http://sg:4984/db/doc_2", data='{"a": 2}')
+        recorder.scope = "test_b"
+        session.put("http://sg:4984/db/doc_3", data='{"a": 3}')
+    finally:
+        instrumentation.remove_hook(recorder)
+
+    report = recorder.report()
+    total = report["endpoints"]["rest PUT /{db}/{doc}"]
+    assert total["count"] == 3
+    assert total["statuses"] == {"201": 3}
+    assert total["bytes_out"] == 24
+    assert total["bytes_in"] == 36
+    assert report["tests"]["test_a"]["rest PUT /{db}/{doc}"]["count"] == 2
+    assert report["tests"]["test_b"]["rest PUT /{db}/{doc}"]["count"] == 1
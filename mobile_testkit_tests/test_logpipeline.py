@@ -0,0 +1,91 @@
+import json
+import logging
+
+from requests import Request, Response
+
+from keywords import logpipeline
+from keywords.logpipeline import HttpMessage, preview, start_log_pipeline, stop_log_pipeline
+from keywords.utils import log_info, log_r
+
+
+def make_response(body=b'{"ok": true}', request_body=None):
+    resp = Response()
+    resp.status_code = 200
+    resp.request = Request("POST", "http://sg:4984/db/_bulk_docs", data=request_body).prepare()
+    resp._content = body
+    return resp
+
+
+def test_preview_is_bounded():
+    assert preview(None) is None
+    assert preview("abc", limit=5) == "abc"
+    assert preview(b"x" * 10, limit=4) == "xxxx... (10 bytes)"
+    assert preview(iter([b"a"])) == "<list_iterator>"
+
+
+def test_log_r_does_not_format_bodies_when_debug_is_disabled(monkeypatch):
+    built = []
+    monkeypatch.setattr(logpipeline.logger, "level", logging.INFO)
+    monkeypatch.setattr("keywords.utils.HttpMessage", lambda resp: built.append(resp))
+
+    log_r(make_response(), info=False)
+
+    assert built == []
+
+
+def test_http_message_leaves_streamed_body_unread():
+    resp = make_response(body=False)
+    resp.raw = None
+
+    assert HttpMessage(resp).fields()["response_body"] is None
+
+
+def test_log_r_never_reads_a_streamed_body(caplog):
+    class StreamedResponse(Response):
+        @property
+        def content(self):
+            raise AssertionError("streamed body read")
+
+    resp = StreamedResponse()
+    resp.status_code = 200
+    resp.request = Request("POST", "http://sg:4984/db/_bulk_get", data="{}").prepare()
+    resp._content = b"--boundary"
+    caplog.set_level(logging.DEBUG, logger="keywords")
+
+    log_r(resp, info=False, streamed=True)
+
+    assert [record.getMessage() for record in caplog.records] == ["POST http://sg:4984/db/_bulk_get 200\nHEADERS = {'Content-Length': '2'}\nBODY = {}\nRESPONSE = None"]
+
+
+def test_pipeline_writes_json_lines(tmp_path, caplog):
+    caplog.set_level(logging.DEBUG, logger="keywords")
+    path = tmp_path / "testkit_log.jsonl"
+    start_log_pipeline(str(path), level="DEBUG")
+    try:
+        log_info("hello")
+        log_r(make_response(body=b"r" * 5000, request_body='{"docs": []}'), info=False)
+        assert logpipeline.logger.propagate
+    finally:
+        stop_log_pipeline()
+
+    entries = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [entry["message"] for entry in entries] == ["hello", "POST http://sg:4984/db/_bulk_docs 200"]
+    http = entries[1]["http"]
+    assert http["request_body"] == '{"docs": []}'
+    assert http["response_body"] == "r" * 2048 + "... (5000 bytes)"
+    # The root logger still gets the records
+    assert [record.getMessage() for record in caplog.records][:1] == ["hello"]
+
+
+def test_pipeline_level_only_filters_json_lines(tmp_path, caplog):
+    caplog.set_level(logging.DEBUG, logger="keywords")
+    path = tmp_path / "testkit_log.jsonl"
+    start_log_pipeline(str(path), level="INFO")
+    try:
+        logpipeline.logger.debug("details")
+        log_info("hello")
+    finally:
+        stop_log_pipeline()
+
+    assert [json.loads(line)["message"] for line in path.read_text().splitlines()] == ["hello"]
+    assert [record.getMessage() for record in caplog.records] == ["details", "hello"]
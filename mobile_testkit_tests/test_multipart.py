@@ -0,0 +1,63 @@
+import base64
+import gzip
+import json
+
+from keywords import multipart
+from keywords.MobileRestClient import parse_multipart_response
+
+
+def part(body, headers="Content-Type: application/json"):
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    return b"\r\n".join([headers.encode("utf-8"), b"", body])
+
+
+def body(boundary, parts):
+    delimiter = b"--" + boundary.encode("utf-8")
+    return b"\r\n".join([delimiter + b"\r\n" + p for p in parts]) + b"\r\n" + delimiter + b"--\r\n"
+
+
+def split(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+DOC_WITH_DASHES = {"_id": "doc_0", "_rev": "1-a", "text": "line one\n--abc\nnot a boundary --"}
+
+
+def test_iter_docs_handles_dashes_in_docs_and_any_chunking():
+    data = body("abc", [part(json.dumps(DOC_WITH_DASHES)), part(json.dumps({"_id": "doc_1", "_rev": "1-b"}))])
+
+    for size in [1, 3, 64, len(data)]:
+        docs = list(multipart.iter_docs(split(data, size), "abc"))
+        assert docs == [DOC_WITH_DASHES, {"_id": "doc_1", "_rev": "1-b"}]
+
+
+def test_iter_docs_gzip_part():
+    compressed = gzip.compress(json.dumps({"_id": "doc_0", "_rev": "1-a"}).encode("utf-8"))
+    data = body("abc", [part(compressed, "Content-Type: application/json\r\nContent-Encoding: gzip")])
+
+    assert list(multipart.iter_docs(split(data, 5), "abc")) == [{"_id": "doc_0", "_rev": "1-a"}]
+
+
+def test_iter_docs_related_part_inlines_attachments():
+    doc = {"_id": "doc_0", "_rev": "1-a", "_attachments": {"hello.txt": {"follows": True, "length": 5}}}
+    related = body("inner", [
+        part(json.dumps(doc)),
+        part(b"hello", "Content-Type: text/plain\r\nContent-Disposition: attachment; filename=\"hello.txt\""),
+    ])
+    data = body("abc", [
+        part(related, "Content-Type: multipart/related; boundary=\"inner\""),
+        part(json.dumps({"id": "doc_1", "error": "not_found", "status": 404})),
+    ])
+
+    docs = list(multipart.iter_docs(split(data, 11), "abc"))
+
+    assert docs[0]["_attachments"]["hello.txt"] == {"length": 5, "data": base64.b64encode(b"hello").decode("ascii")}
+    assert docs[1]["error"] == "not_found"
+
+
+def test_parse_multipart_response_text():
+    text = body("5570ab", [part(json.dumps(DOC_WITH_DASHES))]).decode("utf-8")
+
+    assert parse_multipart_response(text) == {"rows": [DOC_WITH_DASHES]}
+    assert parse_multipart_response("") == {"rows": []}
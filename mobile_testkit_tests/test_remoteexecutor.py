@@ -0,0 +1,130 @@
+import pytest
+
+from keywords import remoteexecutor
+from keywords.exceptions import RemoteCommandError
+from keywords.remoteexecutor import RemoteExecutor, RotatingFileSink, execute_on_hosts, stream_output
+
+
+class FakeChannel(object):
+
+    def __init__(self, status):
+        self.status = status
+
+    def recv_exit_status(self):
+        return self.status
+
+    def close(self):
+        pass
+
+
+class FakeStream(list):
+
+    def __init__(self, lines, status=0):
+        super(FakeStream, self).__init__(lines)
+        self.channel = FakeChannel(status)
+
+    def close(self):
+        pass
+
+
+class FakeTransport(object):
+
+    def __init__(self):
+        self.active = True
+
+    def is_active(self):
+        return self.active
+
+    def set_keepalive(self, interval):
+        pass
+
+
+class FakeSSHClient(object):
+    connects = []
+
+    def __init__(self):
+        self.transport = None
+        self.commands = []
+
+    def set_missing_host_key_policy(self, policy):
+        pass
+
+    def connect(self, host, **kwargs):
+        FakeSSHClient.connects.append(host)
+        self.transport = FakeTransport()
+
+    def get_transport(self):
+        return self.transport
+
+    def exec_command(self, command, **kwargs):
+        self.commands.append(command)
+        if command == "fail":
+            return FakeStream([]), FakeStream([], status=1), FakeStream(["boom"])
+        lines = ["line {}\n".format(i) for i in range(5)]
+        return FakeStream([]), FakeStream(lines), FakeStream([])
+
+    def close(self):
+        self.transport = None
+
+
+@pytest.fixture
+def fake_ssh(monkeypatch):
+    FakeSSHClient.connects = []
+    monkeypatch.setattr(remoteexecutor.paramiko, "SSHClient", FakeSSHClient)
+    monkeypatch.setattr(remoteexecutor, "_connections", {})
+    yield FakeSSHClient
+    remoteexecutor.close_ssh_clients()
+
+
+def test_stream_output_keeps_a_bounded_tail():
+    seen = []
+    assert stream_output(["a", "b", "c"], sink=seen.append, tail_lines=2) == ["b", "c"]
+    assert seen == ["a", "b", "c"]
+
+
+def test_connection_is_reused(fake_ssh):
+    executor = RemoteExecutor("sg1")
+    status, stdout, stderr = executor.execute("ls", sink=None, tail_lines=2)
+    RemoteExecutor("sg1").execute("ls", sink=None)
+
+    assert (status, stdout, stderr) == (0, ["line 3\n", "line 4\n"], [])
+    assert fake_ssh.connects == ["sg1"]
+
+
+def test_inactive_connection_is_replaced(fake_ssh):
+    RemoteExecutor("sg1").execute("ls", sink=None)
+    remoteexecutor.get_ssh_client("sg1", RemoteExecutor("sg1").username).transport.active = False
+    RemoteExecutor("sg1").execute("ls", sink=None)
+
+    assert fake_ssh.connects == ["sg1", "sg1"]
+
+
+def test_must_execute_raises(fake_ssh):
+    with pytest.raises(RemoteCommandError):
+        RemoteExecutor("sg1").must_execute("fail", sink=None)
+
+
+def test_execute_on_hosts(fake_ssh):
+    lines = []
+    results = execute_on_hosts(["sg1", "sg2"], "ls", sink=lambda host, line: lines.append(host))
+
+    assert sorted(results) == ["sg1", "sg2"]
+    assert all(status == 0 for status, _, _ in results.values())
+    assert sorted(lines) == ["sg1"] * 5 + ["sg2"] * 5
+    assert sorted(fake_ssh.connects) == ["sg1", "sg2"]
+
+
+def test_execute_on_no_hosts(fake_ssh):
+    assert execute_on_hosts([], "ls") == {}
+    assert fake_ssh.connects == []
+
+
+def test_rotating_file_sink(tmp_path):
+    path = tmp_path / "sgload.log"
+    sink = RotatingFileSink(str(path), max_bytes=100, backup_count=2)
+    for i in range(50):
+        sink("line {} 100%\n".format(i))
+    sink.close()
+
+    assert path.read_text().splitlines()[-1] == "line 49 100%"
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["sgload.log", "sgload.log.1", "sgload.log.2"]
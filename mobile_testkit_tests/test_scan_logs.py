@@ -1,3 +1,5 @@
+import zipfile
+
 import pytest
 from keywords.exceptions import LogScanningError
 
@@ -103,3 +105,40 @@ def test_data_race_log():
 
     error_message = str(e.value)
     assert error_message.startswith("DATA RACE found!!")
+
+
+def test_scan_log_files_streams_zip_members(tmp_path):
+    log = b"first line\n2021 PANIC: boom\nok\n"
+    archive = tmp_path / "sgcollect.zip"
+    with zipfile.ZipFile(str(archive), "w") as zf:
+        zf.writestr("sgcollect/sync_gateway.log", log)
+        zf.writestr("sgcollect/config.json", b"panic")
+
+    matches = scan_logs.scan_log_files([str(tmp_path)], keywords=["panic"], processes=1)
+
+    assert matches == [scan_logs.LogMatch("{}/sgcollect/sync_gateway.log".format(archive), 2, log.index(b"PANIC"),
+                                          "panic", "2021 PANIC: boom")]
+    # Nothing is extracted
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["sgcollect.zip"]
+
+
+def test_scan_log_files_keywords_and_patterns_across_blocks(tmp_path):
+    log_path = tmp_path / "sg_info.log"
+    log_path.write_bytes(b"".join(b"line %d <ud>user</ud>\n" % i for i in range(1000)) + b"data race: hostname = sg1")
+    matcher = scan_logs.LogMatcher(keywords=["DATA RACE"], patterns=[r"hostname = (\w+)", "<ud>"])
+
+    with open(str(log_path), "rb") as f:
+        matches = list(matcher.scan_stream(f, "sg_info.log", block_size=100))
+
+    assert [m.line for m in matches if m.pattern == "<ud>"] == list(range(1, 1001))
+    assert [(m.line, m.pattern) for m in matches[-2:]] == [(1001, "DATA RACE"), (1001, r"hostname = (\w+)")]
+    assert matches[-1].text == "data race: hostname = sg1"
+
+
+def test_scan_log_files_process_pool(tmp_path):
+    for i in range(3):
+        (tmp_path / "sg_{}.log".format(i)).write_text("ok\npanic {}\n".format(i))
+
+    matches = scan_logs.scan_log_files([str(tmp_path)], keywords=["panic"], processes=2)
+
+    assert [(m.line, m.text) for m in matches] == [(2, "panic 0"), (2, "panic 1"), (2, "panic 2")]
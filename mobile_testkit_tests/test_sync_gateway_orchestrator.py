@@ -0,0 +1,103 @@
+import json
+
+import pytest
+
+from keywords import SyncGatewayOrchestrator as orchestrator_module
+from keywords.SyncGateway import sync_gateway_ready
+from keywords.SyncGatewayOrchestrator import SyncGatewayOrchestrator
+from keywords.exceptions import ProvisioningError
+from keywords.utils import hostnames_for_urls
+
+
+class FakeSyncGateway(object):
+
+    def __init__(self, events):
+        self.events = events
+
+    def restart_sync_gateways(self, cluster_config, url=None):
+        self.events.append(("restart", url))
+
+    def stop_sync_gateways(self, cluster_config, url=None):
+        self.events.append(("stop", url))
+
+
+@pytest.fixture
+def events(monkeypatch):
+    events = []
+
+    def ready(host, public=True, timeout=120):
+        if host == "broken":
+            raise Exception("TIMEOUT")
+        events.append(("ready", host, public))
+
+    monkeypatch.setattr(orchestrator_module, "wait_for_sync_gateway_ready", ready)
+    return events
+
+
+def orchestrator(events, **kwargs):
+    orchestrator = SyncGatewayOrchestrator("cluster_config", **kwargs)
+    orchestrator.sg = FakeSyncGateway(events)
+    return orchestrator
+
+
+def test_restart_all_nodes_in_one_batch(events):
+    orchestrator(events).restart(["http://sg1:4985", "http://sg2:4985", "http://sg3:4985"])
+
+    assert events[0] == ("restart", ["http://sg1:4985", "http://sg2:4985", "http://sg3:4985"])
+    assert sorted(events[1:]) == [("ready", "sg1", True), ("ready", "sg2", True), ("ready", "sg3", True)]
+
+
+def test_rolling_restart_waits_for_each_batch(events):
+    orchestrator(events, concurrency=2).restart(["ac1", "ac2", "ac3"], sg_accel=True)
+
+    assert [event[0] for event in events] == ["restart", "ready", "ready", "restart", "ready"]
+    assert events[3] == ("restart", ["ac3"]) and events[4] == ("ready", "ac3", False)
+
+
+def test_stop_does_not_probe_and_failures_are_reported(events):
+    orchestrator(events).stop(["sg1", "sg2"])
+    assert events == [("stop", ["sg1", "sg2"])]
+
+    with pytest.raises(ProvisioningError) as e:
+        orchestrator(events).restart(["sg1", "broken"])
+    assert "broken" in str(e.value)
+
+
+class FakeSession(object):
+
+    def __init__(self, statuses):
+        self.statuses = statuses
+        self.urls = []
+
+    def get(self, url, **kwargs):
+        self.urls.append(url)
+        return type("Resp", (object,), {"status_code": self.statuses.pop(0)})
+
+
+def test_sync_gateway_ready_probes_root_and_expvar(tmp_path, monkeypatch):
+    cluster_config = str(tmp_path / "cluster")
+    with open(cluster_config + ".json", "w") as f:
+        json.dump({"environment": {"sync_gateway_ssl": False}}, f)
+    monkeypatch.setenv("CLUSTER_CONFIG", cluster_config)
+
+    session = FakeSession([200, 200])
+    assert sync_gateway_ready("sg1", session=session)
+    assert session.urls == ["http://sg1:4984/", "http://sg1:4985/_expvar"]
+
+    session = FakeSession([503])
+    assert not sync_gateway_ready("fc00::11", public=False, session=session)
+    assert session.urls == ["http://[fc00::11]:4985/_expvar"]
+
+
+def test_hostnames_for_urls(tmp_path):
+    cluster_config = str(tmp_path / "cluster")
+    with open(cluster_config + ".json", "w") as f:
+        json.dump({
+            "sg_accels": [],
+            "sync_gateways": [{"name": "sg1", "ip": "10.0.0.1"}, {"name": "sg2", "ip": "10.0.0.2"}],
+            "couchbase_servers": [],
+            "load_balancers": []
+        }, f)
+
+    assert hostnames_for_urls(cluster_config, "http://10.0.0.1:4985") == "sg1"
+    assert hostnames_for_urls(cluster_config, ["10.0.0.1", "http://10.0.0.2:4984"]) == "sg1:sg2"
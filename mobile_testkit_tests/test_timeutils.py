@@ -0,0 +1,93 @@
+import time
+
+import pytest
+
+from CBLClient.Replication import Replication
+from keywords.exceptions import TimeoutException
+from keywords.timeutils import Backoff, Deadline, wait_until, get_wait_records, clear_wait_records
+
+
+@pytest.fixture(autouse=True)
+def clear_records():
+    clear_wait_records()
+    yield
+    clear_wait_records()
+
+
+def test_backoff_grows_to_maximum():
+    delays = Backoff(initial=0.1, maximum=0.5, factor=2, jitter=0).delays()
+
+    assert [next(delays) for _ in range(5)] == [0.1, 0.2, 0.4, 0.5, 0.5]
+
+
+def test_backoff_jitter_stays_in_range():
+    delays = Backoff(initial=1, maximum=1, jitter=0.2).delays()
+
+    assert all(0.8 <= next(delays) <= 1.2 for _ in range(100))
+
+
+def test_deadline_within_keeps_the_earliest():
+    outer = Deadline(0.5)
+
+    assert Deadline.within(10, outer).expires == outer.expires
+    assert Deadline.within(0.1, outer).expires < outer.expires
+    assert Deadline.within(None, None).remaining() is None
+
+
+def test_wait_until_returns_as_soon_as_predicate_is_true():
+    polls = []
+
+    def ready():
+        polls.append(time.time())
+        return len(polls) == 3 and "ready"
+
+    start = time.time()
+    assert wait_until(ready, timeout=10, backoff=Backoff(initial=0.01, jitter=0)) == "ready"
+    assert time.time() - start < 1
+
+    record = get_wait_records("ready")[0]
+    assert record.polls == 3 and record.success
+
+
+def test_wait_until_timeout():
+    with pytest.raises(TimeoutException):
+        wait_until(lambda: False, timeout=0.1, backoff=Backoff(initial=0.01), name="never")
+
+    assert wait_until(lambda: None, timeout=0.05, raise_on_timeout=False) is None
+    assert not get_wait_records("never")[0].success
+
+
+def test_wait_until_respects_outer_deadline():
+    start = time.time()
+    with pytest.raises(TimeoutException):
+        wait_until(lambda: False, timeout=30, deadline=Deadline(0.1), backoff=Backoff(initial=0.05))
+    assert time.time() - start < 1
+
+
+class FakeReplicatorClient(object):
+    """ Replicator that is busy for a few polls, then idle with everything completed """
+
+    def __init__(self, busy_polls):
+        self.busy_polls = busy_polls
+        self.activity_polls = 0
+
+    def invokeMethod(self, method, args=None, ignore_deserialize=False):
+        if method == "replicator_getActivityLevel":
+            self.activity_polls += 1
+            return "busy" if self.activity_polls <= self.busy_polls else "idle"
+        if method in ("replicator_getTotal", "replicator_getCompleted"):
+            return 10
+        if method == "replicatorConfiguration_isContinuous":
+            return True
+        return None
+
+
+def test_wait_until_replicator_idle_exits_once_idle_settles():
+    replication = Replication("http://fake:8080")
+    replication._client = FakeReplicatorClient(busy_polls=3)
+
+    start = time.time()
+    replication.wait_until_replicator_idle("@repl", sleep_time=0.05)
+
+    assert time.time() - start < 2
+    assert get_wait_records("wait_until_replicator_idle")[0].success
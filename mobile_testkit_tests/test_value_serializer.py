@@ -0,0 +1,62 @@
+import pytest
+
+from CBLClient.MemoryPointer import MemoryPointer
+from CBLClient.ValueSerializer import ValueSerializer
+from libraries.data import doc_generators
+from utilities.benchmark_value_serializer import LegacyValueSerializer
+
+
+@pytest.mark.parametrize("value", [
+    None,
+    "None",
+    "plain",
+    "with \"quotes\" and \\ backslash",
+    "unicode é中\U0001f600 and tab\t",
+    "12345,LONGTYPE",
+    True,
+    False,
+    0,
+    -999999,
+    1000000,
+    2 ** 40,
+    1.5,
+    [],
+    {},
+    [1, "a", None, [2, ["deep \"x\""]], {"k": [True, 1.25]}],
+    {"a": {"b": {"c": {"d": "deep \"value\" é"}}}, 1: "int key", "bytes": b"raw"},
+    {"ptr": MemoryPointer("@12345"), "list_of_dicts": [{"friend_one": "x"}, {"friend_two": "y"}]},
+])
+def test_serialize_matches_legacy_wire_format(value):
+    assert ValueSerializer.serialize(value) == LegacyValueSerializer.serialize(value)
+
+
+def test_serialize_args_matches_legacy_body():
+    args = [("database", MemoryPointer("@db")),
+            ("documents", {"doc_{}".format(i): doc_generators.four_k() for i in range(5)}),
+            ("id", "doc \"0\""),
+            ("limit", 1000)]
+    assert ValueSerializer.serialize_args(args) == LegacyValueSerializer.serialize_args(args)
+    assert ValueSerializer.serialize_args(None) == "{}"
+
+
+@pytest.mark.parametrize("value", [
+    "null", "", "PK\u0003\u0004", "\"plain\"", "true", "false", "I42", "L9999999999", "F1.5", "D-2.25", "#3", "#3.5",
+])
+def test_deserialize_scalars_matches_legacy(value):
+    assert ValueSerializer.deserialize(value) == LegacyValueSerializer.deserialize(value)
+
+
+def test_deserialize_memory_pointer():
+    assert ValueSerializer.deserialize("@123").getAddress() == "@123"
+    assert ValueSerializer.deserialize("\"@123\"").getAddress() == "\"@123\""
+
+
+def test_deserialize_documents_round_trip():
+    docs = {"doc_{}".format(i): doc_generators.simple() for i in range(5)}
+    response = ValueSerializer.serialize(docs)
+    assert ValueSerializer.deserialize(response) == LegacyValueSerializer.deserialize(response)
+
+
+def test_deserialize_invalid_value():
+    with pytest.raises(RuntimeError):
+        ValueSerializer.deserialize("Xbogus")
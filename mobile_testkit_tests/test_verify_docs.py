@@ -0,0 +1,117 @@
+import json
+
+import pytest
+
+from keywords import endpoints
+from keywords.MobileRestClient import MobileRestClient
+
+SG_URL = "http://sg1:4984"
+SG_ROOT = {"vendor": {"name": "Couchbase Sync Gateway", "version": "3.1"}}
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    endpoints.invalidate_endpoints()
+    monkeypatch.setattr("keywords.MobileRestClient.time.sleep", lambda seconds: None)
+    yield
+    endpoints.invalidate_endpoints()
+
+
+class FakeResponse(object):
+
+    def __init__(self, body=None, text=""):
+        self._json = body
+        self.text = text
+        self.status_code = 200
+        self.request = self
+        self.method = "POST"
+        self.url = "fake"
+        self.headers = {"Content-Type": "multipart/mixed; boundary=\"abc\""}
+        self.body = None
+
+    def iter_content(self, chunk_size=1):
+        data = self.text.encode("utf-8")
+        for i in range(0, len(data), 7):
+            yield data[i:i + 7]
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self._json
+
+
+def multipart(docs):
+    parts = ["--abc\r\nContent-Type: application/json\r\n\r\n{}\r\n".format(json.dumps(doc)) for doc in docs]
+    return "".join(parts) + "--abc--"
+
+
+class FakeSyncGateway(object):
+    """ Docs become visible in _bulk_get after a number of polls """
+
+    def __init__(self, revs_per_poll):
+        self.revs_per_poll = revs_per_poll
+        self.bulk_get_requests = []
+        self.changes_requests = []
+
+    def request(self, method, url, **kwargs):
+        if url == SG_URL:
+            return FakeResponse(SG_ROOT)
+        if url.endswith("_bulk_get"):
+            ids = [doc["id"] for doc in json.loads(kwargs["data"])["docs"]]
+            self.bulk_get_requests.append(ids)
+            visible = self.revs_per_poll[min(len(self.bulk_get_requests) - 1, len(self.revs_per_poll) - 1)]
+            docs = [{"_id": doc_id, "_rev": visible[doc_id]} if doc_id in visible else
+                    {"id": doc_id, "error": "not_found", "status": 404} for doc_id in ids]
+            return FakeResponse(text=multipart(docs))
+        if url.endswith("_changes"):
+            since = json.loads(kwargs["data"])["since"]
+            self.changes_requests.append(since)
+            return FakeResponse(self.changes[since])
+        raise AssertionError(url)
+
+
+def make_client(fake_sg):
+    client = MobileRestClient()
+    client._session.request = fake_sg.request
+    return client
+
+
+def test_verify_docs_present_only_requests_missing_docs():
+    expected = [{"id": "doc_{}".format(i), "rev": "1-a"} for i in range(5)]
+    fake_sg = FakeSyncGateway([
+        {"doc_0": "1-a", "doc_1": "1-a"},
+        {"doc_0": "1-a", "doc_1": "1-a", "doc_2": "1-a", "doc_3": "0-old"},
+        {"doc_{}".format(i): "1-a" for i in range(5)},
+    ])
+
+    make_client(fake_sg).verify_docs_present(SG_URL, "db", expected)
+
+    assert fake_sg.bulk_get_requests == [
+        ["doc_0", "doc_1", "doc_2", "doc_3", "doc_4"],
+        ["doc_2", "doc_3", "doc_4"],
+        ["doc_3", "doc_4"],
+    ]
+
+
+def test_verify_docs_present_chunks_requests():
+    expected = [{"id": "doc_{}".format(i), "rev": "1-a"} for i in range(5)]
+    fake_sg = FakeSyncGateway([{"doc_{}".format(i): "1-a" for i in range(5)}])
+
+    make_client(fake_sg).verify_docs_present(SG_URL, "db", expected, chunk_size=2)
+
+    assert fake_sg.bulk_get_requests == [["doc_0", "doc_1"], ["doc_2", "doc_3"], ["doc_4"]]
+
+
+def test_verify_docs_in_changes_resumes_from_last_seq():
+    fake_sg = FakeSyncGateway([{}])
+    fake_sg.changes = {
+        5: {"results": [{"seq": 6, "id": "doc_0", "changes": [{"rev": "1-a"}]}], "last_seq": 6},
+        6: {"results": [{"seq": 7, "id": "doc_1", "changes": [{"rev": "1-a"}]}], "last_seq": 7},
+    }
+    expected = [{"id": "doc_0", "rev": "1-a"}, {"id": "doc_1", "rev": "1-a"}]
+
+    last_seq = make_client(fake_sg).verify_docs_in_changes(SG_URL, "db", expected, since=5)
+
+    assert fake_sg.changes_requests == [5, 6]
+    assert last_seq == 7
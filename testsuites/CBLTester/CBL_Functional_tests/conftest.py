@@ -14,7 +14,7 @@ from keywords.constants import CLUSTER_CONFIGS_DIR
 from keywords.MobileRestClient import MobileRestClient
 from keywords.TestServerFactory import TestServerFactory
 from keywords.SyncGateway import sync_gateway_config_path_for_mode
-from keywords.SyncGateway import SyncGateway
+from keywords.SyncGatewayOrchestrator import SyncGatewayOrchestrator
 from keywords.exceptions import ProvisioningError
 from keywords.tklogging import Logging
 from keywords.constants import RESULTS_DIR
@@ -567,25 +567,12 @@ def params_from_base_suite_setup(request):
         # we trying 5 times in the rbac bucket user api
         server._create_internal_rbac_bucket_user(enable_sample_bucket, cluster_config=cluster_config)
 
-        # Restart SG after the bucket deletion
-        sync_gateways = cluster_topology["sync_gateways"]
-        sg_obj = SyncGateway()
-
-        for sg in sync_gateways:
-            sg_ip = host_for_url(sg["admin"])
-            log_info("Restarting sync gateway {}".format(sg_ip))
-            sg_obj.restart_sync_gateways(cluster_config=cluster_config, url=sg_ip)
-            # Giving time to SG to load all docs into it's cache
-            time.sleep(20)
+        # Restart SG after the bucket deletion, all nodes at once, each one is probed until it serves requests
+        orchestrator = SyncGatewayOrchestrator(cluster_config)
+        orchestrator.restart([host_for_url(sg["admin"]) for sg in cluster_topology["sync_gateways"]])
 
         if mode == "di":
-            ac_obj = SyncGateway()
-            sg_accels = cluster_topology["sg_accels"]
-            for ac in sg_accels:
-                ac_ip = host_for_url(ac)
-                log_info("Restarting sg accel {}".format(ac_ip))
-                ac_obj.restart_sync_gateways(cluster_config=cluster_config, url=ac_ip)
-                time.sleep(5)
+            orchestrator.restart([host_for_url(ac) for ac in cluster_topology["sg_accels"]], sg_accel=True)
 
         sdk_client = get_cluster('couchbase://{}'.format(cbs_ip), enable_sample_bucket)
         n1ql_query = 'create primary index on {}'.format(enable_sample_bucket)
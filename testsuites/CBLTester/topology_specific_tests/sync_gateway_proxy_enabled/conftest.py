@@ -12,7 +12,7 @@ from keywords.constants import CLUSTER_CONFIGS_DIR
 from keywords.MobileRestClient import MobileRestClient
 from keywords.TestServerFactory import TestServerFactory
 from keywords.SyncGateway import sync_gateway_config_path_for_mode
-from keywords.SyncGateway import SyncGateway
+from keywords.SyncGatewayOrchestrator import SyncGatewayOrchestrator
 from keywords.exceptions import ProvisioningError
 from keywords.tklogging import Logging
 from keywords.constants import RESULTS_DIR
@@ -312,16 +312,9 @@ def params_from_base_suite_setup(request):
         # we trying 5 times in the rbac bucket user api
         server._create_internal_rbac_bucket_user(enable_sample_bucket, cluster_config=cluster_config)
 
-        # Restart SG after the bucket deletion
-        sync_gateways = cluster_topology["sync_gateways"]
-        sg_obj = SyncGateway()
-
-        for sg in sync_gateways:
-            sg_ip = host_for_url(sg["admin"])
-            log_info("Restarting sync gateway {}".format(sg_ip))
-            sg_obj.restart_sync_gateways(cluster_config=cluster_config, url=sg_ip)
-            # Giving time to SG to load all docs into it's cache
-            time.sleep(20)
+        # Restart SG after the bucket deletion, all nodes at once, each one is probed until it serves requests
+        orchestrator = SyncGatewayOrchestrator(cluster_config)
+        orchestrator.restart([host_for_url(sg["admin"]) for sg in cluster_topology["sync_gateways"]])
 
         # Create primary index
         password = "password"
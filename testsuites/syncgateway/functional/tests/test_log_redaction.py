@@ -14,7 +14,7 @@ from keywords.utils import log_info, host_for_url
 from libraries.testkit.cluster import Cluster
 from utilities.cluster_config_utils import load_cluster_config_json
 from utilities.cluster_config_utils import persist_cluster_config_environment_prop, copy_to_temp_conf
-from utilities.scan_logs import scan_for_pattern, unzip_log_files
+from utilities.scan_logs import scan_for_pattern, scan_log_files
 from keywords.MobileRestClient import MobileRestClient
 from keywords import document, attachment
 from libraries.provision.ansible_runner import AnsibleRunner
@@ -501,9 +501,10 @@ def verify_log_redaction(cluster_config, log_redaction_level, mode):
                     assert False, str(le)
 
     # verify starting and ending ud tags are equal
-    num_ud_tags = subprocess.check_output("find {} -name '*.log' | xargs grep '<ud>' | wc -l".format(temp_log_path), shell=True)
-    num_end_ud_tags = subprocess.check_output("find {} -name '*.log' | xargs grep '</ud>' | wc -l".format(temp_log_path), shell=True)
-    assert num_ud_tags == num_end_ud_tags, "There is a mismatch of ud tags"
+    ud_tag_lines = {"<ud>": set(), "</ud>": set()}
+    for match in scan_log_files([temp_log_path], keywords=["<ud>", "</ud>"]):
+        ud_tag_lines[match.pattern].add((match.file, match.line))
+    assert len(ud_tag_lines["<ud>"]) == len(ud_tag_lines["</ud>"]), "There is a mismatch of ud tags"
     shutil.rmtree(temp_log_path)
 
 
@@ -659,14 +660,13 @@ def verify_all_logs_in_sgcollectzip(remote_executor, zip_file_name=None):
         result_command = subprocess.check_output(find_command, shell=True)
         assert int(result_command.decode('utf-8').strip()) == 1, "{} do not exist".format(file)
 
-    # unzip file
-    unzip_log_files(sgcollect_zip_filename)
-    sgcollect_zip_directory = sgcollect_zip_filename.split(".zip")[0]
-    grep_command = "grep -E '(?:hostname: |hostname = |Host Name:(?:\s)*)(.*)' {}/*/sync_gateway.log".format(sgcollect_zip_directory)
-    result_command = subprocess.check_output(grep_command, shell=True)
+    # scan sync_gateway.log inside the zip file
+    matches = scan_log_files([sgcollect_zip_filename], patterns=[r"(?:hostname: |hostname = |Host Name:\s*)(.*)"],
+                             extensions=["/sync_gateway.log"])
+    hostname_lines = "\n".join(match.text for match in matches).strip()
     _, stdout, _ = remote_executor.execute("hostname")
-    assert_hostname = result_command.decode('utf-8').strip() == "kernel.hostname = {}".format(stdout[0].rstrip())
-    assert (result_command.decode('utf-8').strip() == "kernel.hostname = localhost.localdomain" or assert_hostname), "did not get the right string from sync_gateway log file"
+    assert_hostname = hostname_lines == "kernel.hostname = {}".format(stdout[0].rstrip())
+    assert (hostname_lines == "kernel.hostname = localhost.localdomain" or assert_hostname), "did not get the right string from sync_gateway log file"
 
 
 @pytest.fixture(scope="function")
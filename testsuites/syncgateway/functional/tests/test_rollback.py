@@ -1,5 +1,4 @@
 import pytest
-import concurrent.futures
 
 from keywords.utils import log_info
 from libraries.testkit.cluster import Cluster
@@ -94,22 +93,20 @@ def test_rollback_server_reset(params_from_base_test_setup, sg_conf_name, x509_c
         auth=auth
     )
 
-    # create a doc that will hash to each vbucket in parallel except for vbucket 66
+    # create a doc that will hash to each vbucket except for vbucket 66
+    vbucket_index = document.get_vbucket_index()
     doc_id_for_every_vbucket_except_66 = []
-    with concurrent.futures.ProcessPoolExecutor() as pex:
-        futures = [pex.submit(document.generate_doc_id_for_vbucket, i) for i in range(num_vbuckets) if i != 66]
-        for future in concurrent.futures.as_completed(futures):
-            doc_id = future.result()
-            doc = document.create_doc(
-                doc_id=doc_id,
-                channels=seth_user_info.channels
-            )
-            doc_id_for_every_vbucket_except_66.append(doc)
+    for _, doc_id in vbucket_index.take_one_per_vbucket(exclude=[66]):
+        doc = document.create_doc(
+            doc_id=doc_id,
+            channels=seth_user_info.channels
+        )
+        doc_id_for_every_vbucket_except_66.append(doc)
 
     vbucket_66_docs = []
-    for _ in range(5):
+    for doc_id in vbucket_index.take(66, 5):
         vbucket_66_docs.append(document.create_doc(
-            doc_id=document.generate_doc_id_for_vbucket(66),
+            doc_id=doc_id,
             channels=seth_user_info.channels
         ))
 
@@ -0,0 +1,134 @@
+import argparse
+import json
+import timeit
+
+from CBLClient.MemoryPointer import MemoryPointer
+from CBLClient.ValueSerializer import ValueSerializer
+from libraries.data import doc_generators
+
+
+class LegacyValueSerializer(object):
+    """ Recursive serializer the TestServer wire format was defined with.
+    Kept as the reference for wire compatibility and as the benchmark baseline.
+    """
+
+    @staticmethod
+    def serialize(value):
+        if value is None or value == "None":
+            return "null"
+        elif isinstance(value, MemoryPointer):
+            return value.getAddress()
+        elif isinstance(value, str):
+            if value.endswith(",LONGTYPE"):
+                value = value.split(',')
+                return "L" + value[0]
+            return "\"" + str(value) + "\""
+        elif isinstance(value, bool):
+            return "true" if value else "false"
+        elif isinstance(value, int):
+            if value < 1000000 and value > -1000000:
+                return "I" + str(int(value))
+            return "L" + str(value)
+        elif isinstance(value, float):
+            return "F" + str(float(value))
+        elif isinstance(value, dict):
+            string_map = {}
+            for map_param in value:
+                if isinstance(value[map_param], bytes):
+                    map_param_value = value[map_param].decode()
+                else:
+                    map_param_value = value[map_param]
+                string_map[map_param] = LegacyValueSerializer.serialize(map_param_value)
+            return json.dumps(string_map)
+        elif isinstance(value, list):
+            return json.dumps([LegacyValueSerializer.serialize(obj) for obj in value])
+
+        raise RuntimeError("Invalid value type: {}: {}".format(value, type(value)))
+
+    @staticmethod
+    def serialize_args(args):
+        body = {}
+        for k, v in args:
+            body[k] = LegacyValueSerializer.serialize(v)
+        return json.dumps(body)
+
+    @staticmethod
+    def deserialize(value):
+        if not value or len(value) == 0 or value == "null":
+            return None
+        elif value.startswith("PK"):
+            return value
+        elif value.startswith("@") or value.startswith("\"@"):
+            return MemoryPointer(value)
+        elif value.startswith("\"") and value.endswith("\""):
+            return value[1:-1]
+        elif value == "true":
+            return True
+        elif value == "false":
+            return False
+        elif value.startswith("I") or value.startswith("L"):
+            return int(value[1:])
+        elif value.startswith("F") or value.startswith("D"):
+            return float(value[1:])
+        elif value.startswith("#"):
+            if "." in value:
+                return float(value[1:])
+            else:
+                return int(value[1:])
+        elif value.startswith("{"):
+            string_map = json.loads(value)
+            return {str(key): LegacyValueSerializer.deserialize(string_map[key]) for key in string_map}
+        elif value.startswith("["):
+            return [LegacyValueSerializer.deserialize(string) for string in json.loads(value)]
+
+        raise RuntimeError("Invalid value type: {}: {}".format(value, type(value)))
+
+
+def build_payload(num_docs, generator):
+    """ Build the args of a database_saveDocuments call with 'num_docs' docs """
+    docs = {}
+    for i in range(num_docs):
+        if generator == "four_k":
+            doc_body = doc_generators.four_k()
+        elif generator == "complex_doc":
+            doc_body = doc_generators.complex_doc()
+        else:
+            doc_body = doc_generators.simple()
+        doc_body["id"] = "doc_{}".format(i)
+        docs["doc_{}".format(i)] = doc_body
+    return [("database", MemoryPointer("@database")), ("documents", docs)]
+
+
+def run_benchmark(num_docs=10000, generator="four_k", repeat=3):
+    """ Time request body encoding and response decoding of a 'num_docs' payload
+    with the legacy and the single pass serializers. Returns the timings in seconds.
+    """
+    args = build_payload(num_docs, generator)
+    body = ValueSerializer.serialize_args(args)
+    if body != LegacyValueSerializer.serialize_args(args):
+        raise AssertionError("Encoded body differs from the legacy wire format")
+
+    # database_getDocuments responds with the serialized doc map
+    response = ValueSerializer.serialize(dict(args)["documents"])
+
+    results = {
+        "legacy_encode": min(timeit.repeat(lambda: LegacyValueSerializer.serialize_args(args), number=1, repeat=repeat)),
+        "encode": min(timeit.repeat(lambda: ValueSerializer.serialize_args(args), number=1, repeat=repeat)),
+        "legacy_decode": min(timeit.repeat(lambda: LegacyValueSerializer.deserialize(response), number=1, repeat=repeat)),
+        "decode": min(timeit.repeat(lambda: ValueSerializer.deserialize(response), number=1, repeat=repeat)),
+    }
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--num-docs", help="Number of docs in the payload", type=int, default=10000)
+    parser.add_argument("--generator", help="Doc generator: simple, four_k or complex_doc", default="four_k")
+    parser.add_argument("--repeat", help="Number of timed runs, the best one is reported", type=int, default=3)
+    args = parser.parse_args()
+
+    timings = run_benchmark(args.num_docs, args.generator, args.repeat)
+    for step in ["encode", "decode"]:
+        legacy = timings["legacy_" + step]
+        current = timings[step]
+        print("{}: legacy {:.3f}s, single pass {:.3f}s ({:.1f}x)".format(step, legacy, current, legacy / current))
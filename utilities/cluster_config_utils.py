@@ -1,4 +1,5 @@
 import configparser
+import copy
 import json
 import os
 import re
@@ -10,6 +11,7 @@ from distutils.dir_util import copy_tree
 from couchbase.cluster import PasswordAuthenticator, ClusterTimeoutOptions, ClusterOptions, Cluster
 from keywords.constants import BUCKET_LIST
 from keywords.constants import SYNC_GATEWAY_CONFIGS_CPC
+from utilities.cluster_topology import get_topology, invalidate_topology
 
 
 class CustomConfigParser(configparser.RawConfigParser):
@@ -64,7 +66,7 @@ def persist_cluster_config_environment_prop(cluster_config, property_name, value
         valid_props = ["cbs_ssl_enabled", "xattrs_enabled", "sg_lb_enabled", "sync_gateway_version", "server_version",
                        "no_conflicts_enabled", "sync_gateway_ssl", "sg_use_views", "number_replicas",
                        "delta_sync_enabled", "x509_certs", "hide_product_version", "cbs_developer_preview", "disable_persistent_config",
-                       "server_tls_skip_verify", "disable_tls_server", "disable_admin_auth", "trace_logs"]
+                       "server_tls_skip_verify", "disable_tls_server", "disable_admin_auth", "trace_logs", "reset_by_diff", "bucket_pool"]
         if property_name not in valid_props:
             raise ProvisioningError("Make sure the property you are trying to change is one of: {}".format(valid_props))
 
@@ -85,11 +87,13 @@ def persist_cluster_config_environment_prop(cluster_config, property_name, value
     with open(cluster_config, 'w') as f:
         config.write(f)
 
+    invalidate_topology(cluster_config)
+
 
 def generate_x509_certs(cluster_config, bucket_name, sg_platform):
     ''' Generate and insert x509 certs for CBS and SG TLS Handshake'''
     cbs_version = get_cbs_version(cluster_config)
-    cluster = load_cluster_config_json(cluster_config)
+    topology = get_topology(cluster_config)
     if sg_platform.lower() != "windows" and sg_platform.lower() != "macos":
         for line in open("ansible.cfg"):
             match = re.match('remote_user\s*=\s*(\w*)$', line)
@@ -107,7 +111,7 @@ def generate_x509_certs(cluster_config, bucket_name, sg_platform):
     src = os.path.join(curr_dir, "resources/x509_cert_gen")
     copy_tree(src, certs_dir)
     os.chdir(certs_dir)
-    cbs_nodes = [node["ip"] for node in cluster["couchbase_servers"]]
+    cbs_nodes = topology.cbs_ips
 
     with open("openssl-san.cnf", "a+") as f:
         for item in range(len(cbs_nodes)):
@@ -126,74 +130,58 @@ def generate_x509_certs(cluster_config, bucket_name, sg_platform):
 
 
 def load_cluster_config_json(cluster_config):
-    """ Load json version of cluster config """
-
-    if ".json" not in cluster_config:
-        cluster_config = "{}.json".format(cluster_config)
-
-    with open(cluster_config) as f:
-        cluster = json.loads(f.read())
+    """ Load json version of cluster config.
+    Returns a copy of the cached parse that the caller is free to modify
+    """
 
-    return cluster
+    return copy.deepcopy(get_topology(cluster_config).config)
 
 
 def is_cbs_ssl_enabled(cluster_config):
     """ Loads cluster config to see if cbs ssl is enabled """
 
-    cluster = load_cluster_config_json(cluster_config)
-    return cluster["environment"]["cbs_ssl_enabled"]
+    return get_topology(cluster_config).env("cbs_ssl_enabled")
 
 
 def is_x509_auth(cluster_config):
     ''' Load cluster config to see if auth should be done using x509 certs '''
-    cluster = load_cluster_config_json(cluster_config)
-    return cluster["environment"]["x509_certs"]
+    return get_topology(cluster_config).env("x509_certs")
 
 
 def get_cbs_servers(cluster_config):
     """ Loads cluster config to see if cbs ssl is enabled """
-    cluster = load_cluster_config_json(cluster_config)
-    cbs_ips = [cb["ip"] for cb in cluster["couchbase_servers"]]
-    return cbs_ips
+    return list(get_topology(cluster_config).cbs_ips)
 
 
 def is_xattrs_enabled(cluster_config):
     """ Loads cluster config to see if cbs ssl is enabled """
 
-    cluster = load_cluster_config_json(cluster_config)
-    return cluster["environment"]["xattrs_enabled"]
+    return get_topology(cluster_config).env("xattrs_enabled")
 
 
 def is_load_balancer_enabled(cluster_config):
     """ Loads cluster config to see if load balancer is enabled """
-    cluster = load_cluster_config_json(cluster_config)
-    return cluster["environment"]["sg_lb_enabled"]
+    return get_topology(cluster_config).env("sg_lb_enabled")
 
 
 def get_load_balancer_ip(cluster_config):
     """ Loads cluster config to fetch load balancer ip """
-    cluster = load_cluster_config_json(cluster_config)
-
-    lb_ip = cluster["load_balancers"][0]["ip"]
-    return lb_ip
+    return get_topology(cluster_config).config["load_balancers"][0]["ip"]
 
 
 def get_sg_replicas(cluster_config):
     """ Loads cluster config to get sync gateway version"""
-    cluster = load_cluster_config_json(cluster_config)
-    return cluster["environment"]["number_replicas"]
+    return get_topology(cluster_config).env("number_replicas")
 
 
 def get_sg_use_views(cluster_config):
     """ Loads cluster config to get sync gateway views/GSI"""
-    cluster = load_cluster_config_json(cluster_config)
-    return cluster["environment"]["sg_use_views"]
+    return get_topology(cluster_config).env("sg_use_views")
 
 
 def is_ipv6(cluster_config):
     """ Loads cluster config to get IPv6 status"""
-    cluster = load_cluster_config_json(cluster_config)
-    return cluster["environment"]["ipv6_enabled"]
+    return get_topology(cluster_config).env("ipv6_enabled")
 
 
 def get_cbs_primary_nodes_str(cluster_config, cbs_nodes):
@@ -216,75 +204,50 @@ def get_cbs_primary_nodes_str(cluster_config, cbs_nodes):
 
 def get_sg_version(cluster_config):
     """ Loads cluster config to get sync gateway version"""
-    cluster = load_cluster_config_json(cluster_config)
-    return cluster["environment"]["sync_gateway_version"]
+    return get_topology(cluster_config).env("sync_gateway_version")
 
 
 def get_cbs_version(cluster_config):
     """ Loads cluster config to get the couchbase server version"""
-    cluster = load_cluster_config_json(cluster_config)
-    return cluster["environment"]["server_version"]
+    return get_topology(cluster_config).env("server_version")
 
 
 def no_conflicts_enabled(cluster_config):
     "Get no conflicts value from cluster config"
-    cluster = load_cluster_config_json(cluster_config)
-    try:
-        return cluster["environment"]["no_conflicts_enabled"]
-    except KeyError:
-        return False
+    return get_topology(cluster_config).env("no_conflicts_enabled", False)
 
 
 def sg_ssl_enabled(cluster_config):
     "Get SG SSL value from cluster config"
-    cluster = load_cluster_config_json(cluster_config)
-    try:
-        return cluster["environment"]["sync_gateway_ssl"]
-    except KeyError:
-        return False
+    return get_topology(cluster_config).env("sync_gateway_ssl", False)
 
 
 def get_revs_limit(cluster_config):
     "Get revs limit"
-    cluster = load_cluster_config_json(cluster_config)
-    return cluster["environment"]["revs_limit"]
+    return get_topology(cluster_config).env("revs_limit")
 
 
 def get_redact_level(cluster_config):
-    cluster = load_cluster_config_json(cluster_config)
-    return cluster["environment"]["redactlevel"]
+    return get_topology(cluster_config).env("redactlevel")
 
 
 def get_sg_platform(cluster_config):
-    cluster = load_cluster_config_json(cluster_config)
-    return cluster["environment"]["sg_platform"]
+    return get_topology(cluster_config).env("sg_platform")
 
 
 def is_delta_sync_enabled(cluster_config):
     """ Loads cluster config to see if delta sync is enabled """
 
-    cluster = load_cluster_config_json(cluster_config)
-    try:
-        return cluster["environment"]["delta_sync_enabled"]
-    except KeyError:
-        return False
+    return get_topology(cluster_config).env("delta_sync_enabled", False)
 
 
 def is_cbs_ce_enabled(cluster_config):
     """ returns if true if CBS CE is enabled otherwise false """
-    cluster = load_cluster_config_json(cluster_config)
-    try:
-        return cluster["environment"]["cbs_ce"]
-    except KeyError:
-        return False
+    return get_topology(cluster_config).env("cbs_ce", False)
 
 
 def is_magma_enabled(cluster_config):
-    cluster = load_cluster_config_json(cluster_config)
-    try:
-        return cluster["environment"]["magma_storage_enabled"]
-    except KeyError:
-        return False
+    return get_topology(cluster_config).env("magma_storage_enabled", False)
 
 
 def copy_to_temp_conf(cluster_config, mode):
@@ -334,31 +297,19 @@ def replace_string_on_sgw_config(sg_conf, replace_string, new_string):
 
 def is_load_balancer_with_two_clusters_enabled(cluster_config):
     """ Loads cluster config to see if load balancer is enabled """
-    cluster = load_cluster_config_json(cluster_config)
-    try:
-        return cluster["environment"]["two_sg_cluster_lb_enabled"]
-    except KeyError:
-        return False
+    return get_topology(cluster_config).env("two_sg_cluster_lb_enabled", False)
 
 
 def is_hide_prod_version_enabled(cluster_config):
     """ Loads cluster config to see if hide_prod_version is enabled """
 
-    cluster = load_cluster_config_json(cluster_config)
-    try:
-        return cluster["environment"]["hide_product_version"]
-    except KeyError:
-        return False
+    return get_topology(cluster_config).env("hide_product_version", False)
 
 
 def is_centralized_persistent_config_disabled(cluster_config):
     """ verify centralized persistent config enabled/disabled"""
 
-    cluster = load_cluster_config_json(cluster_config)
-    try:
-        return cluster["environment"]["disable_persistent_config"]
-    except KeyError:
-        return False
+    return get_topology(cluster_config).env("disable_persistent_config", False)
 
 
 def copy_json_to_temp_file(conf, temp_config="resources/temp/temp_config.json"):
@@ -379,53 +330,43 @@ def get_bucket_list_cpc(sgw_config):
 def is_server_tls_skip_verify_enabled(cluster_config):
     """ verify server tls skip verify config enabled/disabled"""
 
-    cluster = load_cluster_config_json(cluster_config)
-    try:
-        return cluster["environment"]["server_tls_skip_verify"]
-    except KeyError:
-        return False
+    return get_topology(cluster_config).env("server_tls_skip_verify", False)
 
 
 def is_tls_server_disabled(cluster_config):
     """ verify tls server enabled/disabled"""
 
-    cluster = load_cluster_config_json(cluster_config)
-    try:
-        return cluster["environment"]["disable_tls_server"]
-    except KeyError:
-        return False
+    return get_topology(cluster_config).env("disable_tls_server", False)
 
 
 def is_admin_auth_disabled(cluster_config):
     """ verify admin auth enabled/disabled"""
 
-    cluster = load_cluster_config_json(cluster_config)
-    try:
-        return cluster["environment"]["disable_admin_auth"]
-    except KeyError:
-        return False
+    return get_topology(cluster_config).env("disable_admin_auth", False)
+
+
+def is_reset_by_diff_enabled(cluster_config):
+    """ Cluster.reset flushes the buckets instead of recreating them when nothing changed since the last reset """
+
+    return get_topology(cluster_config).env("reset_by_diff", False)
+
+
+def is_bucket_pool_enabled(cluster_config):
+    """ Cluster.reset flushes and reuses the existing buckets instead of deleting and recreating them """
+
+    return get_topology(cluster_config).env("bucket_pool", False)
 
 
 def is_sgw_ce_enabled(cluster_config):
     """ verify sgw ce enabled/disabled"""
 
-    cluster = load_cluster_config_json(cluster_config)
-    try:
-        return cluster["environment"]["sg_ce"]
-    except KeyError:
-        return False
+    return get_topology(cluster_config).env("sg_ce", False)
 
 
 def choose_logging_level(cluster_config):
     """enables trace level logging if trace_logs is True"""
 
-    cluster = load_cluster_config_json(cluster_config)
-    try:
-        trace_logs = cluster["environment"]["trace_logs"]
-    except KeyError:
-        trace_logs = False
-
-    if trace_logs:
+    if get_topology(cluster_config).env("trace_logs", False):
         logging_config = '"logging": {"log_file_path": "/tmp/sg_logs", "console": {"log_level": "trace"}, "debug": {"enabled": true}, "trace": {"enabled": true}'
     else:
         logging_config = '"logging": {"debug": {"enabled": true}'
@@ -0,0 +1,90 @@
+import json
+import os
+import threading
+
+_REQUIRED = object()
+
+
+class ClusterTopology(object):
+    """ Parsed <cluster_config>.json, shared by every caller until the file changes.
+
+    'config' must be treated as read only, load_cluster_config_json hands out copies
+    to callers that modify it. Derived values are computed once per parse with memoize().
+    """
+
+    def __init__(self, path, config, stamp):
+        self.path = path
+        self.config = config
+        self.stamp = stamp
+        self._memo = {}
+        self._lock = threading.RLock()
+
+    @property
+    def environment(self):
+        return self.config["environment"]
+
+    def env(self, name, default=_REQUIRED):
+        """ [environment] value, raises KeyError if missing and no default is given """
+        if default is _REQUIRED:
+            return self.environment[name]
+        return self.environment.get(name, default)
+
+    def memoize(self, key, compute):
+        """ Value of compute(self), computed on the first call for 'key' """
+        with self._lock:
+            if key not in self._memo:
+                self._memo[key] = compute(self)
+            return self._memo[key]
+
+    @property
+    def ipv6_enabled(self):
+        return self.env("ipv6_enabled")
+
+    @property
+    def cbs_ips(self):
+        return self.memoize("cbs_ips", lambda topology: [cb["ip"] for cb in topology.config["couchbase_servers"]])
+
+    @property
+    def sg_ips(self):
+        return self.memoize("sg_ips", lambda topology: [sg["ip"] for sg in topology.config["sync_gateways"]])
+
+
+_lock = threading.Lock()
+# abs json path -> ClusterTopology
+_topologies = {}
+
+
+def cluster_config_json_path(cluster_config):
+    if ".json" not in cluster_config:
+        cluster_config = "{}.json".format(cluster_config)
+    return os.path.abspath(cluster_config)
+
+
+def get_topology(cluster_config):
+    """ ClusterTopology of 'cluster_config' (with or without .json),
+    the file is only parsed again when its mtime or size changed
+    """
+    path = cluster_config_json_path(cluster_config)
+    stat = os.stat(path)
+    stamp = (stat.st_mtime_ns, stat.st_size)
+
+    with _lock:
+        topology = _topologies.get(path)
+        if topology is not None and topology.stamp == stamp:
+            return topology
+
+    with open(path) as f:
+        topology = ClusterTopology(path, json.loads(f.read()), stamp)
+
+    with _lock:
+        _topologies[path] = topology
+    return topology
+
+
+def invalidate_topology(cluster_config=None):
+    """ Forget the parsed 'cluster_config', or every cluster config if None """
+    with _lock:
+        if cluster_config is None:
+            _topologies.clear()
+        else:
+            _topologies.pop(cluster_config_json_path(cluster_config), None)
@@ -0,0 +1,61 @@
+""" pytest plugin recording the latency of every MobileRestClient / CBLClient call per test.
+
+At the end of the session p50 / p95 / p99, statuses and bytes per endpoint are written to
+--latency-report (results/latency_report.json by default), per test and for the whole run:
+
+    {
+        "created": "2021-06-01T10:00:00",
+        "endpoints": {"rest GET /{db}/_changes": {"count": 12, "p50": 0.012, "p95": 0.4, "p99": 0.9, ...}},
+        "tests": {"testsuites/.../test_x.py::test_x[...]": {"rest GET /{db}/_changes": {...}}}
+    }
+"""
+import datetime
+import json
+import os
+
+import pytest
+
+from keywords import instrumentation
+from keywords.instrumentation import LatencyRecorder
+from keywords.utils import log_info
+
+
+def pytest_addoption(parser):
+    parser.addoption("--latency-report", action="store", default="results/latency_report.json",
+                     help="Write per endpoint latency percentiles of the REST / TestServer calls to this file, "
+                          "empty to disable the recording")
+
+
+def pytest_configure(config):
+    if config.getoption("--latency-report"):
+        config._latency_recorder = LatencyRecorder()
+        instrumentation.add_hook(config._latency_recorder)
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_protocol(item, nextitem):
+    recorder = getattr(item.config, "_latency_recorder", None)
+    if recorder is not None:
+        recorder.scope = item.nodeid
+    yield
+    if recorder is not None:
+        recorder.scope = None
+
+
+def pytest_sessionfinish(session, exitstatus):
+    recorder = getattr(session.config, "_latency_recorder", None)
+    if recorder is None:
+        return
+    instrumentation.remove_hook(recorder)
+    if not recorder.scopes:
+        return
+
+    report = recorder.report()
+    report["created"] = datetime.datetime.now().isoformat(timespec="seconds")
+    path = session.config.getoption("--latency-report")
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(report, f, indent=4, sort_keys=True)
+    log_info("Latency report of {} endpoints written to {}".format(len(report["endpoints"]), path))
@@ -1,6 +1,11 @@
 import argparse
 import os
+import re
 import zipfile
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import islice
 
 from keywords.utils import log_info
 from keywords.exceptions import LogScanningError
@@ -32,22 +37,130 @@ def unzip_log_files(directory):
             zf.extractall(zip_file_extract_dir)
 
 
-def scan_logs(directory):
-    """ Unzips .zip files and scans directory recursively for .log files and scan them for error key words.
-    Raise an exception if any of the error keywords are found.
+class LogMatch(namedtuple("LogMatch", ["file", "line", "offset", "pattern", "text"])):
+    """ A match of a LogMatcher pattern.
+    'file' is the log path, or '<archive>.zip/<member>' for zip members,
+    'line' is 1 based and 'offset' is the byte offset of the match in the (uncompressed) file.
     """
-    # Unzip logs
-    unzip_log_files(directory)
+    __slots__ = ()
 
-    log_file_paths = get_file_paths_with_extension(directory, '.log')
 
+class LogMatcher(object):
+    """ Matches case insensitive 'keywords' and regular expressions 'patterns' in one pass.
+
+    Everything is compiled in a single bytes regex alternation, so a block of log is
+    searched once whatever the number of keywords, no line is decoded or lowercased.
+    """
+
+    def __init__(self, keywords=(), patterns=()):
+        self.patterns = list(keywords) + list(patterns)
+        if not self.patterns:
+            raise ValueError("No keyword or pattern to scan for")
+        alternatives = ["(?P<p{}>(?i:{}))".format(i, re.escape(word)) for i, word in enumerate(keywords)]
+        alternatives.extend("(?P<p{}>{})".format(i + len(keywords), pattern) for i, pattern in enumerate(patterns))
+        self.regex = re.compile("|".join(alternatives).encode("utf-8"))
+
+    def pattern_of(self, match):
+        return self.patterns[int(match.lastgroup[1:])]
+
+    def scan_stream(self, stream, name, block_size=1024 * 1024):
+        """ Yield the LogMatch of a binary stream, read 'block_size' bytes at a time.
+        Blocks are cut at the last newline so a line is never split across two searches.
+        """
+        line = 1
+        offset = 0
+        buf = b""
+        while True:
+            data = stream.read(block_size)
+            buf += data
+            cut = len(buf) if not data else buf.rfind(b"\n") + 1
+            if data and cut == 0:
+                # No newline yet, keep reading the line
+                continue
+
+            block = buf[:cut]
+            pos = 0
+            for match in self.regex.finditer(block):
+                start = match.start()
+                line += block.count(b"\n", pos, start)
+                pos = start
+                line_start = block.rfind(b"\n", 0, start) + 1
+                line_end = block.find(b"\n", start)
+                if line_end == -1:
+                    line_end = len(block)
+                text = block[line_start:line_end].decode("utf-8", "replace").rstrip()
+                yield LogMatch(name, line, offset + start, self.pattern_of(match), text)
+            line += block.count(b"\n", pos)
+
+            offset += cut
+            buf = buf[cut:]
+            if not data:
+                break
+
+
+def _is_log(name, extensions):
+    return name.endswith(tuple(extensions))
+
+
+def get_scan_tasks(paths, extensions=(".log",)):
+    """ (path, zip member or None) of every log file of 'paths'.
+    'paths' are files, .zip archives or directories walked recursively for both
+    """
+    tasks = []
+    for path in paths:
+        if os.path.isdir(path):
+            files = sorted(get_file_paths_with_extension(path, ""))
+        else:
+            files = [path]
+        for file_path in files:
+            if file_path.endswith(".zip"):
+                with zipfile.ZipFile(file_path) as zf:
+                    tasks.extend((file_path, info.filename) for info in zf.infolist()
+                                 if not info.is_dir() and _is_log(info.filename, extensions))
+            elif file_path == path or _is_log(file_path, extensions):
+                tasks.append((file_path, None))
+    return tasks
+
+
+def _scan_task(matcher, task, max_matches):
+    path, member = task
+    if member is None:
+        with open(path, "rb") as f:
+            return list(islice(matcher.scan_stream(f, path), max_matches))
+    with zipfile.ZipFile(path) as zf, zf.open(member) as f:
+        return list(islice(matcher.scan_stream(f, "{}/{}".format(path, member)), max_matches))
+
+
+def scan_log_files(paths, keywords=(), patterns=(), extensions=(".log",), processes=None, max_matches=None):
+    """ Scan log files, .zip archives (members are streamed, nothing is extracted) and directories
+    for 'keywords' (case insensitive) and regex 'patterns'.
+
+    Files are spread over a pool of 'processes' processes (os.cpu_count() by default, 1 scans in this process).
+    Returns the LogMatch list, at most 'max_matches' per file, sorted by file and offset.
+    """
+    matcher = LogMatcher(keywords, patterns)
+    tasks = get_scan_tasks(paths, extensions)
+    processes = min(processes or os.cpu_count() or 1, len(tasks))
+
+    matches = []
+    if processes <= 1:
+        for task in tasks:
+            matches.extend(_scan_task(matcher, task, max_matches))
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            for task_matches in executor.map(partial(_scan_task, matcher, max_matches=max_matches), tasks):
+                matches.extend(task_matches)
+    return sorted(matches, key=lambda match: (match.file, match.offset))
+
+
+def scan_logs(directory):
+    """ Scans directory recursively for .log files and .zip archives of .log files for error key words.
+    Raise an exception if any of the error keywords are found.
+    """
     found_errors = False
-    for logfile_path in log_file_paths:
-        try:
-            scan_for_errors(logfile_path, ['panic', 'data race'])
-        except LogScanningError:
-            log_info('Error found for: {}'.format(logfile_path))
-            found_errors = True
+    for match in scan_log_files([directory], keywords=['panic', 'data race']):
+        log_info('Error found for: {} line {}: {}'.format(match.file, match.line, match.text))
+        found_errors = True
 
     if found_errors:
         raise LogScanningError('Found errors in the sync gateway / sg accel logs!!')
@@ -55,43 +168,34 @@ def scan_logs(directory):
 
 def scan_for_errors(log_file_path, error_strings):
     """
-    Scans a log file line by line for a provided array of words.
+    Scans a log file for a provided array of words.
     We use this to look for errors, so we expect that no words will be found
     If any of the words are found, we raise an exception.
 
     'error_strings' should be a list. Example ['panic', 'error', 'data race']
+    Words are matched case insensitively, 'warning' will catch 'WARNING' and 'Warning', etc
     """
 
     if not isinstance(error_strings, list):
         raise ValueError('error_strings must be a list')
+    if not error_strings:
+        return
 
-    # Scan each line in the log file for the words to search for
-    with open(log_file_path) as f:
-        for line in f:
-            for word in error_strings:
-                # convert the word to lowercase and the line to all lower case
-                # which handles the case where 'warning' will catch 'WARNING' and 'Warning', etc
-                if word.lower() in line.lower():
-                    raise LogScanningError('{} found!! Please review: {} '.format(word, log_file_path))
+    for match in scan_log_files([log_file_path], keywords=error_strings, processes=1, max_matches=1):
+        raise LogScanningError('{} found!! Please review: {} '.format(match.pattern, log_file_path))
 
 
 def scan_for_pattern(logfile_path, pattern_list):
     """
-    Scans a log file line by line for a provided array of words.
+    Scans a log file for a provided array of words (case insensitive),
+    raises LogScanningError if none of them is found.
 
     'pattern_list' should be a list. Example ['panic', 'error', 'data race']
     """
     if not isinstance(pattern_list, list):
         raise ValueError('error_strings must be a list')
 
-    # Scan each line in the log file for the words to search for
-    flag = False
-    for line in open(logfile_path):
-        for word in pattern_list:
-            # convert the word to lowercase and the line to all lower case
-            if word.lower() in line.lower():
-                flag = True
-    if flag is False:
+    if not scan_log_files([logfile_path], keywords=pattern_list, processes=1, max_matches=1):
         raise LogScanningError('{} Did not find the words !! Please review: {} '.format(pattern_list, logfile_path))
 
 